@@ -1,6 +1,5 @@
 import ast
 import json
-from crewai import Agent
 from rules.sugaring_rules import SUGARING_RULEBOOK
 from utils.sugar_utils import (
     match_list_comprehension, match_set_comprehension, 
@@ -18,6 +17,9 @@ class ParserAgent:
     
     def get_agent(self):
         """Returns the CrewAI agent for this parser."""
+        # crewai is heavy to import, so it is only loaded when an agent is requested
+        from crewai import Agent
+
         return Agent(
             role="Python Code Parser",
             goal="Parse Python code and identify verbose constructs that can be sugared",
@@ -1,10 +1,8 @@
 import ast
 import json
 import astunparse
-from crewai import Agent
 from rules.sugaring_rules import SUGARING_RULEBOOK
-import anthropic
-import keys
+from rules.rule_index import get_rule
 
 class SugaringAgent:
     """Agent that transforms verbose code into sugared versions with explanations."""
@@ -14,16 +12,29 @@ class SugaringAgent:
         self.description = "I transform verbose Python code into more concise versions using syntactic sugar."
         self.rules = SUGARING_RULEBOOK
         
-        # Initializing the Claude client
-        try:
-            self.claude_client = anthropic.Anthropic(
-                api_key= keys.api_key # Your own ID.
-            )
-        except:
-            self.claude_client = None
+        self._claude_client = None
+        self._claude_client_loaded = False
+
+    @property
+    def claude_client(self):
+        """Claude client, created on first use so importing this agent stays cheap."""
+        if not self._claude_client_loaded:
+            self._claude_client_loaded = True
+            try:
+                import anthropic
+                import keys
+                self._claude_client = anthropic.Anthropic(
+                    api_key= keys.api_key # Your own ID.
+                )
+            except:
+                self._claude_client = None
+        return self._claude_client
     
     def get_agent(self):
         """Returns the CrewAI agent for this sugaring transformer."""
+        # crewai is heavy to import, so it is only loaded when an agent is requested
+        from crewai import Agent
+
         return Agent(
             role="Python Code Transformer",
             goal="Transform verbose Python code into concise, sugared versions",
@@ -101,6 +112,30 @@ class SugaringAgent:
         }
 
     
+    def enhance_explanation(self, rule_ref):
+        """
+        Ask Claude why a transformation improves code quality.
+
+        Returns:
+            The explanation text, or None if no client is configured or the call fails
+        """
+        if not self.claude_client:
+            return None
+        try:
+            message = self.claude_client.messages.create(
+                model="claude-3-7-sonnet-20240307",
+                max_tokens=300,
+                messages=[
+                    {
+                        "role": "user", 
+                        "content": f"Explain why this Python transformation improves code quality: {rule_ref}. Keep your response under 100 words."
+                    }
+                ]
+            )
+        except Exception:
+            return None
+        return "".join(getattr(block, "text", "") for block in message.content) or None
+
     def generate_explanation(self, transformation_result):
         explanations = []
         transformations = transformation_result.get("transformations", [])
@@ -108,30 +143,12 @@ class SugaringAgent:
         for transform in transformations:
             rule_ref = transform.get("rule_ref", "")
             
-            explanation = "No detailed explanation available."
-            
-            for rule in self.rules:
-                if rule["name"] == rule_ref:
-                    explanation = rule["explanation"]
-                    break
+            rule = get_rule(rule_ref)
+            explanation = rule["explanation"] if rule else "No detailed explanation available."
             
             # Use Claude (if available) to enhance the explanation
             if self.claude_client:
-                try:
-                    message = self.claude_client.messages.create(
-                        model="claude-3-7-sonnet-20240307",
-                        max_tokens=300,
-                        messages=[
-                            {
-                                "role": "user", 
-                                "content": f"Explain why this Python transformation improves code quality: {rule_ref}. Keep your response under 100 words."
-                            }
-                        ]
-                    )
-                    claude_explanation = message.content
-                    explanation = claude_explanation
-                except Exception as e:
-                    pass
+                explanation = self.enhance_explanation(rule_ref) or explanation
             
             explanations.append({
                 "transformation_type": transform["type"],
@@ -1,7 +1,6 @@
 import ast
 import json
 import difflib
-from crewai import Agent
 
 class ValidationAgent:
     """Agent that validates the functional equivalence of original and sugared code."""
@@ -12,6 +11,9 @@ class ValidationAgent:
     
     def get_agent(self):
         """Returns the CrewAI agent for this validator."""
+        # crewai is heavy to import, so it is only loaded when an agent is requested
+        from crewai import Agent
+
         return Agent(
             role="Code Validation Specialist",
             goal="Ensure that sugared code maintains the same functionality as the original code",
@@ -1,15 +1,17 @@
-from flask import Flask, render_template, request, jsonify
-import os
-import ast
-import astunparse
-from transformers.sugar_transformer import transform_code
-from transformers.desugar_transformer import desugar_code, DesugarTransformer
-from rules.sugaring_rules import SUGARING_RULEBOOK
-from utils.sugar_utils import (
-    match_list_comprehension, match_set_comprehension, match_dict_comprehension,
-    match_enumerate_pattern, match_ternary_operator, handle_code_errors,
-    concise_comment
-)
+from flask import Flask, Response, render_template, request, jsonify
+from server.pipeline import (dispatch_operation, run_background_result, run_rule_lookup, shape_payload,
+                             http_measurement_allowed)
+from server.wire import encode_response, decode_request, accepts_msgpack, accepts_gzip
+from server.etag import result_key, result_etag, rule_etag, representation_tag
+from server.result_cache import result_cache
+from rules.rule_index import rulebook_version
+from server.coalescing import run_coalesced, single_flight
+from server.admission import admission, Overloaded, DEFAULT_PRIORITY, PRIORITY_CLASSES
+from server.live_preview import preview_hub, submit_preview_edit, event_stream, SESSION_ID_PATTERN
+from server.prefork import streams_supported
+from server.explanations import explanation_streams, event_stream as explanation_event_stream
+from server.jobs import (job_manager, submit_job, get_job, get_job_results, cancel_job, form_options,
+                         ARCHIVE_MIME_TYPES, DEFAULT_PAGE_SIZE)
 
 app = Flask(__name__)
 
@@ -21,301 +23,190 @@ def index():
 def dashboard():
     return render_template('dashboard.html')
 
-@app.route('/process_code', methods=['POST'])
-def process_code():
-    input_code = request.json.get('code', '')
-    operation_type = request.json.get('operation', 'sugarize')  # Default to sugarize
-    
-    if operation_type == 'desugarize':
-        return process_desugarize(input_code)
-    else:
-        return process_sugarize(input_code)
-
-def process_sugarize(input_code):
-    """Process code for sugarization (making code more concise)"""
-    try:
-        # Step 1: Parse the code and identify transformation candidates
-        # Extract and preserve comments with their line numbers
-        original_lines = input_code.splitlines()
-        comments = {}
-        
-        for i, line in enumerate(original_lines):
-            stripped = line.strip()
-            if stripped.startswith('#'):
-                comments[i] = line
-        
-        parsed_ast = ast.parse(input_code)
-        ast_dump = ast.dump(parsed_ast)
-        
-        # Step 2: Identify patterns for transformation
-        potential_transformations = []
-        
-        # Simple pattern matching based on string representation
-        # Using both AST string patterns for backward compatibility and our utility functions for better accuracy
-        
-        # List comprehension
-        if "For(" in ast_dump and "Attribute(attr='append'" in ast_dump:
-            potential_transformations.append({"type": "list_comprehension", "rule_ref": "list_comprehension"})
-
-        # Set comprehension
-        if "For(" in ast_dump and "Attribute(attr='add'" in ast_dump:
-            potential_transformations.append({"type": "set_comprehension", "rule_ref": "set_comprehension"})
-
-        # Dict comprehension
-        if "For(" in ast_dump and "Subscript(value=Name" in ast_dump and "Assign(" in ast_dump:
-            potential_transformations.append({"type": "dict_comprehension", "rule_ref": "dict_comprehension"})
-
-        # Enumerate
-        if "AugAssign(target=Name" in ast_dump and "For(" in ast_dump and "Add()" in ast_dump:
-            potential_transformations.append({"type": "enumerate", "rule_ref": "enumerate_pattern"})
-
-        # Ternary operator
-        if "If(" in ast_dump and "Assign(" in ast_dump and "orelse=[" in ast_dump:
-            potential_transformations.append({"type": "ternary_operator", "rule_ref": "ternary_operator"})
-
-        # Remaining patterns kept the same for compatibility
-        if "For(" in ast_dump and "Subscript(value=Name" in ast_dump and "range(len(" in input_code:
-            potential_transformations.append({"type": "zip", "rule_ref": "zip_pattern"})
-
-        if "Assign(" in ast_dump and "Subscript(value=Name" in ast_dump and "slice=Index(value=Num" in ast_dump:
-            potential_transformations.append({"type": "tuple_unpacking", "rule_ref": "tuple_unpacking"})
-
-        if "Try(" in ast_dump and "Finally(" in ast_dump and "Attribute(attr='close'" in ast_dump:
-            potential_transformations.append({"type": "with_statement", "rule_ref": "with_statement"})
-
-        if "If(" in ast_dump and "Call(func=Name(id='len', ctx=Load()))" in ast_dump and "Compare(left=Name" in ast_dump and "Eq()" in ast_dump:
-            potential_transformations.append({"type": "any_all", "rule_ref": "any_all_pattern"})
-
-        if "For(" in ast_dump and "Attribute(attr='pop'" in ast_dump and "Compare(left=Subscript(value=Name" in ast_dump and "NotEq()" in ast_dump:
-            potential_transformations.append({"type": "list_filter", "rule_ref": "list_filter_pattern"})
-
-        if "For(" in ast_dump and "Name(id='range', ctx=Load())" in ast_dump and "Subscript(value=Name" in ast_dump:
-            potential_transformations.append({"type": "range_enumerate", "rule_ref": "range_enumerate_pattern"})
-
-        if "If(" in ast_dump and "Compare(left=Name" in ast_dump and "Is()" in ast_dump:
-            potential_transformations.append({"type": "identity_check", "rule_ref": "identity_check_pattern"})
-
-        if "For(" in ast_dump and "Compare(left=Name" in ast_dump and "Gt()" in ast_dump:
-            potential_transformations.append({"type": "range_filter", "rule_ref": "range_filter_pattern"})
-
-        if "For(" in ast_dump and "Call(func=Name(id='set', ctx=Load()))" in ast_dump and "Attribute(attr='add'" in ast_dump:
-            potential_transformations.append({"type": "set_add", "rule_ref": "set_add_pattern"})
-
-        if "For(" in ast_dump and "Subscript(value=Name" in ast_dump and "Compare(left=Name" in ast_dump and "Eq()" in ast_dump:
-            potential_transformations.append({"type": "dict_filter", "rule_ref": "dict_filter_pattern"})
+# Cache lifetime of a rule fetched with the current rulebook version in the URL, and without it
+VERSIONED_RULE_MAX_AGE = 31536000
+RULE_MAX_AGE = 3600
 
-        if "While(" in ast_dump and "Compare(left=Name" in ast_dump and "Lt()" in ast_dump:
-            potential_transformations.append({"type": "while_loop", "rule_ref": "while_loop_pattern"})
+def respond(payload, status=200, headers=None):
+    """Encode a payload as JSON or MessagePack, gzip-compressed if the client accepts it"""
+    body, encoding_headers = encode_response(payload, request.headers.get('Accept'),
+                                             request.headers.get('Accept-Encoding'))
+    content_type = encoding_headers.pop('Content-Type')
+    return Response(body, status=status, content_type=content_type, headers=dict(encoding_headers, **(headers or {})))
 
-        if "With(" in ast_dump and "Attribute(attr='open'" in ast_dump:
-            potential_transformations.append({"type": "file_with", "rule_ref": "file_with_pattern"})
+def negotiated_representation():
+    """Name of the encoding respond() will pick for this request, for use in ETags"""
+    return representation_tag(accepts_msgpack(request.headers.get('Accept')),
+                              accepts_gzip(request.headers.get('Accept-Encoding')))
 
-        if "FunctionDef(name='lambda')" in ast_dump and "arguments" in ast_dump:
-            potential_transformations.append({"type": "lambda_function", "rule_ref": "lambda_function_pattern"})
+def not_modified(headers):
+    """304 answer for a client whose copy is current"""
+    return Response(status=304, headers=dict(headers, Vary='Accept, Accept-Encoding'))
 
-        if "For(" in ast_dump and "Call(func=Name(id='map', ctx=Load()))" in ast_dump:
-            potential_transformations.append({"type": "map_function", "rule_ref": "map_function_pattern"})
-
-        if "If(" in ast_dump and "Attribute(attr='startswith'" in ast_dump and "Call(func=Name(id='str', ctx=Load()))" in ast_dump:
-            potential_transformations.append({"type": "string_method_check", "rule_ref": "string_method_check_pattern"})
-
-        if "Assign(" in ast_dump and "Call(func=Name(id='sorted', ctx=Load()))" in ast_dump:
-            potential_transformations.append({"type": "sorted_assignment", "rule_ref": "sorted_assignment_pattern"})
-
-        if "Call(func=Name(id='filter', ctx=Load()))" in ast_dump and "Compare(left=Name" in ast_dump and "Gt()" in ast_dump:
-            potential_transformations.append({"type": "filter_range", "rule_ref": "filter_range_pattern"})
-
-        if "For(" in ast_dump and "Attribute(attr='remove'" in ast_dump and "Compare(left=Subscript(value=Name" in ast_dump:
-            potential_transformations.append({"type": "list_remove", "rule_ref": "list_remove_pattern"})
-
-        if "For(" in ast_dump and "Call(func=Name(id='sorted', ctx=Load()))" in ast_dump and "Subscript(value=Name" in ast_dump:
-            potential_transformations.append({"type": "sorted_list_comprehension", "rule_ref": "sorted_list_comprehension"})
-
-        if "For(" in ast_dump and "Compare(left=Name" in ast_dump and "Lt()" in ast_dump:
-            potential_transformations.append({"type": "filter_less_than", "rule_ref": "filter_less_than_pattern"})
-
-        if "If(" in ast_dump and "Name(id='str', ctx=Load())" in ast_dump and "Call(func=Name(id='isdigit', ctx=Load()))" in ast_dump:
-            potential_transformations.append({"type": "isdigit_check", "rule_ref": "isdigit_check_pattern"})
-
-        if "For(" in ast_dump and "Attribute(attr='update'" in ast_dump and "Subscript(value=Name" in ast_dump:
-            potential_transformations.append({"type": "dict_update", "rule_ref": "dict_update_pattern"})
-
-        if "For(" in ast_dump and "Call(func=Name(id='filter', ctx=Load()))" in ast_dump and "Compare(left=Name" in ast_dump and "Gt()" in ast_dump:
-            potential_transformations.append({"type": "filter_greater_than", "rule_ref": "filter_greater_than_pattern"})
-
-        # Step 3: Apply transformations
-        transformed_code, applied_transformations = transform_code(input_code, SUGARING_RULEBOOK)
-        
-        if not applied_transformations:
-            if comments:
-                # Make sure to include the original comments in their correct positions
-                transformed_lines = input_code.splitlines()
-                transformed_code = "\n".join(transformed_lines)
-            else:
-                transformed_code = "# No transformations were identified in the code.\n" + input_code
-            
-        # Step 4: Generate explanations for transformations
-        explanations = []
-        for transform in potential_transformations:
-            rule_ref = transform.get("rule_ref", "")
-            
-            # Look up explanation in rulebook
-            explanation = "No detailed explanation available."
-            for rule in SUGARING_RULEBOOK:
-                if rule["name"] == rule_ref:
-                    explanation = rule["explanation"]
-                    
-                    # Add examples from rulebook
-                    if "example" in rule:
-                        explanation += f"\n\nExample:\nBefore:\n{rule['example']['before']}\n\nAfter:\n{rule['example']['after']}"
-                    break
-            
-            explanations.append({
-                "transformation_type": transform["type"],
-                "explanation": explanation
-            })
-            
-        # Step 5: Validate the transformed code
-        validation_result = {
-            "is_valid": True,
-            "errors": []
-        }
-        
-        try:
-            # Compile both versions to check syntax
-            compile(input_code, '<string>', 'exec')
-            
-            # Clean up transformed code by removing comments for compilation
-            # But preserve comments for display
-            cleaned_transformed_code = "\n".join([
-                line for line in transformed_code.split("\n")
-                if not line.strip().startswith("#")
-            ])
-            
-            if cleaned_transformed_code.strip():  # Only compile if there's code
-                compile(cleaned_transformed_code, '<string>', 'exec')
-        except Exception as e:
-            validation_result["is_valid"] = False
-            validation_result["errors"].append(str(e))
-            
-        return jsonify({
-            'original_code': input_code,
-            'sugared_code': transformed_code,
-            'comments': comments,
-            'explanations': explanations,
-            'validation': validation_result
-        })
-        
-    except Exception as e:
-        error_result, _ = handle_code_errors(input_code, e)
-        return jsonify({
-            'status': 'error',
-            'message': error_result
-        }), 500
-
-def process_desugarize(input_code):
-    """Process code for desugarization (expanding code and adding comments)"""
+@app.route('/process_code', methods=['POST'])
+def process_code():
     try:
-        # Step 1: Parse the code and extract original comments
-        parsed_ast = ast.parse(input_code)
-        ast_dump = ast.dump(parsed_ast)
-        
-        original_comments = {}
-        for i, line in enumerate(input_code.splitlines()):
-            stripped = line.strip()
-            if stripped.startswith('#'):
-                original_comments[i] = line
-        
-        # Step 2: Check for concise code constructs
-        potential_expansions = []
-        
-        # Check for list comprehensions
-        if "ListComp(" in ast_dump:
-            potential_expansions.append({"type": "list_comprehension_expansion", "description": "Expanding list comprehension to for loop with append"})
-            
-        # Check for set comprehensions
-        if "SetComp(" in ast_dump:
-            potential_expansions.append({"type": "set_comprehension_expansion", "description": "Expanding set comprehension to for loop with add"})
-            
-        # Check for dict comprehensions
-        if "DictComp(" in ast_dump:
-            potential_expansions.append({"type": "dict_comprehension_expansion", "description": "Expanding dictionary comprehension to for loop with assignment"})
-            
-        # Check for ternary operators
-        if "IfExp(" in ast_dump:
-            potential_expansions.append({"type": "ternary_operator_expansion", "description": "Expanding ternary operator to if-else statement"})
-            
-        # Check for generator expressions
-        if "GeneratorExp(" in ast_dump:
-            potential_expansions.append({"type": "generator_expression_expansion", "description": "Expanding generator expression to generator function"})
-            
-        # Check for enumerate usage
-        if "Name(id='enumerate'" in ast_dump:
-            potential_expansions.append({"type": "enumerate_expansion", "description": "Expanding enumerate to counter-based loop"})
-            
-        # Check for sum usage
-        if "Name(id='sum'" in ast_dump:
-            potential_expansions.append({"type": "sum_expansion", "description": "Expanding sum to accumulator loop"})
-
-        # Step 3: Apply desugarization transformations with a comment density of 0.4 (40% of nodes get comments)
-        # Pass the original comments to preserve and enhance them
-        desugared_code, applied_transformations = desugar_code(input_code, comment_density=0.4)
-        
-        # If no transformations were applied, provide a placeholder with some basic comments
-        if not applied_transformations:
-            parsed_ast = ast.parse(input_code)
-            transformer = DesugarTransformer(comment_density=0.5, input_comments=original_comments)
-            transformed_tree = transformer.visit(parsed_ast)
-            ast.fix_missing_locations(transformed_tree)
-            desugared_code = astunparse.unparse(transformed_tree)
-            
-            if not desugared_code.strip():
-                desugared_code = "# No expansions were made. Code is already in a verbose form.\n" + input_code
-        
-        # Step 4: Generate explanations for transformations
-        explanations = []
-        for expansion in potential_expansions:
-            explanations.append({
-                "transformation_type": expansion["type"],
-                "explanation": expansion["description"]
-            })
-        
-        # Step 5: Validate the desugared code
-        validation_result = {
-            "is_valid": True,
-            "errors": []
-        }
-        
+        options = decode_request(request.get_data(), request.content_type)
+    except ValueError as e:
+        return respond({'status': 'error', 'message': str(e)}, 400)
+    if not isinstance(options, dict):
+        return respond({'status': 'error', 'message': "Request body must be an object"}, 400)
+    input_code = options.get('code', '')
+    operation_type = options.get('operation', 'sugarize')  # Default to sugarize
+    if not isinstance(input_code, str):
+        return respond({'status': 'error', 'message': "'code' must be a string"}, 400)
+
+    # Measuring runs the posted code; only a server started with --allow-measure does that
+    if options.get('measure') and not http_measurement_allowed():
+        return respond({'status': 'error',
+                        'message': "Measuring rewrites is disabled on this server (serve --allow-measure)"}, 403)
+
+    # Editors are interactive; CI and repository scans tag themselves as batch
+    priority = options.get('priority') or request.headers.get('X-Request-Priority') or DEFAULT_PRIORITY
+    if priority not in PRIORITY_CLASSES:
+        return respond({'status': 'error', 'message': f"Unknown priority: {priority}"}, 400)
+
+    # The ETag follows from the request alone, so a current client copy costs one hash and no pipeline work
+    key = result_key(input_code, operation_type, options)
+    cache_headers = {}
+    if key is not None:
+        cache_headers = {'ETag': f'"{result_etag(key, negotiated_representation())}"', 'Cache-Control': 'no-cache'}
+        if request.if_none_match.contains_weak(cache_headers['ETag'].strip('"')):
+            return not_modified(cache_headers)
+        cached = result_cache.get(key)
+        if cached is not None:
+            payload, status = cached
+            return respond(payload, status, cache_headers)
+
+    def compute():
+        # Bounded, cost-weighted admission in front of the CPU-bound pipeline; batch
+        # runs yield their units to waiting interactive requests between stages
+        with admission.admit(input_code, priority) as ticket:
+            return dispatch_operation(input_code, operation_type, options, ticket.checkpoint)
+
+    # Identical requests of one priority class in flight together share one computation and admission
+    try:
+        payload, status = run_coalesced(input_code, operation_type, options, compute, priority)
+    except Overloaded as e:
+        return respond({'status': 'error', 'message': e.message, 'retry_after': e.retry_after}, e.status,
+                       {'Retry-After': str(e.retry_after)})
+    payload = shape_payload(payload, status, options)
+    if key is None or status != 200:
+        return respond(payload, status)
+    result_cache.put(key, payload, status)
+    return respond(payload, status, cache_headers)
+
+@app.route('/rules/<name>')
+def rule(name):
+    """One rulebook rule; lean responses reference explanations by rule id"""
+    # The rulebook only changes with a deploy, and a versioned URL never changes meaning
+    if request.args.get('v') == rulebook_version():
+        cache_control = f"public, max-age={VERSIONED_RULE_MAX_AGE}, immutable"
+    else:
+        cache_control = f"public, max-age={RULE_MAX_AGE}"
+    cache_headers = {'ETag': f'"{rule_etag(name, negotiated_representation())}"', 'Cache-Control': cache_control}
+    if request.if_none_match.contains_weak(cache_headers['ETag'].strip('"')):
+        return not_modified(cache_headers)
+
+    payload, status = run_rule_lookup(name)
+    if status != 200:
+        return respond(payload, status)
+    return respond(payload, status, cache_headers)
+
+@app.route('/metrics')
+def metrics():
+    """Admission queue, result cache and coalescing counters of this worker"""
+    return jsonify({
+        'admission': admission.metrics(),
+        'result_cache': dict(result_cache.stats),
+        'coalescing': dict(single_flight.stats),
+    })
+
+@app.route('/background/<token>')
+def background_result(token):
+    """Poll the result of a background thorough tier"""
+    payload, status = run_background_result(token)
+    return respond(payload, status)
+
+# The event stream holds its worker while the browser listens
+PREVIEW_NEEDS_THREADS = "Live preview needs a threaded server (serve without --no-threads)"
+
+@app.route('/preview/<session_id>', methods=['POST'])
+def preview_edit(session_id):
+    """Queue a debounced live-preview edit; its result arrives on the session's event stream"""
+    if not streams_supported():
+        return jsonify({'status': 'error', 'message': PREVIEW_NEEDS_THREADS}), 503
+    payload, status = submit_preview_edit(session_id, request.json or {})
+    return jsonify(payload), status
+
+@app.route('/preview/<session_id>/events')
+def preview_events(session_id):
+    """Server-Sent Events stream of the newest result of a live-preview session"""
+    if not streams_supported():
+        return jsonify({'status': 'error', 'message': PREVIEW_NEEDS_THREADS}), 503
+    if not SESSION_ID_PATTERN.match(session_id):
+        return jsonify({'status': 'error', 'message': "Invalid preview session id"}), 400
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_seq = int(last_event_id) if last_event_id.isdigit() else -1
+    return Response(event_stream(preview_hub.session(session_id), last_seq), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/explanations/<stream_id>')
+def explanation_events(stream_id):
+    """Server-Sent Events stream of the explanations of a stream_explanations request"""
+    if not streams_supported():
+        return jsonify({'status': 'error',
+                        'message': "Explanation streams need a threaded server (serve without --no-threads)"}), 503
+    stream = explanation_streams.get(stream_id)
+    if stream is None:
+        return jsonify({'status': 'error', 'message': f"Unknown explanation stream: {stream_id}"}), 404
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    start = int(last_event_id) if last_event_id.isdigit() else 0
+    return Response(explanation_event_stream(stream, start), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Start a whole-repository run over an uploaded tar archive or a local path"""
+    if request.mimetype in ARCHIVE_MIME_TYPES:
+        # Raw archive body; options in the query string
+        payload, status = submit_job(form_options(request.args), request.stream)
+    elif 'archive' in request.files:
+        payload, status = submit_job(form_options(request.form), request.files['archive'].stream)
+    else:
         try:
-            # Compile both versions to check syntax
-            compile(input_code, '<string>', 'exec')
-            
-            # Clean up desugared code by removing comments for compilation
-            # But preserve comments for display
-            cleaned_desugared_code = "\n".join([
-                line for line in desugared_code.split("\n")
-                if not line.strip().startswith("#")
-            ])
-            
-            if cleaned_desugared_code.strip():  # Only compile if there's code
-                compile(cleaned_desugared_code, '<string>', 'exec')
-        except Exception as e:
-            validation_result["is_valid"] = False
-            validation_result["errors"].append(str(e))
-        
-        return jsonify({
-            'original_code': input_code,
-            'desugared_code': desugared_code,
-            'explanations': explanations,
-            'validation': validation_result
-        })
-    
-    except Exception as e:
-        error_result, _ = handle_code_errors(input_code, e)
-        return jsonify({
-            'status': 'error',
-            'message': error_result
-        }), 500
+            options = decode_request(request.get_data(), request.content_type)
+        except ValueError as e:
+            return respond({'status': 'error', 'message': str(e)}, 400)
+        if not isinstance(options, dict):
+            return respond({'status': 'error', 'message': "Request body must be an object"}, 400)
+        payload, status = submit_job(options)
+    if status != 202:
+        return respond(payload, status)
+    return respond(payload, status, {'Location': f"/jobs/{payload['job_id']}"})
+
+@app.route('/jobs/<job_id>')
+def job_progress(job_id):
+    """Progress of a job"""
+    job_manager.ensure_started()
+    payload, status = get_job(job_id)
+    return respond(payload, status)
+
+@app.route('/jobs/<job_id>/results')
+def job_results(job_id):
+    """One page of a job's per-file results; pass the previous page's next_cursor"""
+    job_manager.ensure_started()
+    cursor = request.args.get('cursor', '0')
+    limit = request.args.get('limit', '')
+    payload, status = get_job_results(job_id, int(cursor) if cursor.isdigit() else 0,
+                                      int(limit) if limit.isdigit() else DEFAULT_PAGE_SIZE)
+    return respond(payload, status)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Cancel a job and delete its results"""
+    payload, status = cancel_job(job_id)
+    return respond(payload, status)
 
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
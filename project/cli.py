@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Command line entry points for the Python syntax sugaring tool.
+
+    python cli.py serve --workers 4 --port 5000
+    python cli.py stdio
+    python cli.py lsp
+    python cli.py instrument script.py [script args...]
+    python cli.py sugarize module.py --profile out.pstats --budget 5
+    python cli.py diff --git main...HEAD
+"""
+
+import argparse
+import os
+import sys
+
+
+def cmd_serve(args):
+    """Run the production pre-fork server."""
+    # The shared result tier is on for served workers only; read when the app module creates its caches
+    from server.shared_cache import CACHE_PATH_ENV, DEFAULT_CACHE_PATH
+    if args.result_cache is not None:
+        os.environ[CACHE_PATH_ENV] = args.result_cache
+    else:
+        os.environ.setdefault(CACHE_PATH_ENV, DEFAULT_CACHE_PATH)
+    if args.allow_measure:
+        from server.pipeline import ALLOW_MEASURE_ENV
+        os.environ[ALLOW_MEASURE_ENV] = '1'
+    if args.jobs_dir is not None:
+        from server.jobs import JOBS_DIR_ENV
+        os.environ[JOBS_DIR_ENV] = args.jobs_dir
+    if args.job_root:
+        from server.jobs import JOB_ROOTS_ENV
+        os.environ[JOB_ROOTS_ENV] = os.pathsep.join(os.path.abspath(root) for root in args.job_root)
+
+    from server.prefork import serve
+    from app import app
+
+    if args.capacity is not None:
+        from server.admission import admission
+        admission.capacity = max(1, args.capacity)
+    if args.job_workers is not None:
+        from server.jobs import job_manager
+        job_manager.workers = max(1, args.job_workers)
+
+    serve(app, host=args.host, port=args.port, workers=args.workers, threads=args.threads)
+    return 0
+
+
+def cmd_stdio(args):
+    """Serve sugarize/desugarize over newline-delimited JSON-RPC on stdin/stdout."""
+    from server.stdio_rpc import main as stdio_main
+
+    return stdio_main()
+
+
+def cmd_lsp(args):
+    """Run the Language Server Protocol server on stdin/stdout."""
+    from server.lsp_server import main as lsp_main
+
+    return lsp_main()
+
+
+def cmd_instrument(args):
+    """Run a script with loop counters and timers, then print its loop hotspots."""
+    from transformers.instrumentation_transformer import (
+        instrument_code, run_instrumented, format_hotspot_report
+    )
+
+    with open(args.script, encoding='utf-8') as f:
+        code = f.read()
+
+    if args.emit:
+        print(instrument_code(code, standalone=True)[0])
+        return 0
+
+    # Like `python script.py`: the script's arguments and its own directory on the import path
+    sys.argv = [args.script] + args.script_args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+    report, error = run_instrumented(code, filename=args.script, top=args.top)
+    print(format_hotspot_report(report), file=sys.stderr)
+    if isinstance(error, SystemExit):
+        return error.code if isinstance(error.code, int) else (0 if error.code is None else 1)
+    if error is not None:
+        import traceback
+        traceback.print_exception(type(error), error, error.__traceback__)
+        return 1
+    return 0
+
+
+def cmd_sugarize(args):
+    """Sugarize a file, optionally guided by a cProfile or line_profiler profile."""
+    import json
+    from server.pipeline import run_sugarize, run_profile_guided_sugarize, run_measured_sugarize
+
+    with open(args.file, encoding='utf-8') as f:
+        code = f.read()
+    on_slower = 'suppress' if args.suppress_slower else 'flag'
+
+    if args.profile:
+        with open(args.profile, 'rb') as f:
+            profile = f.read()
+        payload, status = run_profile_guided_sugarize(code, profile, args.budget, args.file, args.measure, on_slower)
+    elif args.measure:
+        payload, status = run_measured_sugarize(code, on_slower)
+    else:
+        payload, status = run_sugarize(code)
+
+    if status != 200:
+        print(payload.get('message'), file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(payload, indent=2))
+        return 0
+
+    sys.stdout.write(payload['sugared_code'])
+    if args.profile:
+        for edit in payload['edits']:
+            print(f"line {edit['range']['start']['line'] + 1}: {edit['rule']} in {edit['function']} "
+                  f"({edit['cumulative_time']:.3f}s cumulative)", file=sys.stderr)
+    if args.measure:
+        for explanation in payload['explanations']:
+            speedup = explanation['speedup']
+            result = f"{speedup:.2f}x" if speedup else explanation['measurement']['status']
+            flag = " SLOWER" if explanation['slower'] else ""
+            print(f"line {explanation['line']}: {explanation['transformation_type']} {result}{flag}", file=sys.stderr)
+        for edit in payload['suppressed']:
+            print(f"line {edit['range']['start']['line'] + 1}: {edit['rule']} suppressed "
+                  f"({edit['measurement']['speedup']:.2f}x)", file=sys.stderr)
+    if 'skipped_edits' in payload:
+        print(f"{payload['skipped_edits']} other rewrites left out (cold, cosmetic or over budget)", file=sys.stderr)
+    return 0
+
+
+def _python_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d != '__pycache__')
+                for name in sorted(files):
+                    if name.endswith('.py'):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _scan(paths, manifest_path, analysis, analyze):
+    """
+    Run a per-file analysis over Python files, reusing results from the change manifest.
+
+    Yields:
+        Tuples of (path, result) for the files that could be analyzed
+    """
+    from utils.scan_manifest import open_manifest
+
+    manifest = open_manifest(manifest_path)
+    for path in _python_files(paths):
+        try:
+            if manifest is not None:
+                # Unchanged files (same size and mtime) are not even read
+                result = manifest.cached(path, analysis, analyze)
+            else:
+                with open(path, encoding='utf-8') as f:
+                    result = analyze(f.read())
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"{path}: skipped ({e})", file=sys.stderr)
+            continue
+        if 'error' in result:
+            print(f"{path}: skipped ({result['error']})", file=sys.stderr)
+            continue
+        yield path, result
+    if manifest is not None:
+        manifest.prune()
+
+
+def cmd_findings(args):
+    """List sugaring opportunities across files, ranked by estimated performance impact."""
+    import json
+    from utils.text_edits import compute_text_edits
+    from utils.prefilter import get_prefilter
+
+    prefilter = None if args.no_prefilter else get_prefilter()
+
+    def analyze(code):
+        try:
+            _, transformations = compute_text_edits(code, prefilter=prefilter, estimate_cost=True)
+        except (SyntaxError, ValueError) as e:
+            return {"error": str(e)}
+        return {"findings": [{"line": t["location"][0], "type": t["type"], "cost": t["cost"]}
+                             for t in transformations]}
+
+    analysis = "findings:all" if args.no_prefilter else "findings:prefilter"
+    findings = []
+    for path, result in _scan(args.paths, args.manifest, analysis, analyze):
+        findings.extend(dict(finding, file=path) for finding in result["findings"])
+
+    findings.sort(key=lambda finding: -finding["cost"]["impact"])
+    if args.top is not None:
+        findings = findings[:args.top]
+
+    if args.json:
+        print(json.dumps([{"file": f["file"], "line": f["line"], "type": f["type"], "cost": f["cost"]}
+                          for f in findings], indent=2))
+        return 0
+    for finding in findings:
+        cost = finding["cost"]
+        print(f"{finding['file']}:{finding['line']}: {finding['type']} impact {cost['impact']:+.1f} "
+              f"[{cost['complexity_change']}, bytecode {cost['bytecode_before']}->{cost['bytecode_after']}, "
+              f"allocations {cost['allocations_before']}->{cost['allocations_after']}]")
+    return 0
+
+
+def cmd_hotspots(args):
+    """Report likely super-linear loops; exits with 1 when any are found and --fail is set."""
+    import ast
+    import json
+    from transformers.complexity_analyzer import analyze_complexity
+
+    def analyze(code):
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError) as e:
+            return {"error": str(e)}
+        return {"findings": analyze_complexity(code, tree)}
+
+    findings = []
+    for path, result in _scan(args.paths, args.manifest, "hotspots", analyze):
+        findings.extend(dict(finding, file=path) for finding in result["findings"])
+
+    if args.json:
+        print(json.dumps(findings, indent=2))
+    else:
+        for finding in findings:
+            path = " > ".join(f"{loop['loop']} (line {loop['line']})" for loop in finding["loop_path"])
+            print(f"{finding['file']}:{finding['line']}:{finding['col'] + 1}: {finding['complexity']} "
+                  f"{finding['message']} [{path}]")
+    return 1 if args.fail and findings else 0
+
+
+def cmd_diff(args):
+    """Suggest rewrites only for the statements a diff touches; exits with 1 when any are found and --fail is set."""
+    import ast
+    import json
+    from utils.diff_hunks import parse_unified_diff, git_diff, git_toplevel, new_side_revision, read_new_side
+    from utils.text_edits import compute_text_edits
+    from utils.prefilter import get_prefilter
+
+    try:
+        if args.diff is not None:
+            if args.diff == '-':
+                text = sys.stdin.read()
+            else:
+                with open(args.diff, encoding='utf-8') as f:
+                    text = f.read()
+            toplevel, revision = os.getcwd(), None
+        else:
+            # Without --git, the staged changes: what a pre-commit hook is about to commit
+            toplevel = git_toplevel()
+            text = git_diff(args.git, toplevel)
+            revision = new_side_revision(args.git)
+    except (OSError, ValueError) as e:
+        print(f"diff: {e}", file=sys.stderr)
+        return 2
+
+    prefilter = get_prefilter()
+    suggestions = []
+    for path, hunks in sorted(parse_unified_diff(text).items()):
+        if not path.endswith('.py') or not hunks:
+            continue
+        try:
+            code = read_new_side(path, revision, toplevel)
+            # Parsed once; only the statements overlapping a hunk are matched
+            edits, _ = compute_text_edits(code, tree=ast.parse(code, filename=path), hunks=hunks,
+                                          prefilter=prefilter)
+        except (OSError, SyntaxError, UnicodeDecodeError, ValueError) as e:
+            print(f"{path}: skipped ({e})", file=sys.stderr)
+            continue
+        suggestions.extend(dict(edit, file=path) for edit in edits)
+
+    if args.json:
+        print(json.dumps(suggestions, indent=2))
+    else:
+        for suggestion in suggestions:
+            start = suggestion["range"]["start"]
+            print(f"{suggestion['file']}:{start['line'] + 1}:{start['character'] + 1}: {suggestion['rule']}")
+            for line in suggestion["newText"].splitlines():
+                print(f"    {line}")
+    return 1 if args.fail and suggestions else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Python syntax sugaring tool")
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help="Run the multi-worker production server")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5000)
+    serve_parser.add_argument('--workers', type=int, default=None,
+                              help="Number of worker processes (defaults to the CPU count)")
+    serve_parser.add_argument('--threads', action=argparse.BooleanOptionalAction, default=True,
+                              help="Handle requests on threads inside each worker (the default; admission "
+                                   "control, live preview and explanation streams rely on it)")
+    serve_parser.add_argument('--result-cache', default=None, metavar='PATH',
+                              help="SQLite file of the result cache shared by the workers (default: "
+                                   "~/.cache/syntactic/results.sqlite3; 'off' to disable)")
+    serve_parser.add_argument('--capacity', type=int, default=None,
+                              help="Cost units (16 KB of source each) a worker transforms at once; "
+                                   "further requests queue and are refused with 429/503 when it is full")
+    serve_parser.add_argument('--allow-measure', action='store_true',
+                              help="Let HTTP requests time rewrites (runs the posted code in a "
+                                   "resource-limited worker)")
+    serve_parser.add_argument('--jobs-dir', default=None, metavar='PATH',
+                              help="Directory of the job database and uploaded archives")
+    serve_parser.add_argument('--job-root', action='append', default=[], metavar='PATH',
+                              help="Directory whose files jobs may read by local path (repeatable)")
+    serve_parser.add_argument('--job-workers', type=int, default=None,
+                              help="Worker processes that run repository jobs (defaults to half the CPUs)")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    stdio_parser = subparsers.add_parser('stdio', help="Run the JSON-RPC backend on stdin/stdout")
+    stdio_parser.set_defaults(func=cmd_stdio)
+
+    lsp_parser = subparsers.add_parser('lsp', help="Run the Language Server Protocol server on stdin/stdout")
+    lsp_parser.set_defaults(func=cmd_lsp)
+
+    instrument_parser = subparsers.add_parser('instrument', help="Profile a script's loops and comprehensions")
+    instrument_parser.add_argument('script', help="Python script to instrument")
+    instrument_parser.add_argument('script_args', nargs=argparse.REMAINDER, help="Arguments passed to the script")
+    instrument_parser.add_argument('--emit', action='store_true',
+                                   help="Print the instrumented source instead of running it")
+    instrument_parser.add_argument('--top', type=int, default=20, help="Number of hotspots to show")
+    instrument_parser.set_defaults(func=cmd_instrument)
+
+    sugarize_parser = subparsers.add_parser('sugarize', help="Sugarize a Python file")
+    sugarize_parser.add_argument('file', help="Python file to sugarize")
+    sugarize_parser.add_argument('--profile', help="cProfile .pstats file or line_profiler text report")
+    sugarize_parser.add_argument('--budget', type=int, default=None,
+                                 help="Maximum number of profile-guided rewrites to apply")
+    sugarize_parser.add_argument('--measure', action='store_true',
+                                 help="Time each rewrite against the original in an isolated worker")
+    sugarize_parser.add_argument('--suppress-slower', action='store_true',
+                                 help="With --measure, leave out rewrites that measure slower")
+    sugarize_parser.add_argument('--json', action='store_true', help="Print the full response as JSON")
+    sugarize_parser.set_defaults(func=cmd_sugarize)
+
+    findings_parser = subparsers.add_parser('findings', help="Rank sugaring opportunities by estimated impact")
+    findings_parser.add_argument('paths', nargs='+', help="Python files or directories to scan")
+    findings_parser.add_argument('--top', type=int, default=None, help="Number of findings to show")
+    findings_parser.add_argument('--json', action='store_true', help="Print the findings as JSON")
+    findings_parser.add_argument('--no-prefilter', action='store_true',
+                                 help="Parse every file instead of skipping those without rule anchors")
+    findings_parser.add_argument('--manifest', default=None, metavar='PATH',
+                                 help="Change manifest reused across runs, so only changed files are "
+                                      "re-analyzed ('off' to disable)")
+    findings_parser.set_defaults(func=cmd_findings)
+
+    hotspots_parser = subparsers.add_parser('hotspots', help="Flag nested loops and quadratic patterns")
+    hotspots_parser.add_argument('paths', nargs='+', help="Python files or directories to scan")
+    hotspots_parser.add_argument('--fail', action='store_true', help="Exit with status 1 if anything is found")
+    hotspots_parser.add_argument('--json', action='store_true', help="Print the findings as JSON")
+    hotspots_parser.add_argument('--manifest', default=None, metavar='PATH',
+                                 help="Change manifest reused across runs, so only changed files are "
+                                      "re-analyzed ('off' to disable)")
+    hotspots_parser.set_defaults(func=cmd_hotspots)
+
+    diff_parser = subparsers.add_parser('diff', help="Suggest rewrites for the lines a diff changes (pre-commit)")
+    diff_source = diff_parser.add_mutually_exclusive_group()
+    diff_source.add_argument('--git', default=None, metavar='RANGE',
+                             help="Revision range to diff, e.g. main...HEAD (defaults to the staged changes)")
+    diff_source.add_argument('--diff', default=None, metavar='FILE',
+                             help="Unified diff to read ('-' for stdin); paths are relative to the current directory")
+    diff_parser.add_argument('--fail', action='store_true', help="Exit with status 1 if anything is suggested")
+    diff_parser.add_argument('--json', action='store_true', help="Print the suggested edits as JSON")
+    diff_parser.set_defaults(func=cmd_diff)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        return 1
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Precompiled index over the sugaring rulebook.
+
+The rulebook is a list of dictionaries that callers used to scan linearly for
+every explanation lookup. This module turns it into a name-keyed index with the
+full explanation text (including the before/after example) already rendered,
+and caches that index as a marshal file next to the rulebook so a cold process
+can load it without importing and re-processing the rulebook module.
+"""
+
+import hashlib
+import marshal
+import os
+
+RULEBOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sugaring_rules.py')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+CACHE_FORMAT = 1
+
+# Rulebook entry explaining each transformation type recorded by SugarTransformer
+TRANSFORMATION_RULE_REFS = {
+    "list_comprehension": "list_comprehension",
+    "set_comprehension": "set_comprehension",
+    "dict_comprehension": "dict_comprehension",
+    "enumerate_pattern": "enumerate_pattern",
+    "zip_pattern": "zip_pattern",
+    "ternary_operator": "ternary_operator",
+    "tuple_unpacking": "tuple_unpacking",
+    "with_statement": "with_statement",
+    "lambda_expression": "lambda_expression",
+    "generator_expression": "generator_expression",
+    "sum_pattern": "built_in_aggregators",
+    "find_target_pattern": "any_all_checks",
+}
+
+# Tokens that must all occur in a statement's source for each transformation to match it.
+# Used by utils/prefilter.py to skip files and blocks before parsing; a missing entry
+# means the transformation can never be ruled out.
+TRANSFORMATION_ANCHORS = {
+    "list_comprehension": ("for", "append"),
+    "set_comprehension": ("for", "add"),
+    "dict_comprehension": ("for", "["),
+    "enumerate_pattern": ("for", "+", "1"),
+    "zip_pattern": ("for", "range"),
+    "ternary_operator": ("if", "else"),
+    "tuple_unpacking": ("[",),
+    "with_statement": ("try", "finally"),
+    "lambda_expression": ("def", "return"),
+    "generator_expression": ("def", "for", "yield"),
+    "sum_pattern": ("for", "+="),
+    "find_target_pattern": ("for", "break", "True"),
+}
+
+# Transformations SugarTransformer recognises but does not implement yet (their
+# _transform_* methods return None, or the loop is only recorded, as for
+# find_target_pattern), so they can never produce a rewrite
+PLACEHOLDER_TRANSFORMATIONS = {"zip_pattern", "tuple_unpacking", "with_statement", "lambda_expression",
+                               "find_target_pattern"}
+
+_rule_index = None
+
+
+def _rulebook_stamp():
+    """Return a cheap stamp (mtime, size) identifying the current rulebook source."""
+    stat = os.stat(RULEBOOK_PATH)
+    return (CACHE_FORMAT, int(stat.st_mtime_ns), stat.st_size)
+
+
+def _cache_path():
+    return os.path.join(CACHE_DIR, 'rulebook_index.marshal')
+
+
+def render_explanation(rule):
+    """
+    Render the explanation text for a rule, including its example if present.
+
+    Args:
+        rule: Rule dictionary from SUGARING_RULEBOOK
+
+    Returns:
+        Explanation string as shown to the user
+    """
+    explanation = rule["explanation"]
+    if "example" in rule:
+        explanation += f"\n\nExample:\nBefore:\n{rule['example']['before']}\n\nAfter:\n{rule['example']['after']}"
+    return explanation
+
+
+def build_rule_index(rulebook):
+    """
+    Build the name-keyed rule index from a rulebook list.
+
+    Returns:
+        Dictionary with the rulebook version and the rules keyed by name
+    """
+    rules = {}
+    digest = hashlib.sha1()
+    for rule in rulebook:
+        entry = dict(rule)
+        entry["full_explanation"] = render_explanation(rule)
+        rules[rule["name"]] = entry
+        digest.update(repr(sorted(rule.items())).encode('utf-8'))
+
+    return {
+        "version": digest.hexdigest()[:12],
+        "rules": rules,
+    }
+
+
+def _load_cached_index(stamp):
+    try:
+        with open(_cache_path(), 'rb') as f:
+            cached = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+    if not isinstance(cached, dict) or cached.get("stamp") != stamp:
+        return None
+    return cached.get("index")
+
+
+def _write_cached_index(stamp, index):
+    # Best effort: a read-only install simply rebuilds the index on each start
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{_cache_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            marshal.dump({"stamp": stamp, "index": index}, f)
+        os.replace(tmp_path, _cache_path())
+    except OSError:
+        pass
+
+
+def load_rule_index():
+    """
+    Load the precompiled rule index, rebuilding the on-disk cache if it is stale.
+
+    Returns:
+        Dictionary with "version" and "rules" (name -> rule dictionary)
+    """
+    global _rule_index
+    if _rule_index is not None:
+        return _rule_index
+
+    try:
+        stamp = _rulebook_stamp()
+    except OSError:
+        stamp = None
+
+    index = _load_cached_index(stamp) if stamp else None
+    if index is None:
+        from rules.sugaring_rules import SUGARING_RULEBOOK
+        index = build_rule_index(SUGARING_RULEBOOK)
+        if stamp:
+            _write_cached_index(stamp, index)
+
+    _rule_index = index
+    return _rule_index
+
+
+def get_rule(name):
+    """Return the rule dictionary for a rule name, or None if it is unknown."""
+    return load_rule_index()["rules"].get(name)
+
+
+def get_rule_explanation(name, default="No detailed explanation available."):
+    """Return the rendered explanation (with example) for a rule name."""
+    rule = get_rule(name)
+    if rule is None:
+        return default
+    return rule["full_explanation"]
+
+
+def rule_ref_for(transformation_type):
+    """Return the rulebook rule name that explains a transformation type."""
+    return TRANSFORMATION_RULE_REFS.get(transformation_type, transformation_type)
+
+
+def rulebook_version():
+    """Return a short content hash identifying the loaded rulebook."""
+    return load_rule_index()["version"]
@@ -0,0 +1,348 @@
+"""
+Admission control in front of the transformation pipeline.
+
+Transforms are CPU-bound, so accepting every request during a spike only
+makes all of them late. Each request is charged a cost estimated from its
+input size, and a process runs at most `capacity` cost units at once; the
+rest wait in a bounded queue:
+
+- A waiter is admitted as soon as its cost fits, in arrival order, so small
+  requests pass a large one that is still waiting for room. Once the oldest
+  waiter has waited `max_bypass_wait` seconds nobody passes it any more, so
+  large files are delayed but never starved.
+- A request that would push the queue past `max_queue_length` waiters or
+  `max_queue_cost` units is refused at once with 429; one that waited
+  `max_wait` seconds without being admitted is dropped with 503. Both carry a
+  Retry-After estimated from the queued work and the measured service time.
+
+Requests carry a priority class. Interactive work (editors, the web UI) is
+dispatched before batch work (CI, repository scans), with two safeguards:
+
+- While batch requests wait, a minimum share of the capacity stays reserved
+  for them, so a steady stream of editor requests cannot starve them. The
+  reserve and the interactive limit on batch never hold back the oldest head
+  when nothing is running, so two large waiters cannot block each other on
+  an idle server.
+- A running batch request checks between pipeline stages whether interactive
+  work is waiting for room. If its units would let that work in and batch
+  holds more than its reserved share, it gives them back and waits at the
+  front of the batch queue to resume, for at most `max_wait` seconds.
+
+The controller is per process and queues concurrent requests, so it needs
+threaded workers (the default of `serve`; see server/prefork.py).
+
+Queue depth, queued and in-flight cost, wait times, preemptions and rejection
+counts are kept per class for the metrics endpoint.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Any, Tuple, Optional
+
+# Bytes of source charged as one cost unit
+COST_UNIT_BYTES = 16 * 1024
+
+# Cost units a process runs at the same time
+DEFAULT_CAPACITY = 8
+
+# Bounds of the waiting queue
+MAX_QUEUE_LENGTH = 64
+MAX_QUEUE_COST = 64
+
+# Seconds a request may wait for admission before it is dropped with 503
+MAX_WAIT = 10.0
+
+# Seconds the oldest waiter may be passed by smaller requests
+MAX_BYPASS_WAIT = 1.0
+
+PRIORITY_CLASSES = ('interactive', 'batch')
+DEFAULT_PRIORITY = 'interactive'
+
+# Share of the capacity kept for batch requests while any are waiting or running
+MIN_BATCH_SHARE = 0.25
+
+# Initial guess of the service time per cost unit, refined by measurements
+INITIAL_SECONDS_PER_UNIT = 0.05
+SERVICE_SMOOTHING = 0.2
+
+
+def request_cost(input_code, capacity=DEFAULT_CAPACITY):
+    """Cost units of a request: one per started COST_UNIT_BYTES of source, at most the capacity."""
+    size = len(input_code.encode('utf-8', 'surrogatepass')) if isinstance(input_code, str) else 0
+    return max(1, min(capacity, math.ceil(size / COST_UNIT_BYTES)))
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is not admitted.
+
+    Attributes:
+        status: 429 (queue full) or 503 (waited too long)
+        retry_after: Whole seconds the client should wait before retrying
+    """
+
+    def __init__(self, status, retry_after, message):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.message = message
+
+
+class _Waiter:
+    def __init__(self, cost, priority):
+        self.cost = cost
+        self.priority = priority
+        self.arrived = time.monotonic()
+        self.admitted = False
+        self.event = threading.Event()
+
+
+class Ticket:
+    """
+    Units held by one admitted request.
+
+    Attributes:
+        cost: Units held
+        priority: Priority class of the request
+    """
+
+    def __init__(self, controller, cost, priority):
+        self.controller = controller
+        self.cost = cost
+        self.priority = priority
+
+    def checkpoint(self):
+        """
+        Call between pipeline stages: a batch request yields its units to
+        waiting interactive work here and returns once it is readmitted.
+        """
+        if self.priority == 'batch':
+            self.controller.preempt(self)
+
+
+class AdmissionController:
+    """
+    Cost-weighted concurrency limit with a bounded waiting queue per priority class.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_queue_length=MAX_QUEUE_LENGTH,
+                 max_queue_cost=MAX_QUEUE_COST, max_wait=MAX_WAIT, max_bypass_wait=MAX_BYPASS_WAIT,
+                 min_batch_share=MIN_BATCH_SHARE):
+        self.capacity = capacity
+        self.max_queue_length = max_queue_length
+        self.max_queue_cost = max_queue_cost
+        self.max_wait = max_wait
+        self.max_bypass_wait = max_bypass_wait
+        self.min_batch_share = min_batch_share
+        self._lock = threading.Lock()
+        self._queues = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._queued_cost = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._in_flight = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._seconds_per_unit = INITIAL_SECONDS_PER_UNIT
+        self._counters = {priority: {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0,
+                                     "preempted": 0, "resumed_over_capacity": 0,
+                                     "total_wait": 0.0, "max_wait": 0.0}
+                          for priority in PRIORITY_CLASSES}
+
+    def _total_in_flight(self):
+        return sum(self._in_flight.values())
+
+    def _batch_reserve(self):
+        """Units interactive work may not take while batch work waits."""
+        if not self._queues['batch']:
+            return 0
+        reserved = max(1, int(self.capacity * self.min_batch_share))
+        return max(0, reserved - self._in_flight['batch'])
+
+    def _fits(self, cost, priority):
+        limit = self.capacity
+        if priority == 'interactive':
+            limit -= self._batch_reserve()
+        elif self._queues['interactive']:
+            # Interactive work is waiting: batch only gets its reserved share
+            reserved = max(1, int(self.capacity * self.min_batch_share))
+            if self._in_flight['batch'] + cost > reserved:
+                return False
+        return self._total_in_flight() + cost <= limit
+
+    def _admit(self, waiter, priority):
+        self._queues[priority].remove(waiter)
+        self._queued_cost[priority] -= waiter.cost
+        self._in_flight[priority] += waiter.cost
+        waiter.admitted = True
+        waiter.event.set()
+
+    def _admit_waiters(self):
+        # Interactive first; within a class first fit in arrival order, and
+        # nobody passes a head that waited too long
+        now = time.monotonic()
+        for priority in PRIORITY_CLASSES:
+            queue = self._queues[priority]
+            for waiter in list(queue):
+                if self._fits(waiter.cost, priority):
+                    self._admit(waiter, priority)
+                elif waiter is queue[0] and now - waiter.arrived >= self.max_bypass_wait:
+                    break
+        if self._total_in_flight() == 0:
+            # The class limits kept every head out of an idle server: run the oldest one
+            heads = [(queue[0].arrived, priority) for priority, queue in self._queues.items() if queue]
+            if heads:
+                _, priority = min(heads)
+                self._admit(self._queues[priority][0], priority)
+
+    def _retry_after(self, extra_cost=0):
+        work = self._total_in_flight() + sum(self._queued_cost.values()) + extra_cost
+        return max(1, math.ceil(work * self._seconds_per_unit / self.capacity))
+
+    def acquire(self, cost, priority=DEFAULT_PRIORITY):
+        """
+        Wait until `cost` units are available to the priority class.
+
+        Returns:
+            Ticket for the admitted units
+
+        Raises:
+            Overloaded: When the class's queue is full (429) or the wait exceeded max_wait (503)
+            ValueError: For an unknown priority class
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority: {priority}")
+        with self._lock:
+            queue = self._queues[priority]
+            if not queue and self._fits(cost, priority):
+                self._in_flight[priority] += cost
+                self._record_admission(priority, 0.0)
+                return Ticket(self, cost, priority)
+            if (len(queue) >= self.max_queue_length
+                    or self._queued_cost[priority] + cost > self.max_queue_cost):
+                self._counters[priority]["rejected_queue_full"] += 1
+                raise Overloaded(429, self._retry_after(cost), "Server busy: request queue is full")
+            waiter = _Waiter(cost, priority)
+            queue.append(waiter)
+            self._queued_cost[priority] += cost
+            # A waiter that fits may pass a head that is still waiting for room
+            self._admit_waiters()
+
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            waited = time.monotonic() - waiter.arrived
+            if not waiter.admitted:
+                queue.remove(waiter)
+                self._queued_cost[priority] -= waiter.cost
+                self._counters[priority]["rejected_timeout"] += 1
+                # The head may have been blocking others
+                self._admit_waiters()
+                raise Overloaded(503, self._retry_after(), "Server busy: timed out waiting for capacity")
+            self._record_admission(priority, waited)
+        return Ticket(self, cost, priority)
+
+    def _record_admission(self, priority, waited):
+        counters = self._counters[priority]
+        counters["admitted"] += 1
+        counters["total_wait"] += waited
+        counters["max_wait"] = max(counters["max_wait"], waited)
+
+    def preempt(self, ticket):
+        """
+        Yield a batch ticket's units if that lets waiting interactive work in.
+
+        The ticket only yields when the interactive head fits afterwards, with
+        the batch reserve its own re-queued waiter causes counted. It then waits
+        at the front of the batch queue for at most max_wait seconds; past that
+        it takes its units back regardless, since the request is already running.
+
+        Returns:
+            True if the ticket yielded
+        """
+        with self._lock:
+            interactive = self._queues['interactive']
+            if not interactive:
+                return False
+            reserved = max(1, int(self.capacity * self.min_batch_share))
+            if self._in_flight['batch'] <= reserved:
+                return False
+            # Yield tentatively and check the head against the limits as they would then be
+            self._in_flight['batch'] -= ticket.cost
+            waiter = _Waiter(ticket.cost, 'batch')
+            self._queues['batch'].appendleft(waiter)
+            if not self._fits(interactive[0].cost, 'interactive'):
+                self._queues['batch'].popleft()
+                self._in_flight['batch'] += ticket.cost
+                return False
+            self._queued_cost['batch'] += ticket.cost
+            self._counters['batch']["preempted"] += 1
+            self._admit_waiters()
+
+        waiter.event.wait(self.max_wait)
+        with self._lock:
+            if not waiter.admitted:
+                # Resume over capacity rather than stall a running request
+                self._queues['batch'].remove(waiter)
+                self._queued_cost['batch'] -= waiter.cost
+                self._in_flight['batch'] += waiter.cost
+                self._counters['batch']["resumed_over_capacity"] += 1
+        return True
+
+    def release(self, cost, seconds=None, priority=DEFAULT_PRIORITY):
+        """
+        Return `cost` units and admit whoever fits now.
+
+        Args:
+            cost: Units taken by acquire()
+            seconds: Measured service time, used for Retry-After estimates
+            priority: Class the units were taken for
+        """
+        with self._lock:
+            self._in_flight[priority] -= cost
+            if seconds is not None:
+                per_unit = seconds / cost
+                self._seconds_per_unit += SERVICE_SMOOTHING * (per_unit - self._seconds_per_unit)
+            self._admit_waiters()
+
+    @contextmanager
+    def admit(self, input_code, priority=DEFAULT_PRIORITY):
+        """Run the body once the request's cost is admitted; yields its Ticket (see acquire)."""
+        ticket = self.acquire(request_cost(input_code, self.capacity), priority)
+        started = time.perf_counter()
+        try:
+            yield ticket
+        finally:
+            self.release(ticket.cost, time.perf_counter() - started, priority)
+
+    def metrics(self):
+        """Queue depth, queued and in-flight cost, wait times, preemptions and rejections per class."""
+        with self._lock:
+            now = time.monotonic()
+            classes = {}
+            for priority in PRIORITY_CLASSES:
+                queue = self._queues[priority]
+                counters = self._counters[priority]
+                admitted = counters["admitted"]
+                classes[priority] = {
+                    "in_flight_cost": self._in_flight[priority],
+                    "queue_depth": len(queue),
+                    "queued_cost": self._queued_cost[priority],
+                    "oldest_wait": (now - queue[0].arrived) if queue else 0.0,
+                    "admitted": admitted,
+                    "preempted": counters["preempted"],
+                    "resumed_over_capacity": counters["resumed_over_capacity"],
+                    "rejected_queue_full": counters["rejected_queue_full"],
+                    "rejected_timeout": counters["rejected_timeout"],
+                    "mean_wait": counters["total_wait"] / admitted if admitted else 0.0,
+                    "max_wait": counters["max_wait"],
+                }
+            return {
+                "capacity": self.capacity,
+                "in_flight_cost": self._total_in_flight(),
+                "queue_depth": sum(len(queue) for queue in self._queues.values()),
+                "rejected_queue_full": sum(c["rejected_queue_full"] for c in classes.values()),
+                "rejected_timeout": sum(c["rejected_timeout"] for c in classes.values()),
+                "seconds_per_unit": self._seconds_per_unit,
+                "classes": classes,
+            }
+
+
+admission = AdmissionController()
@@ -0,0 +1,133 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When several callers send the same payload at the same moment (a team opening
+the same shared file, CI retrying a job), only the first one runs the
+pipeline. The others wait for that computation and receive its result, so a
+burst of duplicates costs one run instead of one per request.
+
+Requests are keyed by a hash of the source, the operation and the remaining
+request options, so requests that differ in any option (range, tier,
+profile...) never share a result. The in-flight key also carries the
+priority class: a follower waits on the leader's admission, so an
+interactive request must not queue behind a batch leader. Coalescing only covers requests that
+overlap in time within one process; nothing is kept once the computation
+finishes.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Dict, List, Any, Tuple, Optional
+
+# Request fields that are part of the key through their own hash, or that do not
+# change the result (the priority class only orders admission; run_coalesced adds it
+# to the in-flight key)
+KEY_EXCLUDED_OPTIONS = ('code', 'operation', 'priority')
+
+
+def request_key(input_code, operation='sugarize', options=None):
+    """
+    Build the coalescing key of a request.
+
+    Args:
+        input_code: Python source code string
+        operation: 'sugarize' or 'desugarize'
+        options: Request options (the "code" and "operation" fields are ignored)
+
+    Returns:
+        String key; equal keys mean the requests produce the same result
+    """
+    options = {name: value for name, value in (options or {}).items() if name not in KEY_EXCLUDED_OPTIONS}
+    content_hash = hashlib.sha256(input_code.encode('utf-8', 'surrogatepass')).hexdigest()
+    canonical_options = json.dumps(options, sort_keys=True, separators=(',', ':'), default=str)
+    return f"{operation}:{content_hash}:{canonical_options}"
+
+
+class _Call:
+    """One in-flight computation and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Run at most one computation per key at a time; concurrent callers with the
+    same key share its result (or its exception).
+
+    The shared result is handed to every caller as-is, so callers must treat it
+    as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"computed": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        """
+        Return fn()'s result, running fn only if no call with the same key is in flight.
+
+        Args:
+            key: Coalescing key (see request_key)
+            fn: Callable without arguments computing the result
+
+        Returns:
+            The result of the (possibly shared) computation
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["computed"] += 1
+            else:
+                call.followers += 1
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Later requests start a fresh computation; waiters already hold the call
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """Number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
+
+
+single_flight = SingleFlight()
+
+
+def run_coalesced(input_code, operation, options, fn, priority=None):
+    """
+    Run a request's computation through the shared SingleFlight.
+
+    Args:
+        input_code: Python source code string
+        operation: 'sugarize' or 'desugarize'
+        options: Request options
+        fn: Callable without arguments returning the (payload, status) pair
+        priority: Admission class fn runs under; only requests of the same class are coalesced
+
+    Returns:
+        The (payload, status) pair, shared with identical concurrent requests
+    """
+    return single_flight.do(f"{priority}:{request_key(input_code, operation, options)}", fn)
@@ -0,0 +1,70 @@
+"""
+Strong ETags for transformation results and rulebook entries.
+
+A result is a pure function of the source, the operation, the request
+options, the enabled rule set, the rulebook and the code of the pipeline, so
+its ETag is derived from those inputs alone (the code enters as a fingerprint
+of its sources, see utils/fingerprint.py): validating an If-None-Match header costs one hash of the
+request and no pipeline work. The same value identifies the result in the
+server-side result cache.
+
+Requests whose responses are not reproducible (deadline tiers, background
+tokens, explanation stream ids, timing measurements) get no ETag.
+
+The representation (JSON or MessagePack, gzip accepted or not) is part of the
+tag, since a strong ETag has to change with the bytes sent.
+"""
+
+import functools
+import hashlib
+from typing import Dict, List, Any, Tuple, Optional
+
+from rules.rule_index import TRANSFORMATION_RULE_REFS, PLACEHOLDER_TRANSFORMATIONS, rulebook_version
+from server.coalescing import request_key
+from utils.fingerprint import code_fingerprint
+
+# Options whose responses differ between identical requests (deadlines, timings, tokens)
+UNREPRODUCIBLE_OPTIONS = ('tier', 'background', 'stream_explanations', 'measure')
+
+
+@functools.lru_cache(maxsize=1)
+def rule_set_fingerprint():
+    """Short hash of the transformation types the transformer implements."""
+    rules = sorted(rule for rule in TRANSFORMATION_RULE_REFS if rule not in PLACEHOLDER_TRANSFORMATIONS)
+    return hashlib.sha1(",".join(rules).encode('ascii')).hexdigest()[:12]
+
+
+def result_key(input_code, operation='sugarize', options=None):
+    """
+    Cache key of a transformation result, or None if the response is not reproducible.
+
+    Args:
+        input_code: Python source code string
+        operation: 'sugarize' or 'desugarize'
+        options: Request options
+
+    Returns:
+        Hex digest over the request, rule set, rulebook version and pipeline code fingerprint
+    """
+    options = options or {}
+    if any(options.get(name) for name in UNREPRODUCIBLE_OPTIONS):
+        return None
+    digest = hashlib.sha256(request_key(input_code, operation, options).encode('utf-8'))
+    digest.update(f"|{rule_set_fingerprint()}|{rulebook_version()}|{code_fingerprint()}".encode('ascii'))
+    return digest.hexdigest()
+
+
+def representation_tag(msgpack=False, gzip=False):
+    """Suffix naming the negotiated encoding of a response."""
+    return ("msgpack" if msgpack else "json") + ("-gzip" if gzip else "")
+
+
+def result_etag(key, representation):
+    """Strong ETag value (without quotes) for a result key and representation."""
+    return f"{key[:32]}-{representation}"
+
+
+def rule_etag(name, representation):
+    """Strong ETag value (without quotes) for a rulebook entry and representation."""
+    digest = hashlib.sha1(f"{name}|{rulebook_version()}".encode('utf-8')).hexdigest()[:20]
+    return f"{digest}-{representation}"
@@ -0,0 +1,308 @@
+"""
+Explanation streams, decoupled from the transform response.
+
+A sugarize request with "stream_explanations" answers as soon as the code is
+transformed and validated; the explanations are resolved in the background
+and delivered over Server-Sent Events under a stream id. Each explanation is
+resolved, in order of preference, from:
+- the cache of explanations the model already wrote for the rule
+- the model (SugaringAgent's Claude client), when one is configured
+- the precompiled rulebook text
+
+Explanations are emitted as they resolve, each with its index in the
+request's explanation list, followed by a final "done" event. An explanation
+that cannot be resolved is still emitted, with source "error", so every
+stream ends with "done".
+
+Stream ids are random. Events are written through to the shared state store
+(server/shared_state.py) when there is one, so any pre-forked worker can serve
+a stream another worker is resolving.
+"""
+
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple, Optional
+
+from rules.rule_index import get_rule_explanation
+from server.shared_state import default_shared_state
+
+# Explanation streams kept for (re)connecting clients
+MAX_STREAMS = 256
+
+# Model explanations kept per rule
+MAX_CACHED_EXPLANATIONS = 512
+
+# Explanations resolved at the same time across all streams
+EXPLANATION_WORKERS = 4
+
+# Seconds between keep-alive comments on an idle event stream
+HEARTBEAT_INTERVAL = 15.0
+
+# Random bytes in a stream id
+STREAM_ID_BYTES = 16
+
+# Seconds a stream's events stay in the shared store
+SHARED_STREAM_TTL = 600.0
+
+# Seconds between checks of the shared store while following another worker's stream
+SHARED_POLL_INTERVAL = 0.2
+
+
+class ExplanationCache:
+    """
+    Least-recently-used cache of model-written explanations, keyed by rule name.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_EXPLANATIONS):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, rule_ref):
+        with self._lock:
+            explanation = self._entries.get(rule_ref)
+            if explanation is not None:
+                self._entries.move_to_end(rule_ref)
+            return explanation
+
+    def put(self, rule_ref, explanation):
+        with self._lock:
+            self._entries[rule_ref] = explanation
+            self._entries.move_to_end(rule_ref)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+explanation_cache = ExplanationCache()
+
+_agent = None
+_agent_lock = threading.Lock()
+
+
+def _default_model():
+    """Return SugaringAgent.enhance_explanation, or None when no model is configured."""
+    global _agent
+    with _agent_lock:
+        if _agent is None:
+            from agents.sugaring_agent import SugaringAgent
+            _agent = SugaringAgent()
+    return _agent.enhance_explanation if _agent.claude_client else None
+
+
+def resolve_explanation(rule_ref, cache=explanation_cache, model=None):
+    """
+    Resolve the explanation of one rule.
+
+    Args:
+        rule_ref: Rulebook rule name
+        cache: ExplanationCache holding earlier model explanations
+        model: Callable taking a rule name and returning explanation text (or
+            None); defaults to the configured SugaringAgent
+
+    Returns:
+        Tuple of (explanation text, source) with source "cache", "model" or "rulebook"
+    """
+    cached = cache.get(rule_ref)
+    if cached is not None:
+        return cached, "cache"
+    if model is None:
+        model = _default_model()
+    if model is not None:
+        try:
+            explanation = model(rule_ref)
+        except Exception:
+            explanation = None
+        if explanation:
+            cache.put(rule_ref, explanation)
+            return explanation, "model"
+    return get_rule_explanation(rule_ref), "rulebook"
+
+
+class ExplanationStream:
+    """
+    Events of one explanation stream, appended as explanations resolve.
+
+    Args:
+        stream_id: Id clients follow the stream with
+        total: Number of explanations to expect
+        shared: Optional SharedState the events are written through to
+        remote: The stream is resolved by another worker; events are read from `shared`
+    """
+
+    def __init__(self, stream_id, total, shared=None, remote=False):
+        self.stream_id = stream_id
+        self.total = total
+        self.events = []
+        self.done = False
+        self._shared = shared
+        self._remote = remote
+        self._resolved = 0
+        self._listeners = []
+        self._condition = threading.Condition()
+
+    def append(self, event):
+        with self._condition:
+            new_events = [event]
+            if event["event"] == "explanation":
+                self._resolved += 1
+                if self._resolved == self.total:
+                    new_events.append({"event": "done", "data": {"count": self.total}})
+            if self._shared is not None:
+                self._shared.append_stream_events(self.stream_id, len(self.events), new_events)
+            self.events.extend(new_events)
+            self.done = self.events[-1]["event"] == "done"
+            # Pushed under the lock so every listener sees the events in stream order
+            for listener in self._listeners:
+                for new_event in new_events:
+                    self._call(listener, new_event)
+            if self.done:
+                self._listeners = []
+            self._condition.notify_all()
+
+    def listen(self, callback):
+        """
+        Call `callback(event)` for every event, past and future (for transports that push).
+        """
+        with self._condition:
+            for event in self.events:
+                self._call(callback, event)
+            if not self.done:
+                self._listeners.append(callback)
+
+    @staticmethod
+    def _call(callback, event):
+        try:
+            callback(event)
+        except Exception:
+            # A broken push channel must not stop the other listeners
+            pass
+
+    def wait_for_events(self, start, timeout=None):
+        """
+        Block until there are events past index `start` or the stream is done.
+
+        Returns:
+            Tuple of (new events, whether the stream is done)
+        """
+        if self._remote:
+            return self._poll_shared(start, timeout)
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.events) > start or self.done, timeout)
+            return list(self.events[start:]), self.done
+
+    def _poll_shared(self, start, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                events = self._shared.stream_events(self.stream_id, len(self.events)) or []
+                self.events.extend(events)
+                self.done = bool(self.events) and self.events[-1]["event"] == "done"
+                if len(self.events) > start or self.done:
+                    return list(self.events[start:]), self.done
+            if deadline is not None and time.monotonic() >= deadline:
+                return [], False
+            wait = SHARED_POLL_INTERVAL if deadline is None else min(SHARED_POLL_INTERVAL,
+                                                                      max(deadline - time.monotonic(), 0.0))
+            time.sleep(wait)
+
+
+class ExplanationStreams:
+    """
+    Resolves explanation lists in the background and keeps their streams for
+    Server-Sent Events clients.
+
+    Args:
+        shared: Optional SharedState making the streams visible to every worker
+    """
+
+    def __init__(self, max_streams=MAX_STREAMS, workers=EXPLANATION_WORKERS, model=None, shared=None):
+        self.max_streams = max_streams
+        self.workers = workers
+        self.model = model
+        self.shared = shared
+        self._streams = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, transformations):
+        """
+        Start resolving the explanations of a list of transformations.
+
+        Args:
+            transformations: List of {"type", "rule_ref"} dictionaries
+
+        Returns:
+            Stream id to follow the explanations with
+        """
+        stream = ExplanationStream(f"explain-{secrets.token_urlsafe(STREAM_ID_BYTES)}", len(transformations),
+                                   self.shared)
+        if self.shared is not None:
+            self.shared.expire_streams(SHARED_STREAM_TTL)
+            self.shared.open_stream(stream.stream_id, stream.total)
+        with self._lock:
+            self._streams[stream.stream_id] = stream
+            while len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='explanations')
+        if not transformations:
+            stream.append({"event": "done", "data": {"count": 0}})
+        for index, transform in enumerate(transformations):
+            self._executor.submit(self._resolve, stream, index, transform)
+        return stream.stream_id
+
+    def _resolve(self, stream, index, transform):
+        # Whatever goes wrong, the index gets an event, or the stream would never be done
+        try:
+            explanation, source = resolve_explanation(transform.get("rule_ref", ""), model=self.model)
+            transformation_type = transform.get("type")
+        except Exception as e:
+            explanation, source = f"Explanation unavailable: {type(e).__name__}: {e}", "error"
+            transformation_type = transform.get("type") if isinstance(transform, dict) else None
+        stream.append({"event": "explanation", "data": {
+            "index": index,
+            "transformation_type": transformation_type,
+            "explanation": explanation,
+            "source": source,
+        }})
+
+    def get(self, stream_id):
+        """Return the stream with this id, or None if it is unknown or expired."""
+        with self._lock:
+            stream = self._streams.get(stream_id)
+        if stream is None and self.shared is not None:
+            # Resolved by another worker
+            total = self.shared.stream_total(stream_id)
+            if total is not None:
+                stream = ExplanationStream(stream_id, total, self.shared, remote=True)
+        return stream
+
+
+explanation_streams = ExplanationStreams(shared=default_shared_state())
+
+
+def event_stream(stream, start=0, heartbeat=HEARTBEAT_INTERVAL):
+    """
+    Generate the Server-Sent Events of an explanation stream, ending after "done".
+
+    Args:
+        stream: ExplanationStream to follow
+        start: Number of events the client already has (from Last-Event-ID)
+        heartbeat: Seconds between keep-alive comments while waiting
+    """
+    position = start
+    while True:
+        events, done = stream.wait_for_events(position, heartbeat)
+        if not events and not done:
+            yield ": keep-alive\n\n"
+            continue
+        for event in events:
+            position += 1
+            yield f"id: {position}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        if done and position >= len(stream.events):
+            return
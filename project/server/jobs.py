@@ -0,0 +1,818 @@
+"""
+Asynchronous jobs for whole-repository transformation runs.
+
+A job is submitted once, either as a tar archive (optionally compressed) or as
+a path on the server's disk, and answered with a job id. The files are then
+transformed in the background and the client polls the job's progress and
+pages through the per-file results, instead of sending thousands of
+synchronous /process_code requests.
+
+- Jobs, their files and the finished results live in one WAL-mode SQLite
+  database under the jobs directory. Every file's result is written as soon as
+  it is done, so the database doubles as the checkpoint: a runner that starts
+  after a crash or restart picks up the files that are still pending.
+- Results are stored marshalled and zlib-compressed; files the pipeline leaves
+  unchanged are stored as a status only.
+- Files are deduplicated by content hash through a ScanManifest (see
+  utils/scan_manifest.py): a file whose content was already transformed with
+  the same options and rules, in this job or an earlier one, is answered from
+  the manifest, and local files whose size and mtime are unchanged are not
+  even re-read.
+- The files are transformed by a pool of local worker processes at a lower
+  scheduling priority, so a repository scan does not compete with editor
+  requests for the CPU.
+- A worker that crashes or is killed (out of memory, a broken pool) says
+  nothing about the files it had: they stay pending and the pool is replaced.
+  Those files are retried one at a time, so a crash can be pinned on one file;
+  only a file that brings down its worker MAX_WORKER_ATTEMPTS times on its own
+  is given up with an error, which is never stored in the manifest.
+- Only one process per jobs directory runs jobs (an exclusive lock file); the
+  other pre-forked workers just read and write the database. The runner is
+  started by the first job request a worker serves, so after a restart the
+  unfinished jobs resume as soon as a client submits or polls.
+- Local paths are only accepted below the directories listed in
+  $SYNTACTIC_JOB_ROOTS (or `serve --job-root`).
+
+Results are paged in completion order, so a client can read them while the job
+is still running without missing a file that finishes late.
+"""
+
+import ast
+import json
+import marshal
+import os
+import posixpath
+import re
+import shutil
+import sqlite3
+import tarfile
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Tuple, Optional
+
+from utils.scan_manifest import ScanManifest, content_hash
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no flock: every process may run jobs there
+    fcntl = None
+
+# Default location, next to the shared result cache; SYNTACTIC_JOBS_DIR overrides it
+DEFAULT_JOBS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                '__pycache__', 'jobs')
+JOBS_DIR_ENV = 'SYNTACTIC_JOBS_DIR'
+JOB_ROOTS_ENV = 'SYNTACTIC_JOB_ROOTS'
+
+# Worker processes of the runner; half the CPUs leaves room for interactive requests
+DEFAULT_JOB_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# Nice increment of the worker processes
+JOB_NICENESS = 10
+
+# Limits of one job
+MAX_FILE_BYTES = 1024 * 1024
+MAX_ARCHIVE_BYTES = 512 * 1024 * 1024
+MAX_JOB_FILES = 100000
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Seconds the runner sleeps when there is nothing to do
+POLL_INTERVAL = 1.0
+
+# Worker crashes a file may cause, running alone, before it is given up
+MAX_WORKER_ATTEMPTS = 3
+
+# Seconds before a process that did not get the runner lock tries again
+LOCK_RETRY_INTERVAL = 5.0
+
+# Jobs are not latency-critical: wait for a sibling's write instead of failing
+BUSY_TIMEOUT_MS = 5000
+
+RESULT_COMPRESSION_LEVEL = 6
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{16}$')
+JOB_OPERATIONS = ('sugarize', 'desugarize')
+
+# Options that only make sense for one interactive request; measuring runs the
+# submitted code and is left to the CLI
+UNSUPPORTED_JOB_OPTIONS = ('tier', 'background', 'stream_explanations', 'profile', 'range', 'diff', 'measure')
+
+# Request fields that describe the job rather than the per-file pipeline options
+JOB_FIELDS = ('path', 'operation', 'priority')
+
+ARCHIVE_MIME_TYPES = ('application/x-tar', 'application/gzip', 'application/x-gzip',
+                      'application/x-gtar', 'application/x-bzip2', 'application/x-xz')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    options TEXT NOT NULL,
+    root TEXT NOT NULL,
+    owns_root INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    done_seq INTEGER,
+    result BLOB,
+    error TEXT,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE INDEX IF NOT EXISTS files_status ON files (job_id, status);
+CREATE INDEX IF NOT EXISTS files_done ON files (job_id, done_seq);
+"""
+
+
+def default_jobs_dir():
+    """Jobs directory to use: $SYNTACTIC_JOBS_DIR, or the default."""
+    return os.environ.get(JOBS_DIR_ENV) or DEFAULT_JOBS_DIR
+
+
+def default_job_roots():
+    """Directories local-path jobs may read, from $SYNTACTIC_JOB_ROOTS (os.pathsep-separated)."""
+    return [root for root in os.environ.get(JOB_ROOTS_ENV, '').split(os.pathsep) if root]
+
+
+def list_python_files(root):
+    """Python files below root as sorted relative POSIX paths, skipping hidden and cache directories."""
+    paths = []
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d != '__pycache__')
+        for name in sorted(files):
+            if name.endswith('.py'):
+                relative = os.path.relpath(os.path.join(directory, name), root)
+                paths.append(relative.replace(os.sep, '/'))
+    return paths
+
+
+def extract_archive(stream, dest):
+    """
+    Copy the Python files of a tar archive into dest.
+
+    Links, devices and members that would land outside dest are skipped; the
+    archive is read as a stream, so it never has to fit in memory.
+
+    Args:
+        stream: Readable binary file object (plain, gzip, bz2 or xz tar)
+        dest: Directory to write to
+
+    Returns:
+        Sorted relative paths of the extracted files
+
+    Raises:
+        ValueError: For an unreadable archive or one over the size limits
+    """
+    paths = []
+    total = 0
+    try:
+        with tarfile.open(fileobj=stream, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile() or not member.name.endswith('.py'):
+                    continue
+                name = posixpath.normpath(member.name.replace('\\', '/'))
+                if name.startswith(('/', '../')) or name == '..' or ':' in name.split('/')[0]:
+                    continue
+                total += member.size
+                if total > MAX_ARCHIVE_BYTES or len(paths) >= MAX_JOB_FILES:
+                    raise ValueError("Archive exceeds the job size limits")
+                target = os.path.join(dest, *name.split('/'))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with archive.extractfile(member) as source, open(target, 'wb') as f:
+                    shutil.copyfileobj(source, f)
+                paths.append(name)
+    except (tarfile.TarError, EOFError, OSError, zlib.error) as e:
+        raise ValueError(f"Unreadable archive: {e}")
+    return sorted(set(paths))
+
+
+def encode_result(payload):
+    """Compact on-disk form of a result payload."""
+    return zlib.compress(marshal.dumps(payload), RESULT_COMPRESSION_LEVEL)
+
+
+def decode_result(blob):
+    return marshal.loads(zlib.decompress(blob))
+
+
+def process_file(root, path, operation, options):
+    """
+    Transform one file of a job; runs in a worker process.
+
+    Returns:
+        Tuple of (status, encoded result or None, error message or None), where
+        status is 'transformed', 'unchanged', 'skipped' or 'error'
+    """
+    from server.pipeline import run_operation
+
+    full_path = os.path.join(root, *path.split('/'))
+    try:
+        if os.path.getsize(full_path) > MAX_FILE_BYTES:
+            return 'skipped', None, f"larger than {MAX_FILE_BYTES} bytes"
+        with open(full_path, encoding='utf-8') as f:
+            code = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return 'skipped', None, str(e)
+
+    payload, status = run_operation(code, operation, options)
+    if status != 200:
+        return 'error', None, str(payload.get('message'))
+    if 'edits' in payload:
+        unchanged = not payload['edits']
+    else:
+        unchanged = _same_code(code, payload.get('sugared_code', payload.get('desugared_code')))
+    if unchanged:
+        return 'unchanged', None, None
+    try:
+        return 'transformed', encode_result(payload), None
+    except ValueError as e:
+        return 'error', None, f"unstorable result: {e}"
+
+
+def _same_code(code, output):
+    # The pipelines re-print the code and may add a comment; compare the syntax trees
+    if output is None:
+        return False
+    try:
+        return ast.dump(ast.parse(code)) == ast.dump(ast.parse(output))
+    except (SyntaxError, ValueError):
+        return False
+
+
+def _init_worker():
+    # Repository scans are batch work: leave the CPU to the request handlers first
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(JOB_NICENESS)
+        except OSError:
+            pass
+
+
+def form_options(values):
+    """Options of an upload, sent as query or form fields: "true"/"false" become booleans."""
+    booleans = {'true': True, '1': True, 'false': False, '0': False}
+    return {name: booleans.get(value.lower(), value) for name, value in values.items()}
+
+
+def parse_job_options(options):
+    """
+    Validate the options of a job submission.
+
+    Returns:
+        Tuple of (operation, per-file pipeline options)
+
+    Raises:
+        ValueError: For an unknown operation or an option jobs do not support
+    """
+    operation = options.get('operation', 'sugarize')
+    if operation not in JOB_OPERATIONS:
+        raise ValueError(f"operation must be one of {', '.join(JOB_OPERATIONS)}")
+    unsupported = [name for name in UNSUPPORTED_JOB_OPTIONS if options.get(name)]
+    if unsupported:
+        raise ValueError(f"Options not supported for jobs: {', '.join(unsupported)}")
+    file_options = {name: value for name, value in options.items() if name not in JOB_FIELDS}
+    # Clients already have the sources; leave them out of the stored results
+    file_options.setdefault('lean', True)
+    return operation, file_options
+
+
+class _InlineExecutor:
+    """Runs submitted calls at once in the calling thread (JobManager with workers=0)."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class JobManager:
+    """
+    Submits, runs and reports jobs stored in one jobs directory.
+
+    Args:
+        jobs_dir: Directory holding the database and extracted archives
+        workers: Worker processes of the runner; 0 transforms in the runner thread
+        roots: Directories local-path jobs may read (None reads $SYNTACTIC_JOB_ROOTS)
+        processor: Callable (root, path, operation, options) -> (status, blob, error)
+        manifest: ScanManifest deduplicating files by content hash across jobs
+            (defaults to one in the jobs directory; False disables it)
+    """
+
+    def __init__(self, jobs_dir, workers=DEFAULT_JOB_WORKERS, roots=None, processor=process_file, manifest=None):
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.roots = roots
+        self.processor = processor
+        if manifest is None:
+            manifest = ScanManifest(os.path.join(jobs_dir, 'manifest.sqlite3'))
+        self.manifest = manifest or None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._runner = None
+        self._runner_pid = None
+        self._lock_file = None
+        self._lock_retry_at = 0.0
+        self._wake = threading.Event()
+        self._stopping = False
+        self._executor = None
+        # (job_id, seq) of files that were in flight when a worker failed -> crashes while running alone
+        self._suspects = {}
+
+    @property
+    def database_path(self):
+        return os.path.join(self.jobs_dir, 'jobs.sqlite3')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        # A connection must not cross a fork
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        connection = sqlite3.connect(self.database_path, timeout=BUSY_TIMEOUT_MS / 1000.0,
+                                     isolation_level=None, check_same_thread=False)
+        connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.executescript(SCHEMA)
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    # Submission
+
+    def _resolve_local_path(self, path):
+        roots = self.roots if self.roots is not None else default_job_roots()
+        real = os.path.realpath(path)
+        for root in roots:
+            real_root = os.path.realpath(root)
+            if real == real_root or real.startswith(real_root.rstrip(os.sep) + os.sep):
+                return real
+        raise PermissionError(f"Path is outside the allowed job roots: {path}")
+
+    def submit_path(self, path, options):
+        """
+        Create a job over the Python files below a local path.
+
+        Returns:
+            Job id
+
+        Raises:
+            PermissionError: When the path is not below an allowed root
+            ValueError: For invalid options or a path without Python files
+        """
+        operation, file_options = parse_job_options(options)
+        root = self._resolve_local_path(path)
+        if os.path.isfile(root):
+            root, paths = os.path.dirname(root), [os.path.basename(root)]
+        elif os.path.isdir(root):
+            paths = list_python_files(root)
+        else:
+            raise ValueError(f"No such file or directory: {path}")
+        if len(paths) > MAX_JOB_FILES:
+            raise ValueError(f"Job has more than {MAX_JOB_FILES} files")
+        return self._create(operation, file_options, root, False, paths)
+
+    def submit_archive(self, stream, options):
+        """
+        Create a job over the Python files of an uploaded tar archive.
+
+        Returns:
+            Job id
+
+        Raises:
+            ValueError: For invalid options or an unreadable or oversized archive
+        """
+        operation, file_options = parse_job_options(options)
+        job_id = uuid.uuid4().hex[:16]
+        root = os.path.join(self.jobs_dir, job_id)
+        os.makedirs(root, exist_ok=True)
+        try:
+            paths = extract_archive(stream, root)
+        except ValueError:
+            shutil.rmtree(root, ignore_errors=True)
+            raise
+        return self._create(operation, file_options, root, True, paths, job_id)
+
+    def _create(self, operation, file_options, root, owns_root, paths, job_id=None):
+        job_id = job_id or uuid.uuid4().hex[:16]
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO jobs (id, status, operation, options, root, owns_root, total, created, updated) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, operation, json.dumps(file_options), root, int(owns_root), len(paths), now, now))
+            connection.executemany(
+                "INSERT INTO files (job_id, seq, path, status) VALUES (?, ?, ?, 'pending')",
+                ((job_id, seq, path) for seq, path in enumerate(paths)))
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        self._wake.set()
+        return job_id
+
+    # Reporting
+
+    def status(self, job_id):
+        """Progress of a job, or None if it does not exist."""
+        connection = self._connection()
+        row = connection.execute("SELECT status, operation, total, created, updated FROM jobs WHERE id = ?",
+                                 (job_id,)).fetchone()
+        if row is None:
+            return None
+        status, operation, total, created, updated = row
+        counts = dict(connection.execute(
+            "SELECT status, COUNT(*) FROM files WHERE job_id = ? GROUP BY status", (job_id,)).fetchall())
+        done = total - counts.get('pending', 0)
+        return {
+            'job_id': job_id,
+            'status': status,
+            'operation': operation,
+            'total': total,
+            'done': done,
+            'transformed': counts.get('transformed', 0),
+            'unchanged': counts.get('unchanged', 0),
+            'skipped': counts.get('skipped', 0),
+            'errors': counts.get('error', 0),
+            'progress': done / total if total else 1.0,
+            'created': created,
+            'updated': updated,
+        }
+
+    def results(self, job_id, cursor=0, limit=DEFAULT_PAGE_SIZE):
+        """
+        One page of finished files, in completion order.
+
+        Args:
+            job_id: Job to read
+            cursor: Value of "next_cursor" from the previous page (0 for the first)
+            limit: Files per page, at most MAX_PAGE_SIZE
+
+        Returns:
+            Dict with the "results" and the "next_cursor", or None if the job does not exist
+        """
+        connection = self._connection()
+        row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        limit = max(1, min(MAX_PAGE_SIZE, limit))
+        rows = connection.execute(
+            "SELECT done_seq, path, status, result, error FROM files "
+            "WHERE job_id = ? AND done_seq > ? ORDER BY done_seq LIMIT ?", (job_id, cursor, limit)).fetchall()
+        results = []
+        for done_seq, path, status, blob, error in rows:
+            entry = {'path': path, 'status': status}
+            if blob is not None:
+                entry['result'] = decode_result(blob)
+            if error is not None:
+                entry['error'] = error
+            results.append(entry)
+        next_cursor = rows[-1][0] if rows else cursor
+        return {
+            'job_id': job_id,
+            'status': row[0],
+            'results': results,
+            'next_cursor': next_cursor,
+            # Nothing further will appear once a finished job's last page is read
+            'complete': row[0] in ('done', 'cancelled') and len(rows) < limit,
+        }
+
+    def cancel(self, job_id):
+        """Stop a job and delete its results; returns False if it does not exist."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT root, owns_root FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                connection.execute("UPDATE jobs SET status = 'cancelled', updated = ? WHERE id = ?",
+                                   (time.time(), job_id))
+                connection.execute("DELETE FROM files WHERE job_id = ?", (job_id,))
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        if row is None:
+            return False
+        if row[1]:
+            shutil.rmtree(row[0], ignore_errors=True)
+        return True
+
+    # Running
+
+    def _job_state(self, job_id):
+        row = self._connection().execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def _next_job(self):
+        row = self._connection().execute(
+            "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def _record(self, job_id, seq, done_seq, outcome):
+        status, blob, error = outcome
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "UPDATE files SET status = ?, result = ?, error = ?, done_seq = ? "
+                "WHERE job_id = ? AND seq = ? AND status = 'pending'",
+                (status, blob, error, done_seq, job_id, seq))
+            connection.execute("UPDATE jobs SET updated = ? WHERE id = ?", (time.time(), job_id))
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _get_executor(self):
+        if self.workers <= 0:
+            return _InlineExecutor()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._executor
+
+    def _content_hash(self, root, path, remember):
+        if self.manifest is None:
+            return None
+        full_path = os.path.join(root, *path.split('/'))
+        try:
+            if remember:
+                return self.manifest.file_hash(full_path)[0]
+            # Extracted archives are deleted after the job: hash without a manifest entry
+            with open(full_path, 'rb') as f:
+                return content_hash(f.read())
+        except OSError:
+            return None
+
+    def run_job(self, job_id, limit=None):
+        """
+        Transform a job's pending files, writing each result as it finishes.
+
+        Args:
+            job_id: Job to run
+            limit: Stop after this many files (None runs the job to the end)
+
+        Returns:
+            Number of files processed
+        """
+        connection = self._connection()
+        row = connection.execute("SELECT status, operation, options, root FROM jobs WHERE id = ?",
+                                 (job_id,)).fetchone()
+        if row is None or row[0] not in ('queued', 'running'):
+            return 0
+        _, operation, options, root = row
+        options = json.loads(options)
+        connection.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ? AND status = 'queued'",
+                           (time.time(), job_id))
+        pending = connection.execute(
+            "SELECT seq, path FROM files WHERE job_id = ? AND status = 'pending' ORDER BY seq", (job_id,)).fetchall()
+        if limit is not None:
+            pending = pending[:limit]
+        done_seq = connection.execute("SELECT COALESCE(MAX(done_seq), 0) FROM files WHERE job_id = ?",
+                                      (job_id,)).fetchone()[0]
+
+        analysis = f"job:{operation}:{json.dumps(options, sort_keys=True, separators=(',', ':'))}"
+        owns_root = bool(connection.execute("SELECT owns_root FROM jobs WHERE id = ?", (job_id,)).fetchone()[0])
+        queue = iter(pending)
+        held = None
+        in_flight = {}
+        # Files with the same content as one in flight wait for its result
+        followers = {}
+        processed = 0
+        while True:
+            # Keep every worker busy, plus one file queued each; a suspect of an
+            # earlier worker crash runs alone
+            while len(in_flight) < max(1, self.workers * 2) and not self._stopping:
+                item, held = held or next(queue, None), None
+                if item is None:
+                    break
+                seq, path = item
+                alone = (job_id, seq) in self._suspects
+                if alone and in_flight:
+                    held = item
+                    break
+                digest = self._content_hash(root, path, remember=not owns_root)
+                if digest is not None:
+                    outcome = self.manifest.get(digest, analysis)
+                    if outcome is not None:
+                        done_seq += 1
+                        self._record(job_id, seq, done_seq, outcome)
+                        self._suspects.pop((job_id, seq), None)
+                        processed += 1
+                        continue
+                    if digest in followers:
+                        followers[digest].append(seq)
+                        continue
+                    followers[digest] = []
+                future = self._get_executor().submit(self.processor, root, path, operation, options)
+                in_flight[future] = (seq, digest, alone)
+                if alone:
+                    break
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                seq, digest, alone = in_flight.pop(future)
+                seqs = [seq] + (followers.pop(digest, []) if digest is not None else [])
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcome = self._worker_failed(job_id, seq, alone, e)
+                    if outcome is None:
+                        # Not a result: the files stay pending for the next pass
+                        continue
+                else:
+                    # Unreadable or oversized files are not content results, and
+                    # failed runs are retried by the next job
+                    if digest is not None and outcome[0] not in ('skipped', 'error'):
+                        self.manifest.put(digest, analysis, outcome)
+                self._suspects.pop((job_id, seq), None)
+                for each in seqs:
+                    done_seq += 1
+                    self._record(job_id, each, done_seq, outcome)
+                    processed += 1
+            if self._job_state(job_id) != 'running':
+                for future in in_flight:
+                    future.cancel()
+                return processed
+
+        remaining = connection.execute("SELECT COUNT(*) FROM files WHERE job_id = ? AND status = 'pending'",
+                                       (job_id,)).fetchone()[0]
+        if remaining == 0:
+            self._finish(job_id)
+        return processed
+
+    def _worker_failed(self, job_id, seq, alone, error):
+        """
+        Handle a file whose worker raised instead of returning an outcome.
+
+        Returns:
+            None to leave the file pending, or the error outcome of a file
+            that crashed its worker MAX_WORKER_ATTEMPTS times running alone
+        """
+        if isinstance(error, BrokenProcessPool) and self._executor is not None:
+            # Every other file in flight fails with it; the next submission gets a fresh pool
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        attempts = self._suspects.get((job_id, seq), 0) + (1 if alone else 0)
+        if attempts >= MAX_WORKER_ATTEMPTS:
+            return ('error', None, f"worker failed {attempts} times on this file: {error}")
+        self._suspects[(job_id, seq)] = attempts
+        return None
+
+    def _finish(self, job_id):
+        connection = self._connection()
+        row = connection.execute("SELECT root, owns_root FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        connection.execute("UPDATE jobs SET status = 'done', updated = ? WHERE id = ? AND status = 'running'",
+                           (time.time(), job_id))
+        # The results are stored; an uploaded archive's copy is no longer needed
+        if row is not None and row[1]:
+            shutil.rmtree(row[0], ignore_errors=True)
+
+    def _acquire_runner_lock(self):
+        if fcntl is None:
+            return True
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.jobs_dir, 'runner.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def ensure_started(self):
+        """
+        Start the runner thread in this process if no process runs jobs yet.
+
+        Cheap enough to call on every request; the first call after a restart
+        resumes the unfinished jobs.
+        """
+        pid = os.getpid()
+        if self._runner_pid == pid or time.monotonic() < self._lock_retry_at:
+            return
+        with self._lock:
+            if self._runner_pid == pid or time.monotonic() < self._lock_retry_at:
+                return
+            if self._runner_pid is not None:
+                # Forked from the runner process: the thread, lock and pool stay with the parent
+                self._lock_file = self._executor = None
+                self._runner_pid = None
+            try:
+                acquired = self._acquire_runner_lock()
+            except OSError:
+                acquired = False
+            if not acquired:
+                self._lock_retry_at = time.monotonic() + LOCK_RETRY_INTERVAL
+                return
+            self._stopping = False
+            self._runner_pid = pid
+            self._runner = threading.Thread(target=self._run_loop, name='job-runner', daemon=True)
+            self._runner.start()
+
+    def _run_loop(self):
+        while not self._stopping:
+            try:
+                job_id = self._next_job()
+                if job_id is not None:
+                    self.run_job(job_id)
+                    continue
+            except Exception:
+                # Busy database or a broken worker pool: the pending files stay
+                # pending and are retried with a fresh pool
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = None
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+
+    def stop(self):
+        """Stop the runner after the files in flight; unfinished jobs resume on the next start."""
+        self._stopping = True
+        self._wake.set()
+        if self._runner is not None:
+            self._runner.join()
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+        self._runner = self._runner_pid = None
+
+
+def submit_job(options, archive=None, manager=None):
+    """
+    Create a job from a request.
+
+    Args:
+        options: Request options; "path" names a local directory or file
+            unless an archive is uploaded
+        archive: Readable binary stream of an uploaded tar archive, or None
+        manager: JobManager to use (defaults to the process-wide one)
+
+    Returns:
+        Tuple of (response payload, HTTP status code): 202 with the job id
+    """
+    manager = manager or job_manager
+    try:
+        if archive is not None:
+            job_id = manager.submit_archive(archive, options)
+        elif isinstance(options.get('path'), str) and options['path']:
+            job_id = manager.submit_path(options['path'], options)
+        else:
+            return {'status': 'error', 'message': "Send a tar archive or a \"path\""}, 400
+    except PermissionError as e:
+        return {'status': 'error', 'message': str(e)}, 403
+    except ValueError as e:
+        return {'status': 'error', 'message': str(e)}, 400
+    except (OSError, sqlite3.Error) as e:
+        return {'status': 'error', 'message': f"Could not store the job: {e}"}, 500
+    manager.ensure_started()
+    return manager.status(job_id), 202
+
+
+def get_job(job_id, manager=None):
+    """Progress of a job as (payload, status)."""
+    manager = manager or job_manager
+    status = manager.status(job_id) if JOB_ID_PATTERN.match(job_id) else None
+    if status is None:
+        return {'status': 'error', 'message': f"Unknown job: {job_id}"}, 404
+    return status, 200
+
+
+def get_job_results(job_id, cursor=0, limit=DEFAULT_PAGE_SIZE, manager=None):
+    """One page of a job's results as (payload, status)."""
+    manager = manager or job_manager
+    page = manager.results(job_id, cursor, limit) if JOB_ID_PATTERN.match(job_id) else None
+    if page is None:
+        return {'status': 'error', 'message': f"Unknown job: {job_id}"}, 404
+    return page, 200
+
+
+def cancel_job(job_id, manager=None):
+    """Cancel a job and delete its results, as (payload, status)."""
+    manager = manager or job_manager
+    if not JOB_ID_PATTERN.match(job_id) or not manager.cancel(job_id):
+        return {'status': 'error', 'message': f"Unknown job: {job_id}"}, 404
+    return {'job_id': job_id, 'status': 'cancelled'}, 200
+
+
+job_manager = JobManager(default_jobs_dir())
@@ -0,0 +1,284 @@
+"""
+Live-as-you-type preview sessions.
+
+The web UI sends debounced edits of one editor session, each with an
+increasing sequence number, and listens for results on a Server-Sent Events
+stream. Per session:
+- at most one pipeline run is in flight; edits that arrive meanwhile replace
+  each other, so only the newest one runs next
+- the running pipeline checks between stages whether a newer edit arrived and
+  is abandoned if so (see the checkpoint argument of run_sugarize)
+- only the result of the newest edit is published to the stream
+
+Edits with a sequence number at or below the newest one seen are stale and
+dropped on arrival (a delayed or retried POST).
+
+Under the pre-forked server the edits, the run and the event stream of one
+session can land on different workers, so the newest sequence number and the
+published result are also kept in the shared state store (server/shared_state.py):
+a newer edit on any worker abandons the run, and every worker's event stream
+sees the result. The event stream holds its request thread for as long as the
+browser listens, so it needs threaded workers (the default of `serve`).
+"""
+
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple, Optional
+
+from server.shared_state import default_shared_state
+
+# Sessions without edits or listeners for this long are dropped
+SESSION_IDLE_TIMEOUT = 600.0
+
+# Upper bound on live sessions per process; the least recently used is dropped beyond it
+MAX_SESSIONS = 256
+
+# Pipeline runs across all sessions that may execute at the same time
+PREVIEW_WORKERS = 4
+
+# Seconds between keep-alive comments on an idle event stream
+HEARTBEAT_INTERVAL = 15.0
+
+# Seconds between checks of the shared store for a result published by another worker
+SHARED_POLL_INTERVAL = 0.2
+
+PREVIEW_OPERATIONS = ('sugarize', 'desugarize')
+
+# Session ids are chosen by the client
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def run_preview(code, operation, checkpoint):
+    """Run the pipeline for one preview edit and return (payload, status)."""
+    from server.pipeline import run_sugarize, run_desugarize
+
+    if operation == 'desugarize':
+        return run_desugarize(code, checkpoint=checkpoint)
+    return run_sugarize(code, checkpoint=checkpoint)
+
+
+class PreviewSession:
+    """
+    Sequence-numbered edits of one editor and the newest published result.
+    """
+
+    def __init__(self, session_id, executor, runner=run_preview, shared=None):
+        self.session_id = session_id
+        self._executor = executor
+        self._runner = runner
+        self._shared = shared
+        self._condition = threading.Condition()
+        self._latest_seq = -1
+        self._pending = None
+        self._running = False
+        self.result = None
+        self.last_used = time.monotonic()
+        self.stats = {"accepted": 0, "stale": 0, "abandoned": 0, "skipped": 0, "published": 0}
+
+    def submit(self, seq, code, operation='sugarize'):
+        """
+        Queue an edit.
+
+        Args:
+            seq: Sequence number of the edit (increasing per session)
+            code: Python source code string
+            operation: 'sugarize' or 'desugarize'
+
+        Returns:
+            False if the edit was stale and dropped, True otherwise
+        """
+        with self._condition:
+            self.last_used = time.monotonic()
+            if seq <= self._latest_seq:
+                self.stats["stale"] += 1
+                return False
+        # Another worker may already have seen a newer edit of this session
+        if self._shared is not None and self._shared.claim_preview_seq(self.session_id, seq) is False:
+            with self._condition:
+                self.stats["stale"] += 1
+            return False
+        with self._condition:
+            if seq <= self._latest_seq:
+                self.stats["stale"] += 1
+                return False
+            self._latest_seq = seq
+            if self._pending is not None:
+                # Never started: the newer edit replaces it
+                self.stats["skipped"] += 1
+            self._pending = (seq, code, operation)
+            self.stats["accepted"] += 1
+            if self._running:
+                return True
+            self._running = True
+        self._executor.submit(self._drain)
+        return True
+
+    def is_current(self, seq):
+        with self._condition:
+            if seq != self._latest_seq:
+                return False
+        if self._shared is not None:
+            latest = self._shared.latest_preview_seq(self.session_id)
+            return latest is None or latest == seq
+        return True
+
+    def _drain(self):
+        while True:
+            with self._condition:
+                if self._pending is None:
+                    self._running = False
+                    return
+                seq, code, operation = self._pending
+                self._pending = None
+            self._run(seq, code, operation)
+
+    def _run(self, seq, code, operation):
+        from server.pipeline import Superseded
+
+        def checkpoint():
+            if not self.is_current(seq):
+                raise Superseded(seq)
+
+        try:
+            payload, status = self._runner(code, operation, checkpoint)
+        except Superseded:
+            with self._condition:
+                self.stats["abandoned"] += 1
+            return
+        except Exception as e:
+            payload, status = {'status': 'error', 'message': f"{type(e).__name__}: {e}"}, 500
+
+        result = {"seq": seq, "operation": operation, "status": status, "payload": payload}
+        published = self._shared.publish_preview_result(self.session_id, result) if self._shared else None
+        with self._condition:
+            if seq != self._latest_seq or published is False:
+                # Finished after its last checkpoint, but a newer edit arrived meanwhile
+                self.stats["abandoned"] += 1
+                return
+            self.result = result
+            self.stats["published"] += 1
+            self._condition.notify_all()
+
+    def wait_for_result(self, after_seq=-1, timeout=None):
+        """
+        Block until a result newer than `after_seq` is published.
+
+        Returns:
+            The result dictionary ({"seq", "operation", "status", "payload"}),
+            or None on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            if self._shared is not None:
+                wait = SHARED_POLL_INTERVAL if wait is None else min(wait, SHARED_POLL_INTERVAL)
+            with self._condition:
+                self.last_used = time.monotonic()
+                self._condition.wait_for(
+                    lambda: self.result is not None and self.result["seq"] > after_seq, wait)
+                if self.result is not None and self.result["seq"] > after_seq:
+                    return self.result
+            if self._shared is not None:
+                # Published by the worker that ran the edit
+                result = self._shared.preview_result_after(self.session_id, after_seq)
+                if result is not None:
+                    return result
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+
+
+class PreviewHub:
+    """
+    Registry of live preview sessions sharing one pool of pipeline workers.
+
+    Args:
+        shared: Optional SharedState holding the sessions' cross-worker state
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_timeout=SESSION_IDLE_TIMEOUT,
+                 workers=PREVIEW_WORKERS, runner=run_preview, shared=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.workers = workers
+        self._runner = runner
+        self.shared = shared
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def session(self, session_id):
+        """Return the session with this id, creating it if needed."""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix='live-preview')
+                session = PreviewSession(session_id, self._executor, self._runner, self.shared)
+                if self.shared is not None:
+                    self.shared.expire_previews(self.idle_timeout)
+                self._sessions[session_id] = session
+                while len(self._sessions) > self.max_sessions:
+                    oldest = min(self._sessions.values(), key=lambda s: s.last_used)
+                    del self._sessions[oldest.session_id]
+            return session
+
+    def _expire(self):
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used > self.idle_timeout:
+                del self._sessions[session_id]
+
+
+preview_hub = PreviewHub(shared=default_shared_state())
+
+
+def submit_preview_edit(session_id, options, hub=preview_hub):
+    """
+    Validate and queue one edit of a live preview session.
+
+    Args:
+        session_id: Client-chosen session id
+        options: Request body with "seq", "code" and optionally "operation"
+        hub: PreviewHub holding the sessions
+
+    Returns:
+        Tuple of (response payload, HTTP status code); 202 once the edit is
+        queued, the result follows on the session's event stream
+    """
+    if not SESSION_ID_PATTERN.match(session_id or ''):
+        return {'status': 'error', 'message': "Invalid preview session id"}, 400
+    seq = options.get('seq')
+    if not isinstance(seq, int) or isinstance(seq, bool) or seq < 0:
+        return {'status': 'error', 'message': "seq must be a non-negative integer"}, 400
+    operation = options.get('operation', 'sugarize')
+    if operation not in PREVIEW_OPERATIONS:
+        return {'status': 'error', 'message': f"Unknown preview operation: {operation}"}, 400
+
+    accepted = hub.session(session_id).submit(seq, options.get('code', ''), operation)
+    return {'seq': seq, 'accepted': accepted}, 202
+
+
+def event_stream(session, last_seq=-1, heartbeat=HEARTBEAT_INTERVAL):
+    """
+    Generate the Server-Sent Events of a session: one "result" event per
+    published result, with the sequence number as the event id.
+
+    Args:
+        session: PreviewSession to follow
+        last_seq: Sequence number the client already has (from Last-Event-ID)
+        heartbeat: Seconds between keep-alive comments while idle
+    """
+    # Ask the browser to reconnect quickly if the stream drops
+    yield "retry: 1000\n\n"
+    while True:
+        result = session.wait_for_result(last_seq, heartbeat)
+        if result is None:
+            yield ": keep-alive\n\n"
+            continue
+        last_seq = result["seq"]
+        yield f"id: {last_seq}\nevent: result\ndata: {json.dumps(result)}\n\n"
@@ -0,0 +1,508 @@
+"""
+Language Server Protocol server offering sugar rewrites as code actions.
+
+Run it with `python cli.py lsp`; any LSP client can talk to it over stdin/stdout.
+Documents are kept in sync incrementally, each document caches its parsed AST
+for the current version, and code actions are computed on demand from the
+SugarTransformer matchers for the requested range only. Edits are debounced:
+the re-parse runs after a short quiet period, and requests that were queued
+for a document version that has since changed are answered with ContentModified
+instead of doing stale work.
+
+After each debounced re-parse the server publishes sugar opportunities as
+diagnostics. That analysis uses only the match_* predicates (nothing is
+rebuilt or unparsed) and caches results per top-level statement, so an edit
+only re-analyzes the statements whose text changed. A run is dropped as soon
+as a newer edit arrives.
+"""
+
+import ast
+import json
+import queue
+import sys
+import threading
+from typing import Dict, List, Any, Optional
+
+from server.stdio_rpc import (
+    PARSE_ERROR, INVALID_REQUEST, METHOD_NOT_FOUND, INVALID_PARAMS,
+    INTERNAL_ERROR, REQUEST_CANCELLED
+)
+
+CONTENT_MODIFIED = -32801
+SERVER_NOT_INITIALIZED = -32002
+
+# LSP TextDocumentSyncKind.Incremental
+SYNC_INCREMENTAL = 2
+
+# Seconds of quiet after an edit before the document is re-analyzed
+DEBOUNCE_SECONDS = 0.15
+
+# LSP DiagnosticSeverity.Hint
+SEVERITY_HINT = 4
+
+# How many top-level statements to analyze between checks for a newer edit
+STALE_CHECK_INTERVAL = 64
+
+CODE_ACTION_TITLES = {
+    "list_comprehension": "Convert loop to a list comprehension",
+    "set_comprehension": "Convert loop to a set comprehension",
+    "dict_comprehension": "Convert loop to a dict comprehension",
+    "sum_pattern": "Replace accumulation loop with sum()",
+    "enumerate_pattern": "Use enumerate() instead of a manual counter",
+    "ternary_operator": "Convert if/else assignment to a conditional expression",
+    "generator_expression": "Convert generator function to a generator expression",
+    "tuple_unpacking": "Use tuple unpacking",
+    "with_statement": "Use a with statement",
+    "lambda_expression": "Convert function to a lambda",
+    "find_target_pattern": "Replace flag-and-break loop with any()",
+}
+
+
+class Document:
+    """
+    An open text document with its current text and a parse cached per version.
+    """
+
+    def __init__(self, uri, text, version=0):
+        self.uri = uri
+        self.text = text
+        self.version = version
+        self._tree = None
+        self._tree_version = None
+        self._candidate_cache = {}
+        self._lock = threading.Lock()
+
+    def update(self, changes, version):
+        """Apply TextDocumentContentChangeEvents (incremental or full) and move to a new version."""
+        from utils.text_edits import position_to_offset
+
+        with self._lock:
+            for change in changes:
+                if 'range' not in change:
+                    self.text = change['text']
+                    continue
+                lines = self.text.split('\n')
+                start = position_to_offset(lines, change['range']['start'])
+                end = position_to_offset(lines, change['range']['end'])
+                self.text = self.text[:start] + change['text'] + self.text[end:]
+            self.version = version
+
+    def snapshot(self):
+        """
+        Return the current version, text and parsed module, parsing at most once per version.
+
+        Returns:
+            Tuple of (version, text, ast.Module or None if the text does not parse)
+        """
+        with self._lock:
+            if self._tree_version != self.version:
+                try:
+                    self._tree = ast.parse(self.text)
+                except (SyntaxError, ValueError):
+                    self._tree = None
+                self._tree_version = self.version
+            return self.version, self.text, self._tree
+
+    def find_candidates(self):
+        """
+        Detect sugar opportunities, reusing results for top-level statements whose text is unchanged.
+
+        Returns:
+            Tuple of (analyzed version, source lines, candidates with absolute
+            positions); candidates is None if the text does not parse or a newer
+            version arrived during the run
+        """
+        from utils.sugar_utils import detect_sugar_candidates
+        from utils.text_edits import split_lines
+
+        version, text, tree = self.snapshot()
+        if tree is None:
+            return version, None, None
+
+        lines = split_lines(text)
+        previous_cache = self._candidate_cache
+        cache = {}
+        candidates = []
+        for index, stmt in enumerate(tree.body):
+            if index % STALE_CHECK_INTERVAL == 0 and self.version != version:
+                return version, None, None
+
+            key = (stmt.col_offset, stmt.end_col_offset, '\n'.join(lines[stmt.lineno - 1:stmt.end_lineno]))
+            found = previous_cache.get(key)
+            if found is None:
+                # Cached relative to the statement so it survives lines shifting above it
+                found = [
+                    dict(candidate, lineno=candidate["lineno"] - stmt.lineno,
+                         end_lineno=candidate["end_lineno"] - stmt.lineno)
+                    for candidate in detect_sugar_candidates([stmt])
+                ]
+            cache[key] = found
+            for candidate in found:
+                candidates.append(dict(candidate, lineno=candidate["lineno"] + stmt.lineno,
+                                       end_lineno=candidate["end_lineno"] + stmt.lineno))
+
+        self._candidate_cache = cache
+        return version, lines, candidates
+
+
+def build_diagnostic(lines, candidate):
+    """Convert a detected sugar candidate into an LSP Diagnostic."""
+    from utils.text_edits import to_position
+
+    rule = candidate["type"]
+    return {
+        "range": {
+            "start": to_position(lines, candidate["lineno"], candidate["col_offset"]),
+            "end": to_position(lines, candidate["end_lineno"], candidate["end_col_offset"]),
+        },
+        "severity": SEVERITY_HINT,
+        "source": "python-sugar",
+        "code": rule,
+        "message": CODE_ACTION_TITLES.get(rule, rule.replace('_', ' ')),
+    }
+
+
+class Debouncer:
+    """
+    Runs a callback per key after a quiet period; a newer call for the same key
+    replaces the pending one.
+    """
+
+    def __init__(self, delay=DEBOUNCE_SECONDS):
+        self.delay = delay
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, callback, *args):
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            if timer:
+                timer.cancel()
+            timer = threading.Timer(self.delay, self._fire, (key, callback, args))
+            timer.daemon = True
+            self._timers[key] = timer
+            timer.start()
+
+    def cancel(self, key):
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            if timer:
+                timer.cancel()
+
+    def _fire(self, key, callback, args):
+        with self._lock:
+            self._timers.pop(key, None)
+        callback(*args)
+
+
+class LanguageServer:
+    """
+    Minimal LSP server speaking Content-Length framed JSON-RPC.
+    """
+
+    def __init__(self, reader=None, writer=None, debounce=DEBOUNCE_SECONDS):
+        self.reader = reader or sys.stdin.buffer
+        self.writer = writer or sys.stdout.buffer
+        self.documents = {}
+        self.debouncer = Debouncer(debounce)
+        self.initialized = False
+        self.shutdown_requested = False
+        self._exit_code = None
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+        self.requests = {
+            'initialize': self.initialize,
+            'shutdown': self.shutdown,
+            'textDocument/codeAction': self.code_action,
+        }
+        self.notifications = {
+            'initialized': lambda params: None,
+            'exit': self.exit,
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didClose': self.did_close,
+            '$/cancelRequest': self.cancel_request,
+        }
+
+    # Transport
+
+    def read_message(self):
+        """Read one framed message; returns None at end of stream and {} for a malformed one."""
+        content_length = None
+        while True:
+            header = self.reader.readline()
+            if not header:
+                return None
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.decode('ascii', errors='replace').partition(':')
+            if name.lower() == 'content-length':
+                try:
+                    content_length = int(value.strip())
+                except ValueError:
+                    content_length = -1
+        if content_length is None:
+            return {}
+        if content_length < 0:
+            # Without a length the body cannot be found; the next header line resynchronizes
+            self._log("invalid Content-Length header")
+            return {}
+        body = self.reader.read(content_length)
+        try:
+            message = json.loads(body.decode('utf-8'))
+        except ValueError:
+            self.send_error(None, PARSE_ERROR, "Parse error")
+            return {}
+        if not isinstance(message, dict):
+            self.send_error(None, INVALID_REQUEST, "Invalid request")
+            return {}
+        return message
+
+    def write_message(self, message):
+        body = json.dumps(message, separators=(',', ':')).encode('utf-8')
+        with self._write_lock:
+            self.writer.write(f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body)
+            self.writer.flush()
+
+    def send_result(self, request_id, result):
+        self.write_message({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def send_error(self, request_id, code, message):
+        self.write_message({"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}})
+
+    def send_notification(self, method, params):
+        self.write_message({"jsonrpc": "2.0", "method": method, "params": params})
+
+    @staticmethod
+    def _log(text):
+        # stdout carries the protocol
+        print(f"lsp: {text}", file=sys.stderr)
+
+    # Main loop
+
+    def serve(self):
+        """Serve until the client sends exit or closes the stream; returns the exit code."""
+        worker = threading.Thread(target=self._work, name='lsp-worker', daemon=True)
+        worker.start()
+
+        while self._exit_code is None:
+            message = self.read_message()
+            if message is None:
+                break
+            if message:
+                self._dispatch(message)
+
+        self._queue.put(None)
+        worker.join()
+        return self._exit_code if self._exit_code is not None else 1
+
+    def _dispatch(self, message):
+        method = message.get('method')
+        request_id = message.get('id')
+        if not isinstance(method, str):
+            # Responses to server-initiated requests are not used
+            if request_id is not None and 'result' not in message and 'error' not in message:
+                self.send_error(request_id, INVALID_REQUEST, "Invalid request")
+            return
+
+        if request_id is None:
+            # Notifications keep document state in order, so they run on the reader thread
+            handler = self.notifications.get(method)
+            if handler:
+                try:
+                    handler(message.get('params') or {})
+                except Exception as e:
+                    # There is no one to answer: log it and keep serving
+                    self._log(f"{method} failed: {type(e).__name__}: {e}")
+            return
+
+        if isinstance(request_id, bool) or not isinstance(request_id, (str, int)):
+            self.send_error(None, INVALID_REQUEST, "Invalid request: id must be a string or an integer")
+            return
+
+        if not self.initialized and method != 'initialize':
+            self.send_error(request_id, SERVER_NOT_INITIALIZED, "Server not initialized")
+            return
+
+        if method == 'shutdown':
+            # Recorded right away so a following exit is clean; the reply is
+            # still queued behind the requests that came before it
+            self.shutdown_requested = True
+
+        with self._lock:
+            self._pending.add(request_id)
+        self._queue.put((message, self._document_version(message)))
+
+    def _document_version(self, message):
+        params = message.get('params')
+        document = params.get('textDocument') if isinstance(params, dict) else None
+        uri = document.get('uri') if isinstance(document, dict) else None
+        document = self.documents.get(uri) if isinstance(uri, str) else None
+        return (uri, document.version) if document else None
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            message, version = item
+            request_id = message['id']
+            try:
+                self._handle_request(message, version)
+            finally:
+                with self._lock:
+                    self._pending.discard(request_id)
+                    self._cancelled.discard(request_id)
+
+    def _handle_request(self, message, version):
+        request_id = message['id']
+        if self._is_cancelled(request_id):
+            self.send_error(request_id, REQUEST_CANCELLED, "Request cancelled")
+            return
+        if self._is_stale(version):
+            # The document changed after this request was made; its answer would be stale
+            self.send_error(request_id, CONTENT_MODIFIED, "Content modified")
+            return
+
+        handler = self.requests.get(message['method'])
+        if handler is None:
+            self.send_error(request_id, METHOD_NOT_FOUND, f"Method not found: {message['method']}")
+            return
+        try:
+            result = handler(message.get('params') or {})
+        except (KeyError, TypeError, ValueError) as e:
+            self.send_error(request_id, INVALID_PARAMS, f"Invalid params: {e}")
+            return
+        except Exception as e:
+            self.send_error(request_id, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+            return
+
+        if self._is_cancelled(request_id):
+            self.send_error(request_id, REQUEST_CANCELLED, "Request cancelled")
+        elif self._is_stale(version):
+            self.send_error(request_id, CONTENT_MODIFIED, "Content modified")
+        else:
+            self.send_result(request_id, result)
+
+    def _is_cancelled(self, request_id):
+        with self._lock:
+            return request_id in self._cancelled
+
+    def _is_stale(self, version):
+        if version is None:
+            return False
+        uri, requested = version
+        document = self.documents.get(uri)
+        return document is None or document.version != requested
+
+    # Lifecycle
+
+    def initialize(self, params):
+        self.initialized = True
+        return {
+            "capabilities": {
+                "textDocumentSync": {
+                    "openClose": True,
+                    "change": SYNC_INCREMENTAL,
+                },
+                "codeActionProvider": {
+                    "codeActionKinds": ["quickfix", "refactor.rewrite"],
+                },
+            },
+            "serverInfo": {"name": "python-sugar-lsp"},
+        }
+
+    def shutdown(self, params):
+        return None
+
+    def exit(self, params):
+        self._exit_code = 0 if self.shutdown_requested else 1
+
+    def cancel_request(self, params):
+        request_id = params.get('id')
+        with self._lock:
+            if request_id in self._pending:
+                self._cancelled.add(request_id)
+
+    # Document synchronization
+
+    def did_open(self, params):
+        item = params['textDocument']
+        self.documents[item['uri']] = Document(item['uri'], item['text'], item.get('version', 0))
+        self.schedule_analysis(item['uri'])
+
+    def did_change(self, params):
+        identifier = params['textDocument']
+        document = self.documents.get(identifier['uri'])
+        if document is None:
+            return
+        document.update(params.get('contentChanges', []), identifier.get('version', document.version + 1))
+        self.schedule_analysis(identifier['uri'])
+
+    def did_close(self, params):
+        uri = params['textDocument']['uri']
+        self.debouncer.cancel(uri)
+        if self.documents.pop(uri, None) is not None:
+            self.send_notification('textDocument/publishDiagnostics', {"uri": uri, "diagnostics": []})
+
+    def schedule_analysis(self, uri):
+        """Re-analyze a document once edits pause; superseded runs are dropped."""
+        self.debouncer.call(uri, self.analyze, uri)
+
+    def analyze(self, uri):
+        """Background analysis of a document: publish its sugar opportunities as diagnostics."""
+        document = self.documents.get(uri)
+        if document is None:
+            return
+        version, lines, candidates = document.find_candidates()
+        # Drop the run if the document was edited or closed while we worked
+        if candidates is None or self.documents.get(uri) is not document or document.version != version:
+            return
+        self.send_notification('textDocument/publishDiagnostics', {
+            "uri": uri,
+            "version": version,
+            "diagnostics": [build_diagnostic(lines, candidate) for candidate in candidates],
+        })
+
+    # Code actions
+
+    def code_action(self, params):
+        """Return one quick-fix per sugar rewrite available in the requested range."""
+        from utils.text_edits import compute_text_edits
+
+        uri = params['textDocument']['uri']
+        document = self.documents.get(uri)
+        if document is None:
+            return []
+        _, text, tree = document.snapshot()
+        if tree is None:
+            return []
+
+        requested = params['range']
+        start_line = requested['start']['line'] + 1
+        end_line = requested['end']['line'] + 1
+        edits, _ = compute_text_edits(text, start_line, end_line, tree=tree, enclosing=True)
+
+        actions = []
+        for edit in edits:
+            rule = edit.pop("rule") or "rewrite"
+            actions.append({
+                "title": CODE_ACTION_TITLES.get(rule, f"Apply {rule.replace('_', ' ')}"),
+                "kind": "quickfix",
+                "edit": {"changes": {uri: [edit]}},
+                "data": {"rule": rule},
+            })
+        return actions
+
+
+def main():
+    """Serve LSP on the process's stdin/stdout."""
+    protocol_out = sys.stdout.buffer
+    # Anything the transformers print must not corrupt the protocol stream
+    sys.stdout = sys.stderr
+    return LanguageServer(sys.stdin.buffer, protocol_out).serve()
@@ -0,0 +1,924 @@
+"""
+Transformation pipeline shared by the HTTP app and the editor backends.
+Each entry point returns a plain (payload, status) pair so it can be served
+over Flask, stdio JSON-RPC or any other transport.
+"""
+
+import ast
+import os
+from utils.sugar_utils import handle_code_errors
+from rules.rule_index import get_rule, get_rule_explanation, rule_ref_for, rulebook_version
+
+# The transformer modules are imported on first use so a transport can answer
+# its first request without paying for them at startup.
+
+# What to do with a rewrite that measures slower than the original
+ON_SLOWER_CHOICES = ('flag', 'suppress')
+
+# Measuring executes the submitted code; the HTTP app only allows it when this
+# is set to 1 (`serve --allow-measure`). The CLI and editor backends measure the
+# user's own files.
+ALLOW_MEASURE_ENV = 'SYNTACTIC_ALLOW_MEASURE'
+
+# Latency tiers: 'fast' answers within a deadline, 'thorough' runs every rule and analysis
+TIER_CHOICES = ('fast', 'thorough')
+
+
+class Superseded(Exception):
+    """Raised by a checkpoint when a newer request made the running one obsolete."""
+
+
+def http_measurement_allowed():
+    """Whether the server operator opted in to measuring rewrites of HTTP requests."""
+    return os.environ.get(ALLOW_MEASURE_ENV) == '1'
+
+
+def run_operation(input_code, operation='sugarize', options=None):
+    """
+    Dispatch to the sugarize or desugarize pipeline based on the operation name.
+
+    Args:
+        input_code: Python source code string
+        operation: 'sugarize' or 'desugarize'
+        options: Request options; a sugarize request with "range" or "edits"
+            returns minimal text edits instead of the rewritten file, and a
+            desugarize request with mode "profile" expands comprehensions into
+            executable loops ("instrument" also adds loop counters and timers);
+            a sugarize request with "profile" applies only the rewrites in the
+            hottest profiled functions, up to "budget" edits; "measure" times
+            each rewrite and "on_slower" ('flag' or 'suppress') decides what
+            happens to rewrites that measure slower; "tier" ('fast' or
+            'thorough') selects deadline-aware sugaring with "budget_ms" and
+            "background" (see run_tiered_sugarize); "stream_explanations"
+            returns the rewritten file before its explanations (see run_sugarize);
+            "lean" leaves out the echoed input and rulebook text (see server/wire.py);
+            a sugarize request with "diff" (unified diff text, with "filename"
+            picking the file of a multi-file diff) returns edits only for the
+            statements the diff touches; "costs" attaches the static cost model
+            to the transformations of an edits response; "hotspots" adds the
+            complexity findings to a sugarize response
+    """
+    options = options or {}
+    payload, status = dispatch_operation(input_code, operation, options)
+    return shape_payload(payload, status, options), status
+
+
+def shape_payload(payload, status, options):
+    """Apply the response-shaping request options (currently "lean") to a payload."""
+    if options.get('lean') and status < 400:
+        from server.wire import lean_payload
+        return lean_payload(payload)
+    return payload
+
+
+def dispatch_operation(input_code, operation, options, checkpoint=None):
+    """
+    Run the pipeline the request options select (see run_operation), without shaping the payload.
+
+    Every transport goes through here, so a request means the same over HTTP,
+    stdio and LSP.
+
+    Args:
+        input_code: Python source code string
+        operation: 'sugarize' or 'desugarize'
+        options: Request options
+        checkpoint: Callable run between the stages of the plain sugarize and
+            desugarize pipelines (see run_sugarize)
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    if operation == 'desugarize':
+        return run_desugarize(input_code, options.get('mode'), checkpoint)
+    if options.get('tier') is not None:
+        return run_tiered_sugarize(input_code, options['tier'], options.get('budget_ms'),
+                                   bool(options.get('background')))
+    if options.get('profile') is not None:
+        return run_profile_guided_sugarize(input_code, options['profile'], options.get('budget'),
+                                           options.get('filename'), bool(options.get('measure')),
+                                           options.get('on_slower', 'flag'))
+    if options.get('range') is not None or options.get('edits') or options.get('diff') is not None:
+        return run_sugarize_edits(input_code, options.get('range'), options.get('diff'), options.get('filename'),
+                                  bool(options.get('costs')))
+    if options.get('measure'):
+        return run_measured_sugarize(input_code, options.get('on_slower', 'flag'))
+    return run_sugarize(input_code, checkpoint, stream_explanations=bool(options.get('stream_explanations')),
+                        hotspots=bool(options.get('hotspots')))
+
+
+def run_rule_lookup(name):
+    """
+    Look up one rulebook rule, for clients that cache explanation text by rule id.
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    rule = get_rule(name)
+    if rule is None:
+        return {'status': 'error', 'message': f"Unknown rule: {name}"}, 404
+    return dict(rule, rulebook_version=rulebook_version()), 200
+
+
+def parse_line_range(value):
+    """
+    Validate a {"start_line", "end_line"} request range (1-based, inclusive).
+
+    Returns:
+        Tuple of (start_line, end_line); either may be None for an open end
+    """
+    if value is None:
+        return None, None
+    if not isinstance(value, dict):
+        raise ValueError("range must be an object with start_line and end_line")
+    start_line = value.get('start_line')
+    end_line = value.get('end_line')
+    for bound in (start_line, end_line):
+        if bound is not None and (not isinstance(bound, int) or isinstance(bound, bool) or bound < 1):
+            raise ValueError("range lines must be positive integers")
+    if start_line is not None and end_line is not None and end_line < start_line:
+        raise ValueError("range end_line must not be before start_line")
+    return start_line, end_line
+
+
+def run_sugarize(input_code, checkpoint=None, stream_explanations=False, hotspots=False):
+    """
+    Process code for sugarization (making code more concise).
+
+    Args:
+        input_code: Python source code string
+        checkpoint: Callable run between pipeline stages; it raises Superseded
+            to abandon the run (see server/live_preview.py) or blocks while
+            the run yields to higher-priority work (see server/admission.py)
+        stream_explanations: Answer without explanations and resolve them in the
+            background instead; the payload's "explanation_stream" id follows
+            them over Server-Sent Events (see server/explanations.py)
+        hotspots: Also run the complexity analyzer and add its findings as
+            "hotspots"; off by default, since it is a second walk of the tree
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    try:
+        # Step 1: Parse the code and identify transformation candidates
+        # Extract and preserve comments with their line numbers
+        original_lines = input_code.splitlines()
+        comments = {}
+        
+        for i, line in enumerate(original_lines):
+            stripped = line.strip()
+            if stripped.startswith('#'):
+                comments[i] = line
+        
+        parsed_ast = ast.parse(input_code)
+        ast_dump = ast.dump(parsed_ast)
+        if checkpoint:
+            checkpoint()
+        
+        # Step 2: Identify patterns for transformation
+        potential_transformations = []
+        
+        # Simple pattern matching based on string representation
+        # Using both AST string patterns for backward compatibility and our utility functions for better accuracy
+        
+        # List comprehension
+        if "For(" in ast_dump and "Attribute(attr='append'" in ast_dump:
+            potential_transformations.append({"type": "list_comprehension", "rule_ref": "list_comprehension"})
+
+        # Set comprehension
+        if "For(" in ast_dump and "Attribute(attr='add'" in ast_dump:
+            potential_transformations.append({"type": "set_comprehension", "rule_ref": "set_comprehension"})
+
+        # Dict comprehension
+        if "For(" in ast_dump and "Subscript(value=Name" in ast_dump and "Assign(" in ast_dump:
+            potential_transformations.append({"type": "dict_comprehension", "rule_ref": "dict_comprehension"})
+
+        # Enumerate
+        if "AugAssign(target=Name" in ast_dump and "For(" in ast_dump and "Add()" in ast_dump:
+            potential_transformations.append({"type": "enumerate", "rule_ref": "enumerate_pattern"})
+
+        # Ternary operator
+        if "If(" in ast_dump and "Assign(" in ast_dump and "orelse=[" in ast_dump:
+            potential_transformations.append({"type": "ternary_operator", "rule_ref": "ternary_operator"})
+
+        # Remaining patterns kept the same for compatibility
+        if "For(" in ast_dump and "Subscript(value=Name" in ast_dump and "range(len(" in input_code:
+            potential_transformations.append({"type": "zip", "rule_ref": "zip_pattern"})
+
+        if "Assign(" in ast_dump and "Subscript(value=Name" in ast_dump and "slice=Index(value=Num" in ast_dump:
+            potential_transformations.append({"type": "tuple_unpacking", "rule_ref": "tuple_unpacking"})
+
+        if "Try(" in ast_dump and "Finally(" in ast_dump and "Attribute(attr='close'" in ast_dump:
+            potential_transformations.append({"type": "with_statement", "rule_ref": "with_statement"})
+
+        if "If(" in ast_dump and "Call(func=Name(id='len', ctx=Load()))" in ast_dump and "Compare(left=Name" in ast_dump and "Eq()" in ast_dump:
+            potential_transformations.append({"type": "any_all", "rule_ref": "any_all_pattern"})
+
+        if "For(" in ast_dump and "Attribute(attr='pop'" in ast_dump and "Compare(left=Subscript(value=Name" in ast_dump and "NotEq()" in ast_dump:
+            potential_transformations.append({"type": "list_filter", "rule_ref": "list_filter_pattern"})
+
+        if "For(" in ast_dump and "Name(id='range', ctx=Load())" in ast_dump and "Subscript(value=Name" in ast_dump:
+            potential_transformations.append({"type": "range_enumerate", "rule_ref": "range_enumerate_pattern"})
+
+        if "If(" in ast_dump and "Compare(left=Name" in ast_dump and "Is()" in ast_dump:
+            potential_transformations.append({"type": "identity_check", "rule_ref": "identity_check_pattern"})
+
+        if "For(" in ast_dump and "Compare(left=Name" in ast_dump and "Gt()" in ast_dump:
+            potential_transformations.append({"type": "range_filter", "rule_ref": "range_filter_pattern"})
+
+        if "For(" in ast_dump and "Call(func=Name(id='set', ctx=Load()))" in ast_dump and "Attribute(attr='add'" in ast_dump:
+            potential_transformations.append({"type": "set_add", "rule_ref": "set_add_pattern"})
+
+        if "For(" in ast_dump and "Subscript(value=Name" in ast_dump and "Compare(left=Name" in ast_dump and "Eq()" in ast_dump:
+            potential_transformations.append({"type": "dict_filter", "rule_ref": "dict_filter_pattern"})
+
+        if "While(" in ast_dump and "Compare(left=Name" in ast_dump and "Lt()" in ast_dump:
+            potential_transformations.append({"type": "while_loop", "rule_ref": "while_loop_pattern"})
+
+        if "With(" in ast_dump and "Attribute(attr='open'" in ast_dump:
+            potential_transformations.append({"type": "file_with", "rule_ref": "file_with_pattern"})
+
+        if "FunctionDef(name='lambda')" in ast_dump and "arguments" in ast_dump:
+            potential_transformations.append({"type": "lambda_function", "rule_ref": "lambda_function_pattern"})
+
+        if "For(" in ast_dump and "Call(func=Name(id='map', ctx=Load()))" in ast_dump:
+            potential_transformations.append({"type": "map_function", "rule_ref": "map_function_pattern"})
+
+        if "If(" in ast_dump and "Attribute(attr='startswith'" in ast_dump and "Call(func=Name(id='str', ctx=Load()))" in ast_dump:
+            potential_transformations.append({"type": "string_method_check", "rule_ref": "string_method_check_pattern"})
+
+        if "Assign(" in ast_dump and "Call(func=Name(id='sorted', ctx=Load()))" in ast_dump:
+            potential_transformations.append({"type": "sorted_assignment", "rule_ref": "sorted_assignment_pattern"})
+
+        if "Call(func=Name(id='filter', ctx=Load()))" in ast_dump and "Compare(left=Name" in ast_dump and "Gt()" in ast_dump:
+            potential_transformations.append({"type": "filter_range", "rule_ref": "filter_range_pattern"})
+
+        if "For(" in ast_dump and "Attribute(attr='remove'" in ast_dump and "Compare(left=Subscript(value=Name" in ast_dump:
+            potential_transformations.append({"type": "list_remove", "rule_ref": "list_remove_pattern"})
+
+        if "For(" in ast_dump and "Call(func=Name(id='sorted', ctx=Load()))" in ast_dump and "Subscript(value=Name" in ast_dump:
+            potential_transformations.append({"type": "sorted_list_comprehension", "rule_ref": "sorted_list_comprehension"})
+
+        if "For(" in ast_dump and "Compare(left=Name" in ast_dump and "Lt()" in ast_dump:
+            potential_transformations.append({"type": "filter_less_than", "rule_ref": "filter_less_than_pattern"})
+
+        if "If(" in ast_dump and "Name(id='str', ctx=Load())" in ast_dump and "Call(func=Name(id='isdigit', ctx=Load()))" in ast_dump:
+            potential_transformations.append({"type": "isdigit_check", "rule_ref": "isdigit_check_pattern"})
+
+        if "For(" in ast_dump and "Attribute(attr='update'" in ast_dump and "Subscript(value=Name" in ast_dump:
+            potential_transformations.append({"type": "dict_update", "rule_ref": "dict_update_pattern"})
+
+        if "For(" in ast_dump and "Call(func=Name(id='filter', ctx=Load()))" in ast_dump and "Compare(left=Name" in ast_dump and "Gt()" in ast_dump:
+            potential_transformations.append({"type": "filter_greater_than", "rule_ref": "filter_greater_than_pattern"})
+
+        # Flag likely super-linear hotspots on the tree parsed above (detection only)
+        hotspot_findings = None
+        if hotspots:
+            from transformers.complexity_analyzer import analyze_complexity
+            hotspot_findings = analyze_complexity(input_code, parsed_ast)
+        if checkpoint:
+            checkpoint()
+
+        # Step 3: Apply transformations
+        from transformers.sugar_transformer import transform_code
+        from rules.sugaring_rules import SUGARING_RULEBOOK
+        transformed_code, applied_transformations = transform_code(input_code, SUGARING_RULEBOOK)
+        
+        if not applied_transformations:
+            if comments:
+                # Make sure to include the original comments in their correct positions
+                transformed_lines = input_code.splitlines()
+                transformed_code = "\n".join(transformed_lines)
+            else:
+                transformed_code = "# No transformations were identified in the code.\n" + input_code
+        if checkpoint:
+            checkpoint()
+            
+        # Step 4: Generate explanations for transformations
+        explanations = []
+        explanation_stream = None
+        if stream_explanations:
+            from server.explanations import explanation_streams
+            explanation_stream = explanation_streams.submit(potential_transformations)
+            potential_transformations = []
+        for transform in potential_transformations:
+            rule_ref = transform.get("rule_ref", "")
+            
+            # Look up explanation (with example) in the precompiled rule index
+            explanation = get_rule_explanation(rule_ref)
+            
+            explanations.append({
+                "transformation_type": transform["type"],
+                "rule": rule_ref,
+                "explanation": explanation
+            })
+            
+        # Step 5: Validate the transformed code
+        validation_result = {
+            "is_valid": True,
+            "errors": []
+        }
+        
+        try:
+            # Compile both versions to check syntax
+            compile(input_code, '<string>', 'exec')
+            
+            # Clean up transformed code by removing comments for compilation
+            # But preserve comments for display
+            cleaned_transformed_code = "\n".join([
+                line for line in transformed_code.split("\n")
+                if not line.strip().startswith("#")
+            ])
+            
+            if cleaned_transformed_code.strip():  # Only compile if there's code
+                compile(cleaned_transformed_code, '<string>', 'exec')
+        except Exception as e:
+            validation_result["is_valid"] = False
+            validation_result["errors"].append(str(e))
+            
+        payload = {
+            'original_code': input_code,
+            'sugared_code': transformed_code,
+            'comments': comments,
+            'explanations': explanations,
+            'validation': validation_result
+        }
+        if hotspot_findings is not None:
+            payload['hotspots'] = hotspot_findings
+        if explanation_stream is not None:
+            payload['explanation_stream'] = explanation_stream
+        return payload, 200
+        
+    except Superseded:
+        raise
+    except Exception as e:
+        error_result, _ = handle_code_errors(input_code, e)
+        return {
+            'status': 'error',
+            'message': error_result
+        }, 500
+
+def run_desugarize(input_code, mode=None, checkpoint=None):
+    """
+    Process code for desugarization (expanding code and adding comments).
+
+    Args:
+        input_code: Python source code string
+        mode: None for the explanatory expansion, 'profile' for executable loops,
+            'instrument' for loops that record iteration counts and timings
+        checkpoint: Callable run between pipeline stages of the explanatory
+            expansion; it raises Superseded to abandon the run or blocks
+            while the run yields to higher-priority work
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    if mode == 'profile':
+        return run_profile_desugarize(input_code)
+    if mode == 'instrument':
+        return run_instrument_desugarize(input_code)
+    if mode is not None:
+        return {
+            'status': 'error',
+            'message': f"Unknown desugar mode: {mode}"
+        }, 400
+
+    try:
+        # Step 1: Parse the code and extract original comments
+        parsed_ast = ast.parse(input_code)
+        ast_dump = ast.dump(parsed_ast)
+        
+        original_comments = {}
+        for i, line in enumerate(input_code.splitlines()):
+            stripped = line.strip()
+            if stripped.startswith('#'):
+                original_comments[i] = line
+        if checkpoint:
+            checkpoint()
+        
+        # Step 2: Check for concise code constructs
+        potential_expansions = []
+        
+        # Check for list comprehensions
+        if "ListComp(" in ast_dump:
+            potential_expansions.append({"type": "list_comprehension_expansion", "description": "Expanding list comprehension to for loop with append"})
+            
+        # Check for set comprehensions
+        if "SetComp(" in ast_dump:
+            potential_expansions.append({"type": "set_comprehension_expansion", "description": "Expanding set comprehension to for loop with add"})
+            
+        # Check for dict comprehensions
+        if "DictComp(" in ast_dump:
+            potential_expansions.append({"type": "dict_comprehension_expansion", "description": "Expanding dictionary comprehension to for loop with assignment"})
+            
+        # Check for ternary operators
+        if "IfExp(" in ast_dump:
+            potential_expansions.append({"type": "ternary_operator_expansion", "description": "Expanding ternary operator to if-else statement"})
+            
+        # Check for generator expressions
+        if "GeneratorExp(" in ast_dump:
+            potential_expansions.append({"type": "generator_expression_expansion", "description": "Expanding generator expression to generator function"})
+            
+        # Check for enumerate usage
+        if "Name(id='enumerate'" in ast_dump:
+            potential_expansions.append({"type": "enumerate_expansion", "description": "Expanding enumerate to counter-based loop"})
+            
+        # Check for sum usage
+        if "Name(id='sum'" in ast_dump:
+            potential_expansions.append({"type": "sum_expansion", "description": "Expanding sum to accumulator loop"})
+
+        # Step 3: Apply desugarization transformations with a comment density of 0.4 (40% of nodes get comments)
+        # Pass the original comments to preserve and enhance them
+        from transformers.desugar_transformer import desugar_code, DesugarTransformer
+        desugared_code, applied_transformations = desugar_code(input_code, comment_density=0.4)
+        
+        # If no transformations were applied, provide a placeholder with some basic comments
+        if not applied_transformations:
+            import astunparse
+            parsed_ast = ast.parse(input_code)
+            transformer = DesugarTransformer(comment_density=0.5, input_comments=original_comments)
+            transformed_tree = transformer.visit(parsed_ast)
+            ast.fix_missing_locations(transformed_tree)
+            desugared_code = astunparse.unparse(transformed_tree)
+            
+            if not desugared_code.strip():
+                desugared_code = "# No expansions were made. Code is already in a verbose form.\n" + input_code
+        if checkpoint:
+            checkpoint()
+        
+        # Step 4: Generate explanations for transformations
+        explanations = []
+        for expansion in potential_expansions:
+            explanations.append({
+                "transformation_type": expansion["type"],
+                "explanation": expansion["description"]
+            })
+        
+        # Step 5: Validate the desugared code
+        validation_result = {
+            "is_valid": True,
+            "errors": []
+        }
+        
+        try:
+            # Compile both versions to check syntax
+            compile(input_code, '<string>', 'exec')
+            
+            # Clean up desugared code by removing comments for compilation
+            # But preserve comments for display
+            cleaned_desugared_code = "\n".join([
+                line for line in desugared_code.split("\n")
+                if not line.strip().startswith("#")
+            ])
+            
+            if cleaned_desugared_code.strip():  # Only compile if there's code
+                compile(cleaned_desugared_code, '<string>', 'exec')
+        except Exception as e:
+            validation_result["is_valid"] = False
+            validation_result["errors"].append(str(e))
+        
+        return {
+            'original_code': input_code,
+            'desugared_code': desugared_code,
+            'explanations': explanations,
+            'validation': validation_result
+        }, 200
+    
+    except Superseded:
+        raise
+    except Exception as e:
+        error_result, _ = handle_code_errors(input_code, e)
+        return {
+            'status': 'error',
+            'message': error_result
+        }, 500
+
+
+def run_profile_desugarize(input_code):
+    """
+    Expand comprehensions into real, semantically equivalent loops so line
+    profilers and coverage tools can attribute time to each iteration body.
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    try:
+        from transformers.loop_expander import expand_comprehensions
+        desugared_code, expansions = expand_comprehensions(input_code)
+
+        explanations = []
+        for expansion in expansions:
+            explanations.append({
+                "transformation_type": expansion["type"],
+                "explanation": (f"Comprehension on line {expansion['location']} now runs as explicit loops "
+                                f"in {expansion['function']}()")
+            })
+
+        validation_result = {
+            "is_valid": True,
+            "errors": []
+        }
+        try:
+            compile(desugared_code, '<string>', 'exec')
+        except Exception as e:
+            validation_result["is_valid"] = False
+            validation_result["errors"].append(str(e))
+
+        return {
+            'original_code': input_code,
+            'desugared_code': desugared_code,
+            'expansions': expansions,
+            'explanations': explanations,
+            'validation': validation_result
+        }, 200
+
+    except Exception as e:
+        error_result, _ = handle_code_errors(input_code, e)
+        return {
+            'status': 'error',
+            'message': error_result
+        }, 500
+
+
+def run_instrument_desugarize(input_code):
+    """
+    Rewrite code with per-loop iteration counters and timers. The code is only
+    rewritten here, never run; the instrumented script prints its hotspot
+    report to stderr when it exits.
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    try:
+        from transformers.instrumentation_transformer import instrument_code
+        instrumented_code, metadata = instrument_code(input_code, standalone=True)
+
+        validation_result = {
+            "is_valid": True,
+            "errors": []
+        }
+        try:
+            compile(instrumented_code, '<string>', 'exec')
+        except Exception as e:
+            validation_result["is_valid"] = False
+            validation_result["errors"].append(str(e))
+
+        return {
+            'original_code': input_code,
+            'desugared_code': instrumented_code,
+            'sites': metadata["sites"],
+            'validation': validation_result
+        }, 200
+
+    except Exception as e:
+        error_result, _ = handle_code_errors(input_code, e)
+        return {
+            'status': 'error',
+            'message': error_result
+        }, 500
+
+
+def _rule_explanations(edits):
+    """One rulebook explanation per distinct rule used by the edits."""
+    explanations = []
+    seen_rules = set()
+    for edit in edits:
+        rule_ref = rule_ref_for(edit["rule"])
+        if rule_ref in seen_rules:
+            continue
+        seen_rules.add(rule_ref)
+        explanations.append({
+            "transformation_type": edit["rule"],
+            "rule": rule_ref,
+            "explanation": get_rule_explanation(rule_ref)
+        })
+    return explanations
+
+
+def _measured_explanations(input_code, edits, on_slower='flag'):
+    """
+    Time every edit and build one explanation per edit carrying its measurement.
+
+    Returns:
+        Tuple of (edits to apply, explanations, suppressed edits)
+    """
+    from utils.speedup import measure_edits
+
+    kept = []
+    explanations = []
+    suppressed = []
+    for edit, measurement in zip(edits, measure_edits(input_code, edits)):
+        if measurement["slower"] and on_slower == 'suppress':
+            suppressed.append(dict(edit, measurement=measurement))
+            continue
+        kept.append(edit)
+        explanations.append({
+            "transformation_type": edit["rule"],
+            "rule": rule_ref_for(edit["rule"]),
+            "explanation": get_rule_explanation(rule_ref_for(edit["rule"])),
+            "line": edit["range"]["start"]["line"] + 1,
+            "speedup": measurement["speedup"],
+            "memory_delta_bytes": measurement["memory_delta_bytes"],
+            "slower": measurement["slower"],
+            "measurement": measurement
+        })
+    return kept, explanations, suppressed
+
+
+def run_measured_sugarize(input_code, on_slower='flag'):
+    """
+    Sugarize the whole file and measure each rewrite in an isolated worker.
+
+    Every explanation carries the measured speedup (original time / sugared
+    time) and peak memory delta of its rewrite. Rewrites that measure slower
+    are flagged, or left out of the sugared code with on_slower='suppress'.
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    if on_slower not in ON_SLOWER_CHOICES:
+        return {'status': 'error', 'message': "on_slower must be 'flag' or 'suppress'"}, 400
+
+    try:
+        from utils.text_edits import compute_text_edits, apply_text_edits
+        edits, _ = compute_text_edits(input_code)
+        edits, explanations, suppressed = _measured_explanations(input_code, edits, on_slower)
+        sugared_code = apply_text_edits(input_code, edits)
+
+        validation_result = {
+            "is_valid": True,
+            "errors": []
+        }
+        try:
+            compile(sugared_code, '<string>', 'exec')
+        except Exception as e:
+            validation_result["is_valid"] = False
+            validation_result["errors"].append(str(e))
+
+        return {
+            'original_code': input_code,
+            'sugared_code': sugared_code,
+            'edits': edits,
+            'suppressed': suppressed,
+            'explanations': explanations,
+            'validation': validation_result
+        }, 200
+
+    except Exception as e:
+        error_result, _ = handle_code_errors(input_code, e)
+        return {
+            'status': 'error',
+            'message': error_result
+        }, 500
+
+
+def run_profile_guided_sugarize(input_code, profile, budget=None, filename=None, measure=False, on_slower='flag'):
+    """
+    Apply only the performance-relevant rewrites in the hottest functions of a profile.
+
+    Args:
+        input_code: Python source code string
+        profile: cProfile pstats data (bytes or base64 text) or line_profiler text,
+            or function timings already returned by load_profile
+        budget: Maximum number of edits to apply (defaults to DEFAULT_BUDGET)
+        filename: Only use profile entries recorded for this file name
+        measure: Time each selected rewrite (see run_measured_sugarize)
+        on_slower: 'flag' or 'suppress' rewrites that measure slower
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    from utils.profile_guided import load_profile, profile_guided_edits, DEFAULT_BUDGET
+    from utils.text_edits import apply_text_edits
+
+    if on_slower not in ON_SLOWER_CHOICES:
+        return {'status': 'error', 'message': "on_slower must be 'flag' or 'suppress'"}, 400
+
+    if budget is None:
+        budget = DEFAULT_BUDGET
+    if not isinstance(budget, int) or isinstance(budget, bool) or budget < 0:
+        return {'status': 'error', 'message': "budget must be a non-negative integer"}, 400
+    try:
+        timings = profile if isinstance(profile, list) else load_profile(profile)
+    except ValueError as e:
+        return {'status': 'error', 'message': str(e)}, 400
+
+    try:
+        edits, hot_functions, skipped = profile_guided_edits(input_code, timings, budget, filename)
+
+        suppressed = []
+        if measure:
+            edits, explanations, suppressed = _measured_explanations(input_code, edits, on_slower)
+        else:
+            explanations = _rule_explanations(edits)
+        sugared_code = apply_text_edits(input_code, edits)
+
+        validation_result = {
+            "is_valid": True,
+            "errors": []
+        }
+        try:
+            compile(sugared_code, '<string>', 'exec')
+        except Exception as e:
+            validation_result["is_valid"] = False
+            validation_result["errors"].append(str(e))
+
+        return {
+            'original_code': input_code,
+            'sugared_code': sugared_code,
+            'edits': edits,
+            'hot_functions': [
+                {key: function[key] for key in ('qualname', 'line', 'cumulative_time', 'share')}
+                for function in hot_functions
+            ],
+            'skipped_edits': skipped + len(suppressed),
+            'suppressed': suppressed,
+            'explanations': explanations,
+            'validation': validation_result
+        }, 200
+
+    except Exception as e:
+        error_result, _ = handle_code_errors(input_code, e)
+        return {
+            'status': 'error',
+            'message': error_result
+        }, 500
+
+
+def parse_diff_hunks(diff, filename=None):
+    """
+    Changed line ranges of one file from a unified diff.
+
+    Args:
+        diff: Unified diff text
+        filename: File to take from a diff touching several files
+
+    Returns:
+        List of (start_line, end_line) ranges (1-based, inclusive)
+    """
+    from utils.diff_hunks import parse_unified_diff
+
+    if not isinstance(diff, str):
+        raise ValueError("diff must be unified diff text")
+    if filename is not None and not isinstance(filename, str):
+        raise ValueError("filename must be a string")
+    files = parse_unified_diff(diff)
+    if filename is not None:
+        normalized = filename.replace('\\', '/')
+        for path, hunks in files.items():
+            if normalized == path or normalized.endswith('/' + path) or path.endswith('/' + normalized):
+                return hunks
+        return []
+    if len(files) > 1:
+        raise ValueError("diff touches several files; pass the filename to use")
+    return next(iter(files.values()), [])
+
+
+def run_sugarize_edits(input_code, line_range=None, diff=None, filename=None, costs=False):
+    """
+    Sugarize only the statements inside a line range and return minimal text edits.
+
+    Args:
+        input_code: Full Python source of the document
+        line_range: Optional {"start_line", "end_line"} dictionary (1-based, inclusive)
+        diff: Optional unified diff whose new side is input_code; only statements
+            overlapping its changed lines are matched (replaces line_range)
+        filename: Path of input_code in a diff that touches several files
+        costs: Attach the static cost estimate to each transformation
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    try:
+        start_line, end_line = parse_line_range(line_range)
+        hunks = parse_diff_hunks(diff, filename) if diff is not None else None
+    except ValueError as e:
+        return {'status': 'error', 'message': str(e)}, 400
+
+    try:
+        from utils.text_edits import compute_text_edits, apply_text_edits
+        edits, transformations = compute_text_edits(input_code, start_line, end_line, hunks=hunks,
+                                                    estimate_cost=costs)
+        explanations = _rule_explanations(edits)
+
+        # Validate the document as it will look once the edits are applied
+        validation_result = {
+            "is_valid": True,
+            "errors": []
+        }
+        try:
+            compile(apply_text_edits(input_code, edits), '<string>', 'exec')
+        except Exception as e:
+            validation_result["is_valid"] = False
+            validation_result["errors"].append(str(e))
+
+        return {
+            'edits': edits,
+            'transformations': [
+                {"type": t["type"], "location": list(t["location"]), "cost": t.get("cost")} for t in transformations
+            ],
+            'explanations': explanations,
+            'validation': validation_result
+        }, 200
+
+    except Exception as e:
+        error_result, _ = handle_code_errors(input_code, e)
+        return {
+            'status': 'error',
+            'message': error_result
+        }, 500
+
+
+def run_tiered_sugarize(input_code, tier='fast', budget_ms=None, background=False):
+    """
+    Sugarize within a latency tier.
+
+    The fast tier picks the rules with the best value per measured cost that fit
+    the deadline and makes one pass over the file with them, stopping before the
+    first top-level statement that would not fit; the response is marked
+    "partial" (with "pending_rules" and "pending_from_line") if rules or
+    statements were left out. With background=True the remaining rules and
+    statements, validation, the cost model and
+    the def-use check continue on a background thread; the response carries a
+    "background" token for run_background_result (stdio clients get the result
+    pushed), or a "background_error" when too many runs are already pending.
+    The thorough tier does all of that before answering.
+
+    Args:
+        input_code: Python source code string
+        tier: 'fast' or 'thorough'
+        budget_ms: Deadline of the fast tier in milliseconds (defaults to DEFAULT_BUDGET_MS)
+        background: Continue with the thorough tier after a fast response
+
+    Returns:
+        Tuple of (response payload, HTTP status code)
+    """
+    import time
+    from server.tiered import (DEFAULT_BUDGET_MS, default_rules, run_rule_passes, run_thorough_tier,
+                               background_results)
+    from utils.text_edits import apply_text_edits
+
+    started = time.perf_counter()
+    if tier not in TIER_CHOICES:
+        return {'status': 'error', 'message': "tier must be 'fast' or 'thorough'"}, 400
+    if budget_ms is None:
+        budget_ms = DEFAULT_BUDGET_MS
+    if not isinstance(budget_ms, (int, float)) or isinstance(budget_ms, bool) or budget_ms < 0:
+        return {'status': 'error', 'message': "budget_ms must be a non-negative number"}, 400
+
+    try:
+        tree = ast.parse(input_code)
+        if tier == 'thorough':
+            result = run_thorough_tier(input_code, tree=tree)
+            edits = result["edits"]
+            payload = {
+                'tier': tier,
+                'partial': False,
+                'pending_from_line': None,
+                'pending_rules': [],
+                'validation': result["validation"],
+                'costs': result["costs"],
+                'loop_variable_escapes': result["loop_variable_escapes"],
+            }
+        else:
+            edits, pending_line, pending_rules = run_rule_passes(input_code, default_rules(), tree,
+                                                                 started + budget_ms / 1000.0)
+            token = background_results.submit(input_code, edits, pending_line, pending_rules) if background else None
+            payload = {
+                'tier': tier,
+                'partial': pending_line is not None or bool(pending_rules),
+                'pending_from_line': pending_line,
+                'pending_rules': pending_rules,
+                'background': token,
+            }
+            if background and token is None:
+                payload['background_error'] = "too many background runs pending; retry later or use the thorough tier"
+
+        payload.update({
+            'sugared_code': apply_text_edits(input_code, edits),
+            'edits': edits,
+            'explanations': _rule_explanations(edits),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+        })
+        return payload, 200
+
+    except Exception as e:
+        error_result, _ = handle_code_errors(input_code, e)
+        return {
+            'status': 'error',
+            'message': error_result
+        }, 500
+
+
+def run_background_result(token):
+    """
+    Look up the result of a background thorough tier.
+
+    Returns:
+        Tuple of (result payload, HTTP status code); 202 while still running
+    """
+    from server.tiered import background_results
+
+    result = background_results.get(token)
+    if result is None:
+        return {'status': 'error', 'message': f"unknown background token: {token}"}, 404
+    return result, 202 if result["status"] == "running" else 200
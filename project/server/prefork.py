@@ -0,0 +1,236 @@
+"""
+Pre-fork production server for the transformation service.
+
+The master process loads the rule index and transformer modules once, freezes the
+garbage collector so the warmed heap stays shared copy-on-write, and then forks
+worker processes. Where the platform supports SO_REUSEPORT every worker binds its
+own listening socket on the same port and the kernel balances connections between
+them; otherwise the workers accept on a single inherited socket. Workers that
+exit are restarted by the master.
+
+Workers handle requests on threads by default. Admission control
+(server/admission.py) runs inside each worker and can only queue requests that
+arrive while others are running, so a single-threaded worker would never queue
+and would never answer 429/503. With threads=False each worker serves one
+request at a time and the kernel's accept backlog is the only queue.
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Any, Optional
+
+# Sample input used to exercise the transformer code paths before forking
+WARM_UP_CODE = """
+result = []
+for x in items:
+    result.append(x * 2)
+"""
+
+# Set in the workers of a server started with --no-threads. An event stream would hold
+# such a worker for as long as the client listens, so the app refuses them.
+BLOCKING_WORKERS_ENV = 'SYNTACTIC_BLOCKING_WORKERS'
+
+# A worker that dies faster than this after starting counts as a crash loop
+MIN_WORKER_LIFETIME = 1.0
+MAX_RESTART_DELAY = 5.0
+
+
+def streams_supported():
+    """Whether this process may serve long-lived responses such as event streams."""
+    return os.environ.get(BLOCKING_WORKERS_ENV) != '1'
+
+
+def warm_up():
+    """
+    Load the rule registry and transformer modules in the master process.
+
+    Everything imported or cached here is inherited by the forked workers.
+    """
+    from rules.rule_index import load_rule_index
+    from transformers.sugar_transformer import transform_code
+    from transformers.desugar_transformer import desugar_code
+    from utils.fingerprint import code_fingerprint
+
+    load_rule_index()
+    # Hashed once here so no worker pays for it on its first request
+    code_fingerprint()
+    transform_code(WARM_UP_CODE)
+    desugar_code("squares = [x * x for x in items]\n")
+
+
+def has_reuse_port():
+    """Check whether the platform supports SO_REUSEPORT."""
+    return hasattr(socket, 'SO_REUSEPORT')
+
+
+def create_listen_socket(host, port, reuse_port=True, listen=True, backlog=128):
+    """
+    Create a TCP socket bound to host:port.
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        reuse_port: Set SO_REUSEPORT so several processes can bind the same port
+        listen: Start listening; a bound but non-listening socket only reserves the port
+        backlog: Listen backlog
+
+    Returns:
+        The bound socket
+    """
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port and has_reuse_port():
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    if listen:
+        sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """
+    Master process that forks and supervises a fixed number of WSGI workers.
+    """
+
+    def __init__(self, app, host='127.0.0.1', port=5000, workers=None, threads=True, reuse_port=True):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.num_workers = max(1, workers or os.cpu_count() or 1)
+        self.threads = threads
+        self.reuse_port = reuse_port and has_reuse_port()
+        self.workers = {}  # pid -> (slot, start time)
+        self.running = False
+        self._socket = None
+        self._restart_delay = 0.0
+
+    def run(self):
+        """Warm up, fork the workers and supervise them until a shutdown signal arrives."""
+        # With SO_REUSEPORT the master only reserves the port: it never listens,
+        # so the kernel never routes a connection to it.
+        self._socket = create_listen_socket(self.host, self.port, self.reuse_port, listen=not self.reuse_port)
+        self.port = self._socket.getsockname()[1]
+
+        warm_up()
+        gc.collect()
+        gc.freeze()
+
+        self.running = True
+        signal.signal(signal.SIGTERM, self._handle_shutdown)
+        signal.signal(signal.SIGINT, self._handle_shutdown)
+
+        print(f"Serving on http://{self.host}:{self.port} with {self.num_workers} workers "
+              f"({'SO_REUSEPORT' if self.reuse_port else 'shared socket'})", file=sys.stderr)
+
+        for slot in range(self.num_workers):
+            self._spawn_worker(slot)
+
+        try:
+            self._supervise()
+        finally:
+            self._stop_workers()
+            self._socket.close()
+
+    def _spawn_worker(self, slot):
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self.workers[pid] = (slot, time.monotonic())
+
+    def _run_worker(self):
+        """Serve requests in a forked worker; never returns."""
+        from werkzeug.serving import make_server
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        if not self.threads:
+            os.environ[BLOCKING_WORKERS_ENV] = '1'
+        exit_code = 0
+        try:
+            if self.reuse_port:
+                sock = create_listen_socket(self.host, self.port, reuse_port=True)
+            else:
+                sock = self._socket
+            server = make_server(self.host, self.port, self.app, threaded=self.threads, fd=sock.fileno())
+            server.serve_forever()
+        except Exception as e:
+            print(f"Worker {os.getpid()} failed: {e}", file=sys.stderr)
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _supervise(self):
+        while self.running:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            slot, started = self.workers.pop(pid, (None, 0.0))
+            if slot is None or not self.running:
+                continue
+
+            # Back off if workers keep dying straight after starting
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                self._restart_delay = min(MAX_RESTART_DELAY, max(0.1, self._restart_delay * 2))
+            else:
+                self._restart_delay = 0.0
+            print(f"Worker {pid} exited with status {status}; restarting", file=sys.stderr)
+            if self._restart_delay:
+                time.sleep(self._restart_delay)
+            if self.running:
+                self._spawn_worker(slot)
+
+    def _handle_shutdown(self, signum, frame):
+        self.running = False
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _stop_workers(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        while self.workers and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.05)
+                continue
+            self.workers.pop(pid, None)
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.workers.clear()
+
+
+def serve(app, host='127.0.0.1', port=5000, workers=None, threads=True):
+    """
+    Serve a WSGI app with pre-forked workers, falling back to one process where fork is unavailable.
+    """
+    if not hasattr(os, 'fork'):
+        from werkzeug.serving import run_simple
+        if not threads:
+            os.environ[BLOCKING_WORKERS_ENV] = '1'
+        warm_up()
+        run_simple(host, port, app, threaded=threads)
+        return
+
+    PreforkServer(app, host=host, port=port, workers=workers, threads=threads).run()
@@ -0,0 +1,88 @@
+"""
+Server-side cache of finished transformation results.
+
+Entries are keyed by server/etag.py's result_key, so a request that misses
+the client's copy (no or stale If-None-Match) is answered with one dictionary
+lookup when another client already asked the same question. Only successful
+responses are stored, shaped as they were sent (lean or not is part of the key).
+
+The in-process map is the first tier. Behind it, a SharedResultCache (see
+server/shared_cache.py) is shared by all worker processes and survives
+restarts; its hits are copied into the first tier.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Tuple, Optional
+
+# Results kept per process
+MAX_CACHED_RESULTS = 1024
+
+
+class ResultCache:
+    """
+    Least-recently-used map from result key to (payload, status).
+
+    Args:
+        max_entries: Entries kept in this process
+        shared: Optional cross-process tier consulted on a miss and written through
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_RESULTS, shared=None):
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "shared_hits": 0, "misses": 0}
+
+    def get(self, key):
+        """Return the cached (payload, status) for a key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+        entry = self.shared.get(key) if self.shared is not None else None
+        with self._lock:
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["shared_hits"] += 1
+            self._store(key, entry)
+        return entry
+
+    def put(self, key, payload, status):
+        """Store a successful result in both tiers; other statuses are not cached."""
+        if status != 200:
+            return
+        with self._lock:
+            self._store(key, (payload, status))
+        if self.shared is not None:
+            self.shared.put(key, payload, status)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Empty this process's tier (the shared tier is left alone)."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def _default_shared_cache():
+    from server.shared_cache import SharedResultCache, default_cache_path
+
+    path = default_cache_path()
+    return SharedResultCache(path) if path else None
+
+
+result_cache = ResultCache(shared=_default_shared_cache())
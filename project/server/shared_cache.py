@@ -0,0 +1,243 @@
+"""
+Result cache shared by every worker process, backed by a WAL-mode SQLite file.
+
+Each pre-forked worker keeps its own in-process cache (server/result_cache.py),
+but a cold worker would otherwise recompute what its siblings already have.
+This tier sits behind it: every worker reads and writes the same SQLite
+database, so a result computed once is a hit everywhere, and the file outlives
+the processes, so a deploy does not start cold.
+
+The tier is opt-in: `serve` turns it on (in the user's cache directory unless
+--result-cache or $SYNTACTIC_RESULT_CACHE says otherwise); the app imported on
+its own, the CLI and the tests run without it.
+
+- WAL journaling lets readers proceed while another worker writes.
+- Keys are prefixed with a fingerprint of the pipeline's source code, so a
+  deploy that changes a transformer never serves results the old code computed.
+- Payloads are stored marshalled, with a format stamp; a file written by an
+  incompatible version is cleared on open instead of misread.
+- Entries carry a last-used time and the oldest ones are evicted once the
+  table exceeds its entry or byte budget.
+- Every failure (locked database, read-only or full disk, corrupt row) is a
+  cache miss: the shared tier can slow nothing down beyond its busy timeout.
+
+Connections are opened lazily per process and thread, so the master can
+create the cache before forking.
+"""
+
+import marshal
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Any, Tuple, Optional
+
+# Location `serve` uses unless told otherwise, in the user's cache directory
+DEFAULT_CACHE_PATH = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                  'syntactic', 'results.sqlite3')
+CACHE_PATH_ENV = 'SYNTACTIC_RESULT_CACHE'
+
+# Changing the stored layout or the Python version invalidates the file
+CACHE_FORMAT = f"1-marshal{marshal.version}-py{sys.version_info[0]}.{sys.version_info[1]}"
+
+MAX_SHARED_ENTRIES = 20000
+MAX_SHARED_BYTES = 256 * 1024 * 1024
+
+# Milliseconds a worker waits for another worker's write lock before treating it as a miss
+BUSY_TIMEOUT_MS = 50
+
+# A hit refreshes an entry's last-used time at most this often (saves a write per hit)
+TOUCH_INTERVAL = 60.0
+
+# Seconds before a process retries a database it failed to open
+OPEN_RETRY_INTERVAL = 5.0
+
+# Eviction is checked once per this many writes
+EVICTION_INTERVAL = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def default_cache_path():
+    """Shared cache file to use: $SYNTACTIC_RESULT_CACHE (set by `serve`); unset or 'off' disables it."""
+    path = os.environ.get(CACHE_PATH_ENV, '')
+    return None if path.lower() in ('', 'off', 'none') else path
+
+
+class SharedResultCache:
+    """
+    Cross-process LRU map from result key to (payload, status) in one SQLite file.
+
+    Args:
+        path: Database file
+        max_entries: Entry budget before the least recently used are evicted
+        max_bytes: Byte budget over the stored payloads
+        namespace: Prefix of the stored keys; defaults to the pipeline's code fingerprint
+    """
+
+    def __init__(self, path, max_entries=MAX_SHARED_ENTRIES, max_bytes=MAX_SHARED_BYTES, namespace=None):
+        self.path = path
+        self._namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._disabled = False
+        self._retry_at = 0.0
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0, "errors": 0}
+
+    def _connection(self):
+        if self._disabled:
+            return None
+        connection = getattr(self._local, 'connection', None)
+        # A connection must not cross a fork; each worker opens its own
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        if time.monotonic() < self._retry_at:
+            return None
+        try:
+            connection = self._open()
+        except OSError:
+            self._count("errors")
+            # The directory can't be created: the location stays unusable for this process
+            self._disabled = True
+            return None
+        except sqlite3.Error:
+            # Locked by a sibling resetting the file, or not writable: try again a little later
+            self._count("errors")
+            self._retry_at = time.monotonic() + OPEN_RETRY_INTERVAL
+            return None
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000.0,
+                                     isolation_level=None, check_same_thread=False)
+        connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        connection.execute("PRAGMA journal_mode = WAL")
+        # WAL stays consistent with NORMAL sync; a crash can only lose the latest cached results
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.executescript(SCHEMA)
+        row = connection.execute("SELECT value FROM meta WHERE name = 'format'").fetchone()
+        if row is None or row[0] != CACHE_FORMAT:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("DELETE FROM results")
+                connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('format', ?)", (CACHE_FORMAT,))
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                connection.execute("ROLLBACK")
+                raise
+        return connection
+
+    def _stored_key(self, key):
+        if self._namespace is None:
+            # Hashed on first use rather than when the app module is imported
+            from utils.fingerprint import code_fingerprint
+            self._namespace = code_fingerprint()
+        return f"{self._namespace}:{key}"
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def get(self, key):
+        """Return the cached (payload, status) for a key, or None."""
+        connection = self._connection()
+        if connection is None:
+            return None
+        try:
+            key = self._stored_key(key)
+            row = connection.execute("SELECT status, payload, last_used FROM results WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            status, blob, last_used = row
+            payload = marshal.loads(blob)
+            now = time.time()
+            if now - last_used > TOUCH_INTERVAL:
+                connection.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+        except (sqlite3.Error, ValueError, EOFError, TypeError):
+            self._count("errors")
+            return None
+        self._count("hits")
+        return payload, status
+
+    def put(self, key, payload, status):
+        """Store a successful result; other statuses and unmarshallable payloads are skipped."""
+        if status != 200:
+            return
+        connection = self._connection()
+        if connection is None:
+            return
+        try:
+            blob = marshal.dumps(payload)
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, status, payload, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self._stored_key(key), status, blob, len(blob), time.time()))
+        except (sqlite3.Error, ValueError):
+            self._count("errors")
+            return
+        self._count("writes")
+        with self._lock:
+            self._writes += 1
+            check = self._writes % EVICTION_INTERVAL == 0
+        if check:
+            self.evict()
+
+    def evict(self):
+        """Drop the least recently used entries until both budgets are met."""
+        connection = self._connection()
+        if connection is None:
+            return 0
+        try:
+            count, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return 0
+            # Walk from the oldest entry until both budgets would be met
+            excess = freed = 0
+            for (size,) in connection.execute("SELECT size FROM results ORDER BY last_used"):
+                if count - excess <= self.max_entries and total - freed <= self.max_bytes:
+                    break
+                excess += 1
+                freed += size
+            deleted = connection.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used LIMIT ?)",
+                (excess,)).rowcount
+        except sqlite3.Error:
+            self._count("errors")
+            return 0
+        self._count("evicted", deleted)
+        return deleted
+
+    def __len__(self):
+        connection = self._connection()
+        if connection is None:
+            return 0
+        try:
+            return connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def clear(self):
+        connection = self._connection()
+        if connection is not None:
+            try:
+                connection.execute("DELETE FROM results")
+            except sqlite3.Error:
+                self._count("errors")
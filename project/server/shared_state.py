@@ -0,0 +1,198 @@
+"""
+Short-lived request state shared by every worker process, in the shared SQLite file.
+
+A pre-forked server routes each connection to any worker, so state that spans
+several requests must not live in one worker's memory. Live preview sessions
+keep their newest sequence number and published result here: an edit posted to
+one worker supersedes a run on another, and an event stream served by a third
+worker sees the result. Explanation streams append their events here, so a
+client can follow a stream from any worker.
+
+The tables live next to the result cache (server/shared_cache.py) in the same
+database file and follow its rules: WAL journaling, a connection per process
+and thread opened lazily, and every failure reported as None so callers fall
+back to their in-process state.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Any, Tuple, Optional
+
+# Milliseconds a worker waits for another worker's write lock
+BUSY_TIMEOUT_MS = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS preview_sessions (
+    session_id TEXT PRIMARY KEY,
+    latest_seq INTEGER NOT NULL,
+    result_seq INTEGER NOT NULL,
+    result TEXT,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stream_events (
+    stream_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (stream_id, position)
+);
+"""
+
+# Position of the row that registers a stream and its size
+STREAM_HEADER = -1
+
+
+class SharedState:
+    """
+    Cross-process store for multi-request state.
+
+    Args:
+        path: Database file (usually the shared result cache's)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._disabled = False
+        self.stats = {"errors": 0}
+
+    def _connection(self):
+        if self._disabled:
+            return None
+        connection = getattr(self._local, 'connection', None)
+        # A connection must not cross a fork
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000.0,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.executescript(SCHEMA)
+        except (OSError, sqlite3.Error):
+            self._count("errors")
+            # Unusable location: every worker keeps its own state
+            self._disabled = True
+            return None
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _execute(self, sql, params=()):
+        connection = self._connection()
+        if connection is None:
+            return None
+        try:
+            return connection.execute(sql, params)
+        except sqlite3.Error:
+            self._count("errors")
+            return None
+
+    def claim_preview_seq(self, session_id, seq):
+        """
+        Make seq the session's newest edit unless a newer one was seen by any worker.
+
+        Returns:
+            True if the edit is the newest, False if stale, None if the store is unavailable
+        """
+        cursor = self._execute(
+            "INSERT INTO preview_sessions (session_id, latest_seq, result_seq, last_used) VALUES (?, ?, -1, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET latest_seq = excluded.latest_seq, last_used = excluded.last_used "
+            "WHERE excluded.latest_seq > preview_sessions.latest_seq",
+            (session_id, seq, time.time()))
+        return None if cursor is None else cursor.rowcount == 1
+
+    def latest_preview_seq(self, session_id):
+        """Newest edit of the session seen by any worker, or None."""
+        cursor = self._execute("SELECT latest_seq FROM preview_sessions WHERE session_id = ?", (session_id,))
+        row = cursor.fetchone() if cursor is not None else None
+        return None if row is None else row[0]
+
+    def publish_preview_result(self, session_id, result):
+        """
+        Store a result if its edit is still the newest.
+
+        Returns:
+            True if stored, False if a newer edit arrived, None if the store is unavailable
+        """
+        try:
+            encoded = json.dumps(result)
+        except (TypeError, ValueError):
+            return None
+        cursor = self._execute(
+            "UPDATE preview_sessions SET result = ?, result_seq = ?, last_used = ? "
+            "WHERE session_id = ? AND latest_seq = ?",
+            (encoded, result["seq"], time.time(), session_id, result["seq"]))
+        return None if cursor is None else cursor.rowcount == 1
+
+    def preview_result_after(self, session_id, after_seq):
+        """The session's published result if it is newer than after_seq, else None."""
+        cursor = self._execute("SELECT result FROM preview_sessions WHERE session_id = ? AND result_seq > ?",
+                               (session_id, after_seq))
+        row = cursor.fetchone() if cursor is not None else None
+        if row is None or row[0] is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def expire_previews(self, idle_timeout):
+        """Drop sessions no worker touched for idle_timeout seconds."""
+        self._execute("DELETE FROM preview_sessions WHERE last_used < ?", (time.time() - idle_timeout,))
+
+    def open_stream(self, stream_id, total):
+        """Register a stream of `total` items so other workers can find it before its first event."""
+        self._execute("INSERT OR REPLACE INTO stream_events (stream_id, position, event, created) VALUES (?, ?, ?, ?)",
+                      (stream_id, STREAM_HEADER, json.dumps({"total": total}), time.time()))
+
+    def stream_total(self, stream_id):
+        """Number of items of a registered stream, or None if no worker registered it."""
+        cursor = self._execute("SELECT event FROM stream_events WHERE stream_id = ? AND position = ?",
+                               (stream_id, STREAM_HEADER))
+        row = cursor.fetchone() if cursor is not None else None
+        return None if row is None else json.loads(row[0])["total"]
+
+    def append_stream_events(self, stream_id, first_position, events):
+        """Store events of a stream at consecutive positions starting at first_position."""
+        connection = self._connection()
+        if connection is None:
+            return
+        now = time.time()
+        try:
+            connection.executemany(
+                "INSERT OR REPLACE INTO stream_events (stream_id, position, event, created) VALUES (?, ?, ?, ?)",
+                [(stream_id, first_position + offset, json.dumps(event), now) for offset, event in enumerate(events)])
+        except (sqlite3.Error, TypeError, ValueError):
+            self._count("errors")
+
+    def stream_events(self, stream_id, start):
+        """Events of a stream from position `start` on, or None if the store is unavailable."""
+        cursor = self._execute("SELECT event FROM stream_events WHERE stream_id = ? AND position >= ? "
+                               "ORDER BY position", (stream_id, max(start, 0)))
+        if cursor is None:
+            return None
+        return [json.loads(event) for (event,) in cursor.fetchall()]
+
+    def expire_streams(self, max_age):
+        """Drop the events of streams registered more than max_age seconds ago."""
+        self._execute("DELETE FROM stream_events WHERE stream_id IN (SELECT stream_id FROM stream_events "
+                      "WHERE position = ? AND created < ?)", (STREAM_HEADER, time.time() - max_age))
+
+
+def default_shared_state():
+    """SharedState in the shared result cache's file, or None when that tier is off."""
+    from server.shared_cache import default_cache_path
+
+    path = default_cache_path()
+    return SharedState(path) if path else None
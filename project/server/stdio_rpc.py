@@ -0,0 +1,260 @@
+"""
+Newline-delimited JSON-RPC 2.0 backend over stdin/stdout.
+
+Editors start this once (`python cli.py stdio`) and keep it running, so every
+command skips TCP, HTTP parsing and Flask. Each line on stdin is one request and
+each line on stdout is one response. Requests can be pipelined: the reader keeps
+accepting lines while earlier requests are processed, responses carry the request
+id, and a `$/cancelRequest` notification drops a request that has not finished.
+
+Methods:
+    sugarize      {"code": str, "range"?: {...}}    -> sugarize payload, or text edits
+                                                       when "range" or "edits" is given
+    desugarize    {"code": str, "mode"?: str}       -> desugarize payload
+    process_code  {"code": str, "operation": str}   -> payload for the operation
+    ping          {}                                -> "pong"
+    shutdown      {}                                -> null, then the server exits
+
+A sugarize request with "tier": "fast" and "background": true is answered
+within its deadline; the thorough result follows later as a
+`sugarize/backgroundResult` notification carrying the response's token.
+With "stream_explanations": true the response carries no explanations; each
+one follows as a `sugarize/explanation` notification with the response's
+"explanation_stream" id, and a final one with "event": "done".
+"""
+
+import json
+import queue
+import sys
+import threading
+from typing import Dict, List, Any, Optional
+
+from server.pipeline import run_operation
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+REQUEST_CANCELLED = -32800
+
+
+def _sugarize(params):
+    return run_operation(_require_code(params), 'sugarize', params)
+
+
+def _desugarize(params):
+    return run_operation(_require_code(params), 'desugarize', params)
+
+
+def _process_code(params):
+    return run_operation(_require_code(params), params.get('operation', 'sugarize'), params)
+
+
+def _ping(params):
+    return "pong", 200
+
+
+def _require_code(params):
+    code = params.get('code')
+    if not isinstance(code, str):
+        raise InvalidParams("'code' must be a string")
+    return code
+
+
+class InvalidParams(ValueError):
+    """Raised by a method handler when its params are malformed."""
+
+
+METHODS = {
+    'sugarize': _sugarize,
+    'desugarize': _desugarize,
+    'process_code': _process_code,
+    'ping': _ping,
+}
+
+
+class StdioRPCServer:
+    """
+    JSON-RPC server that reads requests from one stream and writes responses to another.
+    """
+
+    def __init__(self, reader=None, writer=None):
+        self.reader = reader or sys.stdin.buffer
+        self.writer = writer or sys.stdout.buffer
+        self.methods = dict(METHODS)
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._shutdown = False
+        self._shutdown_id = None
+
+    def serve(self):
+        """Read requests until EOF or shutdown; returns the process exit code."""
+        worker = threading.Thread(target=self._work, name='rpc-worker', daemon=True)
+        worker.start()
+
+        for line in self.reader:
+            line = line.strip()
+            if not line:
+                continue
+            self._dispatch_line(line)
+            if self._shutdown:
+                break
+
+        # Drain queued requests before acknowledging shutdown
+        self._queue.put(None)
+        worker.join()
+        if self._shutdown_id is not None:
+            self._send_result(self._shutdown_id, None)
+        return 0
+
+    def _dispatch_line(self, line):
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            self._send_error(None, PARSE_ERROR, f"Parse error: {e}")
+            return
+
+        if not isinstance(message, dict):
+            self._send_error(None, INVALID_REQUEST, "Invalid request")
+            return
+        request_id = message.get('id')
+        if isinstance(request_id, bool) or not isinstance(request_id, (str, int, type(None))):
+            self._send_error(None, INVALID_REQUEST, "Invalid request: id must be a string, an integer or null")
+            return
+        if not isinstance(message.get('method'), str):
+            self._send_error(request_id, INVALID_REQUEST, "Invalid request")
+            return
+        if not isinstance(message.get('params', {}), (dict, type(None))):
+            # A notification gets no response, not even an error
+            if 'id' in message:
+                self._send_error(request_id, INVALID_REQUEST, "Invalid request: params must be an object")
+            return
+
+        method = message['method']
+
+        if method == '$/cancelRequest':
+            cancel_id = (message.get('params') or {}).get('id')
+            if isinstance(cancel_id, bool) or not isinstance(cancel_id, (str, int)):
+                return
+            with self._lock:
+                # Cancelling a request that already finished is a no-op
+                if cancel_id in self._pending:
+                    self._cancelled.add(cancel_id)
+            return
+
+        if method in ('shutdown', 'exit'):
+            self._shutdown = True
+            self._shutdown_id = request_id
+            return
+
+        if request_id is not None:
+            with self._lock:
+                self._pending.add(request_id)
+        self._queue.put(message)
+
+    def _work(self):
+        # A single worker keeps CPU-bound transforms off the reader thread without
+        # contending for the GIL; the reader stays free to receive cancellations.
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            try:
+                self._handle(message)
+            finally:
+                with self._lock:
+                    self._pending.discard(message.get('id'))
+                    self._cancelled.discard(message.get('id'))
+
+    def _handle(self, message):
+        request_id = message.get('id')
+        if self._take_cancelled(request_id):
+            self._send_error(request_id, REQUEST_CANCELLED, "Request cancelled")
+            return
+
+        handler = self.methods.get(message['method'])
+        if handler is None:
+            self._send_error(request_id, METHOD_NOT_FOUND, f"Method not found: {message['method']}")
+            return
+
+        params = message.get('params') or {}
+        try:
+            if not isinstance(params, dict):
+                raise InvalidParams("params must be an object")
+            result, status = handler(params)
+        except InvalidParams as e:
+            self._send_error(request_id, INVALID_PARAMS, str(e))
+            return
+        except Exception as e:
+            self._send_error(request_id, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+            return
+
+        # A cancellation that arrived while we were working still wins
+        if self._take_cancelled(request_id):
+            self._send_error(request_id, REQUEST_CANCELLED, "Request cancelled")
+            return
+
+        if request_id is None:
+            return
+        if status >= 400:
+            code = INVALID_PARAMS if status < 500 else INTERNAL_ERROR
+            self._send_error(request_id, code, result.get('message', 'Transformation failed'), result)
+        else:
+            self._send_result(request_id, result)
+            if isinstance(result, dict) and result.get('background'):
+                self._push_background(result['background'])
+            if isinstance(result, dict) and result.get('explanation_stream'):
+                self._push_explanations(result['explanation_stream'])
+
+    def _push_background(self, token):
+        from server.tiered import background_results
+
+        def push(background_result):
+            self._write({"jsonrpc": "2.0", "method": "sugarize/backgroundResult", "params": background_result})
+        background_results.notify(token, push)
+
+    def _push_explanations(self, stream_id):
+        from server.explanations import explanation_streams
+
+        stream = explanation_streams.get(stream_id)
+        if stream is None:
+            return
+
+        def push(event):
+            params = dict(event["data"], stream=stream_id, event=event["event"])
+            self._write({"jsonrpc": "2.0", "method": "sugarize/explanation", "params": params})
+        stream.listen(push)
+
+    def _take_cancelled(self, request_id):
+        with self._lock:
+            if request_id in self._cancelled:
+                self._cancelled.discard(request_id)
+                return True
+        return False
+
+    def _send_result(self, request_id, result):
+        self._write({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def _send_error(self, request_id, code, message, data=None):
+        error = {"code": code, "message": message}
+        if data is not None:
+            error["data"] = data
+        self._write({"jsonrpc": "2.0", "id": request_id, "error": error})
+
+    def _write(self, message):
+        data = json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._write_lock:
+            self.writer.write(data)
+            self.writer.flush()
+
+
+def main():
+    """Serve JSON-RPC on the process's stdin/stdout."""
+    protocol_out = sys.stdout.buffer
+    # Anything the transformers print must not corrupt the protocol stream
+    sys.stdout = sys.stderr
+    return StdioRPCServer(sys.stdin.buffer, protocol_out).serve()
@@ -0,0 +1,428 @@
+"""
+Tiered, deadline-aware sugaring.
+
+Interactive callers (editors) and batch callers (CI) have very different
+latency budgets, so sugaring is split into two tiers:
+
+- The fast tier picks rules in order of value per measured cost while their
+  combined cost fits the deadline, then makes one pass that tries them on each
+  top-level statement and stops before the first statement that would not fit.
+  The response says "partial" when rules or statements were left out.
+- The thorough tier finishes the remaining rules and statements and runs the expensive
+  analyses: validation of the edited file, the static cost model and a
+  def-use check for loop variables that a rewrite would stop binding. It runs
+  inline (CI), or in a background thread after a fast response; the result is
+  kept for polling under an unguessable token, in the shared result store when
+  the server has one (so any pre-forked worker can answer the poll), and
+  pushed to transports that registered for it. At most MAX_PENDING_RUNS runs
+  wait for the background thread; beyond that the fast answer comes alone.
+
+The pass times each rule's matching, and the running average per source line
+feeds the next choice of rules and predicts whether the next statement fits.
+"""
+
+import ast
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Tuple, Optional
+
+from rules.rule_index import TRANSFORMATION_RULE_REFS, PLACEHOLDER_TRANSFORMATIONS
+from server.result_cache import result_cache
+
+# Default deadline of the fast tier
+DEFAULT_BUDGET_MS = 50
+
+# Relative value of a rule's rewrites; rewrites that change per-iteration work rank above cosmetic ones
+RULE_VALUE = {
+    "list_comprehension": 3.0,
+    "set_comprehension": 3.0,
+    "dict_comprehension": 3.0,
+    "sum_pattern": 3.0,
+    "enumerate_pattern": 2.0,
+    "generator_expression": 1.5,
+    "ternary_operator": 1.0,
+}
+DEFAULT_RULE_VALUE = 1.0
+
+# Rules whose rewrite removes a for loop, so the loop variable is no longer bound afterwards
+LOOP_REMOVING_RULES = {"list_comprehension", "set_comprehension", "dict_comprehension", "sum_pattern"}
+
+# Weight of the newest measurement in the running average
+COST_SMOOTHING = 0.3
+
+# Finished background results kept for polling
+MAX_STORED_RESULTS = 256
+
+# Background runs queued or running at once; further requests get no background run
+MAX_PENDING_RUNS = 16
+
+# Random bytes in a background token
+TOKEN_BYTES = 16
+
+# Namespace of background results in the shared result store
+SHARED_KEY_PREFIX = 'background:'
+
+
+class RuleCostTracker:
+    """
+    Running average of each rule's cost, in seconds per source line.
+    """
+
+    def __init__(self, smoothing=COST_SMOOTHING):
+        self.smoothing = smoothing
+        self._costs = {}
+        self._lock = threading.Lock()
+
+    def record(self, rule, seconds, lines):
+        per_line = seconds / max(lines, 1)
+        with self._lock:
+            previous = self._costs.get(rule)
+            self._costs[rule] = per_line if previous is None else (
+                previous + self.smoothing * (per_line - previous))
+
+    def expected(self, rule, lines):
+        """Expected seconds for matching the rule over `lines` lines (None if never measured)."""
+        with self._lock:
+            per_line = self._costs.get(rule)
+        return None if per_line is None else per_line * max(lines, 1)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._costs)
+
+    def order(self, rules):
+        """
+        Sort rules by value per expected cost, best first. Rules that were never
+        measured go first, so every rule gets measured once.
+        """
+        costs = self.snapshot()
+
+        def key(rule):
+            value = RULE_VALUE.get(rule, DEFAULT_RULE_VALUE)
+            cost = costs.get(rule)
+            if cost is None:
+                return (0, -value)
+            return (1, -value / max(cost, 1e-12))
+        return sorted(rules, key=key)
+
+
+rule_costs = RuleCostTracker()
+
+
+def default_rules():
+    """Transformation types SugarTransformer implements."""
+    return [rule for rule in TRANSFORMATION_RULE_REFS if rule not in PLACEHOLDER_TRANSFORMATIONS]
+
+
+def _position_key(position):
+    return (position["line"], position["character"])
+
+
+def _overlaps(edit, accepted):
+    start = _position_key(edit["range"]["start"])
+    end = _position_key(edit["range"]["end"])
+    return any(start < _position_key(other["range"]["end"]) and _position_key(other["range"]["start"]) < end
+               for other in accepted)
+
+
+def run_rule_passes(code, rules, tree=None, deadline=None, start_line=None, end_line=None, tracker=rule_costs):
+    """
+    Run one sugaring pass statement by statement until the deadline, with the
+    rules that fit it.
+
+    Rules are taken in order of value per measured cost while their combined
+    expected cost over the visited lines fits the deadline; the best rule and
+    unmeasured rules are taken as long as any time is left. The deadline is then checked before each top-level
+    statement: a statement is only started if the chosen rules' cost per line
+    says it fits.
+
+    Args:
+        code: Python source code string
+        rules: Transformation types to try
+        tree: Already parsed module for `code`
+        deadline: time.perf_counter() value after which no further statement starts
+        start_line: First 1-based line to visit (None for the start of the file)
+        end_line: Statements starting after this 1-based line are not visited (None for the end of the file)
+        tracker: RuleCostTracker to record the rules' timings in and read estimates from
+
+    Returns:
+        Tuple of (edits in document order, 1-based line of the first statement
+        left out or None when the pass finished, rules left out)
+    """
+    from utils.text_edits import compute_text_edits_until
+    from utils.prefilter import get_prefilter
+
+    if tree is None:
+        tree = ast.parse(code)
+    last_line = code.count('\n') + 1 if end_line is None else end_line
+    lines = last_line - (start_line or 1) + 1
+    if lines <= 0:
+        return [], None, []
+
+    chosen = []
+    per_line = 0.0
+    for rule in tracker.order(rules):
+        expected = tracker.expected(rule, 1)
+        if deadline is not None:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            # The best rule runs while any time is left; the per-statement check decides how far it gets
+            if expected is not None and chosen and now + (per_line + expected) * lines > deadline:
+                continue
+        chosen.append(rule)
+        per_line += expected or 0.0
+    left_out = [rule for rule in rules if rule not in chosen]
+    if not chosen:
+        return [], start_line or 1, left_out
+
+    def fits(stmt):
+        if end_line is not None and stmt.lineno > end_line:
+            return False
+        if deadline is None:
+            return True
+        return time.perf_counter() + per_line * (stmt.end_lineno - stmt.lineno + 1) <= deadline
+
+    timings = {}
+    edits, pending_line = compute_text_edits_until(code, fits, start_line, tree=tree, prefilter=get_prefilter(chosen),
+                                                   enabled=set(chosen), timings=timings)
+    visited = (pending_line or last_line + 1) - (start_line or 1)
+    if end_line is not None and pending_line is not None and pending_line > end_line:
+        pending_line = None
+    if visited > 0:
+        for rule in chosen:
+            tracker.record(rule, timings.get(rule, 0.0), visited)
+    return _sorted_edits(edits), pending_line, left_out
+
+
+def _sorted_edits(edits):
+    return sorted(edits, key=lambda edit: _position_key(edit["range"]["start"]))
+
+
+def _rewritten_loop(tree, edit):
+    # The rewritten statement ends where the edit ends; an initialization may start the edit earlier
+    start_line = edit["range"]["start"]["line"] + 1
+    end_line = edit["range"]["end"]["line"] + 1
+    loops = [node for node in ast.walk(tree)
+             if isinstance(node, ast.For) and node.end_lineno == end_line and node.lineno >= start_line]
+    return min(loops, key=lambda node: node.lineno) if loops else None
+
+
+def _enclosing_scope(tree, target):
+    scope = tree
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+            if node.lineno <= target.lineno and target.end_lineno <= node.end_lineno and node is not target:
+                if scope is tree or node.lineno >= scope.lineno:
+                    scope = node
+    return scope
+
+
+def _scope_names_read_after(scope, line):
+    names = set()
+    stack = list(ast.iter_child_nodes(scope))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.lineno > line:
+            names.add(node.id)
+        stack.extend(ast.iter_child_nodes(node))
+    return names
+
+
+def loop_variable_escapes(code, edits, tree=None):
+    """
+    Def-use check: find rewrites that remove a loop whose variable is read after it.
+
+    A comprehension does not leave its variable bound, so code after the loop
+    that reads it would change meaning (or raise NameError).
+
+    Returns:
+        List of {"line", "rule", "names"} for the affected edits
+    """
+    if tree is None:
+        tree = ast.parse(code)
+    findings = []
+    for edit in edits:
+        if edit["rule"] not in LOOP_REMOVING_RULES:
+            continue
+        loop = _rewritten_loop(tree, edit)
+        if loop is None:
+            continue
+        targets = {node.id for node in ast.walk(loop.target) if isinstance(node, ast.Name)}
+        escaping = targets & _scope_names_read_after(_enclosing_scope(tree, loop), loop.end_lineno)
+        if escaping:
+            findings.append({"line": loop.lineno, "rule": edit["rule"], "names": sorted(escaping)})
+    return findings
+
+
+def edit_costs(code, edits):
+    """Static cost estimate (see utils/cost_model.py) for each edit, aligned with `edits`."""
+    from utils.cost_model import transformation_cost, infer_container_kinds
+    from utils.speedup import extract_snippets
+
+    kinds = infer_container_kinds([ast.parse(code)])
+    costs = []
+    for edit in edits:
+        original, sugared = extract_snippets(code, edit)
+        try:
+            costs.append(transformation_cost(ast.parse(original).body, ast.parse(sugared).body, kinds))
+        except SyntaxError:
+            costs.append(None)
+    return costs
+
+
+def validate_edits(code, edits):
+    """Compile the source as it will look once the edits are applied."""
+    from utils.text_edits import apply_text_edits
+
+    validation = {"is_valid": True, "errors": []}
+    try:
+        compile(apply_text_edits(code, edits), '<string>', 'exec')
+    except Exception as e:
+        validation["is_valid"] = False
+        validation["errors"].append(str(e))
+    return validation
+
+
+def run_thorough_tier(code, edits=None, pending_line=1, pending_rules=(), tree=None):
+    """
+    Finish the pending rules and statements and run the expensive analyses.
+
+    Args:
+        code: Python source code string
+        edits: Edits already produced by the fast tier
+        pending_line: Line of the first statement the fast tier left out
+            (1 for the whole file, None when it finished)
+        pending_rules: Rules the fast tier left out of the statements before pending_line
+        tree: Already parsed module for `code`
+
+    Returns:
+        Dictionary with the complete "edits", "validation", per-edit "costs",
+        "loop_variable_escapes" and the measured "rule_costs"
+    """
+    if tree is None:
+        tree = ast.parse(code)
+    edits = list(edits or [])
+    more_edits = []
+    if pending_rules and pending_line != 1:
+        end_line = None if pending_line is None else pending_line - 1
+        more_edits += run_rule_passes(code, list(pending_rules), tree, end_line=end_line)[0]
+    if pending_line is not None:
+        more_edits += run_rule_passes(code, default_rules(), tree, start_line=pending_line)[0]
+    for edit in more_edits:
+        if not _overlaps(edit, edits):
+            edits.append(edit)
+    edits = _sorted_edits(edits)
+
+    return {
+        "edits": edits,
+        "validation": validate_edits(code, edits),
+        "costs": edit_costs(code, edits),
+        "loop_variable_escapes": loop_variable_escapes(code, edits, tree),
+        "rule_costs": rule_costs.snapshot(),
+    }
+
+
+class BackgroundResults:
+    """
+    Runs thorough tiers on a single background thread and keeps their results
+    for polling. Transports that can push register a callback per token.
+
+    Args:
+        max_results: Results kept in this process
+        max_pending: Runs allowed to wait for or occupy the background thread
+        shared: Optional cross-process store (a SharedResultCache) that results
+            are written through to, so a poll can land on any worker
+    """
+
+    def __init__(self, max_results=MAX_STORED_RESULTS, max_pending=MAX_PENDING_RUNS, shared=None):
+        self.max_results = max_results
+        self.max_pending = max_pending
+        self.shared = shared
+        self._results = OrderedDict()
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = None
+
+    def submit(self, code, edits, pending_line, pending_rules=()):
+        """
+        Queue a thorough tier run.
+
+        Returns:
+            Token to poll the result with, or None when too many runs are pending
+        """
+        token = f"tier-{secrets.token_urlsafe(TOKEN_BYTES)}"
+        running = {"token": token, "status": "running"}
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+            self._results[token] = running
+            while len(self._results) > self.max_results:
+                expired, _ = self._results.popitem(last=False)
+                self._callbacks.pop(expired, None)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thorough-tier')
+        self._publish(token, running)
+        self._executor.submit(self._run, token, code, edits, pending_line, pending_rules)
+        return token
+
+    def _publish(self, token, result):
+        if self.shared is not None:
+            self.shared.put(SHARED_KEY_PREFIX + token, result, 200)
+
+    def _run(self, token, code, edits, pending_line, pending_rules):
+        try:
+            result = dict(run_thorough_tier(code, edits, pending_line, pending_rules), token=token,
+                          status="complete")
+        except Exception as e:
+            result = {"token": token, "status": "error", "message": f"{type(e).__name__}: {e}"}
+        self._publish(token, result)
+        with self._lock:
+            self._pending -= 1
+            if token in self._results:
+                self._results[token] = result
+            callbacks = self._callbacks.pop(token, [])
+        for callback in callbacks:
+            self._call(callback, result)
+
+    def notify(self, token, callback):
+        """
+        Call `callback(result)` once the token's run finishes (right away if it already has).
+        """
+        with self._lock:
+            result = self._results.get(token)
+            if result is None:
+                return
+            if result["status"] == "running":
+                self._callbacks.setdefault(token, []).append(callback)
+                return
+        self._call(callback, result)
+
+    @staticmethod
+    def _call(callback, result):
+        try:
+            callback(result)
+        except Exception:
+            # A broken push channel must not take the worker down
+            pass
+
+    def get(self, token):
+        """Return the stored result for a token (status "running" until done), or None."""
+        with self._lock:
+            result = self._results.get(token)
+        if result is None and self.shared is not None:
+            # Submitted by another worker process
+            cached = self.shared.get(SHARED_KEY_PREFIX + token)
+            if cached is not None:
+                result = cached[0]
+        return result
+
+
+background_results = BackgroundResults(shared=result_cache.shared)
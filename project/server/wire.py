@@ -0,0 +1,146 @@
+"""
+Response shaping and wire encodings for the HTTP app.
+
+Lean mode: a request with "lean": true gets only what a client that already
+has the source needs. The echoed original code and comments are dropped, and
+each explanation is reduced to its rule id (plus any measurement fields). The
+rule text is fetched once from `/rules/<name>?v=<rulebook_version>` and cached
+by the client.
+
+Encodings: responses are JSON by default, or MessagePack when the client
+accepts application/msgpack and the optional msgpack package is installed.
+Bodies above a small threshold are gzip-compressed when the client accepts
+gzip. Request bodies may be sent as MessagePack too.
+"""
+
+import gzip
+import json
+from typing import Dict, List, Any, Tuple, Optional
+
+try:
+    import msgpack
+except ImportError:
+    # Optional: without it every client gets JSON
+    msgpack = None
+
+from rules.rule_index import get_rule, rule_ref_for, rulebook_version
+
+MSGPACK_MIME_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Bodies smaller than this are sent uncompressed; gzip would not pay for its header
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+
+# Payload fields a lean response leaves out
+LEAN_DROPPED_FIELDS = ('original_code', 'comments')
+
+
+def lean_payload(payload):
+    """
+    Reduce a pipeline payload to the rewritten code or edits plus rule ids.
+
+    Args:
+        payload: Successful payload of any sugarize or desugarize pipeline
+
+    Returns:
+        New payload without echoed input or rulebook explanation text, with
+        the distinct rule ids under "rules" and the "rulebook_version" to
+        fetch their text with
+    """
+    lean = {key: value for key, value in payload.items() if key not in LEAN_DROPPED_FIELDS}
+    rules = []
+    if 'explanations' in payload:
+        explanations = []
+        for explanation in payload['explanations']:
+            entry = dict(explanation)
+            rule = entry.setdefault('rule', rule_ref_for(explanation['transformation_type']))
+            # The measurement repeats the flattened speedup fields
+            entry.pop('measurement', None)
+            if get_rule(rule) is not None:
+                # Text the client can fetch (and cache) from /rules/<name>
+                entry.pop('explanation', None)
+                if rule not in rules:
+                    rules.append(rule)
+            explanations.append(entry)
+        lean['explanations'] = explanations
+    lean['rules'] = rules
+    lean['rulebook_version'] = rulebook_version()
+    return lean
+
+
+def _accepts(header, values):
+    for part in (header or '').split(','):
+        value, *params = part.split(';')
+        if value.strip().lower() not in values:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            return True
+    return False
+
+
+def accepts_msgpack(accept):
+    """Whether the Accept header asks for MessagePack and it can be produced."""
+    return msgpack is not None and _accepts(accept, MSGPACK_MIME_TYPES)
+
+
+def accepts_gzip(accept_encoding):
+    """Whether the Accept-Encoding header allows gzip."""
+    return _accepts(accept_encoding, ('gzip',))
+
+
+def encode_response(payload, accept=None, accept_encoding=None):
+    """
+    Serialize a payload for the client.
+
+    Args:
+        payload: JSON-compatible response payload
+        accept: Request's Accept header
+        accept_encoding: Request's Accept-Encoding header
+
+    Returns:
+        Tuple of (body bytes, headers dictionary)
+    """
+    if accepts_msgpack(accept):
+        body = msgpack.packb(payload, use_bin_type=True)
+        headers = {'Content-Type': 'application/msgpack'}
+    else:
+        body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+
+    if len(body) >= GZIP_MIN_BYTES and accepts_gzip(accept_encoding):
+        body = gzip.compress(body, GZIP_LEVEL, mtime=0)
+        headers['Content-Encoding'] = 'gzip'
+    headers['Vary'] = 'Accept, Accept-Encoding'
+    return body, headers
+
+
+def decode_request(data, content_type=None):
+    """
+    Parse a request body sent as JSON or MessagePack.
+
+    Returns:
+        The decoded object
+
+    Raises:
+        ValueError: If the body can't be decoded
+    """
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    if media_type in MSGPACK_MIME_TYPES:
+        if msgpack is None:
+            raise ValueError("MessagePack request bodies need the msgpack package")
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except Exception as e:
+            raise ValueError(f"Invalid MessagePack body: {e}")
+    try:
+        return json.loads(data or b'{}')
+    except ValueError as e:
+        raise ValueError(f"Invalid JSON body: {e}")
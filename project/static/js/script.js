@@ -31,6 +31,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const diffPanel = document.getElementById('diff-panel');
     const resultTitle = document.getElementById('result-title');
     const operationRadios = document.querySelectorAll('input[name="operation"]');
+    const livePreviewToggle = document.getElementById('live-preview');
 
     // Hide panels initially
     explanationsPanel.style.display = 'none';
@@ -40,6 +41,9 @@ document.addEventListener('DOMContentLoaded', () => {
     operationRadios.forEach(radio => {
         radio.addEventListener('change', () => {
             updateResultTitle(radio.value);
+            if (livePreviewToggle.checked) {
+                scheduleLivePreview();
+            }
         });
     });
 
@@ -54,6 +58,10 @@ document.addEventListener('DOMContentLoaded', () => {
     // Set initial title
     updateResultTitle('sugarize');
 
+    // Results of earlier requests with an ETag, keyed by request body (revalidated, not reused blindly)
+    const MAX_PROCESSED_RESULTS = 20;
+    const processedResults = new Map();
+
     // Process button click handler
     processBtn.addEventListener('click', async () => {
         const originalCode = originalEditor.getValue();
@@ -76,17 +84,34 @@ document.addEventListener('DOMContentLoaded', () => {
         
         // Call the backend API to process the code
         try {
+            const requestBody = JSON.stringify({ 
+                code: originalCode,
+                operation: selectedOperation,
+                // Show the code right away; explanations follow over Server-Sent Events
+                stream_explanations: selectedOperation === 'sugarize',
+                // The editor already has the source; rule text comes from the rule cache
+                lean: true
+            });
+            const requestHeaders = {
+                'Content-Type': 'application/json'
+            };
+            // Re-sending the same request: the server answers 304 if our copy is still current
+            const previous = processedResults.get(requestBody);
+            if (previous) {
+                requestHeaders['If-None-Match'] = previous.etag;
+            }
+            
             const response = await fetch('/process_code', {
                 method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ 
-                    code: originalCode,
-                    operation: selectedOperation
-                })
+                headers: requestHeaders,
+                body: requestBody
             });
             
+            if (response.status === 304 && previous) {
+                renderResult(Object.assign({ original_code: originalCode }, previous.result), selectedOperation);
+                return;
+            }
+            
             if (!response.ok) {
                 console.error('Server error:', response.statusText);
                 
@@ -100,30 +125,14 @@ document.addEventListener('DOMContentLoaded', () => {
             }
             
             const result = await response.json();
-            
-            // Update transformed code based on the operation
-            if (selectedOperation === 'sugarize') {
-                transformedEditor.setValue(result.sugared_code);
-            } else {
-                transformedEditor.setValue(result.desugared_code);
+            const etag = response.headers.get('ETag');
+            if (etag) {
+                processedResults.set(requestBody, { etag: etag, result: result });
+                if (processedResults.size > MAX_PROCESSED_RESULTS) {
+                    processedResults.delete(processedResults.keys().next().value);
+                }
             }
-            
-            // Update validation status
-            updateValidationStatus(result.validation);
-            
-            // Update explanations
-            updateExplanations(result.explanations);
-            
-            // Update diff view
-            updateDiffView(
-                result.original_code, 
-                selectedOperation === 'sugarize' ? result.sugared_code : result.desugared_code,
-                selectedOperation
-            );
-            
-            // Show panels
-            explanationsPanel.style.display = 'block';
-            diffPanel.style.display = 'block';
+            renderResult(Object.assign({ original_code: originalCode }, result), selectedOperation);
             
         } catch (error) {
             console.error('Error:', error);
@@ -151,6 +160,125 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
     
+    // Show a pipeline result in the editor, validation, explanation and diff panels
+    function renderResult(result, operation) {
+        // Update transformed code based on the operation
+        if (operation === 'sugarize') {
+            transformedEditor.setValue(result.sugared_code);
+        } else {
+            transformedEditor.setValue(result.desugared_code);
+        }
+        
+        // Update validation status
+        updateValidationStatus(result.validation);
+        
+        // Update explanations
+        if (result.explanation_stream) {
+            followExplanationStream(result.explanation_stream);
+        } else {
+            updateExplanations(result.explanations, result.rulebook_version);
+        }
+        
+        // Update diff view
+        updateDiffView(
+            result.original_code, 
+            operation === 'sugarize' ? result.sugared_code : result.desugared_code,
+            operation
+        );
+        
+        // Show panels
+        explanationsPanel.style.display = 'block';
+        diffPanel.style.display = 'block';
+    }
+
+    // Live preview: debounced edits are posted with increasing sequence numbers and
+    // results arrive on a Server-Sent Events stream. The server abandons work for
+    // edits that were superseded, and only results for the newest edit are shown.
+    const LIVE_PREVIEW_DEBOUNCE_MS = 300;
+    const previewSessionId = Array.from({ length: 24 },
+        () => Math.floor(Math.random() * 36).toString(36)).join('');
+    let previewSeq = 0;
+    let previewTimer = null;
+    let previewEvents = null;
+
+    function startLivePreview() {
+        if (previewEvents) {
+            return;
+        }
+        previewEvents = new EventSource(`/preview/${previewSessionId}/events`);
+        previewEvents.addEventListener('result', event => {
+            const update = JSON.parse(event.data);
+            // A result for an older edit can still be in flight when the user keeps typing
+            if (update.seq !== previewSeq || !livePreviewToggle.checked) {
+                return;
+            }
+            if (update.status !== 200) {
+                validationStatus.innerHTML = `
+                    <div class="validation-error">
+                        <p>${update.payload.message}</p>
+                    </div>
+                `;
+                return;
+            }
+            try {
+                renderResult(update.payload, update.operation);
+            } catch (error) {
+                console.error('Error:', error);
+            }
+        });
+        scheduleLivePreview();
+    }
+
+    function stopLivePreview() {
+        clearTimeout(previewTimer);
+        if (previewEvents) {
+            previewEvents.close();
+            previewEvents = null;
+        }
+    }
+
+    function scheduleLivePreview() {
+        clearTimeout(previewTimer);
+        previewTimer = setTimeout(sendLivePreview, LIVE_PREVIEW_DEBOUNCE_MS);
+    }
+
+    async function sendLivePreview() {
+        const code = originalEditor.getValue();
+        if (!code.trim()) {
+            return;
+        }
+        previewSeq += 1;
+        try {
+            await fetch(`/preview/${previewSessionId}`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({
+                    seq: previewSeq,
+                    code: code,
+                    operation: document.querySelector('input[name="operation"]:checked').value
+                })
+            });
+        } catch (error) {
+            console.error('Live preview error:', error);
+        }
+    }
+
+    livePreviewToggle.addEventListener('change', () => {
+        if (livePreviewToggle.checked) {
+            startLivePreview();
+        } else {
+            stopLivePreview();
+        }
+    });
+
+    originalEditor.on('change', () => {
+        if (livePreviewToggle.checked) {
+            scheduleLivePreview();
+        }
+    });
+
     // Function to update validation status
     function updateValidationStatus(validation) {
         validationStatus.innerHTML = '';
@@ -175,8 +303,51 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Explanations of the latest result, received one at a time as they resolve
+    let explanationEvents = null;
+
+    function followExplanationStream(streamId) {
+        if (explanationEvents) {
+            explanationEvents.close();
+        }
+        explanationsContent.innerHTML = '<p class="explanations-loading">Loading explanations...</p>';
+        const received = [];
+        const events = new EventSource(`/explanations/${streamId}`);
+        explanationEvents = events;
+
+        events.addEventListener('explanation', event => {
+            received.push(JSON.parse(event.data));
+            received.sort((a, b) => a.index - b.index);
+            updateExplanations(received);
+        });
+        events.addEventListener('done', () => {
+            events.close();
+            if (explanationEvents === events) {
+                explanationEvents = null;
+            }
+            updateExplanations(received);
+        });
+        events.onerror = () => {
+            // The stream expired or the server restarted; keep what arrived
+            events.close();
+        };
+    }
+
+    // Rule texts by rule id; versioned URLs let the browser cache them for good as well
+    const ruleTexts = new Map();
+
+    function fetchRuleText(rule, version) {
+        const key = `${rule}@${version}`;
+        if (!ruleTexts.has(key)) {
+            ruleTexts.set(key, fetch(`/rules/${encodeURIComponent(rule)}?v=${version}`)
+                .then(response => response.ok ? response.json() : null)
+                .then(data => data ? data.full_explanation : 'No detailed explanation available.'));
+        }
+        return ruleTexts.get(key);
+    }
+
     // Function to update explanations
-    function updateExplanations(explanations) {
+    function updateExplanations(explanations, rulebookVersion) {
         explanationsContent.innerHTML = '';
         
         if (explanations.length === 0) {
@@ -190,9 +361,16 @@ document.addEventListener('DOMContentLoaded', () => {
             
             item.innerHTML = `
                 <div class="transformation-type">${titleCase(explanation.transformation_type.replace(/_/g, ' '))}</div>
-                <p>${explanation.explanation}</p>
+                <p>${explanation.explanation || ''}</p>
             `;
             
+            // Lean responses reference the rulebook text by rule id
+            if (explanation.explanation === undefined && explanation.rule) {
+                fetchRuleText(explanation.rule, rulebookVersion).then(text => {
+                    item.querySelector('p').textContent = text;
+                });
+            }
+            
             explanationsContent.appendChild(item);
         });
     }
@@ -0,0 +1,74 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.admission import AdmissionController, Overloaded, request_cost, COST_UNIT_BYTES
+
+
+class TestAdmission(unittest.TestCase):
+
+    def _acquire_in_thread(self, controller, cost, admitted):
+        def run():
+            try:
+                controller.acquire(cost)
+                admitted.append(cost)
+            except Overloaded as e:
+                admitted.append(e)
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def _wait_for_queue(self, controller, depth):
+        for _ in range(1000):
+            if controller.metrics()["queue_depth"] >= depth:
+                return
+            threading.Event().wait(0.01)
+
+    def test_cost_follows_input_size(self):
+        """Requests are charged per started cost unit of source, clamped to the capacity."""
+        self.assertEqual(request_cost(""), 1)
+        self.assertEqual(request_cost("x" * (COST_UNIT_BYTES + 1)), 2)
+        self.assertEqual(request_cost("x" * COST_UNIT_BYTES * 100, capacity=8), 8)
+
+    def test_full_queue_is_refused_with_retry_after(self):
+        """Beyond the queue bound a request gets 429 at once; a waiter that times out gets 503."""
+        controller = AdmissionController(capacity=1, max_queue_length=1, max_wait=0.2)
+        controller.acquire(1)
+        admitted = []
+        waiter = self._acquire_in_thread(controller, 1, admitted)
+        self._wait_for_queue(controller, 1)
+
+        with self.assertRaises(Overloaded) as refused:
+            controller.acquire(1)
+        self.assertEqual(refused.exception.status, 429)
+        self.assertGreaterEqual(refused.exception.retry_after, 1)
+
+        waiter.join(10)
+        self.assertEqual(admitted[0].status, 503)
+        metrics = controller.metrics()
+        self.assertEqual((metrics["rejected_queue_full"], metrics["rejected_timeout"]), (1, 1))
+        self.assertEqual(metrics["queue_depth"], 0)
+
+    def test_small_requests_pass_a_waiting_giant(self):
+        """A large waiter does not block small ones that fit, until it has waited long enough."""
+        controller = AdmissionController(capacity=4, max_bypass_wait=10.0)
+        controller.acquire(2)
+        admitted = []
+        giant = self._acquire_in_thread(controller, 4, admitted)
+        self._wait_for_queue(controller, 1)
+        small = self._acquire_in_thread(controller, 1, admitted)
+        small.join(10)
+        self.assertEqual(admitted, [1])
+
+        controller.release(2)
+        controller.release(1)
+        giant.join(10)
+        self.assertEqual(admitted, [1, 4])
+        self.assertEqual(controller.metrics()["in_flight_cost"], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.coalescing import SingleFlight, request_key, run_coalesced, single_flight
+
+SAMPLE_CODE = """result = []
+for x in items:
+    result.append(x * 2)
+"""
+
+class TestCoalescing(unittest.TestCase):
+
+    def _run_concurrently(self, flight, key, fn, callers=5):
+        results = []
+        errors = []
+
+        def call():
+            try:
+                results.append(flight.do(key, fn))
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        return results, errors
+
+    def _release_when_waiting(self, flight, followers, release):
+        # Let the computation finish once every other caller is waiting on it
+        for _ in range(1000):
+            if flight.stats["coalesced"] >= followers:
+                break
+            threading.Event().wait(0.01)
+        release.set()
+
+    def test_concurrent_duplicates_share_one_computation(self):
+        """Callers arriving while the first computation runs wait for it instead of recomputing."""
+        flight = SingleFlight()
+        release = threading.Event()
+        runs = []
+
+        def compute():
+            runs.append(1)
+            release.wait(10)
+            return {"sugarized_code": "result = [x * 2 for x in items]"}, 200
+
+        waiter = threading.Thread(target=self._release_when_waiting, args=(flight, 4, release))
+        waiter.start()
+        results, errors = self._run_concurrently(flight, "key", compute)
+        waiter.join(10)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(flight.stats, {"computed": 1, "coalesced": 4})
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_errors_reach_every_waiter(self):
+        """An exception of the shared computation is raised in every coalesced caller."""
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def compute():
+            release.wait(10)
+            raise ValueError("boom")
+
+        waiter = threading.Thread(target=self._release_when_waiting, args=(flight, 2, release))
+        waiter.start()
+        results, errors = self._run_concurrently(flight, "key", compute, callers=3)
+        waiter.join(10)
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+        # Nothing is kept once the computation finished
+        self.assertEqual(flight.do("key", lambda: 42), 42)
+
+    def test_key_covers_content_operation_and_options(self):
+        """Only requests with the same source, operation and options are coalesced."""
+        key = request_key(SAMPLE_CODE, 'sugarize', {"code": SAMPLE_CODE, "range": {"start_line": 1, "end_line": 3}})
+        self.assertEqual(key, request_key(SAMPLE_CODE, 'sugarize', {"range": {"end_line": 3, "start_line": 1}}))
+        self.assertNotEqual(key, request_key(SAMPLE_CODE, 'desugarize', {"range": {"start_line": 1, "end_line": 3}}))
+        self.assertNotEqual(key, request_key(SAMPLE_CODE, 'sugarize', {"range": {"start_line": 1, "end_line": 2}}))
+        self.assertNotEqual(key, request_key(SAMPLE_CODE + "\n", 'sugarize', {"range": {"start_line": 1, "end_line": 3}}))
+
+    def test_priority_classes_are_not_coalesced(self):
+        """An interactive request does not wait on a batch computation of the same payload."""
+        release = threading.Event()
+        batch = threading.Thread(target=run_coalesced,
+                                 args=(SAMPLE_CODE, 'sugarize', {}, lambda: (release.wait(10), 200), 'batch'))
+        batch.start()
+        for _ in range(1000):
+            if single_flight.in_flight():
+                break
+            threading.Event().wait(0.01)
+        try:
+            self.assertEqual(run_coalesced(SAMPLE_CODE, 'sugarize', {}, lambda: ("interactive", 200), 'interactive'),
+                             ("interactive", 200))
+        finally:
+            release.set()
+            batch.join(10)
+
+    def test_non_string_code_is_rejected_before_coalescing(self):
+        """A request whose code is not a string is a client error, not a failed computation."""
+        from app import app
+
+        client = app.test_client()
+        for code in (5, None, ["print(1)"]):
+            response = client.post('/process_code', json={"code": code})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()["message"], "'code' must be a string")
+
+if __name__ == '__main__':
+    unittest.main()
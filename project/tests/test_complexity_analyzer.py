@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from transformers.complexity_analyzer import analyze_complexity
+from server.pipeline import run_sugarize
+
+SAMPLE_CODE = """def report(items):
+    seen = []
+    text = ""
+    for x in items:
+        if x not in seen:
+            seen.append(x)
+        for y in items:
+            pass
+        seen.remove(x)
+        ordered = sorted(seen)
+        text += str(x)
+        if x in (1, 2):
+            pass
+    return text
+"""
+
+class TestComplexityAnalyzer(unittest.TestCase):
+
+    def test_quadratic_patterns_are_flagged(self):
+        """Each super-linear pattern is reported once with its complexity and loop path."""
+        findings = {finding["pattern"]: finding for finding in analyze_complexity(SAMPLE_CODE)}
+        self.assertEqual(set(findings), {
+            "list_membership_in_loop", "nested_same_collection", "linear_method_in_loop",
+            "sort_in_loop", "string_concatenation_in_loop",
+        })
+        self.assertEqual(findings["list_membership_in_loop"]["complexity"], "O(n^2)")
+        self.assertEqual(findings["sort_in_loop"]["complexity"], "O(n^2 log n)")
+        self.assertEqual(
+            [loop["loop"] for loop in findings["nested_same_collection"]["loop_path"]],
+            ["for x in items", "for y in items"]
+        )
+
+    def test_linear_code_is_not_flagged(self):
+        """Set lookups, nested function bodies and single loops are left alone."""
+        code = (
+            "seen = set()\n"
+            "for x in items:\n"
+            "    if x in seen:\n"
+            "        seen.remove(x)\n"
+            "    def key(value):\n"
+            "        return sorted(value)\n"
+        )
+        self.assertEqual(analyze_complexity(code), [])
+
+    def test_sugarize_reports_hotspots_on_request(self):
+        """A sugarize response lists hotspots next to the explanations only when asked for."""
+        payload, status = run_sugarize(SAMPLE_CODE, hotspots=True)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(payload["hotspots"]), 5)
+        self.assertNotIn("hotspots", run_sugarize(SAMPLE_CODE)[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+import ast
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.cost_model import transformation_cost, infer_container_kinds
+from transformers.sugar_transformer import transform_code
+
+def _statements(code):
+    return ast.parse(code).body
+
+class TestCostModel(unittest.TestCase):
+
+    def test_membership_against_set_is_cheaper(self):
+        """Looking items up in a set instead of a list drops a factor of n."""
+        kinds = infer_container_kinds(_statements("seen = []\nunique = set()"))
+        cost = transformation_cost(
+            _statements("for x in items:\n    if x in seen:\n        found.append(x)"),
+            _statements("for x in items:\n    if x in unique:\n        found.append(x)"),
+            kinds
+        )
+        self.assertEqual(cost["complexity_before"], "O(n^2)")
+        self.assertEqual(cost["complexity_after"], "O(n)")
+        self.assertGreater(cost["impact"], 0)
+
+    def test_sum_moves_the_loop_out_of_bytecode(self):
+        """sum() replaces interpreted loop iterations with a C loop."""
+        cost = transformation_cost(
+            _statements("total = 0\nfor x in items:\n    total += x"),
+            _statements("total = sum(items)")
+        )
+        self.assertGreater(cost["loop_instructions_before"], 0)
+        self.assertEqual(cost["loop_instructions_after"], 0)
+        self.assertGreater(cost["impact"], 0)
+
+    def test_generator_avoids_intermediate_list(self):
+        """A generator argument does not materialize a temporary list."""
+        cost = transformation_cost(
+            _statements("total = sum([x * 2 for x in items])"),
+            _statements("total = sum((x * 2 for x in items))")
+        )
+        self.assertEqual(cost["intermediate_allocations_before"], 1)
+        self.assertEqual(cost["intermediate_allocations_after"], 0)
+
+    def test_transformations_carry_cost(self):
+        """Each applied transformation reports its estimated cost."""
+        code = "result = []\nfor x in items:\n    result.append(x * 2)\n"
+        _, transformations = transform_code(code, estimate_cost=True)
+        self.assertIsNone(transform_code(code)[1][0]["cost"])
+        self.assertEqual(transformations[0]["type"], "list_comprehension")
+        self.assertIn("impact", transformations[0]["cost"])
+        self.assertEqual(transformations[0]["cost"]["allocations_after"], 1)
+
+    def test_edits_requests_attach_costs_on_request(self):
+        """An HTTP edits request gets costs only when it sends "costs": true."""
+        from app import app
+
+        code = "result = []\nfor x in items:\n    result.append(x * 2)\n"
+        client = app.test_client()
+        for costs in (False, True):
+            response = client.post('/process_code', json={"code": code, "edits": True, "costs": costs})
+            self.assertEqual(response.status_code, 200)
+            cost = response.get_json()["transformations"][0]["cost"]
+            self.assertEqual(cost is not None, costs)
+
+if __name__ == '__main__':
+    unittest.main()
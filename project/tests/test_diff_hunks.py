@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.diff_hunks import parse_unified_diff
+from utils.text_edits import compute_text_edits
+from server.pipeline import run_operation
+
+SAMPLE_CODE = """def double(items):
+    result = []
+    for x in items:
+        result.append(x * 2)
+    return result
+
+def increment(items):
+    out = []
+    for y in items:
+        out.append(y + 2)
+    return out
+"""
+
+SAMPLE_DIFF = """diff --git a/sample.py b/sample.py
+--- a/sample.py
++++ b/sample.py
+@@ -10 +10 @@ def increment(items):
+-        out.append(y + 1)
++        out.append(y + 2)
+"""
+
+
+class TestDiffHunks(unittest.TestCase):
+
+    def test_hunks_follow_the_new_side(self):
+        """Added lines become ranges, deletions mark the following line, deleted files are left out."""
+        diff = """--- a/one.py
++++ b/one.py
+@@ -1,3 +1,4 @@
+ import os
+--- removed line that looks like a header
++added = 1
++added = 2
+ x = 1
+@@ -20,2 +21,0 @@
+-gone = 1
+-gone = 2
+--- a/two.py
++++ /dev/null
+@@ -1 +0,0 @@
+-print(1)
+"""
+        self.assertEqual(parse_unified_diff(diff), {"one.py": [(2, 3), (22, 22)]})
+        self.assertEqual(parse_unified_diff(SAMPLE_DIFF), {"sample.py": [(10, 10)]})
+
+    def test_only_statements_overlapping_hunks_are_matched(self):
+        """A change inside one loop's body suggests a rewrite of that loop and nothing else."""
+        edits, transformations = compute_text_edits(SAMPLE_CODE, hunks=[(10, 10)])
+        self.assertEqual(len(edits), 1)
+        self.assertEqual(edits[0]["range"]["start"]["line"], 7)
+        self.assertIn("for y in items", edits[0]["newText"])
+        self.assertEqual(len(transformations), 1)
+        self.assertEqual(compute_text_edits(SAMPLE_CODE, hunks=[]), ([], []))
+        self.assertEqual(compute_text_edits(SAMPLE_CODE, hunks=[(6, 6)])[0], [])
+
+    def test_diff_requests_return_scoped_edits(self):
+        """A sugarize request with a diff answers with edits for the touched statements only."""
+        payload, status = run_operation(SAMPLE_CODE, 'sugarize', {"diff": SAMPLE_DIFF})
+        self.assertEqual(status, 200)
+        self.assertEqual([edit["range"]["start"]["line"] for edit in payload["edits"]], [7])
+
+        two_files = SAMPLE_DIFF + SAMPLE_DIFF.replace("sample.py", "other.py")
+        self.assertEqual(run_operation(SAMPLE_CODE, 'sugarize', {"diff": two_files})[1], 400)
+        payload, status = run_operation(SAMPLE_CODE, 'sugarize', {"diff": two_files, "filename": "src/sample.py"})
+        self.assertEqual((status, len(payload["edits"])), (200, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import os
+from unittest import mock
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server import etag
+from server.etag import result_key, result_etag, rule_etag, representation_tag
+from server.result_cache import ResultCache
+
+SAMPLE_CODE = """result = []
+for x in items:
+    result.append(x * 2)
+"""
+
+class TestEtag(unittest.TestCase):
+
+    def test_key_follows_input_operation_options_and_rulebook(self):
+        """Any input that can change the result changes the key; the code field itself is not an option."""
+        key = result_key(SAMPLE_CODE, 'sugarize', {"code": SAMPLE_CODE, "lean": True})
+        self.assertEqual(key, result_key(SAMPLE_CODE, 'sugarize', {"lean": True}))
+        self.assertNotEqual(key, result_key(SAMPLE_CODE, 'sugarize', {}))
+        self.assertNotEqual(key, result_key(SAMPLE_CODE, 'desugarize', {"lean": True}))
+        self.assertNotEqual(key, result_key(SAMPLE_CODE.replace("2", "3"), 'sugarize', {"lean": True}))
+        with mock.patch.object(etag, 'rulebook_version', return_value="changed"):
+            self.assertNotEqual(key, result_key(SAMPLE_CODE, 'sugarize', {"lean": True}))
+        # Editing the pipeline's code changes every key without a hand-bumped format number
+        with mock.patch.object(etag, 'code_fingerprint', return_value="edited"):
+            self.assertNotEqual(key, result_key(SAMPLE_CODE, 'sugarize', {"lean": True}))
+
+    def test_unreproducible_responses_get_no_key(self):
+        """Deadline tiers, background tokens, streamed explanations and timings are never validated."""
+        for option in ("tier", "background", "stream_explanations", "measure"):
+            self.assertIsNone(result_key(SAMPLE_CODE, 'sugarize', {option: "fast" if option == "tier" else True}))
+
+    def test_representation_is_part_of_the_tag(self):
+        """JSON, MessagePack and gzip variants of one result carry different strong ETags."""
+        key = result_key(SAMPLE_CODE)
+        tags = {result_etag(key, representation_tag(msgpack, gzip)) for msgpack in (False, True) for gzip in (False, True)}
+        self.assertEqual(len(tags), 4)
+        self.assertNotEqual(rule_etag("list_comprehension", "json"), rule_etag("set_comprehension", "json"))
+
+        cache = ResultCache(max_entries=1)
+        cache.put(key, {"sugared_code": "x"}, 200)
+        cache.put("failed", {"status": "error"}, 500)
+        self.assertEqual(cache.get(key), ({"sugared_code": "x"}, 200))
+        self.assertIsNone(cache.get("failed"))
+        self.assertEqual(cache.stats, {"hits": 1, "shared_hits": 0, "misses": 1})
+
+if __name__ == '__main__':
+    unittest.main()
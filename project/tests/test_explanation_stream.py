@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.explanations import (ExplanationCache, ExplanationStreams, resolve_explanation,
+                                 explanation_streams, event_stream)
+from server.pipeline import run_sugarize
+from server.shared_state import SharedState
+from rules.rule_index import get_rule_explanation
+
+SAMPLE_CODE = """result = []
+for x in items:
+    if x > 0:
+        result.append(x * 2)
+"""
+
+class TestExplanationStream(unittest.TestCase):
+
+    def test_transform_answers_before_explanations(self):
+        """The transformed code and validation come back with a stream id instead of explanations."""
+        payload, status = run_sugarize(SAMPLE_CODE, stream_explanations=True)
+        self.assertEqual(status, 200)
+        inline, _ = run_sugarize(SAMPLE_CODE)
+        self.assertEqual(payload["sugared_code"], inline["sugared_code"])
+        self.assertEqual(payload["validation"], inline["validation"])
+        self.assertEqual(payload["explanations"], [])
+
+        stream = explanation_streams.get(payload["explanation_stream"])
+        events = list(event_stream(stream))
+        self.assertTrue(events[-1].startswith(f"id: {len(events)}\nevent: done\n"))
+        # Same explanations as the inline response, delivered as they resolve
+        self.assertEqual(len(events), len(inline["explanations"]) + 1)
+        self.assertIn('"transformation_type": "ternary_operator"', "".join(events))
+
+    def test_slow_model_does_not_block_and_is_cached(self):
+        """Explanations arrive as the model resolves them; a second request for the rule hits the cache."""
+        release = threading.Event()
+        calls = []
+
+        def model(rule_ref):
+            calls.append(rule_ref)
+            release.wait(10)
+            return f"Model text for {rule_ref}"
+
+        streams = ExplanationStreams(model=model)
+        stream = streams.get(streams.submit([{"type": "list_comprehension", "rule_ref": "list_comprehension"}]))
+        self.assertEqual(stream.wait_for_events(0, timeout=0.05), ([], False))
+
+        pushed = []
+        stream.listen(pushed.append)
+        release.set()
+        events, done = stream.wait_for_events(1, timeout=10)
+        self.assertTrue(done)
+        self.assertEqual([event["event"] for event in pushed], ["explanation", "done"])
+        self.assertEqual(pushed[0]["data"]["source"], "model")
+
+        cache = ExplanationCache()
+        cache.put("list_comprehension", "Cached text")
+        self.assertEqual(resolve_explanation("list_comprehension", cache, model), ("Cached text", "cache"))
+        self.assertEqual(calls, ["list_comprehension"])
+
+    def test_rulebook_fallback_without_model(self):
+        """Without a model (or when it fails) the rulebook explanation is used."""
+        def failing_model(rule_ref):
+            raise RuntimeError("no network")
+
+        explanation, source = resolve_explanation("set_comprehension", ExplanationCache(), failing_model)
+        self.assertEqual(source, "rulebook")
+        self.assertEqual(explanation, get_rule_explanation("set_comprehension"))
+
+    def test_streams_are_shared_and_always_finish(self):
+        """Ids are random, another worker can follow the stream, and a bad transform still ends in done."""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        path = os.path.join(tmp, 'results.sqlite3')
+        resolving = ExplanationStreams(model=lambda rule_ref: None, shared=SharedState(path))
+        other_worker = ExplanationStreams(shared=SharedState(path))
+
+        stream_id = resolving.submit([{"rule_ref": "list_comprehension"}, "not a transform"])
+        self.assertGreater(len(stream_id), len("explain-") + 16)
+        self.assertIsNone(other_worker.get("explain-1"))
+        events = list(event_stream(other_worker.get(stream_id), heartbeat=0.05))
+        self.assertEqual([event.split("\n")[1] for event in events if event.startswith("id:")],
+                         ["event: explanation", "event: explanation", "event: done"])
+        self.assertIn('"source": "error"', "".join(events))
+
+if __name__ == '__main__':
+    unittest.main()
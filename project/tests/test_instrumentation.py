@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+import subprocess
+import tempfile
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from transformers.instrumentation_transformer import instrument_code, run_instrumented
+
+SAMPLE_CODE = """def pairs(n):
+    total = 0
+    for i in range(n):
+        for j in range(i):
+            if j == 5:
+                break
+            total += j
+    return total
+
+def countdown(n):
+    while n:
+        yield n
+        n -= 1
+
+result = pairs(10)
+squares = [x * x for x in range(30) if x % 2]
+steps = list(countdown(4))
+"""
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_counts_map_to_original_lines(self):
+        """Each loop and comprehension reports its iteration count on its original line."""
+        report, error = run_instrumented(SAMPLE_CODE)
+        self.assertIsNone(error)
+        by_line = {entry["line"]: entry for entry in report}
+
+        self.assertEqual(by_line[3]["hits"], 10)
+        # Inner loop: 0+1+2+3+4+5 iterations, then six more that break at j == 5
+        self.assertEqual(by_line[4]["hits"], sum(min(i, 6) for i in range(10)))
+        self.assertEqual(by_line[16]["kind"], "listcomp")
+        self.assertEqual(by_line[16]["hits"], 30)
+        self.assertGreater(by_line[3]["total_ns"], 0)
+
+        # A loop that yields would time its consumer too, so it is only counted
+        self.assertEqual(by_line[11]["hits"], 4)
+        self.assertIsNone(by_line[11]["total_ns"])
+
+    def test_instrumented_code_keeps_behavior(self):
+        """Instrumented code computes the same results as the original."""
+        instrumented, metadata = instrument_code(SAMPLE_CODE)
+        original, rewritten = {}, {}
+        exec(SAMPLE_CODE, original)
+        exec(instrumented, rewritten)
+        for name in ('result', 'squares', 'steps'):
+            self.assertEqual(rewritten[name], original[name])
+        self.assertEqual(len(rewritten[metadata["hits"]]), len(metadata["sites"]))
+
+    def test_failure_still_reports(self):
+        """Counters collected before an exception are still reported."""
+        report, error = run_instrumented("for i in range(3):\n    pass\nraise ValueError('boom')\n")
+        self.assertIsInstance(error, ValueError)
+        self.assertEqual(report[0]["hits"], 3)
+
+    def test_sites_quote_their_own_source_line(self):
+        """A form feed inside a line does not shift the source quoted for later loops."""
+        report, error = run_instrumented("note = 'a\x0cb'\nfor i in range(2):\n    pass\n")
+        self.assertIsNone(error)
+        self.assertEqual((report[0]["line"], report[0]["source"]), (2, "for i in range(2):"))
+
+    def test_cli_runs_the_script_with_its_directory_importable(self):
+        """`cli.py instrument` imports the script's sibling modules like `python script.py` does."""
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'helper.py'), 'w', encoding='utf-8') as f:
+                f.write("VALUES = [1, 2, 3]\n")
+            script = os.path.join(directory, 'script.py')
+            with open(script, 'w', encoding='utf-8') as f:
+                f.write("from helper import VALUES\nfor v in VALUES:\n    pass\n")
+            cli = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cli.py')
+            completed = subprocess.run([sys.executable, cli, 'instrument', script], capture_output=True, text=True,
+                                       cwd=tempfile.gettempdir(), timeout=60)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        self.assertIn("for v in VALUES:", completed.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+import sys
+import os
+import io
+import shutil
+import tarfile
+import tempfile
+import threading
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.jobs import MAX_WORKER_ATTEMPTS, JobManager, submit_job, get_job, get_job_results, process_file
+
+LOOP_CODE = """result = []
+for x in items:
+    result.append(x * 2)
+"""
+
+PLAIN_CODE = "print('hello')\n"
+
+
+class TestJobs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.repo = os.path.join(self.tmp, 'repo')
+        os.makedirs(os.path.join(self.repo, 'pkg'))
+        os.makedirs(os.path.join(self.repo, '.git'))
+        for path, code in (('a.py', LOOP_CODE), ('pkg/b.py', PLAIN_CODE), ('pkg/c.py', LOOP_CODE),
+                           ('.git/d.py', LOOP_CODE), ('notes.txt', LOOP_CODE)):
+            with open(os.path.join(self.repo, *path.split('/')), 'w') as f:
+                f.write(code)
+        self.jobs_dir = os.path.join(self.tmp, 'jobs')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_local_path_job_pages_through_results(self):
+        """A local path job transforms every Python file; results are paged in completion order."""
+        manager = JobManager(self.jobs_dir, workers=0, roots=[self.repo])
+        self.assertEqual(submit_job({'path': self.tmp}, manager=manager)[1], 403)
+        payload, status = submit_job({'path': self.repo}, manager=manager)
+        self.assertEqual((status, payload['total']), (202, 3))
+        job_id = payload['job_id']
+        # Submitting started the runner in this process
+        for _ in range(1000):
+            progress, _ = get_job(job_id, manager=manager)
+            if progress['status'] == 'done':
+                break
+            threading.Event().wait(0.01)
+        manager.stop()
+
+        self.assertEqual((progress['status'], progress['done'], progress['transformed'], progress['unchanged']),
+                         ('done', 3, 2, 1))
+        first, _ = get_job_results(job_id, 0, 2, manager=manager)
+        second, _ = get_job_results(job_id, first['next_cursor'], 2, manager=manager)
+        self.assertFalse(first['complete'])
+        self.assertTrue(second['complete'])
+        results = {entry['path']: entry for entry in first['results'] + second['results']}
+        self.assertEqual(sorted(results), ['a.py', 'pkg/b.py', 'pkg/c.py'])
+        self.assertIn('[', results['a.py']['result']['sugared_code'])
+        self.assertNotIn('result', results['pkg/b.py'])
+
+    def test_archive_upload_keeps_only_safe_python_files(self):
+        """Tarball members outside the job directory, links and non-Python files are ignored."""
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+            for name, code in (('src/a.py', LOOP_CODE), ('../evil.py', LOOP_CODE), ('README', 'x')):
+                data = code.encode('utf-8')
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+            link = tarfile.TarInfo('link.py')
+            link.type = tarfile.SYMTYPE
+            link.linkname = '/etc/passwd'
+            archive.addfile(link)
+        buffer.seek(0)
+
+        manager = JobManager(self.jobs_dir, workers=0, roots=[])
+        payload, status = submit_job({}, archive=buffer, manager=manager)
+        manager.stop()
+        self.assertEqual((status, payload['total']), (202, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp, 'evil.py')))
+        self.assertEqual(submit_job({}, archive=io.BytesIO(b"not a tar"), manager=manager)[1], 400)
+        self.assertEqual(submit_job({'tier': 'fast'}, archive=buffer, manager=manager)[1], 400)
+
+    def test_restart_resumes_pending_files(self):
+        """Finished files are checkpointed; a new manager on the same directory only runs the rest."""
+        calls = []
+
+        def processor(root, path, operation, options):
+            calls.append(path)
+            return process_file(root, path, operation, options)
+
+        first = JobManager(self.jobs_dir, workers=0, roots=[self.repo], processor=processor)
+        job_id = first.submit_path(self.repo, {})
+        self.assertEqual(first.run_job(job_id, limit=1), 1)
+        self.assertEqual(first.status(job_id)['status'], 'running')
+
+        resumed = JobManager(self.jobs_dir, workers=0, roots=[self.repo], processor=processor)
+        self.assertEqual(resumed.run_job(job_id), 2)
+        # pkg/c.py has the same content as a.py and is answered from the manifest
+        self.assertEqual(calls, ['a.py', 'pkg/b.py'])
+        self.assertEqual(resumed.status(job_id)['status'], 'done')
+        self.assertTrue(resumed.cancel(job_id))
+        self.assertEqual(get_job_results(job_id, manager=resumed)[0]['results'], [])
+
+    def test_worker_failures_leave_files_pending(self):
+        """A crashed worker records nothing; only a file that keeps crashing alone is given up."""
+        failures = {'a.py': 1, 'pkg/b.py': MAX_WORKER_ATTEMPTS + 1}
+        calls = []
+
+        def processor(root, path, operation, options):
+            calls.append(path)
+            if failures.get(path, 0) > 0:
+                failures[path] -= 1
+                raise MemoryError("worker killed")
+            return process_file(root, path, operation, options)
+
+        manager = JobManager(self.jobs_dir, workers=0, roots=[self.repo], processor=processor)
+        job_id = manager.submit_path(self.repo, {})
+        # Only pkg/c.py finishes; a.py and pkg/b.py stay pending
+        self.assertEqual(manager.run_job(job_id), 1)
+        self.assertEqual(manager.status(job_id)['done'], 1)
+        # a.py succeeds on its retry, pkg/b.py crashes on its own every time
+        self.assertEqual(manager.run_job(job_id), 1)
+        for _ in range(MAX_WORKER_ATTEMPTS - 2):
+            self.assertEqual(manager.run_job(job_id), 0)
+        self.assertEqual(manager.status(job_id)['status'], 'running')
+        self.assertEqual(manager.run_job(job_id), 1)
+        self.assertEqual(manager.status(job_id)['status'], 'done')
+        results = {entry['path']: entry for entry in get_job_results(job_id, manager=manager)[0]['results']}
+        self.assertIn('[', results['a.py']['result']['sugared_code'])
+        self.assertIn('worker failed', results['pkg/b.py']['error'])
+
+        # The give-up is not a content result: a new job runs the file again
+        del calls[:]
+        second = manager.submit_path(self.repo, {})
+        self.assertEqual(manager.run_job(second), 3)
+        self.assertEqual(calls, ['pkg/b.py'])
+
+if __name__ == '__main__':
+    unittest.main()
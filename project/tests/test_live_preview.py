@@ -0,0 +1,113 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.live_preview import PreviewHub, submit_preview_edit, event_stream
+from server.pipeline import run_sugarize, Superseded
+from server.shared_state import SharedState
+from server.prefork import BLOCKING_WORKERS_ENV
+
+SAMPLE_CODE = """result = []
+for x in items:
+    result.append(x * 2)
+"""
+
+class TestLivePreview(unittest.TestCase):
+
+    def test_superseded_edit_is_abandoned_between_stages(self):
+        """A newer edit stops the running pipeline at its next checkpoint; only the newest result is published."""
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+
+        def runner(code, operation, checkpoint):
+            runs.append(code)
+            if code == "first":
+                started.set()
+                release.wait(10)
+                checkpoint()
+            return {"sugared_code": code}, 200
+
+        hub = PreviewHub(runner=runner)
+        session = hub.session("session-1")
+        self.assertTrue(session.submit(1, "first"))
+        self.assertTrue(started.wait(10))
+        self.assertTrue(session.submit(2, "second"))
+        # Queued behind the running edit and replaced before it ever starts
+        self.assertTrue(session.submit(3, "third"))
+        release.set()
+
+        result = session.wait_for_result(timeout=10)
+        self.assertEqual(result["seq"], 3)
+        self.assertEqual(result["payload"], {"sugared_code": "third"})
+        self.assertEqual(runs, ["first", "third"])
+        self.assertEqual(session.stats["abandoned"], 1)
+        self.assertEqual(session.stats["skipped"], 1)
+
+    def test_stale_sequence_numbers_are_dropped(self):
+        """Edits at or below the newest sequence number and malformed edits are refused."""
+        hub = PreviewHub(runner=lambda code, operation, checkpoint: ({"code": code}, 200))
+        payload, status = submit_preview_edit("session-2", {"seq": 5, "code": SAMPLE_CODE}, hub)
+        self.assertEqual((payload, status), ({"seq": 5, "accepted": True}, 202))
+        payload, status = submit_preview_edit("session-2", {"seq": 4, "code": SAMPLE_CODE}, hub)
+        self.assertEqual((payload, status), ({"seq": 4, "accepted": False}, 202))
+
+        self.assertEqual(submit_preview_edit("session-2", {"seq": "6"}, hub)[1], 400)
+        self.assertEqual(submit_preview_edit("session-2", {"seq": 6, "operation": "explain"}, hub)[1], 400)
+        self.assertEqual(submit_preview_edit("../etc", {"seq": 6}, hub)[1], 400)
+
+        events = event_stream(hub.session("session-2"))
+        self.assertEqual(next(events), "retry: 1000\n\n")
+        self.assertTrue(next(events).startswith("id: 5\nevent: result\n"))
+
+    def test_pipeline_checkpoint_propagates_superseded(self):
+        """run_sugarize calls the checkpoint between stages and does not turn Superseded into an error payload."""
+        calls = []
+        payload, status = run_sugarize(SAMPLE_CODE, checkpoint=lambda: calls.append(1))
+        self.assertEqual(status, 200)
+        self.assertGreaterEqual(len(calls), 3)
+
+        def cancel():
+            raise Superseded(1)
+        with self.assertRaises(Superseded):
+            run_sugarize(SAMPLE_CODE, checkpoint=cancel)
+
+    def test_sessions_are_shared_between_workers(self):
+        """An edit on one worker supersedes a run on another, whose stream then sees the newer result."""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        path = os.path.join(tmp, 'results.sqlite3')
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_runner(code, operation, checkpoint):
+            started.set()
+            release.wait(10)
+            checkpoint()
+            return {"sugared_code": code}, 200
+
+        first_worker = PreviewHub(runner=slow_runner, shared=SharedState(path))
+        second_worker = PreviewHub(runner=lambda code, operation, checkpoint: ({"sugared_code": code}, 200),
+                                   shared=SharedState(path))
+        self.assertTrue(first_worker.session("session-3").submit(1, "first"))
+        self.assertTrue(started.wait(10))
+        self.assertTrue(second_worker.session("session-3").submit(2, "second"))
+        self.assertFalse(first_worker.session("session-3").submit(2, "again"))
+
+        result = first_worker.session("session-3").wait_for_result(timeout=10)
+        self.assertEqual((result["seq"], result["payload"]), (2, {"sugared_code": "second"}))
+        release.set()
+
+        from app import app
+        os.environ[BLOCKING_WORKERS_ENV] = '1'
+        self.addCleanup(os.environ.pop, BLOCKING_WORKERS_ENV, None)
+        self.assertEqual(app.test_client().get('/preview/session-3/events').status_code, 503)
+
+if __name__ == '__main__':
+    unittest.main()
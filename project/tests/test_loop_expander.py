@@ -0,0 +1,79 @@
+import unittest
+import ast
+import sys
+import os
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from transformers.loop_expander import expand_comprehensions
+from server.pipeline import run_operation
+
+SAMPLE_CODE = """
+data = [3, 1, 2, 3]
+x = 'outer'
+squares = [x * x for x in data if x > 1]
+pairs = {k: v for k, v in zip('abc', data)}
+parity = {x % 2 for x in data}
+grid = [[y * x for y in range(x)] for x in data]
+total = sum(x for x in data)
+
+class Config:
+    base = [1, 2]
+    doubled = [b * 2 for b in base]
+
+def pairs_below(n):
+    return [(a, b) for a in range(n) for b in range(a) if (a + b) % 2]
+
+odd_pairs = pairs_below(5)
+"""
+
+def _run(code):
+    namespace = {}
+    exec(code, namespace)
+    return namespace
+
+class TestLoopExpander(unittest.TestCase):
+
+    def test_expanded_code_is_equivalent(self):
+        """Expanded loops compute the same values without leaking loop variables."""
+        expanded, expansions = expand_comprehensions(SAMPLE_CODE)
+        tree = ast.parse(expanded)
+        self.assertFalse(any(isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp))
+                             for node in ast.walk(tree)))
+        self.assertEqual(len(expansions), 8)
+
+        original = _run(SAMPLE_CODE)
+        result = _run(expanded)
+        for name in ('squares', 'pairs', 'parity', 'grid', 'total', 'odd_pairs', 'x'):
+            self.assertEqual(result[name], original[name], name)
+        self.assertEqual(result['Config'].doubled, [2, 4])
+
+        # Helpers are removed from module and class namespaces again
+        self.assertFalse([name for name in result if name.startswith('_') and not name.startswith('__')])
+        self.assertFalse([name for name in vars(result['Config']) if name.startswith('_listcomp')])
+
+    def test_temporary_names_avoid_user_names(self):
+        """Generated names never shadow names from the original code."""
+        code = "_result = 5\n_iterable = 6\nvalues = [i + _result for i in range(_iterable)]\n"
+        expanded, _ = expand_comprehensions(code)
+        self.assertEqual(_run(expanded)['values'], _run(code)['values'])
+
+    def test_generator_stays_lazy(self):
+        """Generator expressions become generator functions, not eager lists."""
+        code = "seen = []\ngen = (seen.append(i) or i for i in range(3))\nfirst = next(gen)\n"
+        result = _run(expand_comprehensions(code)[0])
+        self.assertEqual(result['seen'], [0])
+
+    def test_profile_mode_through_pipeline(self):
+        """The desugarize operation accepts mode 'profile' and validates the output."""
+        payload, status = run_operation(SAMPLE_CODE, 'desugarize', {'mode': 'profile'})
+        self.assertEqual(status, 200)
+        self.assertTrue(payload['validation']['is_valid'])
+        self.assertEqual(payload['expansions'][0]['function'], '_listcomp_4')
+
+        _, status = run_operation(SAMPLE_CODE, 'desugarize', {'mode': 'fastest'})
+        self.assertEqual(status, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import contextlib
+import io
+import json
+import sys
+import os
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.lsp_server import LanguageServer, Document, CONTENT_MODIFIED
+
+URI = 'file:///sample.py'
+
+def _frame(message):
+    body = json.dumps(message).encode('utf-8')
+    return f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body
+
+def _unframe(data):
+    messages = []
+    while data:
+        header, _, rest = data.partition(b'\r\n\r\n')
+        length = int(header.split(b':')[1])
+        messages.append(json.loads(rest[:length]))
+        data = rest[length:]
+    return messages
+
+class TestLanguageServer(unittest.TestCase):
+
+    def _run(self, messages):
+        reader = io.BytesIO(b''.join(_frame(message) for message in messages))
+        writer = io.BytesIO()
+        server = LanguageServer(reader, writer, debounce=0.01)
+        exit_code = server.serve()
+        return exit_code, {m.get("id"): m for m in _unframe(writer.getvalue()) if "id" in m}
+
+    def test_code_actions_after_incremental_change(self):
+        """Code actions reflect incremental edits and cover only the requested range."""
+        text = "x = 1\nresult = []\nfor v in values:\n    result.append(v)\n"
+        exit_code, responses = self._run([
+            {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+            {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+            {"jsonrpc": "2.0", "method": "textDocument/didOpen", "params": {
+                "textDocument": {"uri": URI, "languageId": "python", "version": 1, "text": text}}},
+            # Rename 'values' to 'items' on line 2
+            {"jsonrpc": "2.0", "method": "textDocument/didChange", "params": {
+                "textDocument": {"uri": URI, "version": 2},
+                "contentChanges": [{"range": {"start": {"line": 2, "character": 9},
+                                              "end": {"line": 2, "character": 15}}, "text": "items"}]}},
+            {"jsonrpc": "2.0", "id": 2, "method": "textDocument/codeAction", "params": {
+                "textDocument": {"uri": URI},
+                "range": {"start": {"line": 2, "character": 0}, "end": {"line": 2, "character": 0}},
+                "context": {"diagnostics": []}}},
+            {"jsonrpc": "2.0", "id": 3, "method": "textDocument/codeAction", "params": {
+                "textDocument": {"uri": URI},
+                "range": {"start": {"line": 0, "character": 0}, "end": {"line": 0, "character": 0}},
+                "context": {"diagnostics": []}}},
+            {"jsonrpc": "2.0", "id": 4, "method": "shutdown"},
+            {"jsonrpc": "2.0", "method": "exit"},
+        ])
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(responses[1]["result"]["capabilities"]["textDocumentSync"]["change"], 2)
+
+        actions = responses[2]["result"]
+        self.assertEqual(len(actions), 1)
+        self.assertEqual(actions[0]["data"]["rule"], "list_comprehension")
+        edit = actions[0]["edit"]["changes"][URI][0]
+        self.assertEqual(edit["newText"], "result = [v for v in items]")
+        self.assertEqual(edit["range"]["start"], {"line": 1, "character": 0})
+
+        self.assertEqual(responses[3]["result"], [])
+
+    def test_stale_request_is_not_answered_with_old_results(self):
+        """A request queued for an outdated version gets ContentModified."""
+        server = LanguageServer(io.BytesIO(), io.BytesIO())
+        server.documents[URI] = Document(URI, "x = 1\n", 1)
+        version = server._document_version({"params": {"textDocument": {"uri": URI}}})
+        server.documents[URI].update([{"text": "x = 2\n"}], 2)
+
+        server._handle_request({"id": 7, "method": "textDocument/codeAction", "params": {}}, version)
+        response = _unframe(server.writer.getvalue())[0]
+        self.assertEqual(response["error"]["code"], CONTENT_MODIFIED)
+
+    def test_analysis_publishes_diagnostics_and_reuses_unchanged_statements(self):
+        """Diagnostics follow edits, and only changed statements are re-analyzed."""
+        text = "result = []\nfor v in values:\n    result.append(v)\n\ndef f(x):\n    if x:\n        y = 1\n    else:\n        y = 2\n"
+        server = LanguageServer(io.BytesIO(), io.BytesIO())
+        document = server.documents[URI] = Document(URI, text, 1)
+        server.analyze(URI)
+        published = _unframe(server.writer.getvalue())[-1]
+        self.assertEqual(published["method"], "textDocument/publishDiagnostics")
+        self.assertEqual(published["params"]["version"], 1)
+        diagnostics = published["params"]["diagnostics"]
+        self.assertEqual([d["code"] for d in diagnostics], ["list_comprehension", "ternary_operator"])
+        self.assertEqual(diagnostics[0]["range"]["start"], {"line": 1, "character": 0})
+        self.assertEqual(diagnostics[1]["range"]["start"], {"line": 5, "character": 4})
+
+        cached_function = [v for k, v in document._candidate_cache.items() if k[2].startswith('def f')][0]
+        # Insert a line at the top: the function's results are reused but shifted
+        document.update([{"range": {"start": {"line": 0, "character": 0}, "end": {"line": 0, "character": 0}},
+                          "text": "import os\n"}], 2)
+        server.analyze(URI)
+        diagnostics = _unframe(server.writer.getvalue())[-1]["params"]["diagnostics"]
+        self.assertEqual(diagnostics[1]["range"]["start"], {"line": 6, "character": 4})
+        self.assertIs([v for k, v in document._candidate_cache.items() if k[2].startswith('def f')][0],
+                      cached_function)
+
+        server.did_close({"textDocument": {"uri": URI}})
+        self.assertEqual(_unframe(server.writer.getvalue())[-1]["params"]["diagnostics"], [])
+
+    def test_rules_without_a_rewrite_are_not_reported(self):
+        """A flag-and-break search loop has no code action, so it gets no diagnostic."""
+        text = "found = False\nfor x in items:\n    if x == t:\n        found = True\n        break\n"
+        server = LanguageServer(io.BytesIO(), io.BytesIO())
+        server.documents[URI] = Document(URI, text, 1)
+        server.analyze(URI)
+        self.assertEqual(_unframe(server.writer.getvalue())[-1]["params"]["diagnostics"], [])
+
+    def test_malformed_input_is_logged_and_serving_continues(self):
+        """A bad Content-Length, a failing notification and an object id do not stop the server."""
+        reader = io.BytesIO(b"Content-Length: twelve\r\n\r\n" + b"".join(_frame(message) for message in [
+            {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+            {"jsonrpc": "2.0", "method": "textDocument/didChange", "params": {"textDocument": []}},
+            {"jsonrpc": "2.0", "id": {"nested": 1}, "method": "shutdown"},
+            {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+            {"jsonrpc": "2.0", "method": "exit"},
+        ]))
+        writer = io.BytesIO()
+        log = io.StringIO()
+        with contextlib.redirect_stderr(log):
+            LanguageServer(reader, writer, debounce=0.01).serve()
+        responses = {m.get("id"): m for m in _unframe(writer.getvalue()) if "id" in m}
+        self.assertEqual(sorted(responses, key=str), [1, 2, None])
+        self.assertEqual(responses[None]["error"]["code"], -32600)
+        self.assertIn("Content-Length", log.getvalue())
+        self.assertIn("textDocument/didChange failed", log.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import ast
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.prefilter import Prefilter, get_prefilter
+from utils.text_edits import compute_text_edits
+from rules.rule_index import TRANSFORMATION_ANCHORS, TRANSFORMATION_RULE_REFS
+
+SAMPLE_CODE = """import os
+
+CONFIG = {"debug": False}
+
+def clean(value):
+    return value.strip()
+
+def build(items):
+    result = []
+    for x in items:
+        result.append(x * 2)
+    return result
+"""
+
+class TestPrefilter(unittest.TestCase):
+
+    def test_every_registered_rule_has_anchors(self):
+        """The prefilter can rule out every transformation in the registry."""
+        self.assertEqual(set(TRANSFORMATION_ANCHORS), set(TRANSFORMATION_RULE_REFS))
+        self.assertFalse(get_prefilter().unfiltered)
+
+    def test_files_without_anchors_are_not_parsed(self):
+        """Source no rule could match is skipped before ast.parse."""
+        prefilter = get_prefilter()
+        broken = "def clean(value:\n    return value.strip()\n"
+        self.assertFalse(prefilter.may_match(broken))
+        self.assertFalse(prefilter.may_match(broken.encode('utf-8')))
+        self.assertEqual(compute_text_edits(broken, prefilter=prefilter), ([], []))
+        with self.assertRaises(SyntaxError):
+            compute_text_edits(broken)
+
+    def test_only_candidate_blocks_are_visited(self):
+        """Top-level statements without anchors are skipped without changing the edits."""
+        prefilter = Prefilter(["list_comprehension"])
+        tree = ast.parse(SAMPLE_CODE)
+        may_contain_candidate = prefilter.block_filter(SAMPLE_CODE)
+        self.assertEqual([may_contain_candidate(stmt) for stmt in tree.body], [False, False, False, True])
+
+        filtered, _ = compute_text_edits(SAMPLE_CODE, prefilter=prefilter)
+        unfiltered, _ = compute_text_edits(SAMPLE_CODE)
+        self.assertEqual(filtered, unfiltered)
+        self.assertEqual(filtered[0]["rule"], "list_comprehension")
+
+if __name__ == '__main__':
+    unittest.main()
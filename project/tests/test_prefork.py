@@ -0,0 +1,108 @@
+import unittest
+import json
+import subprocess
+import sys
+import os
+import signal
+import time
+import urllib.request
+from unittest import mock
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server import prefork
+from server.prefork import BLOCKING_WORKERS_ENV, create_listen_socket, has_reuse_port
+from utils.startup_profile import PROJECT_DIR
+
+class TestPreforkServer(unittest.TestCase):
+
+    @unittest.skipUnless(has_reuse_port(), "SO_REUSEPORT not available")
+    def test_reuse_port_allows_shared_binding(self):
+        """Two listening sockets can share one port with SO_REUSEPORT."""
+        first = create_listen_socket('127.0.0.1', 0)
+        port = first.getsockname()[1]
+        second = create_listen_socket('127.0.0.1', port)
+        self.assertEqual(second.getsockname()[1], port)
+        first.close()
+        second.close()
+
+    def _start_server(self, workers):
+        probe = create_listen_socket('127.0.0.1', 0, reuse_port=False)
+        port = probe.getsockname()[1]
+        probe.close()
+
+        process = subprocess.Popen(
+            [sys.executable, 'cli.py', 'serve', '--workers', str(workers), '--port', str(port)],
+            cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.addCleanup(process.wait, timeout=10)
+        self.addCleanup(process.terminate)
+        return process, port
+
+    def _sugarize(self, port, timeout=10):
+        body = json.dumps({"code": "result = []\nfor x in items:\n    result.append(x)\n"}).encode()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                request = urllib.request.Request(
+                    f"http://127.0.0.1:{port}/process_code", data=body,
+                    headers={'Content-Type': 'application/json'}
+                )
+                with urllib.request.urlopen(request, timeout=2) as response:
+                    return json.loads(response.read())
+            except OSError:
+                time.sleep(0.05)
+        return None
+
+    @staticmethod
+    def _children(pid):
+        children = set()
+        for name in os.listdir('/proc'):
+            try:
+                with open(f'/proc/{name}/stat') as f:
+                    # The parent pid follows the parenthesised command name
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except (OSError, IndexError):
+                continue
+            if name.isdigit() and int(fields[1]) == pid:
+                children.add(int(name))
+        return children
+
+    def test_single_process_fallback_honours_no_threads(self):
+        """Without fork, serve(threads=False) runs one blocking server, not a threaded one."""
+        self.addCleanup(os.environ.pop, BLOCKING_WORKERS_ENV, None)
+        with mock.patch.object(prefork, 'os', mock.Mock(wraps=os, spec=['environ'], environ=os.environ)), \
+                mock.patch.object(prefork, 'warm_up'), mock.patch('werkzeug.serving.run_simple') as run_simple:
+            prefork.serve(object(), threads=False)
+        self.assertFalse(run_simple.call_args.kwargs['threaded'])
+        self.assertEqual(os.environ.get(BLOCKING_WORKERS_ENV), '1')
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "fork not available")
+    def test_serve_command_answers_requests(self):
+        """The serve command forks workers that answer /process_code."""
+        _, port = self._start_server(workers=2)
+        result = self._sugarize(port)
+        self.assertIsNotNone(result)
+        self.assertIn('[x for x in items]', result['sugared_code'])
+
+    @unittest.skipUnless(hasattr(os, 'fork') and os.path.isdir('/proc'), "fork or /proc not available")
+    def test_crashed_worker_is_restarted(self):
+        """A worker killed by a signal is replaced, and the server keeps answering."""
+        process, port = self._start_server(workers=1)
+        self.assertIsNotNone(self._sugarize(port))
+        (worker,) = self._children(process.pid)
+        os.kill(worker, signal.SIGKILL)
+
+        deadline = time.monotonic() + 10
+        replacements = set()
+        while time.monotonic() < deadline and not replacements:
+            replacements = self._children(process.pid) - {worker}
+            time.sleep(0.05)
+        self.assertEqual(len(replacements), 1)
+        result = self._sugarize(port)
+        self.assertIsNotNone(result)
+        self.assertIn('[x for x in items]', result['sugared_code'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import base64
+import cProfile
+import marshal
+import os
+import sys
+import tempfile
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.profile_guided import load_profile, load_profile_file, profile_guided_edits, parse_pstats
+from server.pipeline import run_operation
+
+SAMPLE_CODE = """def hot(items):
+    result = []
+    for x in items:
+        result.append(x * 2)
+    return result
+
+def warm(items):
+    total = 0
+    for v in items:
+        total += v
+    return total
+
+def pick(flag):
+    if flag:
+        value = 1
+    else:
+        value = 2
+    return value
+
+def never_called(items):
+    seen = set()
+    for item in items:
+        seen.add(item)
+    return seen
+
+for _ in range(100):
+    hot(range(3000))
+warm(range(10))
+pick(True)
+"""
+
+LINE_PROFILER_REPORT = """Timer unit: 1e-06 s
+
+Total time: 0.5 s
+File: sample.py
+Function: warm at line 7
+
+Line #      Hits         Time  Per Hit   % Time  Line Contents
+==============================================================
+
+Total time: 0.01 s
+File: sample.py
+Function: hot at line 1
+"""
+
+class TestProfileGuided(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        profiler = cProfile.Profile()
+        profiler.runctx(compile(SAMPLE_CODE, 'sample.py', 'exec'), {}, {})
+        with tempfile.NamedTemporaryFile(suffix='.pstats', delete=False) as f:
+            cls.pstats_path = f.name
+        profiler.dump_stats(cls.pstats_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.unlink(cls.pstats_path)
+
+    def test_hot_functions_first_and_budget_respected(self):
+        """Performance rewrites are ordered by cumulative time and capped by the budget."""
+        profile = load_profile_file(self.pstats_path)
+        edits, hot_functions, skipped = profile_guided_edits(SAMPLE_CODE, profile, budget=1, filename='sample.py')
+        self.assertEqual(hot_functions[0]["qualname"], "hot")
+        self.assertEqual([(edit["function"], edit["rule"]) for edit in edits], [("hot", "list_comprehension")])
+        # warm's sum rewrite is over budget; the ternary is cosmetic; never_called was not profiled
+        self.assertEqual(skipped, 3)
+
+        edits, _, _ = profile_guided_edits(SAMPLE_CODE, profile, budget=10)
+        self.assertEqual([edit["function"] for edit in edits], ["hot", "warm"])
+
+    def test_line_profiler_text_report(self):
+        """line_profiler text reports rank functions by their total time."""
+        edits, hot_functions, _ = profile_guided_edits(SAMPLE_CODE, load_profile(LINE_PROFILER_REPORT))
+        self.assertEqual([f["qualname"] for f in hot_functions], ["warm", "hot"])
+        self.assertEqual(edits[0]["rule"], "sum_pattern")
+
+    def test_pipeline_accepts_base64_profile(self):
+        """The sugarize operation takes a base64 pstats profile and rejects garbage."""
+        with open(self.pstats_path, 'rb') as f:
+            encoded = base64.b64encode(f.read()).decode('ascii')
+        payload, status = run_operation(SAMPLE_CODE, 'sugarize', {'profile': encoded, 'budget': 1})
+        self.assertEqual(status, 200)
+        self.assertIn('result = [(x * 2) for x in items]', payload['sugared_code'])
+        self.assertIn('total += v', payload['sugared_code'])
+        self.assertTrue(payload['validation']['is_valid'])
+
+        _, status = run_operation(SAMPLE_CODE, 'sugarize', {'profile': 'not a profile!'})
+        self.assertEqual(status, 400)
+        # HTTP dispatches like the other transports: "profile" wins over "edits"
+        from app import app
+        response = app.test_client().post('/process_code', json={
+            "code": SAMPLE_CODE, "profile": encoded, "budget": 1, "edits": True})
+        self.assertEqual(response.get_json()['sugared_code'], payload['sugared_code'])
+        bad_key = marshal.dumps({('a', 1, 5): (1, 1, 0.1, 0.2, {})})
+        _, status = run_operation(SAMPLE_CODE, 'sugarize', {'profile': base64.b64encode(bad_key).decode('ascii')})
+        self.assertEqual(status, 400)
+
+    def test_pstats_reader_rejects_non_profile_objects(self):
+        """Only the types pstats writes are decoded; code objects and other marshal types are refused."""
+        with open(self.pstats_path, 'rb') as f:
+            self.assertTrue(parse_pstats(f.read()))
+        for data in (marshal.dumps(compile('1', 'x', 'eval')), marshal.dumps({('a', 1, 'f'): [1]}),
+                     marshal.dumps({('a', 1, 5): (1, 1, 0.1, 0.2, {})}),
+                     marshal.dumps({('a', 'one', 'f'): (1, 1, 0.1, 0.2, {})}),
+                     marshal.dumps({('a', 1, 'f'): (1, 1, 0.1, 'slow', {})}),
+                     b'(\xff\xff\xff\x7f', b'{'):
+            with self.assertRaises(ValueError):
+                parse_pstats(data)
+            with self.assertRaises(ValueError):
+                load_profile(base64.b64encode(data).decode('ascii'))
+
+if __name__ == '__main__':
+    unittest.main()
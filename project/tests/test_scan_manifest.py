@@ -0,0 +1,88 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.scan_manifest import ScanManifest, rules_fingerprint
+
+LOOP_CODE = """result = []
+for x in items:
+    result.append(x * 2)
+"""
+
+
+class TestScanManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.database = os.path.join(self.tmp, 'manifest.sqlite3')
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _write(self, name, code):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as f:
+            f.write(code)
+        return path
+
+    def _analyze(self, code):
+        self.calls.append(code)
+        return {"lines": code.count("\n")}
+
+    def test_unchanged_files_are_not_reanalyzed(self):
+        """A rescan reuses the stored hash and result; an edited file is analyzed again."""
+        path = self._write('a.py', LOOP_CODE)
+        manifest = ScanManifest(self.database, fingerprint="rules-1")
+        self.assertEqual(manifest.cached(path, "lines", self._analyze), {"lines": 3})
+
+        rescan = ScanManifest(self.database, fingerprint="rules-1")
+        self.assertEqual(rescan.cached(path, "lines", self._analyze), {"lines": 3})
+        self.assertEqual((rescan.stats["unchanged"], rescan.stats["hashed"], len(self.calls)), (1, 0, 1))
+
+        self._write('a.py', LOOP_CODE + "print(result)\n")
+        self.assertEqual(rescan.cached(path, "lines", self._analyze), {"lines": 4})
+        self.assertEqual(len(self.calls), 2)
+
+    def test_identical_files_share_one_result(self):
+        """Vendored copies are analyzed once, whatever their path."""
+        manifest = ScanManifest(self.database, fingerprint="rules-1")
+        for name in ('a.py', 'vendored_a.py'):
+            manifest.cached(self._write(name, LOOP_CODE), "lines", self._analyze)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(manifest.stats["hits"], 1)
+
+    def test_rule_changes_invalidate_results(self):
+        """Results computed with another rule set or rulebook version are recomputed and pruned."""
+        path = self._write('a.py', LOOP_CODE)
+        ScanManifest(self.database, fingerprint="rules-1").cached(path, "lines", self._analyze)
+
+        updated = ScanManifest(self.database, fingerprint="rules-2")
+        updated.cached(path, "lines", self._analyze)
+        self.assertEqual(len(self.calls), 2)
+        updated.cached(path, "other", self._analyze)
+        self.assertEqual(updated.prune(), 0)
+        self.assertEqual(ScanManifest(self.database, fingerprint="rules-3").prune(), 2)
+
+    def test_failures_and_analyzer_changes_are_not_reused(self):
+        """Failed analyses are not stored; editing the analyzer code invalidates results."""
+        path = self._write('a.py', LOOP_CODE)
+        manifest = ScanManifest(self.database, fingerprint="rules-1")
+        failing = lambda code: self.calls.append(code) or {"error": "analyzer crashed"}
+        self.assertEqual(manifest.cached(path, "lines", failing), {"error": "analyzer crashed"})
+        self.assertEqual(manifest.cached(path, "lines", self._analyze), {"lines": 3})
+        self.assertEqual(len(self.calls), 2)
+
+        with mock.patch('utils.fingerprint.code_fingerprint', return_value="code-1"):
+            before = rules_fingerprint()
+        with mock.patch('utils.fingerprint.code_fingerprint', return_value="code-2"):
+            self.assertNotEqual(rules_fingerprint(), before)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import sys
+import os
+import threading
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.admission import AdmissionController
+from server.coalescing import request_key
+
+
+class TestScheduler(unittest.TestCase):
+
+    def _acquire_in_thread(self, controller, cost, priority, admitted):
+        def run():
+            ticket = controller.acquire(cost, priority)
+            admitted.append((priority, ticket))
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def _wait_for(self, condition):
+        for _ in range(1000):
+            if condition():
+                return
+            threading.Event().wait(0.01)
+
+    def _queued(self, controller, priority):
+        return controller.metrics()["classes"][priority]["queue_depth"]
+
+    def test_interactive_work_is_dispatched_first(self):
+        """When room frees up, a waiting interactive request goes before an earlier batch one."""
+        controller = AdmissionController(capacity=4, min_batch_share=0.25)
+        first = controller.acquire(1, 'batch')
+        held = controller.acquire(3)
+        admitted = []
+        batch = self._acquire_in_thread(controller, 2, 'batch', admitted)
+        self._wait_for(lambda: self._queued(controller, 'batch') == 1)
+        interactive = self._acquire_in_thread(controller, 2, 'interactive', admitted)
+        self._wait_for(lambda: self._queued(controller, 'interactive') == 1)
+
+        controller.release(held.cost)
+        interactive.join(10)
+        self.assertEqual([priority for priority, _ in admitted], ['interactive'])
+        controller.release(first.cost, priority='batch')
+        batch.join(10)
+        self.assertEqual([priority for priority, _ in admitted], ['interactive', 'batch'])
+        self.assertEqual(request_key("x", 'sugarize', {"priority": "batch"}), request_key("x", 'sugarize', {}))
+
+    def test_batch_keeps_its_minimum_share(self):
+        """Interactive requests leave the reserved share to a waiting batch request."""
+        controller = AdmissionController(capacity=4, min_batch_share=0.25)
+        held = controller.acquire(4)
+        admitted = []
+        batch = self._acquire_in_thread(controller, 1, 'batch', admitted)
+        self._wait_for(lambda: self._queued(controller, 'batch') == 1)
+
+        controller.release(held.cost)
+        batch.join(10)
+        # Three units were left to interactive work; the fourth went to the batch request
+        self.assertEqual([priority for priority, _ in admitted], ['batch'])
+        controller.acquire(3)
+        self.assertEqual(controller.metrics()["in_flight_cost"], 4)
+
+    def test_batch_yields_to_interactive_between_stages(self):
+        """A batch run above its reserved share gives its units to a waiting editor at a checkpoint."""
+        controller = AdmissionController(capacity=4, min_batch_share=0.25)
+        reserved = controller.acquire(1, 'batch')
+        extra = controller.acquire(3, 'batch')
+        admitted = []
+        interactive = self._acquire_in_thread(controller, 3, 'interactive', admitted)
+        self._wait_for(lambda: self._queued(controller, 'interactive') == 1)
+
+        resumed = threading.Event()
+
+        def stage():
+            extra.checkpoint()
+            resumed.set()
+        runner = threading.Thread(target=stage)
+        runner.start()
+        interactive.join(10)
+        self.assertEqual([priority for priority, _ in admitted], ['interactive'])
+        self.assertFalse(resumed.is_set())
+
+        # At its reserved share a batch run keeps going
+        reserved.checkpoint()
+        controller.release(3)
+        runner.join(10)
+        self.assertTrue(resumed.is_set())
+        self.assertEqual(controller.metrics()["classes"]["batch"]["preempted"], 1)
+
+    def test_batch_does_not_yield_when_the_reserve_would_block_the_head(self):
+        """No pointless yield when the head cannot fit anyway, and a yielded run resumes within max_wait."""
+        controller = AdmissionController(capacity=8, min_batch_share=0.25, max_wait=0.5)
+        batch = controller.acquire(4, 'batch')
+        admitted = []
+        interactive = self._acquire_in_thread(controller, 8, 'interactive', admitted)
+        self._wait_for(lambda: self._queued(controller, 'interactive') == 1)
+        # Re-queued, the batch run would keep two units reserved: 8 units would still not fit
+        self.assertFalse(controller.preempt(batch))
+        controller.release(batch.cost, priority='batch')
+        interactive.join(10)
+        self.assertEqual([priority for priority, _ in admitted], ['interactive'])
+        controller.release(8)
+
+        # A yielded run that is not readmitted in time takes its units back
+        first = controller.acquire(3, 'batch')
+        second = controller.acquire(3, 'batch')
+        admitted = []
+        interactive = self._acquire_in_thread(controller, 4, 'interactive', admitted)
+        self._wait_for(lambda: self._queued(controller, 'interactive') == 1)
+        self.assertTrue(controller.preempt(second))
+        interactive.join(10)
+        classes = controller.metrics()["classes"]
+        self.assertEqual((classes["batch"]["in_flight_cost"], classes["batch"]["resumed_over_capacity"]), (6, 1))
+
+    def test_full_capacity_waiters_of_both_classes_run_on_an_idle_server(self):
+        """The class limits never keep the oldest head out when nothing is running."""
+        controller = AdmissionController(capacity=8, max_wait=2.0)
+        held = controller.acquire(8)
+        admitted = []
+        batch = self._acquire_in_thread(controller, 8, 'batch', admitted)
+        self._wait_for(lambda: self._queued(controller, 'batch') == 1)
+        interactive = self._acquire_in_thread(controller, 8, 'interactive', admitted)
+        self._wait_for(lambda: self._queued(controller, 'interactive') == 1)
+
+        controller.release(held.cost)
+        batch.join(1)
+        self.assertEqual([priority for priority, _ in admitted], ['batch'])
+        controller.release(8, priority='batch')
+        interactive.join(1)
+        self.assertEqual([priority for priority, _ in admitted], ['batch', 'interactive'])
+        self.assertEqual(sum(classes["rejected_timeout"] for classes in controller.metrics()["classes"].values()), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+import multiprocessing
+import tempfile
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.shared_cache import SharedResultCache, default_cache_path, CACHE_PATH_ENV
+from server.result_cache import ResultCache
+
+PAYLOAD = {"sugared_code": "result = [x * 2 for x in items]", "comments": {0: "# doubled"}}
+
+
+def _write_from_worker(path):
+    SharedResultCache(path).put("from-worker", PAYLOAD, 200)
+
+
+class TestSharedCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'results.sqlite3')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_results_are_shared_across_processes_and_restarts(self):
+        """A result written by one worker is a hit in another and in a fresh cache on the same file."""
+        context = multiprocessing.get_context('fork')
+        worker = context.Process(target=_write_from_worker, args=(self.path,))
+        worker.start()
+        worker.join(30)
+        self.assertEqual(worker.exitcode, 0)
+
+        restarted = ResultCache(shared=SharedResultCache(self.path))
+        self.assertEqual(restarted.get("from-worker"), (PAYLOAD, 200))
+        self.assertEqual(restarted.get("from-worker"), (PAYLOAD, 200))
+        self.assertEqual(restarted.stats, {"hits": 1, "shared_hits": 1, "misses": 0})
+        self.assertIsNone(restarted.get("unknown"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Beyond the entry budget the oldest entries go; errors and failures are not stored."""
+        cache = SharedResultCache(self.path, max_entries=2)
+        for index in range(3):
+            cache.put(f"key-{index}", {"index": index}, 200)
+        cache.put("failed", {"status": "error"}, 500)
+        self.assertEqual(cache.evict(), 1)
+        self.assertIsNone(cache.get("key-0"))
+        self.assertEqual(cache.get("key-2"), ({"index": 2}, 200))
+        self.assertIsNone(cache.get("failed"))
+        self.assertEqual(len(cache), 2)
+
+    def test_unusable_file_is_a_miss(self):
+        """A file that is not a database costs a miss, not an exception."""
+        with open(self.path, 'wb') as f:
+            f.write(b'not a database' * 100)
+        cache = SharedResultCache(self.path)
+        self.assertIsNone(cache.get("key"))
+        cache.put("key", PAYLOAD, 200)
+        self.assertGreater(cache.stats["errors"], 0)
+
+    def test_tier_is_opt_in_and_keyed_by_code(self):
+        """Without the environment variable there is no shared tier; other code never reads these results."""
+        saved = os.environ.pop(CACHE_PATH_ENV, None)
+        self.addCleanup(lambda: saved is None or os.environ.__setitem__(CACHE_PATH_ENV, saved))
+        self.assertIsNone(default_cache_path())
+        os.environ[CACHE_PATH_ENV] = self.path
+        self.assertEqual(default_cache_path(), self.path)
+
+        SharedResultCache(self.path, namespace="code-1").put("key", PAYLOAD, 200)
+        self.assertEqual(SharedResultCache(self.path, namespace="code-1").get("key"), (PAYLOAD, 200))
+        self.assertIsNone(SharedResultCache(self.path, namespace="code-2").get("key"))
+
+if __name__ == '__main__':
+    unittest.main()
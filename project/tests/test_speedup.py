@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.speedup import build_job, measure_edits, run_worker
+from server.pipeline import _measured_explanations, ALLOW_MEASURE_ENV
+
+SAMPLE_CODE = """def build(items, scale):
+    result = []
+    for x in items:
+        result.append(x * scale)
+    config.flush()
+    return result
+"""
+
+# Hand-written edits: one real rewrite and one that is deliberately slower
+COMPREHENSION_EDIT = {
+    "range": {"start": {"line": 1, "character": 4}, "end": {"line": 3, "character": 32}},
+    "newText": "result = [(x * scale) for x in items]",
+    "rule": "list_comprehension",
+}
+SLOWER_EDIT = {
+    "range": {"start": {"line": 1, "character": 4}, "end": {"line": 3, "character": 32}},
+    "newText": "result = [(x * scale) for x in items]\n    result = sorted(result * 3)[::3]",
+    "rule": "list_comprehension",
+}
+UNMEASURABLE_EDIT = {
+    "range": {"start": {"line": 4, "character": 4}, "end": {"line": 4, "character": 18}},
+    "newText": "config.flush(True)",
+    "rule": "with_statement",
+}
+
+class TestSpeedup(unittest.TestCase):
+
+    def test_job_synthesizes_free_variables(self):
+        """Free variables get synthetic inputs based on how the snippet uses them."""
+        job, reason = build_job(SAMPLE_CODE, COMPREHENSION_EDIT)
+        self.assertIsNone(reason)
+        self.assertEqual(job["params"], ["items", "scale"])
+        self.assertIn("items = list(range(", job["setup"])
+        self.assertIn("return (result,)", job["sugared"])
+
+        job, reason = build_job(SAMPLE_CODE, UNMEASURABLE_EDIT)
+        self.assertIsNone(job)
+
+    def test_slower_rewrites_are_flagged_and_suppressed(self):
+        """Measurements reach the explanations, and slower rewrites can be left out."""
+        fast, slow, unmeasurable = measure_edits(SAMPLE_CODE, [COMPREHENSION_EDIT, SLOWER_EDIT, UNMEASURABLE_EDIT])
+        self.assertEqual(fast["status"], "measured")
+        self.assertTrue(fast["equivalent"])
+        self.assertGreater(fast["speedup"], 0)
+        self.assertIsInstance(fast["memory_delta_bytes"], int)
+
+        self.assertTrue(slow["slower"])
+        self.assertEqual(unmeasurable["status"], "unmeasurable")
+
+        kept, explanations, suppressed = _measured_explanations(SAMPLE_CODE, [SLOWER_EDIT], 'suppress')
+        self.assertEqual(kept, [])
+        self.assertEqual(explanations, [])
+        self.assertTrue(suppressed[0]["measurement"]["slower"])
+
+    def test_worker_cannot_write_files(self):
+        """The sandboxed worker fails a job that writes a file, and HTTP measuring needs an opt-in."""
+        job, _ = build_job(SAMPLE_CODE, COMPREHENSION_EDIT)
+        job = dict(job, setup="open('escaped.txt', 'w').write('x' * 10)\n" + job["setup"])
+        result = run_worker([job])[0]
+        self.assertEqual(result["status"], "failed")
+
+        from app import app
+        os.environ.pop(ALLOW_MEASURE_ENV, None)
+        response = app.test_client().post('/process_code', json={
+            "code": SAMPLE_CODE, "operation": "sugarize", "measure": True})
+        self.assertEqual(response.status_code, 403)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import subprocess
+import sys
+import os
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.startup_profile import PROJECT_DIR, parse_importtime, measure_first_response
+from rules.rule_index import build_rule_index, get_rule_explanation, load_rule_index
+from rules.sugaring_rules import SUGARING_RULEBOOK
+
+# Wall-clock assertions depend on the machine, so they only run when asked for
+BENCHMARK_ENV = 'SYNTACTIC_BENCHMARKS'
+
+class TestStartup(unittest.TestCase):
+
+    def test_app_import_is_lazy(self):
+        """Importing app must not pull in the agents' or transformers' dependencies."""
+        code = (
+            "import sys, app\n"
+            "heavy = ['crewai', 'anthropic', 'transformers.sugar_transformer', 'transformers.desugar_transformer']\n"
+            "print(','.join(name for name in heavy if name in sys.modules))\n"
+        )
+        result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR,
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), '')
+
+    @unittest.skipUnless(os.environ.get(BENCHMARK_ENV), f"timing benchmark; set {BENCHMARK_ENV}=1 to run it")
+    def test_first_response_under_a_second(self):
+        """The server should answer its first request well under a second."""
+        elapsed = measure_first_response()
+        self.assertIsNotNone(elapsed, "Server never responded")
+        self.assertLess(elapsed, 1.0)
+
+    def test_parse_importtime(self):
+        """Test parsing of -X importtime output."""
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:       500 |        620 | app\n"
+        )
+        entries = parse_importtime(stderr)
+        self.assertEqual([e["module"] for e in entries], ['_io', 'app'])
+        self.assertEqual(entries[0]["depth"], 1)
+        self.assertEqual(entries[1]["cumulative_us"], 620)
+
+    def test_rule_index_matches_rulebook(self):
+        """The precompiled index must agree with the rulebook source."""
+        index = load_rule_index()
+        self.assertEqual(index, build_rule_index(SUGARING_RULEBOOK))
+        explanation = get_rule_explanation("list_comprehension")
+        self.assertIn("Example:", explanation)
+        self.assertEqual(get_rule_explanation("not_a_rule"), "No detailed explanation available.")
+
+if __name__ == '__main__':
+    unittest.main()
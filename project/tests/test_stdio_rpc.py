@@ -0,0 +1,96 @@
+import unittest
+import io
+import json
+import sys
+import os
+import threading
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.pipeline import run_operation
+from server.stdio_rpc import StdioRPCServer, METHOD_NOT_FOUND, REQUEST_CANCELLED, PARSE_ERROR, INVALID_REQUEST
+
+def _line(message):
+    return (json.dumps(message) + '\n').encode('utf-8')
+
+class TestStdioRPC(unittest.TestCase):
+
+    def _serve(self, lines, server=None):
+        writer = io.BytesIO()
+        server = server or StdioRPCServer(iter(lines), writer)
+        server.writer = writer
+        server.serve()
+        return [json.loads(line) for line in writer.getvalue().splitlines()]
+
+    def test_pipelined_requests(self):
+        """Several requests in one burst each get a response with their id."""
+        code = "result = []\nfor x in items:\n    result.append(x * 2)\n"
+        responses = self._serve([
+            _line({"jsonrpc": "2.0", "id": 1, "method": "sugarize", "params": {"code": code}}),
+            _line({"jsonrpc": "2.0", "id": 2, "method": "desugarize", "params": {"code": "y = [x for x in a]\n"}}),
+            _line({"jsonrpc": "2.0", "id": 3, "method": "unknown"}),
+            b'not json\n',
+            _line({"jsonrpc": "2.0", "id": 4, "method": "shutdown"}),
+        ])
+        by_id = {response["id"]: response for response in responses}
+        self.assertIn('[(x * 2) for x in items]', by_id[1]["result"]["sugared_code"])
+        self.assertIn('desugared_code', by_id[2]["result"])
+        self.assertEqual(by_id[3]["error"]["code"], METHOD_NOT_FOUND)
+        self.assertEqual(by_id[None]["error"]["code"], PARSE_ERROR)
+        # Shutdown is acknowledged after the queued work has drained
+        self.assertEqual(responses[-1], {"jsonrpc": "2.0", "id": 4, "result": None})
+
+    def test_cancel_queued_request(self):
+        """A request cancelled while queued is answered with RequestCancelled."""
+        release = threading.Event()
+        server = StdioRPCServer(None, io.BytesIO())
+
+        def block(params):
+            release.wait(5)
+            return "done", 200
+        server.methods['block'] = block
+
+        def lines():
+            yield _line({"jsonrpc": "2.0", "id": 1, "method": "block"})
+            yield _line({"jsonrpc": "2.0", "id": 2, "method": "sugarize", "params": {"code": "x = 1\n"}})
+            yield _line({"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": 2}})
+            release.set()
+        server.reader = lines()
+
+        responses = {response["id"]: response for response in self._serve(None, server)}
+        self.assertEqual(responses[1]["result"], "done")
+        self.assertEqual(responses[2]["error"]["code"], REQUEST_CANCELLED)
+
+    def test_malformed_ids_and_params_are_invalid_requests(self):
+        """Object ids and non-object params are answered with InvalidRequest instead of crashing the reader."""
+        responses = self._serve([
+            # Malformed notifications are dropped without a response
+            _line({"jsonrpc": "2.0", "method": "$/cancelRequest", "params": [1]}),
+            _line({"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": [1]}}),
+            _line({"jsonrpc": "2.0", "method": "$/cancelRequest", "params": {"id": {"a": 1}}}),
+            _line({"jsonrpc": "2.0", "id": {"a": 1}, "method": "ping"}),
+            _line({"jsonrpc": "2.0", "id": [1], "method": "ping"}),
+            _line({"jsonrpc": "2.0", "id": 1, "method": "ping", "params": "x"}),
+            _line({"jsonrpc": "2.0", "id": 2, "method": "ping"}),
+            _line({"jsonrpc": "2.0", "id": 3, "method": "shutdown"}),
+        ])
+        self.assertEqual([response["error"]["code"] for response in responses[:3]], [INVALID_REQUEST] * 3)
+        self.assertEqual([response["id"] for response in responses[:3]], [None, None, 1])
+        self.assertEqual(responses[3], {"jsonrpc": "2.0", "id": 2, "result": "pong"})
+
+    def test_desugarize_passes_the_mode(self):
+        """The desugarize method honours "mode" like the HTTP route."""
+        code = "y = [x * 2 for x in a]\n"
+        responses = self._serve([
+            _line({"jsonrpc": "2.0", "id": 1, "method": "desugarize", "params": {"code": code}}),
+            _line({"jsonrpc": "2.0", "id": 2, "method": "desugarize", "params": {"code": code, "mode": "profile"}}),
+            _line({"jsonrpc": "2.0", "id": 3, "method": "shutdown"}),
+        ])
+        by_id = {response["id"]: response for response in responses}
+        expected = run_operation(code, 'desugarize', {"mode": "profile"})[0]["desugared_code"]
+        self.assertEqual(by_id[2]["result"]["desugared_code"], expected)
+        self.assertNotEqual(by_id[1]["result"]["desugared_code"], expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.text_edits import compute_text_edits, apply_text_edits, to_position
+
+SAMPLE_CODE = """import os
+result = []
+for x in items:
+    result.append(x * 2)
+
+def total_of(values):
+    total = 0
+    for v in values:
+        total += v
+    return total
+"""
+
+class TestTextEdits(unittest.TestCase):
+
+    def test_edits_cover_only_rewritten_statements(self):
+        """Whole-file edits replace each rewritten loop and its initialization."""
+        edits, transformations = compute_text_edits(SAMPLE_CODE)
+        self.assertEqual([edit["rule"] for edit in edits], ['list_comprehension', 'sum_pattern'])
+        self.assertEqual(edits[0]["range"]["start"], {"line": 1, "character": 0})
+        self.assertEqual(edits[0]["range"]["end"], {"line": 3, "character": 24})
+        self.assertEqual(edits[1]["newText"], 'total = sum(values)')
+        self.assertEqual(edits[1]["range"]["start"], {"line": 6, "character": 4})
+
+        edited = apply_text_edits(SAMPLE_CODE, edits)
+        self.assertIn('result = [(x * 2) for x in items]\n', edited)
+        self.assertIn('    total = sum(values)\n    return total', edited)
+        self.assertTrue(edited.startswith('import os\n'))
+
+    def test_range_limits_analysis(self):
+        """Statements outside the requested lines are left alone."""
+        edits, _ = compute_text_edits(SAMPLE_CODE, start_line=6, end_line=10)
+        self.assertEqual([edit["rule"] for edit in edits], ['sum_pattern'])
+
+        # The initialization is outside the range, so only the loop is replaced
+        edits, _ = compute_text_edits(SAMPLE_CODE, start_line=3, end_line=4)
+        self.assertEqual(edits[0]["range"]["start"], {"line": 2, "character": 0})
+
+    def test_positions_use_utf16_offsets(self):
+        """Columns are converted from UTF-8 bytes to UTF-16 code units."""
+        lines = ['s = "é"; x = 1']
+        self.assertEqual(to_position(lines, 1, len('s = "é"; '.encode('utf-8'))), {"line": 0, "character": 9})
+
+    def test_unusual_line_breaks_do_not_shift_lines(self):
+        """Form feeds, '\\u2028' and CRLF endings number lines the way the parser does."""
+        for prefix in ('\x0c\n', 'note = "a\u2028b\x1cc"\n', '# a\x0cb\r\n'):
+            code = prefix + "result = []\r\nfor x in items:\r\n    result.append(x)\r\n"
+            edits, _ = compute_text_edits(code)
+            self.assertEqual(edits[0]["range"], {"start": {"line": 1, "character": 0},
+                                                 "end": {"line": 3, "character": 20}})
+            self.assertEqual(apply_text_edits(code, edits), prefix + "result = [x for x in items]\r\n")
+
+if __name__ == '__main__':
+    unittest.main()
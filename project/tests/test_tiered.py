@@ -0,0 +1,124 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server.tiered import (DEFAULT_BUDGET_MS, RuleCostTracker, BackgroundResults, background_results,
+                           default_rules, run_rule_passes, run_thorough_tier)
+from server.shared_cache import SharedResultCache
+from server.pipeline import run_tiered_sugarize, run_background_result
+
+SAMPLE_CODE = """def build(items):
+    result = []
+    for x in items:
+        result.append(x * 2)
+    return result, x
+"""
+
+class TestTiered(unittest.TestCase):
+
+    def test_fast_tier_stops_at_deadline_and_background_finishes(self):
+        """A zero budget answers partially; the background tier completes the work."""
+        payload, status = run_tiered_sugarize(SAMPLE_CODE, 'fast', 0, background=True)
+        self.assertEqual(status, 200)
+        self.assertTrue(payload['partial'])
+        self.assertEqual(payload['pending_from_line'], 1)
+        self.assertEqual(payload['edits'], [])
+
+        done = threading.Event()
+        pushed = []
+        background_results.notify(payload['background'], lambda result: (pushed.append(result), done.set()))
+        self.assertTrue(done.wait(10))
+
+        result, status = run_background_result(payload['background'])
+        self.assertEqual(status, 200)
+        self.assertIs(pushed[0], result)
+        self.assertEqual([edit['rule'] for edit in result['edits']], ['list_comprehension'])
+        self.assertTrue(result['validation']['is_valid'])
+        self.assertIsNotNone(result['costs'][0])
+
+    def test_thorough_tier_flags_escaping_loop_variable(self):
+        """The def-use check notices that `x` is read after the loop it would no longer bind."""
+        payload, status = run_tiered_sugarize(SAMPLE_CODE, 'thorough')
+        self.assertEqual(status, 200)
+        self.assertFalse(payload['partial'])
+        self.assertEqual(payload['loop_variable_escapes'], [{"line": 3, "rule": "list_comprehension", "names": ["x"]}])
+
+        payload, status = run_tiered_sugarize(SAMPLE_CODE, 'eventually')
+        self.assertEqual(status, 400)
+
+    def test_deadline_is_checked_per_statement(self):
+        """One pass finishes the statements that fit; the measured cost per line stops the rest."""
+        code = SAMPLE_CODE + SAMPLE_CODE.replace("build", "build_again")
+        payload, status = run_tiered_sugarize(code, 'fast', DEFAULT_BUDGET_MS)
+        self.assertEqual(status, 200)
+        self.assertFalse(payload['partial'])
+        self.assertEqual(len(payload['edits']), 2)
+
+        # 0.05s per line: the 5-line function fits the deadline, the 7-line one does not
+        longer = SAMPLE_CODE + SAMPLE_CODE.replace("build", "build_again").replace("    return",
+                                                                                  "    y = 1\n    z = 2\n    return")
+        tracker = RuleCostTracker()
+        tracker.record("list_comprehension", 0.5, 10)
+        edits, pending_line, pending_rules = run_rule_passes(longer, ["list_comprehension"],
+                                                             deadline=time.perf_counter() + 0.3, tracker=tracker)
+        self.assertEqual(([edit["rule"] for edit in edits], pending_line, pending_rules),
+                         (["list_comprehension"], 6, []))
+
+    def test_measured_cost_feeds_the_order(self):
+        """Unmeasured rules run first; then cheaper rules of equal value lead."""
+        tracker = RuleCostTracker()
+        tracker.record("set_comprehension", 0.001, 100)
+        self.assertEqual(tracker.order(["set_comprehension", "list_comprehension"]),
+                         ["list_comprehension", "set_comprehension"])
+        tracker.record("list_comprehension", 0.01, 100)
+        self.assertEqual(tracker.order(["list_comprehension", "set_comprehension"]),
+                         ["set_comprehension", "list_comprehension"])
+
+    def test_rules_that_do_not_fit_are_left_to_the_thorough_tier(self):
+        """The pass keeps the cheap rule, times each rule it ran, and the thorough tier runs the rest."""
+        tracker = RuleCostTracker()
+        tracker.record("set_comprehension", 0.0001, 100)
+        tracker.record("list_comprehension", 0.5, 10)
+        edits, pending_line, pending_rules = run_rule_passes(SAMPLE_CODE, ["list_comprehension", "set_comprehension"],
+                                                             deadline=time.perf_counter() + 0.2, tracker=tracker)
+        self.assertEqual((edits, pending_line, pending_rules), ([], None, ["list_comprehension"]))
+        self.assertLess(tracker.snapshot()["set_comprehension"], 0.000001)
+
+        result = run_thorough_tier(SAMPLE_CODE, edits, pending_line, pending_rules)
+        self.assertEqual([edit["rule"] for edit in result["edits"]], ["list_comprehension"])
+        self.assertIn("list_comprehension", result["rule_costs"])
+
+    def test_background_results_are_shared_and_bounded(self):
+        """Tokens are random, polls work from another process' store, and the queue is bounded."""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, True)
+        store = SharedResultCache(os.path.join(tmp, 'results.sqlite3'))
+        submitting = BackgroundResults(max_pending=1, shared=store)
+        # Hold the background thread so the first run stays queued
+        release = threading.Event()
+        submitting._executor = ThreadPoolExecutor(max_workers=1)
+        submitting._executor.submit(release.wait)
+        token = submitting.submit(SAMPLE_CODE, [], 1)
+        self.assertGreater(len(token), len("tier-") + 16)
+        self.assertIsNone(submitting.submit(SAMPLE_CODE, [], 1))
+        self.assertEqual(BackgroundResults(shared=store).get(token)["status"], "running")
+        release.set()
+
+        done = threading.Event()
+        submitting.notify(token, lambda result: done.set())
+        self.assertTrue(done.wait(30))
+        other_worker = BackgroundResults(shared=SharedResultCache(store.path))
+        self.assertEqual(other_worker.get(token)["status"], "complete")
+        self.assertIsNone(other_worker.get("tier-1"))
+        self.assertIsNotNone(submitting.submit(SAMPLE_CODE, [], 1))
+
+if __name__ == '__main__':
+    unittest.main()
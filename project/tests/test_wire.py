@@ -0,0 +1,88 @@
+import unittest
+import sys
+import os
+import gzip
+import json
+from unittest import mock
+
+# Add parent directory to path to allow imports from project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from server import wire
+from server.wire import lean_payload, encode_response, decode_request, accepts_gzip
+from server.pipeline import run_operation, run_rule_lookup
+from rules.rule_index import rulebook_version
+
+SAMPLE_CODE = """# Build doubled values
+result = []
+for x in items:
+    result.append(x * 2)
+"""
+
+class TestWire(unittest.TestCase):
+
+    def test_lean_response_references_rules_by_id(self):
+        """Lean mode drops the echoed source and rulebook text but keeps the edits and rule ids."""
+        full, status = run_operation(SAMPLE_CODE, 'sugarize', {"range": {"start_line": 1, "end_line": 4}})
+        lean, lean_status = run_operation(SAMPLE_CODE, 'sugarize', {"range": {"start_line": 1, "end_line": 4},
+                                                                   "lean": True})
+        self.assertEqual((status, lean_status), (200, 200))
+        self.assertEqual(lean["edits"], full["edits"])
+        self.assertEqual(lean["rules"], ["list_comprehension"])
+        self.assertEqual(lean["explanations"], [{"transformation_type": "list_comprehension",
+                                                 "rule": "list_comprehension"}])
+        self.assertEqual(lean["rulebook_version"], rulebook_version())
+
+        rule, status = run_rule_lookup(lean["rules"][0])
+        self.assertEqual(status, 200)
+        self.assertEqual(rule["full_explanation"], full["explanations"][0]["explanation"])
+        self.assertEqual(run_rule_lookup("no_such_rule")[1], 404)
+
+        sugared = lean_payload({"original_code": SAMPLE_CODE, "comments": {0: "# Build doubled values"},
+                                "sugared_code": "result = [x * 2 for x in items]", "explanations": []})
+        self.assertNotIn("original_code", sugared)
+        self.assertNotIn("comments", sugared)
+
+    def test_gzip_only_when_accepted_and_worth_it(self):
+        """Large bodies are gzip-compressed for clients that accept it; small ones are sent as is."""
+        payload = {"sugared_code": SAMPLE_CODE * 100}
+        body, headers = encode_response(payload, 'application/json', 'br, gzip;q=0.5')
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(body)), payload)
+
+        body, headers = encode_response(payload, None, 'gzip;q=0')
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertEqual(json.loads(body), payload)
+        self.assertNotIn("Content-Encoding", encode_response({"ok": True}, None, 'gzip')[1])
+        self.assertFalse(accepts_gzip('identity'))
+
+    def test_msgpack_negotiation(self):
+        """MessagePack is used only when accepted and installed; JSON is the fallback."""
+        body, headers = encode_response({"ok": True}, 'application/msgpack')
+        if wire.msgpack is None:
+            self.assertEqual(headers["Content-Type"], "application/json")
+            with self.assertRaises(ValueError):
+                decode_request(b'\x81\xa2ok\xc3', 'application/msgpack')
+        else:
+            self.assertEqual(headers["Content-Type"], "application/msgpack")
+            self.assertEqual(decode_request(body, 'application/msgpack'), {"ok": True})
+        self.assertEqual(decode_request(b'{"code": "x = 1"}', 'application/json'), {"code": "x = 1"})
+        with self.assertRaises(ValueError):
+            decode_request(b'{bad', 'application/json')
+
+    def test_app_falls_back_to_json_without_msgpack(self):
+        """Without the msgpack package the app answers in JSON and rejects MessagePack bodies."""
+        from app import app
+
+        client = app.test_client()
+        with mock.patch.object(wire, 'msgpack', None):
+            response = client.post('/process_code', json={"code": "x = 1"}, headers={'Accept': 'application/msgpack'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content_type, 'application/json')
+            response = client.post('/process_code', data=b'\x81\xa4code\xa5x = 1',
+                                   content_type='application/msgpack')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("msgpack package", response.get_json()["message"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+"""
+Detection-only pass that flags likely super-linear hotspots.
+
+Patterns reported:
+- nested loops over the same collection
+- `x in seq` against a list, tuple or string inside a loop
+- list.index / count / remove / insert inside a loop
+- sorted() or .sort() inside a loop
+- string accumulation with `+=` inside a loop
+
+Nothing is rewritten. The whole module is covered by a single walk, and
+container kinds are learned from assignments during that same walk, so the
+pass is cheap enough to run on every file (e.g. in CI).
+"""
+
+import ast
+from typing import Dict, List, Any, Tuple, Optional
+
+import astunparse
+
+from utils.cost_model import LINEAR_METHODS, LINEAR_KINDS, container_kind, format_complexity
+
+# Receiver kinds whose methods of the same name are not linear scans
+CONSTANT_TIME_KINDS = {'set', 'dict'}
+
+PATTERN_MESSAGES = {
+    "nested_same_collection": "Nested loops iterate over the same collection",
+    "list_membership_in_loop": "Membership test against a sequence inside a loop; a set gives O(1) lookups",
+    "linear_method_in_loop": "Linear-time list method called inside a loop",
+    "sort_in_loop": "Sorting inside a loop; sort once outside it or keep the data ordered",
+    "string_concatenation_in_loop": "String built with += inside a loop; collect parts and ''.join() them",
+}
+
+
+def _loop_header(node):
+    if isinstance(node, (ast.For, ast.AsyncFor)):
+        return f"for {_source(node.target)} in {_source(node.iter)}"
+    if isinstance(node, ast.While):
+        return f"while {_source(node.test)}"
+    generator = node.generators[0]
+    return f"{type(node).__name__} over {_source(generator.iter)}"
+
+
+def _source(node):
+    try:
+        return astunparse.unparse(node).strip()
+    except Exception:
+        return type(node).__name__
+
+
+def _is_fixed_size(node):
+    # Literals (and literal collections of constants) don't grow with the input
+    return (isinstance(node, ast.Constant) or
+            isinstance(node, (ast.List, ast.Tuple, ast.Set)) and
+            all(isinstance(elt, ast.Constant) for elt in node.elts))
+
+
+class ComplexityAnalyzer(ast.NodeVisitor):
+    """
+    Walk a module once and collect complexity findings.
+
+    Each finding records the pattern, its position, an estimated complexity
+    class and the path of enclosing loops (outermost first).
+    """
+
+    def __init__(self, kinds=None):
+        self.kinds = dict(kinds or {})
+        self.loops = []  # Enclosing loops as (node, iterated expression dump or None)
+        self.findings = []
+
+    def _report(self, pattern, node, extra_degree=1, log=False):
+        degree = len(self.loops) + extra_degree - 1
+        self.findings.append({
+            "pattern": pattern,
+            "line": node.lineno,
+            "col": node.col_offset,
+            "complexity": format_complexity((degree, log)),
+            "loop_path": [{"line": loop.lineno, "loop": _loop_header(loop)} for loop, _ in self.loops],
+            "message": PATTERN_MESSAGES[pattern],
+        })
+
+    def _enter_loop(self, node, iterated):
+        key = None
+        if iterated is not None and not _is_fixed_size(iterated):
+            key = ast.dump(iterated)
+            if any(outer_key == key for _, outer_key in self.loops):
+                self.loops.append((node, key))
+                self._report("nested_same_collection", node)
+                return
+        self.loops.append((node, key))
+
+    def _visit_scope(self, node):
+        # A nested function body doesn't run once per iteration of the loops around its definition
+        outer_loops, outer_kinds = self.loops, self.kinds
+        self.loops, self.kinds = [], dict(self.kinds)
+        self.generic_visit(node)
+        self.loops, self.kinds = outer_loops, outer_kinds
+
+    visit_FunctionDef = _visit_scope
+    visit_AsyncFunctionDef = _visit_scope
+    visit_Lambda = _visit_scope
+
+    def visit_Assign(self, node):
+        kind = container_kind(node.value)
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                if kind:
+                    self.kinds[target.id] = kind
+                else:
+                    self.kinds.pop(target.id, None)
+        self.generic_visit(node)
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        self._enter_loop(node, node.iter)
+        for child in [node.target] + node.body + node.orelse:
+            self.visit(child)
+        self.loops.pop()
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self._enter_loop(node, None)
+        self.generic_visit(node)
+        self.loops.pop()
+
+    def _visit_comprehension(self, node):
+        generators = node.generators
+        # The first iterable is evaluated once, outside the comprehension's loop
+        self.visit(generators[0].iter)
+        for index, generator in enumerate(generators):
+            if index:
+                self.visit(generator.iter)
+            self._enter_loop(node, generator.iter)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for part in ([node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]):
+            self.visit(part)
+        del self.loops[len(self.loops) - len(generators):]
+
+    visit_ListComp = _visit_comprehension
+    visit_SetComp = _visit_comprehension
+    visit_DictComp = _visit_comprehension
+    visit_GeneratorExp = _visit_comprehension
+
+    def visit_Compare(self, node):
+        if self.loops:
+            for op, comparator in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and self._is_sequence(comparator):
+                    self._report("list_membership_in_loop", node, extra_degree=2)
+                    break
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if self.loops:
+            func = node.func
+            if isinstance(func, ast.Name) and func.id == 'sorted':
+                self._report("sort_in_loop", node, extra_degree=2, log=True)
+            elif isinstance(func, ast.Attribute) and func.attr == 'sort':
+                self._report("sort_in_loop", node, extra_degree=2, log=True)
+            elif (isinstance(func, ast.Attribute) and func.attr in LINEAR_METHODS and
+                    self._receiver_kind(func.value) not in CONSTANT_TIME_KINDS):
+                self._report("linear_method_in_loop", node, extra_degree=2)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        if self.loops and isinstance(node.op, ast.Add) and self._is_string(node):
+            self._report("string_concatenation_in_loop", node, extra_degree=2)
+        self.generic_visit(node)
+
+    def _receiver_kind(self, node):
+        if isinstance(node, ast.Name):
+            return self.kinds.get(node.id)
+        return container_kind(node)
+
+    def _is_sequence(self, node):
+        if _is_fixed_size(node):
+            return False
+        return self._receiver_kind(node) in LINEAR_KINDS
+
+    def _is_string(self, node):
+        if isinstance(node.target, ast.Name) and self.kinds.get(node.target.id) == 'str':
+            return True
+        value = node.value
+        return (isinstance(value, ast.JoinedStr) or
+                isinstance(value, ast.Constant) and isinstance(value.value, str) or
+                isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and value.func.id == 'str')
+
+
+def analyze_complexity(code, tree=None):
+    """
+    Find likely super-linear hotspots in Python code.
+
+    Args:
+        code: Python source code string
+        tree: Already parsed module for `code`, to skip re-parsing
+
+    Returns:
+        List of findings ({"pattern", "line", "col", "complexity", "loop_path",
+        "message"}) in source order
+    """
+    if tree is None:
+        tree = ast.parse(code)
+    analyzer = ComplexityAnalyzer()
+    analyzer.visit(tree)
+    return sorted(analyzer.findings, key=lambda finding: (finding["line"], finding["col"]))
@@ -0,0 +1,268 @@
+"""
+Module for instrumenting Python code with lightweight loop counters and timers.
+
+A sibling of desugar_transformer.py: instead of expanding code for reading, it
+rewrites it so every loop and comprehension counts its iterations and
+accumulates perf_counter_ns time into preallocated module-level lists (one slot
+per loop site). Running the instrumented code yields a hotspot report mapped
+back to the original line numbers, which is finer grained than cProfile's
+per-function view.
+"""
+
+import ast
+import astunparse
+import time
+from typing import Dict, List, Any, Tuple, Optional
+from transformers.loop_expander import ComprehensionLoopExpander
+from utils.text_edits import split_lines
+
+# Header inserted at the top of the instrumented module
+HEADER_TEMPLATE = """
+from time import perf_counter_ns as {clock}
+{hits} = [0] * {count}
+{elapsed} = [0] * {count}
+"""
+
+# Optional report printed at exit when the instrumented code runs on its own
+STANDALONE_REPORT_TEMPLATE = """
+def {report}():
+    import sys
+    rows = sorted(zip({sites}, {hits}, {elapsed}), key=lambda row: (-row[2], -row[1]))
+    print('Loop hotspots (line, kind, iterations, total ms):', file=sys.stderr)
+    for (line, kind), count, elapsed in rows:
+        if count:
+            print(f'  line {{line:>5}}  {{kind:<10}} {{count:>12}}  {{elapsed / 1e6:12.3f}}', file=sys.stderr)
+import atexit as {atexit}
+{atexit}.register({report})
+"""
+
+
+def suspends(loop):
+    """
+    Check whether a loop can suspend mid-iteration (yield/await in its own scope).
+    Wall time around such a loop would include time spent outside it, so it is only counted.
+    """
+    if isinstance(loop, ast.AsyncFor):
+        return True
+    stack = list(ast.iter_child_nodes(loop))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.Yield, ast.YieldFrom, ast.Await)):
+            return True
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            continue
+        stack.extend(ast.iter_child_nodes(node))
+    return False
+
+
+class InstrumentationTransformer(ast.NodeTransformer):
+    """
+    AST transformer that adds an iteration counter and a timer to every loop.
+    Comprehensions must already be expanded into helper loops (see loop_expander).
+    """
+
+    def __init__(self, source_lines, namer):
+        self.source_lines = source_lines
+        self.namer = namer
+        self.sites = []
+        self.hits_name = namer.fresh_name('_sugar_hits')
+        self.elapsed_name = namer.fresh_name('_sugar_ns')
+        self.clock_name = namer.fresh_name('_sugar_clock')
+        self.outer_comprehension_loops = {}
+
+    def _add_site(self, node, kind, timed):
+        line = getattr(node, 'lineno', 0)
+        source = self.source_lines[line - 1].strip() if 0 < line <= len(self.source_lines) else ''
+        self.sites.append({
+            "site": len(self.sites),
+            "line": line,
+            "end_line": getattr(node, 'end_lineno', line),
+            "kind": kind,
+            "source": source,
+            "timed": timed,
+        })
+        return len(self.sites) - 1
+
+    def _counter(self, site):
+        return ast.parse(f"{self.hits_name}[{site}] += 1").body[0]
+
+    def _timed(self, node, site):
+        """Wrap a loop so its total wall time is added to the site's slot however it exits."""
+        start_name = self.namer.fresh_name(f'_sugar_t{site}')
+        start = ast.parse(f"{start_name} = {self.clock_name}()").body[0]
+        stop = ast.parse(f"{self.elapsed_name}[{site}] += {self.clock_name}() - {start_name}").body[0]
+        wrapper = ast.Try(body=[node], handlers=[], orelse=[], finalbody=[stop])
+        for new_node in (start, stop, wrapper):
+            ast.copy_location(new_node, node)
+        return [start, wrapper]
+
+    def visit_FunctionDef(self, node):
+        kind = getattr(node, 'comprehension_kind', None)
+        if kind is not None:
+            for stmt in node.body:
+                if isinstance(stmt, ast.For):
+                    self.outer_comprehension_loops[id(stmt)] = kind
+        self.generic_visit(node)
+        return node
+
+    def _instrument_loop(self, node, kind):
+        self.generic_visit(node)
+        timed = not suspends(node)
+        site = self._add_site(node, kind, timed)
+        node.body.insert(0, ast.copy_location(self._counter(site), node.body[0]))
+        return self._timed(node, site) if timed else node
+
+    def visit_For(self, node):
+        helper = getattr(node, 'comprehension_helper', None)
+        if helper is None:
+            return self._instrument_loop(node, 'for')
+
+        kind = self.outer_comprehension_loops.get(id(node))
+        self.generic_visit(node)
+        if kind is None:
+            # Inner generator of a comprehension; the outer loop owns the site
+            return node
+
+        timed = not suspends(node)
+        site = self._add_site(node, kind, timed)
+        # Count iterations of the innermost generator, i.e. elements considered
+        innermost = node
+        for child in ast.walk(node):
+            if isinstance(child, ast.For) and getattr(child, 'comprehension_helper', None) == helper:
+                innermost = child
+        innermost.body.insert(0, ast.copy_location(self._counter(site), innermost))
+        return self._timed(node, site) if timed else node
+
+    def visit_AsyncFor(self, node):
+        return self._instrument_loop(node, 'async for')
+
+    def visit_While(self, node):
+        return self._instrument_loop(node, 'while')
+
+    def header(self, standalone=False):
+        """Build the statements that allocate the counter arrays (and optionally print a report at exit)."""
+        source = HEADER_TEMPLATE.format(
+            clock=self.clock_name, hits=self.hits_name, elapsed=self.elapsed_name, count=len(self.sites))
+        if standalone:
+            sites_name = self.namer.fresh_name('_sugar_sites')
+            source += f"{sites_name} = {[(site['line'], site['kind']) for site in self.sites]!r}\n"
+            source += STANDALONE_REPORT_TEMPLATE.format(
+                report=self.namer.fresh_name('_sugar_report'),
+                atexit=self.namer.fresh_name('_sugar_atexit'),
+                sites=sites_name,
+                hits=self.hits_name,
+                elapsed=self.elapsed_name,
+            )
+        return ast.parse(source).body
+
+
+def _header_position(body):
+    """Index after the module docstring and __future__ imports."""
+    position = 0
+    if body and isinstance(body[0], ast.Expr) and isinstance(getattr(body[0], 'value', None), ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        position = 1
+    while position < len(body) and isinstance(body[position], ast.ImportFrom) and body[position].module == '__future__':
+        position += 1
+    return position
+
+
+def instrument_code(code: str, standalone=False) -> Tuple[str, Dict[str, Any]]:
+    """
+    Rewrite code so every loop and comprehension records iterations and time.
+
+    Args:
+        code: Python source code string
+        standalone: Also print a hotspot report to stderr when the code exits
+
+    Returns:
+        Tuple containing:
+        - Instrumented code
+        - Metadata: "sites" (one per loop, with original line numbers) and the
+          names of the "hits" and "elapsed" counter lists
+    """
+    tree = ast.parse(code)
+    expander = ComprehensionLoopExpander(tree)
+    tree = expander.expand(tree)
+
+    transformer = InstrumentationTransformer(split_lines(code), expander)
+    tree = transformer.visit(tree)
+
+    position = _header_position(tree.body)
+    tree.body[position:position] = transformer.header(standalone)
+    ast.fix_missing_locations(tree)
+
+    return astunparse.unparse(tree), {
+        "sites": transformer.sites,
+        "hits": transformer.hits_name,
+        "elapsed": transformer.elapsed_name,
+    }
+
+
+def hotspot_report(sites, hits, elapsed, top=None, total_ns=None):
+    """
+    Combine site metadata with collected counters into a ranked hotspot report.
+
+    Args:
+        sites: Site list from instrument_code
+        hits: Iteration counts per site
+        elapsed: Nanoseconds per site (inclusive of nested loops)
+        top: Keep only the first N entries
+        total_ns: Wall time of the whole run; shares are relative to it
+            (defaults to the slowest site, since nested sites overlap)
+
+    Returns:
+        List of report entries, hottest first
+    """
+    total_time = total_ns or max([elapsed[site["site"]] for site in sites if site["timed"]] or [0]) or 1
+    report = []
+    for site in sites:
+        count = hits[site["site"]]
+        if not count:
+            continue
+        entry = dict(site, hits=count)
+        if site["timed"]:
+            entry["total_ns"] = elapsed[site["site"]]
+            entry["ns_per_hit"] = elapsed[site["site"]] / count
+            entry["share"] = elapsed[site["site"]] / total_time
+        else:
+            entry["total_ns"] = entry["ns_per_hit"] = entry["share"] = None
+        report.append(entry)
+
+    report.sort(key=lambda entry: (-(entry["total_ns"] or 0), -entry["hits"]))
+    return report[:top] if top else report
+
+
+def run_instrumented(code, filename='<instrumented>', top=None):
+    """
+    Instrument code, run it in a fresh namespace and report its loop hotspots.
+
+    Returns:
+        Tuple of (hotspot report, exception raised by the code or None)
+    """
+    instrumented, metadata = instrument_code(code)
+    namespace = {'__name__': '__main__', '__file__': filename}
+    error = None
+    compiled = compile(instrumented, filename, 'exec')
+    started = time.perf_counter_ns()
+    try:
+        exec(compiled, namespace)
+    except BaseException as e:
+        # Report what ran before the failure (including sys.exit) instead of losing it
+        error = e
+    total_ns = time.perf_counter_ns() - started
+    hits = namespace.get(metadata["hits"], [0] * len(metadata["sites"]))
+    elapsed = namespace.get(metadata["elapsed"], [0] * len(metadata["sites"]))
+    return hotspot_report(metadata["sites"], hits, elapsed, top, total_ns), error
+
+
+def format_hotspot_report(report):
+    """Format a hotspot report as a text table."""
+    lines = [f"{'line':>6}  {'kind':<10} {'iterations':>12} {'total ms':>12} {'ns/iter':>10} {'share':>7}  source"]
+    for entry in report:
+        if entry["timed"]:
+            timing = f"{entry['total_ns'] / 1e6:12.3f} {entry['ns_per_hit']:10.0f} {entry['share']:7.1%}"
+        else:
+            timing = f"{'-':>12} {'-':>10} {'-':>7}"
+        lines.append(f"{entry['line']:>6}  {entry['kind']:<10} {entry['hits']:>12} {timing}  {entry['source']}")
+    return "\n".join(lines)
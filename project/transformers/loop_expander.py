@@ -0,0 +1,229 @@
+"""
+Profiling-friendly desugaring: expand comprehensions into real, executable loops.
+
+Each comprehension is replaced by a call to a small generated function holding
+the equivalent for/if loops, defined right before the statement that uses it.
+This mirrors how Python itself scopes a comprehension (the first iterable is
+evaluated in the enclosing scope, loop variables never leak, evaluation order
+inside the surrounding expression is unchanged), while giving line profilers
+and coverage tools a real line for every iteration body.
+"""
+
+import ast
+import astunparse
+from typing import Dict, List, Any, Tuple, Optional
+from utils.desugar_utils import collect_identifiers, build_comprehension_loop
+
+# Statement fields that hold nested statement lists
+BLOCK_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+
+COMPREHENSION_KINDS = {
+    ast.ListComp: "listcomp",
+    ast.SetComp: "setcomp",
+    ast.DictComp: "dictcomp",
+    ast.GeneratorExp: "genexpr",
+}
+
+# Statements after which a hoisted helper can't (or needn't) be deleted
+NO_CLEANUP_STATEMENTS = (ast.Return, ast.Raise, ast.Break, ast.Continue)
+
+
+def can_expand(node):
+    """
+    Check whether a comprehension can be moved into a helper function without changing its meaning.
+
+    Async comprehensions, awaits, walrus targets (which bind in the enclosing
+    scope) and zero-argument super() are left untouched.
+    """
+    for child in ast.walk(node):
+        if isinstance(child, (ast.Await, ast.NamedExpr, ast.Yield, ast.YieldFrom)):
+            return False
+        if isinstance(child, ast.comprehension) and child.is_async:
+            return False
+        if isinstance(child, ast.Name) and child.id in ('super', '__class__'):
+            return False
+    return True
+
+
+class _ComprehensionHoister(ast.NodeTransformer):
+    """Replace the comprehensions of one statement with calls to hoisted helpers."""
+
+    def __init__(self, expander, helpers):
+        self.expander = expander
+        self.helpers = helpers
+
+    def visit_Lambda(self, node):
+        # A lambda body runs in its own scope; helpers defined outside can't see its arguments
+        return node
+
+    def _expand(self, node):
+        if not can_expand(node) or (isinstance(node, ast.SetComp) and 'set' in self.expander.used_names):
+            # A shadowed `set` would change what the expanded set() call builds
+            return node
+        first_iter = self.visit(node.generators[0].iter)
+        helper, call = self.expander.build_helper(node, first_iter)
+        self.helpers.append(helper)
+        return ast.copy_location(call, node)
+
+    visit_ListComp = _expand
+    visit_SetComp = _expand
+    visit_DictComp = _expand
+    visit_GeneratorExp = _expand
+
+
+class ComprehensionLoopExpander:
+    """
+    Rewrites a module so every expandable comprehension runs as explicit loops.
+    """
+
+    def __init__(self, tree):
+        self.used_names = collect_identifiers(tree)
+        self.transformations = []
+
+    def fresh_name(self, base):
+        """Return an identifier based on `base` that is not used anywhere in the module."""
+        name = base
+        counter = 2
+        while name in self.used_names:
+            name = f"{base}_{counter}"
+            counter += 1
+        self.used_names.add(name)
+        return name
+
+    def build_helper(self, node, first_iter):
+        """
+        Build the helper function for a comprehension and the call that replaces it.
+
+        Returns:
+            Tuple of (FunctionDef, Call expression)
+        """
+        kind = COMPREHENSION_KINDS[type(node)]
+        line = getattr(node, 'lineno', 0)
+        helper_name = self.fresh_name(f"_{kind}_{line}")
+        iter_name = self.fresh_name("_iterable")
+
+        result_name = None
+        key_name = None
+        if kind == "genexpr":
+            body = build_comprehension_loop(node, iter_name)
+        else:
+            result_name = self.fresh_name("_result")
+            if kind == "dictcomp":
+                key_name = self.fresh_name("_key")
+            initial = {
+                "listcomp": ast.List(elts=[], ctx=ast.Load()),
+                "setcomp": ast.Call(func=ast.Name(id='set', ctx=ast.Load()), args=[], keywords=[]),
+                "dictcomp": ast.Dict(keys=[], values=[]),
+            }[kind]
+            body = ([ast.Assign(targets=[ast.Name(id=result_name, ctx=ast.Store())], value=initial)] +
+                    build_comprehension_loop(node, iter_name, result_name, key_name) +
+                    [ast.Return(value=ast.Name(id=result_name, ctx=ast.Load()))])
+
+        helper = ast.FunctionDef(
+            name=helper_name,
+            args=ast.arguments(posonlyargs=[], args=[ast.arg(arg=iter_name, annotation=None)], vararg=None,
+                               kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[]),
+            body=body,
+            decorator_list=[],
+            returns=None,
+        )
+        if 'type_params' in ast.FunctionDef._fields:
+            helper.type_params = []
+        ast.copy_location(helper, node)
+
+        # Tag the generated loops so later passes (e.g. instrumentation) can tell them apart
+        helper.comprehension_kind = kind
+        for child in ast.walk(helper):
+            if isinstance(child, ast.For):
+                child.comprehension_helper = helper_name
+
+        # Like the comprehension itself, the helper's own comprehensions get a fresh scope
+        helper.body = self.expand_block(helper.body, 'function')
+
+        argument = first_iter
+        if kind == "genexpr" and 'iter' not in self.used_names:
+            # A generator expression calls iter() on its first iterable immediately
+            argument = ast.Call(func=ast.Name(id='iter', ctx=ast.Load()), args=[first_iter], keywords=[])
+        call = ast.Call(func=ast.Name(id=helper_name, ctx=ast.Load()), args=[argument], keywords=[])
+
+        self.transformations.append({
+            "type": f"{kind}_loop_expansion",
+            "location": line,
+            "function": helper_name,
+        })
+        return helper, call
+
+    def expand_block(self, statements, scope):
+        """
+        Expand the comprehensions in a statement list and its nested blocks.
+
+        Args:
+            statements: List of statements sharing one scope
+            scope: 'module', 'class' or 'function'; helpers hoisted into module
+                and class namespaces are deleted again after use
+
+        Returns:
+            New statement list
+        """
+        result = []
+        for stmt in statements:
+            self._expand_nested_blocks(stmt, scope)
+
+            helpers = []
+            hoister = _ComprehensionHoister(self, helpers)
+            for field, value in ast.iter_fields(stmt):
+                if field in BLOCK_FIELDS:
+                    continue
+                if isinstance(value, list):
+                    setattr(stmt, field, [hoister.visit(item) if isinstance(item, ast.AST) else item for item in value])
+                elif isinstance(value, ast.AST):
+                    setattr(stmt, field, hoister.visit(value))
+
+            result.extend(helpers)
+            result.append(stmt)
+            if helpers and scope != 'function' and not isinstance(stmt, NO_CLEANUP_STATEMENTS):
+                result.append(ast.copy_location(
+                    ast.Delete(targets=[ast.Name(id=helper.name, ctx=ast.Del()) for helper in helpers]), stmt))
+        return result
+
+    def _expand_nested_blocks(self, stmt, scope):
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            inner_scope = 'function'
+        elif isinstance(stmt, ast.ClassDef):
+            inner_scope = 'class'
+        else:
+            inner_scope = scope
+
+        for field in BLOCK_FIELDS:
+            children = getattr(stmt, field, None)
+            if not children:
+                continue
+            if field in ('handlers', 'cases'):
+                # ExceptHandler / match_case nodes each carry their own statement list
+                for child in children:
+                    child.body = self.expand_block(child.body, inner_scope)
+            else:
+                setattr(stmt, field, self.expand_block(children, inner_scope))
+
+    def expand(self, tree):
+        tree.body = self.expand_block(tree.body, 'module')
+        return ast.fix_missing_locations(tree)
+
+
+def expand_comprehensions(code: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Expand every comprehension in the code into executable loops.
+
+    Args:
+        code: Python source code string
+
+    Returns:
+        Tuple containing:
+        - Transformed code
+        - List of applied transformations, each naming the generated function
+          and the original line so profiler output can be mapped back
+    """
+    tree = ast.parse(code)
+    expander = ComprehensionLoopExpander(tree)
+    expanded_tree = expander.expand(tree)
+    return astunparse.unparse(expanded_tree), expander.transformations
@@ -6,6 +6,18 @@ Removes unnecessary initializations before comprehension statements.
 import ast
 from typing import Set, Dict, List
 
+
+def is_empty_initialization(value):
+    """
+    Check whether an assigned value is an empty container or zero accumulator
+    ([], {}, set() or 0) that a following comprehension or sum() makes redundant.
+    """
+    return (isinstance(value, ast.List) and len(value.elts) == 0 or
+            isinstance(value, ast.Dict) and len(value.keys) == 0 or
+            isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and
+            value.func.id == 'set' and len(value.args) == 0 or
+            isinstance(value, ast.Num) and value.n == 0)
+
 class RedundantAssignmentCleaner(ast.NodeTransformer):
     """
     Removes redundant container initializations before assignments to the same variable.
@@ -39,12 +51,7 @@ class RedundantAssignmentCleaner(ast.NodeTransformer):
                         assign1 = node.body[idx1]
                         assign2 = node.body[idx2]
                         
-                        if (isinstance(assign1.value, ast.List) and len(assign1.value.elts) == 0 or
-                            isinstance(assign1.value, ast.Dict) and len(assign1.value.keys) == 0 or
-                            isinstance(assign1.value, ast.Call) and isinstance(assign1.value.func, ast.Name) and 
-                            assign1.value.func.id == 'set' and len(assign1.value.args) == 0 or
-                            isinstance(assign1.value, ast.Num) and assign1.value.n == 0):  
-                            
+                        if is_empty_initialization(assign1.value):
                             to_remove.add(idx1)
         
         node.body = [stmt for i, stmt in enumerate(node.body) if i not in to_remove]
@@ -13,6 +13,7 @@ from utils.sugar_utils import (
     create_find_target_expression, handle_code_errors, concise_comment
 )
 from transformers.redundant_assignment_cleaner import RedundantAssignmentCleaner
+from utils.cost_model import transformation_cost, infer_container_kinds
 
 class SugarTransformer(ast.NodeTransformer):
     """
@@ -20,11 +21,53 @@ class SugarTransformer(ast.NodeTransformer):
     Transforms verbose constructs into their sugared equivalents.
     """
     
-    def __init__(self, rules=None):
+    def __init__(self, rules=None, enabled=None, estimate_cost=False):
         self.rules = rules or []
+        self.enabled = set(enabled) if enabled is not None else None  # Transformation types to try (None for all)
+        self.estimate_cost = estimate_cost  # Attach the static cost model to each transformation (opt-in)
         self.transformations = []
         self.applied_rules = []  # Keeping track of which rules were applied
         self.previous_assign_nodes = {}  # Keeping track of previous assignments by variable name
+        self.container_kinds = {}  # Container kind (list, set, ...) of names in the module, for the cost model
+
+    def visit_Module(self, node):
+        """
+        Visit Module node to learn which names hold which container kinds.
+        """
+        if self.estimate_cost:
+            self.container_kinds = infer_container_kinds([node])
+        self.generic_visit(node)
+        return node
+
+    def _record_transformation(self, rule, node, replacement=None, removed=None):
+        """
+        Record an applied transformation together with its estimated static cost.
+
+        Args:
+            rule: Transformation type
+            node: The original statement
+            replacement: The statement replacing it (None if the rule only reports)
+            removed: An initialization statement made redundant by the rewrite
+        """
+        cost = None
+        if self.estimate_cost:
+            original = ([removed] if removed is not None else []) + [node]
+            cost = transformation_cost(original, [replacement] if replacement is not None else [],
+                                       self._cost_kinds())
+        self.transformations.append({
+            "type": rule,
+            "location": (node.lineno, node.col_offset),
+            "cost": cost
+        })
+        self.applied_rules.append(rule)
+
+    def _enabled(self, rule):
+        """Check whether a transformation type should be tried."""
+        return self.enabled is None or rule in self.enabled
+
+    def _cost_kinds(self):
+        """Container kinds the cost model should assume for the current node."""
+        return self.container_kinds
         
     def visit_Assign(self, node):
         """
@@ -39,9 +82,12 @@ class SugarTransformer(ast.NodeTransformer):
                 isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name) and 
                 node.value.func.id == 'set' and len(node.value.args) == 0):
                 self.previous_assign_nodes[var_name] = node
+            else:
+                # A later non-empty assignment means the old initialization no longer applies
+                self.previous_assign_nodes.pop(var_name, None)
         
         # Checking for tuple unpacking pattern
-        unpacking = self._transform_tuple_unpacking(node)
+        unpacking = self._enabled("tuple_unpacking") and self._transform_tuple_unpacking(node)
         if unpacking:
             self.transformations.append({
                 "type": "tuple_unpacking",
@@ -58,7 +104,7 @@ class SugarTransformer(ast.NodeTransformer):
         Visit For node and transform list/set/dict comprehensions if applicable.
         """
         # Checking for list comprehension pattern: for loop with append
-        if match_list_comprehension(node):
+        if self._enabled("list_comprehension") and match_list_comprehension(node):
             # Getting the call node for the transformation
             expr = node.body[0]
             call = expr.value
@@ -70,11 +116,8 @@ class SugarTransformer(ast.NodeTransformer):
             list_comp = create_list_comprehension(node, call)
             
             # Recording the transformation
-            self.transformations.append({
-                "type": "list_comprehension",
-                "location": (node.lineno, node.col_offset)
-            })
-            self.applied_rules.append("list_comprehension")
+            self._record_transformation("list_comprehension", node, list_comp,
+                                        self.previous_assign_nodes.get(target_var))
             
             # Marking the initialization assignment for removal if we tracked it
             if target_var in self.previous_assign_nodes:
@@ -84,7 +127,7 @@ class SugarTransformer(ast.NodeTransformer):
             return list_comp
             
         # Checking for set comprehension pattern: for loop with add
-        if match_set_comprehension(node):
+        if self._enabled("set_comprehension") and match_set_comprehension(node):
             # Getting the call node for the transformation
             expr = node.body[0]
             call = expr.value
@@ -96,11 +139,8 @@ class SugarTransformer(ast.NodeTransformer):
             set_comp = create_set_comprehension(node, call)
             
             # Recording the transformation
-            self.transformations.append({
-                "type": "set_comprehension",
-                "location": (node.lineno, node.col_offset)
-            })
-            self.applied_rules.append("set_comprehension")
+            self._record_transformation("set_comprehension", node, set_comp,
+                                        self.previous_assign_nodes.get(target_var))
             
             # Marking the initialization assignment for removal if we tracked it
             if target_var in self.previous_assign_nodes:
@@ -109,7 +149,7 @@ class SugarTransformer(ast.NodeTransformer):
             return set_comp
             
         # Checking for sum pattern: total = 0, for x in numbers: total += x
-        if match_sum_pattern(node):
+        if self._enabled("sum_pattern") and match_sum_pattern(node):
             # Get the augmented assignment node
             augassign = node.body[0]
             
@@ -120,11 +160,8 @@ class SugarTransformer(ast.NodeTransformer):
             sum_expr = create_sum_expression(node, augassign)
             
             # Record the transformation
-            self.transformations.append({
-                "type": "sum_pattern",
-                "location": (node.lineno, node.col_offset)
-            })
-            self.applied_rules.append("sum_pattern")
+            self._record_transformation("sum_pattern", node, sum_expr,
+                                        self.previous_assign_nodes.get(target_var))
             
             # Mark the initialization assignment for removal if we tracked it
             if target_var in self.previous_assign_nodes:
@@ -133,13 +170,9 @@ class SugarTransformer(ast.NodeTransformer):
             return sum_expr
 
         # Check for find target pattern: boolean flag with break
-        if match_find_target_pattern(node):
+        if self._enabled("find_target_pattern") and match_find_target_pattern(node):
             # This is just for identification for now, not actual transformation
-            self.transformations.append({
-                "type": "find_target_pattern",
-                "location": (node.lineno, node.col_offset)
-            })
-            self.applied_rules.append("find_target_pattern")
+            self._record_transformation("find_target_pattern", node)
             
             # For now, we just identify the pattern but don't transform it
             # In a full implementation, we would transform this to 'any' or 'next'
@@ -149,34 +182,23 @@ class SugarTransformer(ast.NodeTransformer):
             return node
             
         # Check for dict comprehension pattern: for loop with dict assignment
-        dict_comp = self._transform_dict_comprehension(node)
+        dict_comp = self._enabled("dict_comprehension") and self._transform_dict_comprehension(node)
         if dict_comp:
-            self.transformations.append({
-                "type": "dict_comprehension",
-                "location": (node.lineno, node.col_offset)
-            })
-            self.applied_rules.append("dict_comprehension")
+            self._record_transformation("dict_comprehension", node, dict_comp,
+                                        self.previous_assign_nodes.get(dict_comp.targets[0].id))
             return dict_comp
             
         # Check for enumerate pattern: manual counter with loop
-        if match_enumerate_pattern(node):
+        if self._enabled("enumerate_pattern") and match_enumerate_pattern(node):
             enum_node = self._transform_enumerate(node)
             if enum_node:
-                self.transformations.append({
-                    "type": "enumerate_pattern",
-                    "location": (node.lineno, node.col_offset)
-                })
-                self.applied_rules.append("enumerate_pattern")
+                self._record_transformation("enumerate_pattern", node, enum_node)
                 return enum_node
             
         # Check for zip pattern: parallel iteration
-        zip_node = self._transform_zip(node)
+        zip_node = self._enabled("zip_pattern") and self._transform_zip(node)
         if zip_node:
-            self.transformations.append({
-                "type": "zip_pattern",
-                "location": (node.lineno, node.col_offset)
-            })
-            self.applied_rules.append("zip_pattern")
+            self._record_transformation("zip_pattern", node, zip_node)
             return zip_node
             
         # Continue with default traversal
@@ -188,14 +210,10 @@ class SugarTransformer(ast.NodeTransformer):
         Visit If node and transform ternary operators if applicable.
         """
         # Check for ternary pattern: if/else for assignment
-        if match_ternary_operator(node):
+        if self._enabled("ternary_operator") and match_ternary_operator(node):
             ternary = self._transform_ternary(node)
             if ternary:
-                self.transformations.append({
-                    "type": "ternary_operator",
-                    "location": (node.lineno, node.col_offset)
-                })
-                self.applied_rules.append("ternary_operator")
+                self._record_transformation("ternary_operator", node, ternary)
                 return ternary
             
         # Continue with default traversal
@@ -207,13 +225,9 @@ class SugarTransformer(ast.NodeTransformer):
         Visit Try node and transform 'with' statements if applicable.
         """
         # Check for with statement pattern: try/finally with close
-        with_stmt = self._transform_with_statement(node)
+        with_stmt = self._enabled("with_statement") and self._transform_with_statement(node)
         if with_stmt:
-            self.transformations.append({
-                "type": "with_statement",
-                "location": (node.lineno, node.col_offset)
-            })
-            self.applied_rules.append("with_statement")
+            self._record_transformation("with_statement", node, with_stmt)
             return with_stmt
             
         # Continue with default traversal
@@ -225,23 +239,15 @@ class SugarTransformer(ast.NodeTransformer):
         Visit FunctionDef node and transform lambda if applicable.
         """
         # Check for generator function pattern
-        if match_generator_expression(node):
+        if self._enabled("generator_expression") and match_generator_expression(node):
             generator_expr = create_generator_expression(node)
-            self.transformations.append({
-                "type": "generator_expression",
-                "location": (node.lineno, node.col_offset)
-            })
-            self.applied_rules.append("generator_expression")
+            self._record_transformation("generator_expression", node, generator_expr)
             return generator_expr
             
         # Check for lambda pattern: simple one-liner function
-        lambda_expr = self._transform_lambda(node)
+        lambda_expr = self._enabled("lambda_expression") and self._transform_lambda(node)
         if lambda_expr:
-            self.transformations.append({
-                "type": "lambda_expression",
-                "location": (node.lineno, node.col_offset)
-            })
-            self.applied_rules.append("lambda_expression")
+            self._record_transformation("lambda_expression", node, lambda_expr)
             return lambda_expr
             
         # Continue with default traversal
@@ -419,13 +425,14 @@ class SugarTransformer(ast.NodeTransformer):
         """Transform simple function into lambda."""
         return None  # Placeholder
 
-def transform_code(code: str, rules=None) -> Tuple[str, List[Dict[str, Any]]]:
+def transform_code(code: str, rules=None, estimate_cost=False) -> Tuple[str, List[Dict[str, Any]]]:
     """
     Transform Python code by applying syntactic sugar.
     
     Args:
         code: Python source code string
         rules: List of transformation rules to apply
+        estimate_cost: Attach the static cost model to each transformation
         
     Returns:
         Tuple containing:
@@ -452,7 +459,7 @@ def transform_code(code: str, rules=None) -> Tuple[str, List[Dict[str, Any]]]:
         tree = ast.parse(code)
         
         # Apply transformations
-        transformer = SugarTransformer(rules)
+        transformer = SugarTransformer(rules, estimate_cost=estimate_cost)
         transformed_tree = transformer.visit(tree)
         ast.fix_missing_locations(transformed_tree)
         
@@ -623,8 +630,8 @@ def transform_code(code: str, rules=None) -> Tuple[str, List[Dict[str, Any]]]:
         
         # Determine which rules were applied
         if transformer.applied_rules:
-            applied_transformations = [{"type": rule_name, "original": "", "transformed": ""} 
-                               for rule_name in transformer.applied_rules]
+            applied_transformations = [{"type": t["type"], "original": "", "transformed": "", "cost": t.get("cost")}
+                               for t in transformer.transformations]
         else:
             applied_transformations = []
             # If no transformations were made, return original code to preserve all comments
@@ -0,0 +1,331 @@
+"""
+Static cost model for sugaring transformations.
+
+Estimates, without running anything, what a rewrite changes about the code:
+- asymptotic complexity (loop nesting, linear membership tests and list
+  scans inside loops, sorting)
+- bytecode size, and the number of interpreted instructions per loop
+  iteration (0 when the loop moved into C, e.g. sum())
+- container allocations, and how many of them are intermediates that are
+  only built to be consumed right away
+The resulting impact score is a heuristic for ranking findings, not a prediction
+of wall-clock time.
+"""
+
+import ast
+import copy
+import dis
+from typing import Dict, List, Any, Tuple, Optional
+
+# Built-ins that consume their whole argument in C
+CONSUMING_CALLS = {'sum', 'any', 'all', 'min', 'max', 'sorted', 'list', 'set', 'frozenset',
+                   'tuple', 'dict'}
+
+# Built-ins whose result is a freshly allocated container
+ALLOCATING_CALLS = {'list', 'set', 'frozenset', 'dict', 'tuple', 'sorted'}
+
+# Sequence methods that scan the whole sequence
+LINEAR_METHODS = {'index', 'count', 'remove', 'insert'}
+
+# Container kinds where `x in container` is a linear scan
+LINEAR_KINDS = {'list', 'tuple', 'str'}
+
+
+def container_kind(value):
+    """Classify the container an expression builds ('list', 'set', 'dict', 'tuple', 'str' or None)."""
+    if isinstance(value, (ast.List, ast.ListComp)):
+        return 'list'
+    if isinstance(value, (ast.Set, ast.SetComp)):
+        return 'set'
+    if isinstance(value, (ast.Dict, ast.DictComp)):
+        return 'dict'
+    if isinstance(value, ast.Tuple):
+        return 'tuple'
+    if isinstance(value, ast.Constant) and isinstance(value.value, str):
+        return 'str'
+    if isinstance(value, ast.Call) and isinstance(value.func, ast.Name):
+        return {'list': 'list', 'sorted': 'list', 'set': 'set', 'frozenset': 'set',
+                'dict': 'dict', 'tuple': 'tuple'}.get(value.func.id)
+    return None
+
+
+def infer_container_kinds(nodes):
+    """Map names to the container kind they are assigned in the given nodes."""
+    kinds = {}
+    for root in nodes:
+        for node in ast.walk(root):
+            if isinstance(node, ast.Assign):
+                kind = container_kind(node.value)
+                for target in node.targets:
+                    if isinstance(target, ast.Name) and kind:
+                        kinds[target.id] = kind
+    return kinds
+
+
+class ComplexityEstimator:
+    """
+    Estimate asymptotic complexity as (polynomial degree, has log factor),
+    treating every iterable of unknown size as size n.
+    """
+
+    def __init__(self, kinds=None):
+        self.kinds = kinds or {}
+
+    def statements(self, statements):
+        return max([self.node(stmt) for stmt in statements] or [(0, False)])
+
+    def _children(self, node, skip=()):
+        costs = [self.node(child) for name, child in _child_nodes(node) if name not in skip]
+        return max(costs or [(0, False)])
+
+    def node(self, node):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            # Defining a function costs nothing per call of the snippet
+            return (0, False)
+
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            body = max(self.statements(node.body), self.statements(node.orelse))
+            return max(self.node(node.iter), _deeper(body))
+
+        if isinstance(node, ast.While):
+            return max(self.node(node.test), _deeper(max(self.statements(node.body), self.node(node.test))))
+
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+            inner_parts = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+            for generator in node.generators:
+                inner_parts.extend(generator.ifs)
+            inner = max(self.node(part) for part in inner_parts)
+            # Later generators' iterables are evaluated once per outer iteration
+            for generator in reversed(node.generators[1:]):
+                inner = _deeper(max(inner, self.node(generator.iter)))
+            return max(self.node(node.generators[0].iter), _deeper(inner))
+
+        if isinstance(node, ast.Call):
+            args = self._children(node)
+            if isinstance(node.func, ast.Name) and node.func.id in CONSUMING_CALLS and node.args:
+                argument = node.args[0]
+                if isinstance(argument, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+                    cost = self.node(argument)
+                else:
+                    cost = max(args, (1, False))
+                if node.func.id == 'sorted':
+                    cost = (max(cost[0], 1), True)
+                return cost
+            if isinstance(node.func, ast.Attribute) and node.func.attr in LINEAR_METHODS:
+                return max(args, (1, False))
+            if (isinstance(node.func, ast.Attribute) and node.func.attr == 'pop' and node.args and
+                    isinstance(node.args[0], ast.Constant) and node.args[0].value == 0):
+                return max(args, (1, False))
+            return args
+
+        if isinstance(node, ast.Compare):
+            cost = self._children(node)
+            for op, comparator in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and self._is_linear(comparator):
+                    cost = max(cost, (1, False))
+            return cost
+
+        return self._children(node)
+
+    def _is_linear(self, node):
+        if isinstance(node, ast.Name):
+            return self.kinds.get(node.id) in LINEAR_KINDS
+        # Literal tuples/lists of constants have a fixed size
+        if isinstance(node, (ast.List, ast.Tuple)):
+            return False
+        return container_kind(node) in LINEAR_KINDS
+
+
+def _child_nodes(node):
+    for name, value in ast.iter_fields(node):
+        if isinstance(value, ast.AST):
+            yield name, value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, ast.AST):
+                    yield name, item
+
+
+def _deeper(cost):
+    return (cost[0] + 1, cost[1])
+
+
+def format_complexity(cost):
+    """Render a (degree, log) pair as big-O notation."""
+    degree, log = cost
+    if degree == 0:
+        return "O(log n)" if log else "O(1)"
+    power = "n" if degree == 1 else f"n^{degree}"
+    return f"O({power} log n)" if log else f"O({power})"
+
+
+def count_allocations(nodes):
+    """
+    Count container allocations in the nodes.
+
+    Returns:
+        Dictionary with "total", "intermediate" (built only to be passed on or
+        iterated) and "in_loops" (allocated once per iteration)
+    """
+    counts = {"total": 0, "intermediate": 0, "in_loops": 0}
+
+    def visit(node, parent, loop_depth):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            return
+        allocates = (
+            isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp)) or
+            (isinstance(node, (ast.List, ast.Set, ast.Dict)) and not isinstance(getattr(node, 'ctx', None), ast.Store)) or
+            (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in ALLOCATING_CALLS)
+        )
+        if allocates:
+            counts["total"] += 1
+            if isinstance(parent, (ast.Call, ast.For, ast.comprehension)):
+                counts["intermediate"] += 1
+            if loop_depth:
+                counts["in_loops"] += 1
+
+        # Loop bodies (and a while test) run once per iteration; a for's iterable and else run once
+        repeated = {
+            ast.For: ('body',), ast.AsyncFor: ('body',), ast.While: ('body', 'test'),
+            ast.ListComp: ('elt',), ast.SetComp: ('elt',), ast.GeneratorExp: ('elt',),
+            ast.DictComp: ('key', 'value'),
+        }.get(type(node), ())
+        for name, child in _child_nodes(node):
+            visit(child, node, loop_depth + 1 if name in repeated else loop_depth)
+
+    for root in nodes:
+        visit(root, None, 0)
+    return counts
+
+
+def _code_objects(code):
+    yield code
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            yield from _code_objects(const)
+
+
+def bytecode_profile(nodes):
+    """
+    Compile statements inside a throwaway function and count their bytecode.
+
+    Returns:
+        Dictionary with "instructions" (all code objects) and "loop_instructions"
+        (instructions in the innermost interpreted loop body; 0 if no loop
+        runs in bytecode), or None if the statements don't compile alone
+    """
+    wrapper = ast.FunctionDef(
+        name='_cost_snippet',
+        args=ast.arguments(posonlyargs=[], args=[], vararg=None, kwonlyargs=[], kw_defaults=[],
+                           kwarg=None, defaults=[]),
+        body=[copy.deepcopy(node) for node in nodes] or [ast.Pass()],
+        decorator_list=[],
+        returns=None,
+    )
+    if 'type_params' in ast.FunctionDef._fields:
+        wrapper.type_params = []
+    module = ast.fix_missing_locations(ast.Module(body=[wrapper], type_ignores=[]))
+    try:
+        compiled = compile(module, '<cost>', 'exec')
+    except (SyntaxError, ValueError, TypeError):
+        return None
+
+    snippet_code = next(const for const in compiled.co_consts if hasattr(const, 'co_code'))
+    instructions = 0
+    loop_sizes = []
+    for code in _code_objects(snippet_code):
+        listing = list(dis.get_instructions(code))
+        instructions += len(listing)
+        for instruction in listing:
+            if instruction.opname == 'FOR_ITER':
+                end = instruction.argval
+                loop_sizes.append(sum(1 for other in listing if instruction.offset < other.offset < end))
+    return {
+        "instructions": instructions,
+        "loop_instructions": min(loop_sizes) if loop_sizes else 0,
+    }
+
+
+def estimate_cost(nodes, kinds=None):
+    """
+    Estimate the static cost of a list of statements.
+
+    Returns:
+        Dictionary with "complexity" (big-O string), "degree", "bytecode" and "allocations"
+    """
+    kinds = dict(kinds or {})
+    kinds.update(infer_container_kinds(nodes))
+    cost = ComplexityEstimator(kinds).statements(nodes)
+    return {
+        "complexity": format_complexity(cost),
+        "degree": cost,
+        "bytecode": bytecode_profile(nodes),
+        "allocations": count_allocations(nodes),
+    }
+
+
+def transformation_cost(original, replacement, kinds=None):
+    """
+    Compare the static cost of the original statements with their replacement.
+
+    Args:
+        original: List of statements being replaced (including a removed initialization)
+        replacement: List of replacement statements (empty if the rule only reports)
+        kinds: Known container kinds of names from the surrounding code
+
+    Returns:
+        Dictionary describing the change in complexity, bytecode and allocations,
+        plus an "impact" score (higher means a bigger expected improvement)
+    """
+    before = estimate_cost(original, kinds)
+    after = estimate_cost(replacement, kinds) if replacement else None
+
+    result = {
+        "complexity_before": before["complexity"],
+        "complexity_after": after["complexity"] if after else None,
+        "bytecode_before": before["bytecode"]["instructions"] if before["bytecode"] else None,
+        "bytecode_after": after["bytecode"]["instructions"] if after and after["bytecode"] else None,
+        "loop_instructions_before": before["bytecode"]["loop_instructions"] if before["bytecode"] else None,
+        "loop_instructions_after": after["bytecode"]["loop_instructions"] if after and after["bytecode"] else None,
+        "allocations_before": before["allocations"]["total"],
+        "allocations_after": after["allocations"]["total"] if after else None,
+        "intermediate_allocations_before": before["allocations"]["intermediate"],
+        "intermediate_allocations_after": after["allocations"]["intermediate"] if after else None,
+    }
+    if after is None:
+        result["complexity_change"] = None
+        result["impact"] = 0.0
+        return result
+
+    if after["degree"] < before["degree"]:
+        result["complexity_change"] = "better"
+    elif after["degree"] > before["degree"]:
+        result["complexity_change"] = "worse"
+    else:
+        result["complexity_change"] = "same"
+
+    result["impact"] = round(impact_score(before, after), 2)
+    return result
+
+
+def impact_score(before, after):
+    """
+    Heuristic ranking score: complexity changes dominate, then the share of
+    interpreted per-iteration work removed, then avoided allocations.
+    """
+    score = 0.0
+    (degree_before, log_before), (degree_after, log_after) = before["degree"], after["degree"]
+    score += 100.0 * (degree_before - degree_after) + 10.0 * (int(log_before) - int(log_after))
+
+    if before["bytecode"] and after["bytecode"]:
+        loop_before = before["bytecode"]["loop_instructions"]
+        loop_after = after["bytecode"]["loop_instructions"]
+        if loop_before:
+            score += 10.0 * (loop_before - loop_after) / loop_before
+        elif loop_after:
+            score -= 10.0
+
+    allocations_before, allocations_after = before["allocations"], after["allocations"]
+    score += 2.0 * (allocations_before["intermediate"] - allocations_after["intermediate"])
+    score += 5.0 * (allocations_before["in_loops"] - allocations_after["in_loops"])
+    return score
@@ -198,6 +198,87 @@ def expand_generator_expression(node):
     
     return [comment_node]
 
+def collect_identifiers(tree):
+    """
+    Collect every identifier bound or referenced anywhere in a tree.
+    Used to pick temporary names that cannot collide with user code.
+
+    Args:
+        tree: AST to scan
+
+    Returns:
+        Set of identifier strings
+    """
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.alias):
+            names.add((node.asname or node.name).split('.')[0])
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            names.update(node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+    return names
+
+def build_comprehension_loop(node, iter_name, result_name=None, key_name=None):
+    """
+    Build the real loop statements that evaluate a comprehension.
+
+    Every generator becomes a nested for loop and every filter a nested if,
+    in the same order Python evaluates them. The first iterable is read from
+    `iter_name` because the comprehension evaluates it in the enclosing scope.
+
+    Args:
+        node: ListComp, SetComp, DictComp or GeneratorExp node
+        iter_name: Name holding the already evaluated first iterable
+        result_name: Name of the result container (unused for generators)
+        key_name: Temporary for dict keys, so the key is evaluated before the value
+
+    Returns:
+        List of statements; the innermost body appends, adds, stores or yields
+    """
+    if isinstance(node, ast.ListComp):
+        body = [ast.Expr(value=ast.Call(
+            func=ast.Attribute(value=ast.Name(id=result_name, ctx=ast.Load()), attr='append', ctx=ast.Load()),
+            args=[node.elt],
+            keywords=[]
+        ))]
+    elif isinstance(node, ast.SetComp):
+        body = [ast.Expr(value=ast.Call(
+            func=ast.Attribute(value=ast.Name(id=result_name, ctx=ast.Load()), attr='add', ctx=ast.Load()),
+            args=[node.elt],
+            keywords=[]
+        ))]
+    elif isinstance(node, ast.DictComp):
+        body = [
+            ast.Assign(targets=[ast.Name(id=key_name, ctx=ast.Store())], value=node.key),
+            ast.Assign(
+                targets=[ast.Subscript(
+                    value=ast.Name(id=result_name, ctx=ast.Load()),
+                    slice=ast.Name(id=key_name, ctx=ast.Load()),
+                    ctx=ast.Store()
+                )],
+                value=node.value
+            ),
+        ]
+    else:
+        body = [ast.Expr(value=ast.Yield(value=node.elt))]
+
+    # Build from the innermost generator outwards
+    for index in range(len(node.generators) - 1, -1, -1):
+        generator = node.generators[index]
+        for condition in reversed(generator.ifs):
+            body = [ast.If(test=condition, body=body, orelse=[])]
+        iter_expr = ast.Name(id=iter_name, ctx=ast.Load()) if index == 0 else generator.iter
+        body = [ast.For(target=generator.target, iter=iter_expr, body=body, orelse=[])]
+
+    return body
+
 def get_educational_explanation(pattern_type):
     """
     Get an educational explanation for a specific code pattern.
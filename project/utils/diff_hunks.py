@@ -0,0 +1,161 @@
+"""
+Changed line ranges from unified diffs, for diff-scoped sugaring.
+
+Pre-commit hooks and code review only care about the lines a change touches.
+A unified diff (or a git revision range, diffed with zero context) is reduced
+to the new-side line ranges of each file; the matchers then run only on the
+statements overlapping those ranges (see compute_text_edits' "hunks"), so the
+work after parsing grows with the size of the change rather than the file.
+"""
+
+import os
+import re
+import subprocess
+from typing import Dict, List, Any, Tuple, Optional
+
+HUNK_HEADER = re.compile(r'^@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+GIT_TIMEOUT = 30
+
+
+def _diff_path(header):
+    path = header[4:].rstrip('\n').split('\t')[0]
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    if path == '/dev/null':
+        return None
+    # git's a/ and b/ prefixes
+    return path[2:] if path.startswith(('a/', 'b/')) else path
+
+
+def parse_unified_diff(text):
+    """
+    Collect the changed new-side lines of every file in a unified diff.
+
+    Added lines become ranges; a pure deletion marks the line after it, so the
+    statement the deletion happened in still counts as changed. Deleted files
+    are left out.
+
+    Args:
+        text: Unified diff, e.g. the output of `git diff` or `diff -u`
+
+    Returns:
+        Dict mapping each new-side path to a sorted list of merged
+        (start_line, end_line) ranges (1-based, inclusive)
+    """
+    hunks = {}
+    path = None
+    line = None
+    # Lines of the current hunk still to come on each side; the hunk ends at 0/0
+    old_left = new_left = 0
+    removed_at = None
+    # Only '\n' ends a row: changed lines may contain form feeds or '\u2028'
+    for row in text.split('\n'):
+        row = row[:-1] if row.endswith('\r') else row
+        if old_left <= 0 and new_left <= 0:
+            if row.startswith('+++ '):
+                path = _diff_path(row)
+                if path is not None:
+                    hunks.setdefault(path, [])
+                continue
+            match = HUNK_HEADER.match(row)
+            if match and path is not None:
+                old_left = int(match.group(1) or 1)
+                new_left = int(match.group(3) or 1)
+                line = int(match.group(2))
+                if new_left == 0:
+                    # Nothing on the new side: the header names the line before the deletion
+                    line += 1
+                removed_at = None
+            continue
+        if row.startswith('\\'):
+            continue
+        if row.startswith('+'):
+            hunks[path].append((line, line))
+            line += 1
+            new_left -= 1
+        elif row.startswith('-'):
+            if removed_at != line:
+                hunks[path].append((max(1, line), max(1, line)))
+                removed_at = line
+            old_left -= 1
+        else:
+            line += 1
+            old_left -= 1
+            new_left -= 1
+    return {name: merge_ranges(ranges) for name, ranges in hunks.items()}
+
+
+def merge_ranges(ranges):
+    """Sort line ranges and merge the ones that touch or overlap."""
+    merged = []
+    for start_line, end_line in sorted(ranges):
+        if merged and start_line <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end_line))
+        else:
+            merged.append((start_line, end_line))
+    return merged
+
+
+def _git(args, cwd):
+    try:
+        completed = subprocess.run(['git'] + args, cwd=cwd, capture_output=True, timeout=GIT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise ValueError(f"git failed: {e}")
+    if completed.returncode != 0:
+        raise ValueError(completed.stderr.decode('utf-8', 'replace').strip() or "git failed")
+    return completed.stdout
+
+
+def git_toplevel(cwd=None):
+    """Root of the git work tree containing cwd; diff paths are relative to it."""
+    return _git(['rev-parse', '--show-toplevel'], cwd).decode('utf-8').strip()
+
+
+def git_diff(revisions=None, cwd=None):
+    """
+    Zero-context diff of the Python files changed by a revision range.
+
+    Args:
+        revisions: 'A..B', 'A...B' or 'A' (against the work tree); None for the
+            staged changes, as a pre-commit hook sees them
+        cwd: Directory inside the repository
+
+    Returns:
+        Unified diff text
+
+    Raises:
+        ValueError: When git fails or the revision range is invalid
+    """
+    if revisions is not None and revisions.startswith('-'):
+        raise ValueError(f"Invalid revision range: {revisions}")
+    args = ['diff', '--no-color', '--no-ext-diff', '--unified=0']
+    args += [revisions] if revisions is not None else ['--cached']
+    return _git(args + ['--', '*.py'], cwd).decode('utf-8', 'replace')
+
+
+def new_side_revision(revisions=None):
+    """
+    Where the new side of a diff lives: ':' for the index, a revision, or None for the work tree.
+    """
+    if revisions is None:
+        return ':'
+    for separator in ('...', '..'):
+        if separator in revisions:
+            return revisions.split(separator, 1)[1] or 'HEAD'
+    return None
+
+
+def read_new_side(path, revision, toplevel):
+    """
+    Source of a changed file as the diff's new side has it.
+
+    Raises:
+        OSError or ValueError: When the file cannot be read
+        UnicodeDecodeError: For a file that is not UTF-8
+    """
+    if revision is None:
+        with open(os.path.join(toplevel, path), encoding='utf-8') as f:
+            return f.read()
+    spec = f":{path}" if revision == ':' else f"{revision}:{path}"
+    return _git(['show', spec], toplevel).decode('utf-8')
@@ -0,0 +1,62 @@
+"""
+Fingerprints of the project's own source code.
+
+Stored results (the shared result cache, ETags, the scan manifest) stay valid
+only as long as the code that computed them is unchanged. Rather than relying
+on a hand-bumped format number, their keys include a hash of the sources the
+result depends on, so editing a transformer or an analyzer invalidates them on
+its own.
+"""
+
+import functools
+import hashlib
+import os
+from typing import Dict, List, Any, Tuple, Optional
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sources a transformation result depends on: the transformers, the rules,
+# the matching and rewriting helpers and the pipeline assembling the payloads
+PIPELINE_SOURCES = ('transformers', 'rules', 'utils', 'server/pipeline.py', 'server/tiered.py', 'server/wire.py')
+
+
+def _python_files(relative_path):
+    path = os.path.join(PROJECT_DIR, relative_path)
+    if os.path.isfile(path):
+        return [relative_path]
+    found = []
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(name for name in dirs if name != '__pycache__')
+        for name in sorted(files):
+            if name.endswith('.py'):
+                found.append(os.path.relpath(os.path.join(root, name), PROJECT_DIR))
+    return found
+
+
+@functools.lru_cache(maxsize=None)
+def source_fingerprint(paths):
+    """
+    Short hash over the Python sources under the given project-relative paths.
+
+    Args:
+        paths: Tuple of files or directories, relative to the project directory
+
+    Returns:
+        12 hex digits; files that cannot be read are left out
+    """
+    digest = hashlib.sha1()
+    for relative_path in paths:
+        for name in _python_files(relative_path):
+            try:
+                with open(os.path.join(PROJECT_DIR, name), 'rb') as f:
+                    data = f.read()
+            except OSError:
+                continue
+            digest.update(name.replace(os.sep, '/').encode('utf-8') + b'\0')
+            digest.update(hashlib.sha1(data).digest())
+    return digest.hexdigest()[:12]
+
+
+def code_fingerprint():
+    """Fingerprint of the code that computes transformation results."""
+    return source_fingerprint(PIPELINE_SOURCES)
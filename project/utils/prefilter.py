@@ -0,0 +1,124 @@
+"""
+Source-level prefilter that rules out files and top-level blocks before parsing.
+
+Every transformation needs a few tokens to be present in the statement it
+rewrites (a list comprehension needs `for` and `append`, a ternary needs `if`
+and `else`...). The anchors of the enabled rules are taken from the rule
+registry once; each file is then checked with one substring search per
+distinct anchor:
+- a file where no rule finds all of its anchors is never handed to ast.parse
+- after parsing, the same check runs over each top-level statement's span,
+  and statements without a complete anchor set are never visited
+
+Anchors only have to be necessary, not sufficient: a false positive ("for"
+inside "format") costs a parse, a false negative would hide a rewrite.
+Substring search runs at memchr speed in C, which on CPython is many times
+faster than a compiled regular expression with word boundaries over the same
+anchors, and an order of magnitude cheaper than ast.parse.
+"""
+
+import functools
+from typing import Dict, List, Any, Tuple, Optional
+
+from rules.rule_index import TRANSFORMATION_ANCHORS, TRANSFORMATION_RULE_REFS, PLACEHOLDER_TRANSFORMATIONS
+
+
+class Prefilter:
+    """
+    Multi-pattern matcher over the anchors of a set of transformations.
+
+    Args:
+        rules: Transformation types to look for (defaults to every registered
+            one that SugarTransformer actually implements)
+    """
+
+    def __init__(self, rules=None):
+        if rules is None:
+            rules = [rule for rule in TRANSFORMATION_RULE_REFS if rule not in PLACEHOLDER_TRANSFORMATIONS]
+        self.rules = {}
+        self.unfiltered = False
+        for rule in rules:
+            if rule in TRANSFORMATION_ANCHORS:
+                self.rules[rule] = frozenset(TRANSFORMATION_ANCHORS[rule])
+            else:
+                # No anchors known, so nothing can be skipped for this rule
+                self.unfiltered = True
+
+        # Each distinct anchor is searched for once
+        self.anchors = sorted({anchor for required in self.rules.values() for anchor in required})
+        self.byte_anchors = {anchor: anchor.encode('ascii') for anchor in self.anchors}
+
+    def find_anchors(self, source, start=0, end=None):
+        """
+        Collect the anchors occurring in (a slice of) the source.
+
+        Args:
+            source: Python source as str or raw bytes
+            start: Offset to start searching at
+            end: Offset to stop searching at (None for the end of the source)
+
+        Returns:
+            Set of anchor strings found
+        """
+        if end is None:
+            end = len(source)
+        if isinstance(source, bytes):
+            return {anchor for anchor, encoded in self.byte_anchors.items()
+                    if source.find(encoded, start, end) != -1}
+        return {anchor for anchor in self.anchors if source.find(anchor, start, end) != -1}
+
+    def matching_rules(self, found):
+        """
+        Rules whose anchors are all among the found anchors.
+
+        Returns:
+            Set of transformation types that may match
+        """
+        return {rule for rule, required in self.rules.items() if required <= found}
+
+    def may_match(self, source):
+        """
+        Whether any enabled rule could match somewhere in the source.
+
+        Args:
+            source: Python source as str or raw bytes
+        """
+        return self.unfiltered or bool(self.matching_rules(self.find_anchors(source)))
+
+    def block_filter(self, source):
+        """
+        Build a predicate telling whether a top-level statement may contain a candidate.
+
+        Args:
+            source: The str source the statements were parsed from
+
+        Returns:
+            Callable taking an ast statement and returning a bool, or None when
+            line numbers can't be mapped to offsets (bare \\r line endings)
+        """
+        if self.unfiltered or source.count('\r') != source.count('\r\n'):
+            return None
+        # Offset of the start of each 1-based line; the AST only breaks lines at \n here
+        offsets = [0, 0]
+        for line in source.split('\n'):
+            offsets.append(offsets[-1] + len(line) + 1)
+
+        def may_contain_candidate(stmt):
+            decorators = getattr(stmt, 'decorator_list', None) or []
+            first_line = min([stmt.lineno] + [d.lineno for d in decorators])
+            end = offsets[min(stmt.end_lineno + 1, len(offsets) - 1)]
+            return bool(self.matching_rules(self.find_anchors(source, offsets[first_line], end)))
+        return may_contain_candidate
+
+
+@functools.lru_cache(maxsize=16)
+def _cached_prefilter(rules):
+    return Prefilter(rules)
+
+
+def get_prefilter(rules=None):
+    """
+    Return a shared Prefilter for a set of transformation types (all by default).
+    The anchor table is built once per distinct rule set.
+    """
+    return _cached_prefilter(tuple(sorted(rules)) if rules is not None else None)
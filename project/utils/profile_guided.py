@@ -0,0 +1,356 @@
+"""
+Profile-guided sugaring: rank the functions of a module by measured time and
+apply only the performance-relevant rewrites in the hottest ones.
+
+Accepted profiles:
+- cProfile/profile output saved with `pstats.Stats.dump_stats` or
+  `python -m cProfile -o out.pstats` (raw bytes or base64 text); the dump is
+  read by a restricted marshal reader that only accepts the dicts, tuples,
+  strings and numbers pstats writes, never marshal.loads
+- The text report of line_profiler (`python -m line_profiler out.lprof`);
+  the pickled .lprof file itself is not loaded, since unpickling untrusted
+  uploads is unsafe
+"""
+
+import ast
+import base64
+import binascii
+import os
+import re
+import struct
+from typing import Dict, List, Any, Tuple, Optional
+
+from utils.text_edits import compute_text_edits
+
+# Rewrites that change how much work the interpreter does per iteration.
+# Everything else (ternaries, lambdas, with statements...) is cosmetic.
+PERFORMANCE_RULES = {
+    "list_comprehension",
+    "set_comprehension",
+    "dict_comprehension",
+    "sum_pattern",
+    "enumerate_pattern",
+}
+
+DEFAULT_BUDGET = 10
+
+LINE_PROFILER_FUNCTION = re.compile(
+    r"Total time:\s*([0-9.eE+-]+)\s*s\s*\n(?:File:\s*(.*?)\s*\n)?Function:\s*(\S+) at line (\d+)"
+)
+
+
+def _function_entry(filename, line, name, seconds):
+    return {
+        "file": filename or "",
+        "line": int(line),
+        "name": name.rsplit('.', 1)[-1],
+        "cumulative_time": float(seconds),
+    }
+
+
+# A pstats dump is {func: (cc, nc, tt, ct, {caller: (nc, cc, tt, ct)})}
+MAX_MARSHAL_DEPTH = 8
+
+# marshal type codes; the high bit of a code asks for the object to be remembered for back-references
+_FLAG_REF = 0x80
+_STRING_CODES = {ord('u'), ord('t'), ord('a'), ord('A')}
+_SHORT_STRING_CODES = {ord('z'), ord('Z')}
+
+
+class _PstatsReader:
+    """
+    Decode the subset of the marshal format that pstats dumps use.
+
+    Uploaded profiles are untrusted; marshal.loads would build code objects
+    and trusts lengths and references. Anything other than None, booleans,
+    ints, floats, str, tuples and dicts is rejected.
+    """
+
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.pos = 0
+        self.refs = []
+
+    def _take(self, size):
+        end = self.pos + size
+        if size < 0 or end > len(self.data):
+            raise ValueError("truncated pstats data")
+        chunk = self.data[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def _int32(self):
+        return struct.unpack('<i', self._take(4))[0]
+
+    def _remember(self, flagged, value):
+        if flagged:
+            self.refs.append(value)
+        return value
+
+    def read(self, depth=0):
+        if depth > MAX_MARSHAL_DEPTH:
+            raise ValueError("pstats data nested too deeply")
+        code = self._take(1)[0]
+        flagged = bool(code & _FLAG_REF)
+        code &= ~_FLAG_REF
+        if code == ord('N'):
+            return None
+        if code in (ord('T'), ord('F')):
+            return code == ord('T')
+        if code == ord('r'):
+            index = self._int32()
+            if not 0 <= index < len(self.refs) or self.refs[index] is None:
+                raise ValueError("invalid back-reference in pstats data")
+            return self.refs[index]
+        if code == ord('i'):
+            return self._remember(flagged, self._int32())
+        if code == ord('l'):
+            size = self._int32()
+            value = 0
+            for shift, digit in enumerate(struct.unpack(f'<{abs(size)}H', self._take(2 * abs(size)))):
+                value |= digit << (15 * shift)
+            return self._remember(flagged, -value if size < 0 else value)
+        if code == ord('g'):
+            return self._remember(flagged, struct.unpack('<d', self._take(8))[0])
+        if code == ord('f'):
+            try:
+                return self._remember(flagged, float(self._take(self._take(1)[0]).decode('ascii')))
+            except (UnicodeDecodeError, ValueError):
+                raise ValueError("invalid float in pstats data")
+        if code in _STRING_CODES or code in _SHORT_STRING_CODES:
+            size = self._take(1)[0] if code in _SHORT_STRING_CODES else self._int32()
+            encoding = 'utf-8' if code in (ord('u'), ord('t')) else 'latin-1'
+            try:
+                return self._remember(flagged, self._take(size).decode(encoding))
+            except UnicodeDecodeError:
+                raise ValueError("invalid string in pstats data")
+        if code in (ord('('), ord(')')):
+            size = self._take(1)[0] if code == ord(')') else self._int32()
+            # The slot is taken before the items, which may refer to later objects
+            slot = len(self.refs)
+            if flagged:
+                self.refs.append(None)
+            items = tuple(self.read(depth + 1) for _ in range(self._checked_size(size)))
+            if flagged:
+                self.refs[slot] = items
+            return items
+        if code == ord('{'):
+            result = self._remember(flagged, {})
+            while True:
+                if self.pos < len(self.data) and self.data[self.pos] == ord('0'):
+                    self.pos += 1
+                    return result
+                key = self.read(depth + 1)
+                if not isinstance(key, (tuple, str, int, float)) and key is not None:
+                    raise ValueError("unhashable key in pstats data")
+                result[key] = self.read(depth + 1)
+        raise ValueError(f"unexpected object type {chr(code)!r} in pstats data")
+
+    def _checked_size(self, size):
+        # Every item takes at least one byte, so a larger count is a lie
+        if size < 0 or size > len(self.data) - self.pos:
+            raise ValueError("truncated pstats data")
+        return size
+
+
+def _is_number(value, types):
+    return isinstance(value, types) and not isinstance(value, bool)
+
+
+def parse_pstats(data):
+    """
+    Read function timings from marshalled pstats data.
+
+    Returns:
+        List of {"file", "line", "name", "cumulative_time"} dictionaries
+
+    Raises:
+        ValueError: If the data is not a pstats dump
+    """
+    stats = _PstatsReader(data).read()
+    if not isinstance(stats, dict):
+        raise ValueError("not a pstats dump")
+
+    functions = []
+    for key, value in stats.items():
+        if not (isinstance(key, tuple) and len(key) == 3 and isinstance(value, tuple) and len(value) >= 4):
+            raise ValueError("not a pstats dump")
+        filename, line, name = key
+        if not (isinstance(filename, str) and isinstance(name, str) and _is_number(line, int)
+                and _is_number(value[3], (int, float))):
+            raise ValueError("not a pstats dump")
+        # Built-ins are recorded as ('~', 0, '<built-in method ...>')
+        if filename == '~' or name.startswith('<'):
+            continue
+        functions.append(_function_entry(filename, line, name, value[3]))
+    return functions
+
+
+def parse_line_profiler_text(text):
+    """
+    Read per-function totals from line_profiler's text report.
+
+    Returns:
+        List of {"file", "line", "name", "cumulative_time"} dictionaries
+    """
+    return [
+        _function_entry(filename, line, name, seconds)
+        for seconds, filename, name, line in LINE_PROFILER_FUNCTION.findall(text)
+    ]
+
+
+def load_profile(data):
+    """
+    Detect the profile format and extract function timings.
+
+    Args:
+        data: Profile contents as bytes, or str (line_profiler text or base64 pstats)
+
+    Returns:
+        List of function timing dictionaries
+
+    Raises:
+        ValueError: If the data is not a recognised profile
+    """
+    if isinstance(data, str):
+        if 'Function:' in data and 'Total time:' in data:
+            return parse_line_profiler_text(data)
+        try:
+            data = base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("profile must be line_profiler text or base64-encoded pstats data")
+    elif b'Function:' in data[:4096] and b'Total time:' in data[:4096]:
+        return parse_line_profiler_text(data.decode('utf-8', errors='replace'))
+
+    try:
+        return parse_pstats(data)
+    except (EOFError, TypeError, ValueError):
+        raise ValueError("unrecognised profile format")
+
+
+def load_profile_file(path):
+    """Load a profile from a .pstats file or a saved line_profiler report."""
+    with open(path, 'rb') as f:
+        return load_profile(f.read())
+
+
+def find_functions(tree):
+    """
+    List the functions defined in a module with their line spans.
+
+    Returns:
+        List of {"name", "qualname", "line", "first_line", "end_line"}; first_line
+        includes decorators, which is what profilers report
+    """
+    functions = []
+    stack = [(tree, '')]
+    while stack:
+        node, prefix = stack.pop()
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                decorators = [d.lineno for d in child.decorator_list]
+                functions.append({
+                    "name": child.name,
+                    "qualname": prefix + child.name,
+                    "line": child.lineno,
+                    "first_line": min([child.lineno] + decorators),
+                    "end_line": child.end_lineno,
+                })
+                stack.append((child, prefix + child.name + '.'))
+            elif isinstance(child, ast.ClassDef):
+                stack.append((child, prefix + child.name + '.'))
+            elif not isinstance(child, (ast.expr, ast.Lambda)):
+                stack.append((child, prefix))
+    return functions
+
+
+def rank_functions(functions, profile, filename=None):
+    """
+    Attach measured cumulative time to the module's functions, hottest first.
+
+    A profile entry matches a function when the names agree and the profiled
+    line is the function's def or decorator line. If the code changed since it
+    was profiled, a name that is unique in the module still matches.
+
+    Args:
+        functions: Output of find_functions
+        profile: Output of load_profile
+        filename: Only use profile entries whose file has this base name
+
+    Returns:
+        List of function dictionaries with "cumulative_time" and "share", hottest first
+    """
+    if filename:
+        profile = [entry for entry in profile if os.path.basename(entry["file"]) == os.path.basename(filename)]
+
+    name_counts = {}
+    for function in functions:
+        name_counts[function["name"]] = name_counts.get(function["name"], 0) + 1
+
+    timings = {}
+    for entry in profile:
+        candidates = [f for f in functions if f["name"] == entry["name"]]
+        exact = [f for f in candidates if entry["line"] in (f["line"], f["first_line"])]
+        if exact:
+            matched = exact[0]
+        elif len(candidates) == 1 and name_counts[entry["name"]] == 1:
+            matched = candidates[0]
+        else:
+            continue
+        key = matched["qualname"], matched["line"]
+        timings[key] = max(timings.get(key, 0.0), entry["cumulative_time"])
+
+    total = max(timings.values()) if timings else 0.0
+    ranked = []
+    for function in functions:
+        seconds = timings.get((function["qualname"], function["line"]))
+        if seconds is None:
+            continue
+        ranked.append(dict(function, cumulative_time=seconds, share=seconds / total if total else 0.0))
+    ranked.sort(key=lambda f: -f["cumulative_time"])
+    return ranked
+
+
+def _innermost_function(functions, line):
+    containing = [f for f in functions if f["line"] <= line <= f["end_line"]]
+    return max(containing, key=lambda f: f["line"]) if containing else None
+
+
+def profile_guided_edits(code, profile, budget=DEFAULT_BUDGET, filename=None, tree=None):
+    """
+    Select the performance-relevant sugaring edits in the hottest functions.
+
+    Args:
+        code: Python source code string
+        profile: Function timings from load_profile
+        budget: Maximum number of edits to apply
+        filename: Restrict the profile to entries for this file
+        tree: Already parsed module for `code`
+
+    Returns:
+        Tuple containing:
+        - Selected edits (each with "function" and "cumulative_time"), hottest first
+        - Ranked hot functions
+        - Number of candidate edits left out (cold, cosmetic or over budget)
+    """
+    if tree is None:
+        tree = ast.parse(code)
+    functions = find_functions(tree)
+    hot_functions = rank_functions(functions, profile, filename)
+    timing = {(f["qualname"], f["line"]): f["cumulative_time"] for f in hot_functions}
+
+    edits, _ = compute_text_edits(code, tree=tree)
+    candidates = []
+    for edit in edits:
+        if edit["rule"] not in PERFORMANCE_RULES:
+            continue
+        # Edits report 0-based lines; the AST spans are 1-based
+        function = _innermost_function(functions, edit["range"]["start"]["line"] + 1)
+        seconds = timing.get((function["qualname"], function["line"])) if function else None
+        if seconds is None:
+            continue
+        candidates.append(dict(edit, function=function["qualname"], cumulative_time=seconds))
+
+    candidates.sort(key=lambda edit: -edit["cumulative_time"])
+    selected = candidates[:budget] if budget is not None else candidates
+    return selected, hot_functions, len(edits) - len(selected)
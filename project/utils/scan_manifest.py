@@ -0,0 +1,239 @@
+"""
+Change manifest for incremental repository scans.
+
+Repeated CLI and batch runs over the same repository used to read, parse and
+analyze every file again. The manifest remembers two things in one SQLite
+file:
+
+- For every scanned path, its size, modification time and content hash. A
+  file whose size and mtime are unchanged is not even read: its stored hash
+  is reused.
+- For every content hash, the results of each analysis, stamped with the rule
+  set, the rulebook version and a fingerprint of the analyzer code they were
+  computed with. Identical files (vendored copies, generated boilerplate)
+  share one entry, and a result is only reused while the rules and the code
+  that produced it are current. Failed analyses are not stored.
+
+So a rescan of a mostly-unchanged repository is a stat per file plus the work
+for the files that actually changed. Like the shared result cache, every
+database failure is treated as a miss: the scan then simply does the work.
+"""
+
+import hashlib
+import marshal
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Dict, List, Any, Tuple, Optional
+
+MANIFEST_PATH_ENV = 'SYNTACTIC_SCAN_MANIFEST'
+
+# Changing the stored layout or the Python version invalidates the stored results
+MANIFEST_FORMAT = f"1-marshal{marshal.version}"
+
+BUSY_TIMEOUT_MS = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    content_hash TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    result BLOB NOT NULL,
+    PRIMARY KEY (content_hash, analysis)
+);
+"""
+
+
+def default_manifest_path():
+    """Manifest file to use: $SYNTACTIC_SCAN_MANIFEST, or one in the user's cache directory; 'off' disables it."""
+    path = os.environ.get(MANIFEST_PATH_ENV)
+    if path is None:
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(cache_home, 'syntactic', 'manifest.sqlite3')
+    return None if path.lower() in ('', 'off', 'none') else path
+
+
+def content_hash(data):
+    """Hash identifying a file's content."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def rules_fingerprint():
+    """Rule set, rulebook version and analyzer code a stored result was computed with."""
+    from server.etag import rule_set_fingerprint
+    from rules.rule_index import rulebook_version
+    from utils.fingerprint import code_fingerprint
+
+    # Analyses such as hotspots depend on neither the rules nor the rulebook, only on their code
+    return f"{rule_set_fingerprint()}:{rulebook_version()}:{code_fingerprint()}:{MANIFEST_FORMAT}"
+
+
+class ScanManifest:
+    """
+    Path-to-hash manifest and content-addressed result store.
+
+    Args:
+        path: Database file
+        fingerprint: Stamp of the current rules (defaults to rules_fingerprint())
+    """
+
+    def __init__(self, path, fingerprint=None):
+        self.path = path
+        self._fingerprint = fingerprint
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._disabled = False
+        self.stats = {"unchanged": 0, "hashed": 0, "hits": 0, "misses": 0, "errors": 0}
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            self._fingerprint = rules_fingerprint()
+        return self._fingerprint
+
+    def _connection(self):
+        if self._disabled:
+            return None
+        connection = getattr(self._local, 'connection', None)
+        # A connection must not cross a fork
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000.0,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.executescript(SCHEMA)
+        except (OSError, sqlite3.Error):
+            self._count("errors")
+            # Unusable location: scan without the manifest
+            self._disabled = True
+            return None
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def file_hash(self, path):
+        """
+        Content hash of a file, reusing the stored one while its size and mtime are unchanged.
+
+        Returns:
+            Tuple of (content hash, file bytes or None when the file was not read)
+
+        Raises:
+            OSError: When the file cannot be read
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        connection = self._connection()
+        if connection is not None:
+            try:
+                row = connection.execute("SELECT size, mtime_ns, content_hash FROM files WHERE path = ?",
+                                         (path,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+                self._count("unchanged")
+                return row[2], None
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = content_hash(data)
+        self._count("hashed")
+        if connection is not None:
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)",
+                    (path, stat.st_size, stat.st_mtime_ns, digest))
+            except sqlite3.Error:
+                self._count("errors")
+        return digest, data
+
+    def get(self, digest, analysis):
+        """Stored result of an analysis of some content, or None if absent or computed with other rules."""
+        connection = self._connection()
+        if connection is None:
+            return None
+        try:
+            row = connection.execute(
+                "SELECT fingerprint, result FROM results WHERE content_hash = ? AND analysis = ?",
+                (digest, analysis)).fetchone()
+            result = marshal.loads(zlib.decompress(row[1])) if row is not None and row[0] == self.fingerprint else None
+        except (sqlite3.Error, zlib.error, ValueError, EOFError, TypeError):
+            self._count("errors")
+            return None
+        self._count("hits" if result is not None else "misses")
+        return result
+
+    def put(self, digest, analysis, result):
+        """Store the result of an analysis of some content."""
+        connection = self._connection()
+        if connection is None:
+            return
+        try:
+            blob = zlib.compress(marshal.dumps(result))
+            connection.execute(
+                "INSERT OR REPLACE INTO results (content_hash, analysis, fingerprint, result) VALUES (?, ?, ?, ?)",
+                (digest, analysis, self.fingerprint, blob))
+        except (sqlite3.Error, ValueError):
+            self._count("errors")
+
+    def prune(self):
+        """Drop results computed with other rules; returns how many were removed."""
+        connection = self._connection()
+        if connection is None:
+            return 0
+        try:
+            return connection.execute("DELETE FROM results WHERE fingerprint != ?", (self.fingerprint,)).rowcount
+        except sqlite3.Error:
+            self._count("errors")
+            return 0
+
+    def cached(self, path, analysis, compute):
+        """
+        Result of an analysis of a file, computed only when its content or the rules changed.
+
+        Args:
+            path: File to analyze
+            analysis: Name of the analysis and its options, e.g. "findings:prefilter"
+            compute: Callable taking the decoded source and returning a marshallable result
+
+        Returns:
+            The stored or computed result; a result with an "error" key is
+            returned but not stored, so the file is analyzed again next time
+
+        Raises:
+            OSError, UnicodeDecodeError: When the file cannot be read
+        """
+        digest, data = self.file_hash(path)
+        result = self.get(digest, analysis)
+        if result is not None:
+            return result
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        result = compute(data.decode('utf-8'))
+        if not (isinstance(result, dict) and 'error' in result):
+            self.put(digest, analysis, result)
+        return result
+
+
+def open_manifest(path=None):
+    """ScanManifest at path (or the default location), or None when the manifest is disabled."""
+    path = path if path is not None else default_manifest_path()
+    if path is None or path.lower() in ('', 'off', 'none'):
+        return None
+    return ScanManifest(path)
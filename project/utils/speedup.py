@@ -0,0 +1,291 @@
+"""
+Measured speedups for suggested rewrites.
+
+Each rewritten snippet is extracted together with its replacement, inputs are
+synthesized for its free variables, and both versions are timed with timeit in
+a separate, isolated Python process (see speedup_worker.py). The result says
+how much faster (or slower) the sugared version is, how its peak memory
+compares, and whether both versions produced the same values.
+"""
+
+import ast
+import builtins
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+from typing import Dict, List, Any, Tuple, Optional
+
+from utils.text_edits import position_to_offset
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'speedup_worker.py')
+
+# Size of synthesized collections
+INPUT_SIZE = 1000
+
+# A rewrite must be at least this much slower than the original to count as slower;
+# smaller differences are timing noise
+SLOWER_THRESHOLD = 0.95
+
+DEFAULT_TIMEOUT = 30.0
+MAX_MEASUREMENTS = 20
+
+# Snippets that touch these are never executed
+UNSAFE_NAMES = {
+    '__import__', 'open', 'exec', 'eval', 'compile', 'input', 'breakpoint',
+    'globals', 'locals', 'vars', 'getattr', 'setattr', 'delattr', 'exit', 'quit',
+}
+
+# Calls whose argument is consumed as an iterable
+ITERABLE_CONSUMERS = {'sum', 'any', 'all', 'enumerate', 'zip', 'sorted', 'list', 'set', 'tuple',
+                      'dict', 'len', 'min', 'max', 'reversed', 'iter', 'map', 'filter'}
+
+BUILTIN_NAMES = set(dir(builtins))
+
+
+def extract_snippets(code, edit):
+    """
+    Cut the original statement(s) covered by an edit and the replacement, both dedented.
+
+    Returns:
+        Tuple of (original snippet, sugared snippet)
+    """
+    lines = code.split('\n')
+    start = edit["range"]["start"]
+    end = edit["range"]["end"]
+    line_start = position_to_offset(lines, {"line": start["line"], "character": 0})
+    prefix = code[line_start:position_to_offset(lines, start)]
+    original = prefix + code[position_to_offset(lines, start):position_to_offset(lines, end)]
+    sugared = prefix + edit["newText"]
+    return textwrap.dedent(original), textwrap.dedent(sugared)
+
+
+def analyze_names(tree):
+    """
+    Find the free variables of a snippet and how they are used.
+
+    Returns:
+        Tuple of (free variable -> role, names assigned by the snippet); roles are
+        'iterable', 'callable', 'object' (attribute access) or 'value'
+    """
+    assigned = set()
+    loaded = []
+    roles = {}
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Store):
+                assigned.add(node.id)
+            elif isinstance(node.ctx, ast.Load):
+                loaded.append(node.id)
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name):
+            # An augmented assignment reads its target first
+            loaded.append(node.target.id)
+        elif isinstance(node, (ast.arg,)):
+            assigned.add(node.arg)
+
+    def mark(expr, role):
+        if isinstance(expr, ast.Name):
+            roles.setdefault(expr.id, role)
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.For, ast.comprehension)):
+            mark(node.iter, 'iterable')
+        elif isinstance(node, ast.Subscript):
+            mark(node.value, 'iterable')
+        elif isinstance(node, ast.Compare) and any(isinstance(op, (ast.In, ast.NotIn)) for op in node.ops):
+            for comparator in node.comparators:
+                mark(comparator, 'iterable')
+        elif isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name) and node.func.id in ITERABLE_CONSUMERS:
+                for arg in node.args:
+                    mark(arg, 'iterable')
+            mark(node.func, 'callable')
+        elif isinstance(node, ast.Attribute):
+            mark(node.value, 'object')
+
+    free = {}
+    for name in loaded:
+        if name in assigned or name in BUILTIN_NAMES or name in free:
+            continue
+        free[name] = roles.get(name, 'value')
+    return free, assigned
+
+
+def synthesize_inputs(free):
+    """
+    Build setup source that binds every free variable to a synthetic value.
+
+    Returns:
+        Setup source string, or None if some variable can't be synthesized
+    """
+    setup = []
+    for name, role in free.items():
+        if role == 'iterable':
+            value = f"list(range({INPUT_SIZE}))"
+        elif role == 'callable':
+            value = "lambda *args, **kwargs: args[0] if args else 0"
+        elif role == 'object':
+            # Attribute access on unknown objects can't be faked meaningfully
+            return None
+        else:
+            value = str(INPUT_SIZE // 2)
+        setup.append(f"{name} = {value}")
+    return "\n".join(setup) + "\n"
+
+
+def assigned_targets(tree):
+    """Names bound by plain or augmented assignments (not loop or comprehension variables)."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign):
+            targets = node.targets
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)):
+            targets = [node.target]
+        else:
+            continue
+        for target in targets:
+            for child in ast.walk(target):
+                if isinstance(child, ast.Name):
+                    names.add(child.id)
+    return names
+
+
+def _is_unsafe(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.Global, ast.Nonlocal, ast.FunctionDef,
+                             ast.AsyncFunctionDef, ast.ClassDef, ast.Await, ast.Yield, ast.YieldFrom)):
+            return True
+        if isinstance(node, ast.Name) and node.id in UNSAFE_NAMES:
+            return True
+        if isinstance(node, ast.Attribute) and node.attr.startswith('__'):
+            return True
+    return False
+
+
+def _wrap_function(name, snippet, params, outputs):
+    body = textwrap.indent(snippet.rstrip('\n'), '    ')
+    returned = ', '.join(outputs) + (',' if len(outputs) == 1 else '')
+    return f"def {name}({', '.join(params)}):\n{body}\n    return ({returned})\n"
+
+
+def build_job(code, edit):
+    """
+    Prepare a timing job for one edit.
+
+    Returns:
+        Tuple of (job dictionary or None, reason it can't be measured)
+    """
+    original, sugared = extract_snippets(code, edit)
+    try:
+        original_tree = ast.parse(original)
+        sugared_tree = ast.parse(sugared)
+    except SyntaxError:
+        return None, "snippet does not parse on its own"
+
+    if _is_unsafe(original_tree) or _is_unsafe(sugared_tree):
+        return None, "snippet defines functions, imports or uses restricted built-ins"
+
+    free, _ = analyze_names(original_tree)
+    sugared_free, _ = analyze_names(sugared_tree)
+    for name, role in sugared_free.items():
+        free.setdefault(name, role)
+
+    setup = synthesize_inputs(free)
+    if setup is None:
+        return None, "inputs can't be synthesized for attribute access on free variables"
+
+    params = list(free)
+    # Compare the names both versions leave behind (e.g. the built list), not loop variables
+    outputs = sorted((assigned_targets(original_tree) & assigned_targets(sugared_tree)) - set(params)) or ['None']
+    return {
+        "setup": setup,
+        "original": _wrap_function("_original_snippet", original, params, outputs),
+        "sugared": _wrap_function("_sugared_snippet", sugared, params, outputs),
+        "original_name": "_original_snippet",
+        "sugared_name": "_sugared_snippet",
+        "params": params,
+    }, None
+
+
+def run_worker(jobs, timeout=DEFAULT_TIMEOUT):
+    """
+    Time the jobs in a separate isolated interpreter.
+
+    Returns:
+        List of results in job order; jobs that didn't finish get a timeout status
+    """
+    if not jobs:
+        return []
+    # The worker sandboxes itself (see speedup_worker.sandbox) and runs in an empty directory
+    cpu_seconds = str(int(timeout) + 1)
+    try:
+        with tempfile.TemporaryDirectory() as scratch:
+            completed = subprocess.run(
+                [sys.executable, '-I', WORKER_PATH, cpu_seconds],
+                input=json.dumps(jobs), capture_output=True, text=True, timeout=timeout, cwd=scratch
+            )
+        output = completed.stdout
+    except subprocess.TimeoutExpired as e:
+        output = e.stdout or ''
+        if isinstance(output, bytes):
+            output = output.decode('utf-8', errors='replace')
+
+    results = []
+    for line in output.splitlines():
+        try:
+            results.append(json.loads(line))
+        except ValueError:
+            break
+    while len(results) < len(jobs):
+        results.append({"status": "timeout", "error": f"worker did not finish within {timeout}s"})
+    return results
+
+
+def summarize(result):
+    """Turn raw worker timings into speedup, memory delta and a slower flag."""
+    if result.get("status") != "measured":
+        return dict(result, speedup=None, memory_delta_bytes=None, slower=False)
+    speedup = result["original_ns"] / result["sugared_ns"] if result["sugared_ns"] else None
+    return dict(
+        result,
+        speedup=round(speedup, 3) if speedup else None,
+        memory_delta_bytes=result["sugared_peak_bytes"] - result["original_peak_bytes"],
+        slower=bool(speedup and speedup < SLOWER_THRESHOLD),
+    )
+
+
+def measure_edits(code, edits, timeout=DEFAULT_TIMEOUT, max_measurements=MAX_MEASUREMENTS):
+    """
+    Measure the speedup of each edit's rewrite.
+
+    Args:
+        code: Source the edits apply to
+        edits: Edits from compute_text_edits (or a selection of them)
+        timeout: Seconds allowed for the whole worker run
+        max_measurements: Edits beyond this many are reported as skipped
+
+    Returns:
+        List of measurement dictionaries aligned with `edits`, each with "status",
+        "speedup" (original time / sugared time), "memory_delta_bytes" (sugared
+        peak minus original peak) and "slower"
+    """
+    measurements = [None] * len(edits)
+    jobs = []
+    job_indexes = []
+    for index, edit in enumerate(edits):
+        if len(jobs) >= max_measurements:
+            measurements[index] = {"status": "skipped", "error": "measurement limit reached"}
+            continue
+        job, reason = build_job(code, edit)
+        if job is None:
+            measurements[index] = {"status": "unmeasurable", "error": reason}
+            continue
+        jobs.append(job)
+        job_indexes.append(index)
+
+    for index, result in zip(job_indexes, run_worker(jobs, timeout)):
+        measurements[index] = result
+    return [summarize(measurement) for measurement in measurements]
@@ -0,0 +1,132 @@
+"""
+Isolated timing worker for measured speedups.
+
+Run as `python -I speedup_worker.py`: reads a JSON list of jobs on stdin and
+writes one JSON result per job to stdout. Only the standard library is
+imported so the worker can run without the project on sys.path.
+
+Each job carries two function definitions (original and sugared snippet), the
+source that builds the synthesized inputs, and the parameter names to pass.
+
+Before running any job the worker sandboxes itself (POSIX only): address
+space, CPU time, new processes, file sizes and new file descriptors are all
+limited, so a snippet can neither run away nor write to the filesystem. The
+limits are set here, in the child, rather than through preexec_fn, which is
+not safe to use from a threaded server.
+"""
+
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+REPEAT = 3
+
+# Address space of the worker
+MEMORY_LIMIT = 1 << 30
+DEFAULT_CPU_SECONDS = 30
+
+
+def _peak_memory(function, args):
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _comparable(value):
+    # Iterators compare by identity; compare what they produce instead
+    if hasattr(value, '__next__'):
+        return list(value)
+    return value
+
+
+def run_job(job):
+    namespace = {}
+    exec(job["setup"], namespace)
+    exec(job["original"], namespace)
+    exec(job["sugared"], namespace)
+    original = namespace[job["original_name"]]
+    sugared = namespace[job["sugared_name"]]
+    args = [namespace[name] for name in job["params"]]
+
+    try:
+        equivalent = _comparable(original(*args)) == _comparable(sugared(*args))
+    except Exception:
+        equivalent = None
+
+    original_timer = timeit.Timer(lambda: original(*args))
+    sugared_timer = timeit.Timer(lambda: sugared(*args))
+    # Each side gets its own loop count so a much slower rewrite can't stall the worker
+    original_number, _ = original_timer.autorange()
+    sugared_number, _ = sugared_timer.autorange()
+
+    # Interleave the runs so drift (frequency scaling, other load) hits both sides
+    original_best = sugared_best = float('inf')
+    for _ in range(REPEAT):
+        original_best = min(original_best, original_timer.timeit(original_number) / original_number)
+        sugared_best = min(sugared_best, sugared_timer.timeit(sugared_number) / sugared_number)
+
+    return {
+        "status": "measured",
+        "original_ns": original_best * 1e9,
+        "sugared_ns": sugared_best * 1e9,
+        "original_peak_bytes": _peak_memory(original, args),
+        "sugared_peak_bytes": _peak_memory(sugared, args),
+        "equivalent": equivalent,
+    }
+
+
+def sandbox(cpu_seconds):
+    """
+    Limit this process before it runs untrusted snippets.
+
+    Args:
+        cpu_seconds: CPU time after which the kernel kills the worker
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    # Every file the worker needs is open by now: no new descriptors, no file
+    # growth (writes fail) and no child processes
+    highest_fd = max(sys.stdin.fileno(), sys.__stdout__.fileno(), sys.stderr.fileno(), sys.stdout.fileno())
+    limits = [
+        ('RLIMIT_AS', MEMORY_LIMIT),
+        ('RLIMIT_CPU', cpu_seconds),
+        ('RLIMIT_NPROC', 0),
+        ('RLIMIT_FSIZE', 0),
+        ('RLIMIT_NOFILE', highest_fd + 1),
+    ]
+    for name, value in limits:
+        limit = getattr(resource, name, None)
+        if limit is None:
+            continue
+        try:
+            resource.setrlimit(limit, (value, value))
+        except (ValueError, OSError):
+            pass
+
+
+def main():
+    cpu_seconds = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CPU_SECONDS
+    jobs = json.load(sys.stdin)
+    results = sys.stdout
+    # Anything the snippets print must not end up in the result stream
+    sys.stdout = open(os.devnull, 'w')
+    sandbox(cpu_seconds)
+    for job in jobs:
+        try:
+            result = run_job(job)
+        except Exception as e:
+            result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+        results.write(json.dumps(result) + "\n")
+        results.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Startup profiling helpers.
+Reports per-module import cost the way `python -X importtime` does, and measures
+how long the Flask server takes to answer its first request.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Any, Optional
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr_text):
+    """
+    Parse the stderr output of `python -X importtime`.
+
+    Args:
+        stderr_text: Raw stderr text written by the interpreter
+
+    Returns:
+        List of dictionaries with module, self_us, cumulative_us and depth
+    """
+    entries = []
+    for line in stderr_text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            # Header line ("self [us] | cumulative | imported package")
+            continue
+        raw_name = parts[2].rstrip()
+        name = raw_name.lstrip()
+        entries.append({
+            "module": name,
+            "self_us": self_us,
+            "cumulative_us": cumulative_us,
+            "depth": (len(raw_name) - len(name)) // 2,
+        })
+    return entries
+
+
+def import_time_report(module='app', top=20):
+    """
+    Import a module in a fresh interpreter with -X importtime and summarize the result.
+
+    Args:
+        module: Module to import (relative to the project directory)
+        top: Number of most expensive modules to include
+
+    Returns:
+        Dictionary with the total import time and the slowest modules
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True
+    )
+    entries = parse_importtime(result.stderr)
+    total_us = sum(entry["self_us"] for entry in entries)
+    slowest = sorted(entries, key=lambda entry: entry["cumulative_us"], reverse=True)[:top]
+
+    return {
+        "module": module,
+        "ok": result.returncode == 0,
+        "total_ms": total_us / 1000.0,
+        "slowest": slowest,
+    }
+
+
+def format_import_time_report(report):
+    """Format an import_time_report() result as a plain-text table."""
+    lines = [f"Import of '{report['module']}' took {report['total_ms']:.1f} ms"]
+    lines.append(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for entry in report["slowest"]:
+        lines.append(
+            f"{entry['cumulative_us'] / 1000.0:>14.1f} {entry['self_us'] / 1000.0:>9.1f}  "
+            f"{'  ' * entry['depth']}{entry['module']}"
+        )
+    return "\n".join(lines)
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(path='/', timeout=10.0, port=None):
+    """
+    Start the Flask app in a subprocess and time how long it takes to answer a request.
+
+    Args:
+        path: URL path to request
+        timeout: Seconds to wait before giving up
+        port: Port to bind; a free port is picked if omitted
+
+    Returns:
+        Seconds from process spawn to the first successful response, or None on timeout
+    """
+    port = port or _free_port()
+    code = f"import app; app.app.run(host='127.0.0.1', port={port}, debug=False, use_reloader=False)"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', code],
+        cwd=PROJECT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        url = f"http://127.0.0.1:{port}{path}"
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1.0) as response:
+                    response.read()
+                return time.perf_counter() - start
+            except OSError:
+                if process.poll() is not None:
+                    return None
+                time.sleep(0.005)
+        return None
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == '__main__':
+    print(format_import_time_report(import_time_report(sys.argv[1] if len(sys.argv) > 1 else 'app')))
+    elapsed = measure_first_response()
+    if elapsed is None:
+        print("\nServer did not respond")
+    else:
+        print(f"\nFirst response after {elapsed * 1000:.0f} ms")
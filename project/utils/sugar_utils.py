@@ -7,6 +7,8 @@ import ast
 import astunparse
 from typing import Dict, List, Any, Tuple, Optional
 
+from rules.rule_index import PLACEHOLDER_TRANSFORMATIONS
+
 # Pattern matching utilities
 def match_list_comprehension(node):
     """
@@ -142,13 +144,9 @@ def match_ternary_operator(node):
     if len(if_assign.targets) != 1 or len(else_assign.targets) != 1:
         return False
     
-    # Get the target names as strings for comparison
+    # Compare the targets structurally (ast.dump is far cheaper than unparsing)
     try:
-        if_target = astunparse.unparse(if_assign.targets[0]).strip()
-        else_target = astunparse.unparse(else_assign.targets[0]).strip()
-        
-        # Check if they're the same target
-        return if_target == else_target
+        return ast.dump(if_assign.targets[0]) == ast.dump(else_assign.targets[0])
     except:
         return False
 
@@ -262,6 +260,72 @@ def match_find_target_pattern(node):
     
     return False
 
+def match_for_loop_sugar(node):
+    """
+    Return the transformation type SugarTransformer would apply to a for loop, or None.
+    Checks the matchers in the same order as SugarTransformer.visit_For.
+    """
+    if match_list_comprehension(node):
+        return "list_comprehension"
+    if match_set_comprehension(node):
+        return "set_comprehension"
+    if match_sum_pattern(node):
+        return "sum_pattern"
+    if match_find_target_pattern(node):
+        return "find_target_pattern"
+    if match_dict_comprehension(node):
+        return "dict_comprehension"
+    if match_enumerate_pattern(node):
+        return "enumerate_pattern"
+    return None
+
+def detect_sugar_candidates(statements):
+    """
+    Find sugar opportunities in a list of statements without building or unparsing any code.
+    
+    Only the match_* predicates run, so this is the cheap path for diagnostics and scans.
+    Patterns that are recognised but never rewritten (PLACEHOLDER_TRANSFORMATIONS)
+    are left out, since no code action could act on them.
+    
+    Args:
+        statements: List of AST statement nodes (e.g. a module body)
+        
+    Returns:
+        List of dictionaries with the transformation type and the statement's span
+    """
+    candidates = []
+    stack = list(reversed(statements))
+    while stack:
+        node = stack.pop()
+        kind = None
+        if isinstance(node, ast.For):
+            kind = match_for_loop_sugar(node)
+        elif isinstance(node, ast.If):
+            if match_ternary_operator(node):
+                kind = "ternary_operator"
+        elif isinstance(node, ast.FunctionDef):
+            if match_generator_expression(node):
+                kind = "generator_expression"
+        
+        if kind and kind not in PLACEHOLDER_TRANSFORMATIONS:
+            candidates.append({
+                "type": kind,
+                "lineno": node.lineno,
+                "col_offset": node.col_offset,
+                "end_lineno": getattr(node, 'end_lineno', node.lineno),
+                "end_col_offset": getattr(node, 'end_col_offset', node.col_offset),
+            })
+        
+        # Nested blocks are searched too, in source order
+        children = []
+        for field in ('body', 'orelse', 'finalbody', 'handlers'):
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                children.extend(child for child in value if isinstance(child, (ast.stmt, ast.excepthandler)))
+        stack.extend(reversed(children))
+    
+    return candidates
+
 # Common functionality for error handling
 def handle_code_errors(code, error):
     """
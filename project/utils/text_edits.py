@@ -0,0 +1,323 @@
+"""
+Range-scoped sugaring that returns minimal text edits instead of a rewritten file.
+
+Only statements that lie inside the requested line range are matched, and each
+rewrite is reported as an edit covering just the original statement's span (plus
+the redundant container initialization right before it, when that is removed too).
+For diff-scoped requests the range is a list of changed hunks instead, and every
+statement overlapping one of them is matched (see utils/diff_hunks.py).
+Positions follow the Language Server Protocol: 0-based lines and UTF-16 character
+offsets, so editors can apply the edits directly.
+"""
+
+import ast
+import time
+import astunparse
+from typing import Dict, List, Any, Tuple, Optional
+
+from transformers.sugar_transformer import SugarTransformer
+from transformers.redundant_assignment_cleaner import is_empty_initialization
+from utils.cost_model import infer_container_kinds
+
+# Statement fields that hold nested statement lists
+BODY_FIELDS = ('body', 'orelse', 'finalbody', 'handlers')
+
+
+class ShallowSugarTransformer(SugarTransformer):
+    """
+    SugarTransformer that only rewrites the node it is given, never its children.
+    The caller walks nested statement lists itself so every edit stays minimal.
+    """
+
+    def __init__(self, rules=None, module=None, enabled=None, estimate_cost=False, timings=None):
+        super().__init__(rules, enabled, estimate_cost)
+        self.module = module
+        self.scope = None  # Top-level statement whose nested statements are being visited
+        self.timings = timings  # Seconds spent matching each rule, accumulated when a dict is given
+        self._timed = None  # (rule, start) of the rule being matched
+        self._kinds_cache = {}
+
+    def generic_visit(self, node):
+        return node
+
+    def visit(self, node):
+        try:
+            return super().visit(node)
+        finally:
+            if self.timings is not None:
+                self._charge(None)
+
+    def _enabled(self, rule):
+        # Each rule's check is followed by its matcher, so the time until the next
+        # check (or the end of the visit) is charged to that rule
+        enabled = super()._enabled(rule)
+        if self.timings is not None:
+            self._charge(rule if enabled else None)
+        return enabled
+
+    def _charge(self, rule):
+        now = time.perf_counter()
+        if self._timed is not None:
+            previous, started = self._timed
+            self.timings[previous] = self.timings.get(previous, 0.0) + now - started
+        self._timed = None if rule is None else (rule, now)
+
+    def _cost_kinds(self):
+        # Inferred lazily from the module-level assignments and the current top-level
+        # statement, so statements without rewrites never pay for it
+        if self.module is None or self.scope is None:
+            return self.container_kinds
+        key = id(self.scope)
+        if key not in self._kinds_cache:
+            module_assignments = [stmt for stmt in self.module.body if isinstance(stmt, ast.Assign)]
+            kinds = infer_container_kinds(module_assignments)
+            kinds.update(infer_container_kinds([self.scope]))
+            self._kinds_cache = {key: kinds}
+        return self._kinds_cache[key]
+
+
+def split_lines(code):
+    """
+    Split source into lines the way AST line numbers and LSP positions count them.
+
+    Only '\n' ends a line (a '\r' before it is dropped): str.splitlines also
+    breaks at form feeds, '\x1c'-'\x1e' and '\u2028', which Python's tokenizer
+    does not, and would shift every following line.
+    """
+    return [line[:-1] if line.endswith('\r') else line for line in code.split('\n')]
+
+
+def to_position(lines, lineno, col_offset):
+    """
+    Convert an AST position (1-based line, UTF-8 byte column) to an LSP position.
+
+    Args:
+        lines: Source lines without line endings
+        lineno: 1-based line number from the AST
+        col_offset: UTF-8 byte offset from the AST
+
+    Returns:
+        Dictionary with 0-based line and UTF-16 character offset
+    """
+    line_index = lineno - 1
+    if line_index >= len(lines):
+        return {"line": line_index, "character": 0}
+    prefix = lines[line_index].encode('utf-8')[:col_offset].decode('utf-8', errors='ignore')
+    return {"line": line_index, "character": len(prefix.encode('utf-16-le')) // 2}
+
+
+def statement_in_range(stmt, start_line=None, end_line=None):
+    """Check whether a statement lies entirely inside the 1-based inclusive line range."""
+    if start_line is not None and stmt.lineno < start_line:
+        return False
+    if end_line is not None and getattr(stmt, 'end_lineno', stmt.lineno) > end_line:
+        return False
+    return True
+
+
+def statement_overlaps_range(stmt, start_line=None, end_line=None):
+    """Check whether a statement shares at least one line with the range."""
+    if start_line is not None and getattr(stmt, 'end_lineno', stmt.lineno) < start_line:
+        return False
+    if end_line is not None and stmt.lineno > end_line:
+        return False
+    return True
+
+
+def _overlaps_any(stmt, ranges):
+    return any(statement_overlaps_range(stmt, start_line, end_line) for start_line, end_line in ranges)
+
+
+def _inside_any(stmt, ranges):
+    return any(statement_in_range(stmt, start_line, end_line) for start_line, end_line in ranges)
+
+
+def _render_statement(node, indent):
+    """Unparse a replacement statement and indent its continuation lines."""
+    ast.fix_missing_locations(node)
+    text_lines = split_lines(astunparse.unparse(node).strip('\n'))
+    return '\n'.join([text_lines[0]] + [indent + line for line in text_lines[1:]])
+
+
+def _assigned_name(node):
+    if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+        return node.targets[0].id
+    return None
+
+
+def _redundant_initialization(previous, replacement, ranges, enclosing):
+    """Return the preceding statement if the replacement makes it a dead initialization."""
+    target = _assigned_name(replacement)
+    if (previous is None or target is None or _assigned_name(previous) != target or
+            not is_empty_initialization(previous.value)):
+        return None
+    if not enclosing and not _inside_any(previous, ranges):
+        return None
+    return previous
+
+
+def _collect_edits(statements, lines, transformer, ranges, edits, enclosing=False, candidate=None, overlapping=False,
+                   fits=None):
+    previous = None
+    top_level = transformer.scope is None
+    for stmt in statements:
+        if top_level:
+            if fits is not None and _overlaps_any(stmt, ranges) and not fits(stmt):
+                transformer.scope = None
+                return stmt
+            transformer.scope = stmt
+        if not _overlaps_any(stmt, ranges):
+            previous = stmt
+            continue
+        # Plain assignments are still visited: the transformer tracks initializations from them
+        if candidate and not isinstance(stmt, ast.Assign) and not candidate(stmt):
+            previous = stmt
+            continue
+
+        replacement = None
+        rule = None
+        if enclosing or overlapping or _inside_any(stmt, ranges):
+            recorded = len(transformer.transformations)
+            result = transformer.visit(stmt)
+            if result is not stmt and isinstance(result, ast.stmt):
+                replacement = result
+                rule = transformer.transformations[recorded]["type"] if len(transformer.transformations) > recorded else None
+
+        if replacement is not None:
+            first = _redundant_initialization(previous, replacement, ranges, enclosing or overlapping) or stmt
+            line = lines[stmt.lineno - 1]
+            indent = line[:len(line) - len(line.lstrip())]
+            edits.append({
+                "range": {
+                    "start": to_position(lines, first.lineno, first.col_offset),
+                    "end": to_position(lines, stmt.end_lineno, stmt.end_col_offset),
+                },
+                "newText": _render_statement(replacement, indent),
+                "rule": rule,
+            })
+        if replacement is None or enclosing:
+            # Look for rewrites in nested blocks
+            for field in BODY_FIELDS:
+                children = getattr(stmt, field, None)
+                if children:
+                    _collect_edits(children, lines, transformer, ranges, edits, enclosing, overlapping=overlapping)
+        previous = stmt
+    if top_level:
+        transformer.scope = None
+    return None
+
+
+def compute_text_edits(code, start_line=None, end_line=None, rules=None, tree=None, enclosing=False,
+                       prefilter=None, enabled=None, estimate_cost=False, hunks=None):
+    """
+    Compute minimal sugaring edits for the statements inside a line range.
+
+    Args:
+        code: Full Python source of the document
+        start_line: First 1-based line of the range (None for the start of the file)
+        end_line: Last 1-based line of the range, inclusive (None for the end of the file)
+        rules: Transformation rules passed to SugarTransformer
+        tree: Already parsed module for `code`, to skip re-parsing
+        enclosing: Also offer rewrites of statements that only overlap the range
+            (e.g. the loop around a cursor position); the edits may then overlap
+        prefilter: Optional utils.prefilter.Prefilter; source without the anchors
+            of any enabled rule is not parsed at all, and top-level statements
+            without them are not visited
+        enabled: Transformation types to try (None for all)
+        estimate_cost: Attach the static cost model to each transformation
+            (the transformations' "cost" is None otherwise); off by default,
+            since only findings, the thorough tier and requests asking for
+            costs read it
+        hunks: List of (start_line, end_line) changed line ranges, replacing
+            start_line/end_line; every statement overlapping one of them is
+            matched, but edits never overlap. An empty list matches nothing.
+
+    Returns:
+        Tuple containing:
+        - List of edits ({"range", "newText", "rule"}) in document order
+        - List of transformations recorded by the transformer, each with its
+          static "cost" estimate when requested (see utils/cost_model.py)
+    """
+    if hunks is not None and not hunks:
+        return [], []
+    candidate = None
+    if prefilter is not None:
+        if not prefilter.may_match(code):
+            return [], []
+        candidate = prefilter.block_filter(code)
+    if tree is None:
+        tree = ast.parse(code)
+    lines = split_lines(code)
+    transformer = ShallowSugarTransformer(rules, module=tree, enabled=enabled, estimate_cost=estimate_cost)
+    edits = []
+    ranges = hunks if hunks is not None else [(start_line, end_line)]
+    _collect_edits(tree.body, lines, transformer, ranges, edits, enclosing, candidate, overlapping=hunks is not None)
+    return edits, transformer.transformations
+
+
+def compute_text_edits_until(code, fits, start_line=None, tree=None, prefilter=None, enabled=None, timings=None):
+    """
+    Compute sugaring edits top-level statement by statement, while there is time.
+
+    One pass tries every enabled rule on each statement, so stopping early
+    leaves out statements rather than rules.
+
+    Args:
+        code: Full Python source of the document
+        fits: Callable taking the next top-level statement and returning
+            whether to visit it; the pass stops at the first one it rejects
+        start_line: First 1-based line to visit (None for the start of the file)
+        tree: Already parsed module for `code`
+        prefilter: Optional utils.prefilter.Prefilter (see compute_text_edits)
+        enabled: Transformation types to try (None for all)
+        timings: Optional dict the seconds spent matching each rule are added to
+
+    Returns:
+        Tuple of (edits in document order, 1-based first line of the statement
+        the pass stopped at, or None when it reached the end)
+    """
+    candidate = None
+    if prefilter is not None:
+        if not prefilter.may_match(code):
+            return [], None
+        candidate = prefilter.block_filter(code)
+    if tree is None:
+        tree = ast.parse(code)
+    transformer = ShallowSugarTransformer(module=tree, enabled=enabled, timings=timings)
+    edits = []
+    stopped = _collect_edits(tree.body, split_lines(code), transformer, [(start_line, None)], edits,
+                             candidate=candidate, fits=fits)
+    return edits, None if stopped is None else stopped.lineno
+
+
+def position_to_offset(lines, position):
+    """
+    Convert an LSP position to an index into the source string.
+
+    Args:
+        lines: Source split on '\n' with the '\r' of CRLF endings kept, since
+            offsets count every character (split_lines drops them)
+        position: Dictionary with 0-based line and UTF-16 character offset
+    """
+    offset = sum(len(line) + 1 for line in lines[:position["line"]])
+    if position["line"] < len(lines):
+        line = lines[position["line"]]
+        units = line.encode('utf-16-le')[:position["character"] * 2].decode('utf-16-le', errors='ignore')
+        offset += len(units)
+    return offset
+
+
+def apply_text_edits(code, edits):
+    """
+    Apply non-overlapping edits (as returned by compute_text_edits) to the source.
+
+    Returns:
+        The edited source string
+    """
+    lines = code.split('\n')
+    result = code
+    for edit in sorted(edits, key=lambda e: (e["range"]["start"]["line"], e["range"]["start"]["character"]), reverse=True):
+        start = position_to_offset(lines, edit["range"]["start"])
+        end = position_to_offset(lines, edit["range"]["end"])
+        result = result[:start] + edit["newText"] + result[end:]
+    return result
@@ -49,12 +49,16 @@ try {
     fs.copyFileSync(path.join(sourceDir, 'app.py'), path.join(destDir, 'app.py'));
     console.log(`Copied: ${path.join(sourceDir, 'app.py')} -> ${path.join(destDir, 'app.py')}`);
     
+    // Copy cli.py (entry point for the stdio JSON-RPC backend)
+    fs.copyFileSync(path.join(sourceDir, 'cli.py'), path.join(destDir, 'cli.py'));
+    console.log(`Copied: ${path.join(sourceDir, 'cli.py')} -> ${path.join(destDir, 'cli.py')}`);
+    
     // Copy requirements.txt
     fs.copyFileSync(path.join(sourceDir, 'requirements.txt'), path.join(destDir, 'requirements.txt'));
     console.log(`Copied: ${path.join(sourceDir, 'requirements.txt')} -> ${path.join(destDir, 'requirements.txt')}`);
     
     // Copy directories
-    const dirs = ['transformers', 'utils', 'rules', 'templates', 'static'];
+    const dirs = ['server', 'transformers', 'utils', 'rules', 'templates', 'static'];
     for (const dir of dirs) {
         copyDir(path.join(sourceDir, dir), path.join(destDir, dir));
     }
@@ -1,11 +1,13 @@
 import * as vscode from 'vscode';
-import axios from 'axios';
 import * as cp from 'child_process';
 import * as path from 'path';
 
-// Set up the transformation service URL - replace with your service URL or localhost
-const SERVICE_URL = 'http://localhost:5000/process_code';
+// The Python backend runs as one long-lived process speaking newline-delimited
+// JSON-RPC over stdin/stdout (python cli.py stdio), so no port is needed.
 let pythonProcess: cp.ChildProcess | null = null;
+let nextRequestId = 1;
+let stdoutBuffer = '';
+const pendingRequests = new Map<number, { resolve: (value: any) => void; reject: (reason: any) => void }>();
 
 export function activate(context: vscode.ExtensionContext) {
     // Register the sugarize command
@@ -40,12 +42,22 @@ export function activate(context: vscode.ExtensionContext) {
     startPythonServer(context.extensionPath);
 }
 
+interface TextEdit {
+    range: {
+        start: { line: number; character: number };
+        end: { line: number; character: number };
+    };
+    newText: string;
+    rule?: string;
+}
+
 interface TransformationResponse {
     status?: string;
     message?: string;
     sugared_code?: string;
     desugared_code?: string;
     expanded_code?: string;
+    edits?: TextEdit[];
 }
 
 // Function to transform code based on the operation type
@@ -68,6 +80,19 @@ async function transformCode(operation: string) {
     const text = selection.isEmpty
         ? editor.document.getText()
         : editor.document.getText(selection);
+    
+    // Sugarize sends the whole document plus the selected lines and gets back
+    // minimal edits, so only the selected statements are analyzed and replaced
+    const params: { [key: string]: any } = operation === 'sugarize'
+        ? { code: editor.document.getText(), edits: true }
+        : { code: text };
+    if (operation === 'sugarize' && !selection.isEmpty) {
+        // A selection ending at column 0 does not include that last line
+        const endLine = selection.end.character === 0 && selection.end.line > selection.start.line
+            ? selection.end.line
+            : selection.end.line + 1;
+        params.range = { start_line: selection.start.line + 1, end_line: endLine };
+    }
 
     // No text to transform
     if (!text) {
@@ -102,17 +127,42 @@ async function transformCode(operation: string) {
     vscode.window.withProgress({
         location: vscode.ProgressLocation.Notification,
         title: `${operation === 'sugarize' ? 'Making code concise' : 'Expanding code'}...`,
-        cancellable: false
-    }, async (progress: vscode.Progress<{ message?: string; increment?: number }>) => {
+        cancellable: true
+    }, async (progress: vscode.Progress<{ message?: string; increment?: number }>, token: vscode.CancellationToken) => {
         try {
             // Call the API
-            const response = await callTransformationAPI(text, operation);
+            const response = await callTransformationAPI(operation, params, token);
+            
+            if (token.isCancellationRequested) {
+                return;
+            }
             
             if (response.status === 'error') {
                 vscode.window.showErrorMessage(`Error: ${response.message}`);
                 return;
             }
             
+            if (response.edits) {
+                // Apply only the rewritten statements
+                const edits = response.edits;
+                await editor.edit((editBuilder: vscode.TextEditorEdit) => {
+                    for (const edit of edits) {
+                        editBuilder.replace(
+                            new vscode.Range(
+                                edit.range.start.line, edit.range.start.character,
+                                edit.range.end.line, edit.range.end.character
+                            ),
+                            edit.newText
+                        );
+                    }
+                });
+                
+                vscode.window.showInformationMessage(
+                    edits.length ? `Applied ${edits.length} concise rewrite(s).` : 'No transformations were identified.'
+                );
+                return;
+            }
+            
             // Get the transformed code from the response
             const transformedCode = operation === 'sugarize' 
                 ? response.sugared_code 
@@ -147,19 +197,26 @@ async function transformCode(operation: string) {
     });
 }
 
-async function callTransformationAPI(code: string, operation: string): Promise<TransformationResponse> {
+async function callTransformationAPI(
+    operation: string,
+    params: object,
+    token?: vscode.CancellationToken
+): Promise<TransformationResponse> {
     try {
-        // First, try the remote service
-        const response = await axios.post(SERVICE_URL, {
-            code: code,
-            operation: operation
-        });
-        return response.data;
+        return await sendRequest(operation, params, token);
     } catch (error: any) {
-        // If the remote service fails, inform the user they need to set up the local service
-        if (error.code === 'ECONNREFUSED' || error.code === 'ENOTFOUND') {
+        if (error && error.code === -32800) {
+            return { status: 'cancelled', message: 'Request cancelled.' };
+        }
+        if (error && error.data) {
+            // Transformation errors carry the pipeline's error payload
+            return error.data;
+        }
+        
+        // If the backend is not running, inform the user they need to set up the local service
+        if (!pythonProcess) {
             vscode.window.showErrorMessage(
-                'Could not connect to Python transformation service. Make sure the service is running locally.'
+                'Could not reach the Python transformation service. Make sure the service is running locally.'
             );
             
             // Provide instructions for setting up the local service
@@ -183,6 +240,66 @@ async function callTransformationAPI(code: string, operation: string): Promise<T
     }
 }
 
+// Send one JSON-RPC request to the backend; requests are pipelined and matched by id
+function sendRequest(method: string, params: object, token?: vscode.CancellationToken): Promise<any> {
+    return new Promise((resolve, reject) => {
+        if (!pythonProcess || !pythonProcess.stdin) {
+            reject(new Error('Python transformation server is not running.'));
+            return;
+        }
+        
+        const id = nextRequestId++;
+        pendingRequests.set(id, { resolve, reject });
+        pythonProcess.stdin.write(JSON.stringify({ jsonrpc: '2.0', id: id, method: method, params: params }) + '\n');
+        
+        token?.onCancellationRequested(() => {
+            if (pendingRequests.has(id) && pythonProcess && pythonProcess.stdin) {
+                pythonProcess.stdin.write(JSON.stringify({ jsonrpc: '2.0', method: '$/cancelRequest', params: { id: id } }) + '\n');
+            }
+        });
+    });
+}
+
+// Split the backend's stdout into lines and resolve the matching pending requests
+function handleServerOutput(chunk: Buffer) {
+    stdoutBuffer += chunk.toString('utf8');
+    let newline = stdoutBuffer.indexOf('\n');
+    while (newline >= 0) {
+        const line = stdoutBuffer.slice(0, newline).trim();
+        stdoutBuffer = stdoutBuffer.slice(newline + 1);
+        newline = stdoutBuffer.indexOf('\n');
+        if (!line) {
+            continue;
+        }
+        
+        let message: any;
+        try {
+            message = JSON.parse(line);
+        } catch {
+            continue;
+        }
+        
+        const pending = pendingRequests.get(message.id);
+        if (!pending) {
+            continue;
+        }
+        pendingRequests.delete(message.id);
+        if (message.error) {
+            pending.reject(message.error);
+        } else {
+            pending.resolve(message.result);
+        }
+    }
+}
+
+function rejectPendingRequests(reason: string) {
+    for (const pending of pendingRequests.values()) {
+        pending.reject(new Error(reason));
+    }
+    pendingRequests.clear();
+    stdoutBuffer = '';
+}
+
 function startPythonServer(extensionPath: string) {
     try {
         // If the server is already running, don't start a new one
@@ -197,26 +314,28 @@ function startPythonServer(extensionPath: string) {
         // Find the Python executable
         const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
         
-        // Command to run the server
-        const command = `${pythonCommand} ${path.join(serverPath, 'app.py')}`;
+        // Start the long-lived JSON-RPC backend
+        pythonProcess = cp.spawn(pythonCommand, [path.join(serverPath, 'cli.py'), 'stdio'], {
+            cwd: serverPath,
+            stdio: ['pipe', 'pipe', 'inherit']
+        });
+        
+        pythonProcess.stdout?.on('data', handleServerOutput);
         
-        // Start the Python process
-        pythonProcess = cp.exec(command, { cwd: serverPath }, (error, stdout, stderr) => {
-            if (error) {
-                vscode.window.showErrorMessage(`Failed to start Python server: ${error.message}`);
-                pythonProcess = null;
-            }
+        pythonProcess.on('error', (error) => {
+            vscode.window.showErrorMessage(`Failed to start Python server: ${error.message}`);
+            rejectPendingRequests('Python transformation server failed to start.');
+            pythonProcess = null;
         });
         
         // Listen for process exit
-        if (pythonProcess) {
-            pythonProcess.on('exit', (code) => {
-                vscode.window.showInformationMessage(`Python server stopped with code ${code}`);
-                pythonProcess = null;
-            });
-            
-            vscode.window.showInformationMessage('Python transformation server started.');
-        }
+        pythonProcess.on('exit', (code) => {
+            vscode.window.showInformationMessage(`Python server stopped with code ${code}`);
+            rejectPendingRequests('Python transformation server stopped.');
+            pythonProcess = null;
+        });
+        
+        vscode.window.showInformationMessage('Python transformation server started.');
     } catch (error: any) {
         vscode.window.showErrorMessage(`Failed to start Python server: ${error.message}`);
     }
@@ -229,8 +348,8 @@ function stopPythonServer() {
             // On Windows, we need to use taskkill to kill the process and its children
             cp.exec(`taskkill /pid ${pythonProcess.pid} /f /t`);
         } else {
-            // On Unix-like systems, we can kill the process directly
-            pythonProcess.kill();
+            // On Unix-like systems, ask the backend to drain and exit by closing its stdin
+            pythonProcess.stdin?.end();
         }
         
         pythonProcess = null;
@@ -252,9 +371,9 @@ To use the VS Code Python Code Transformer extension, you need to run the Python
 2. If the service fails to start automatically, you can:
    - Navigate to the python-server directory in your extension folder
    - Run \`pip install -r requirements.txt\` to install dependencies
-   - Run \`python app.py\` to start the server
+   - Run \`python cli.py stdio\` to check that the backend starts
 
-3. The service should be running at http://localhost:5000
+3. The extension talks to the backend over stdin/stdout, so no port needs to be free.
 
 4. Once the service is running, you can use the extension to transform Python code.
 `;